@@ -0,0 +1,67 @@
+"""
+Tests for Administrativo app.
+"""
+import pytest
+from rest_framework.test import APIClient
+
+from apps.core.models import User
+from .models import Escola, Matricula, Funcionario, Financeiro, Documento
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    """
+    Query-count budget of every list and detail endpoint.
+
+    Each row points at its own user and school, so a serializer field that
+    queries per row goes over the budget.
+    """
+
+    LINHAS = 5
+    # Max queries of a list page, checked by the orcamento_lista_detalhe fixture
+    ORCAMENTOS = {
+        'escolas': 2,
+        'matriculas': 2,
+        'funcionarios': 2,
+        'financeiro': 2,
+        'documentos': 2,
+    }
+
+    def setup_method(self):
+        """Setup LINHAS rows of every model, each with its own user and school."""
+        self.client = APIClient()
+        for i in range(self.LINHAS):
+            usuario = User.objects.create(
+                username=f'usuario_orcamento{i}', first_name='Usuário', last_name=str(i)
+            )
+            escola = Escola.objects.create(
+                nome=f'Escola {i}', cnpj=f'00.000.000/0001-{i:02d}', diretor=usuario
+            )
+            Matricula.objects.create(
+                escola=escola, aluno=usuario, numero_matricula=f'M{i}', ano_letivo=2025
+            )
+            Funcionario.objects.create(
+                escola=escola, user=usuario, matricula_funcional=f'F{i}', cargo='professor',
+                data_admissao='2024-02-01', salario=4500
+            )
+            Financeiro.objects.create(
+                aluno=usuario,
+                tipo='mensalidade',
+                descricao='Março',
+                valor=900,
+                data_vencimento='2025-03-10',
+            )
+            Documento.objects.create(
+                usuario=usuario, tipo='cpf', numero=f'000.000.000-{i:02d}', arquivo='docs/cpf.pdf'
+            )
+        self.client.force_authenticate(user=usuario)
+
+    @pytest.mark.parametrize('endpoint', sorted(ORCAMENTOS))
+    def test_list_and_detail_within_budget(self, endpoint, orcamento_lista_detalhe):
+        """Test that list and detail cost the same few queries whatever the number of rows."""
+        orcamento_lista_detalhe(
+            self.client,
+            f'/api/v1/administrativo/{endpoint}/',
+            self.ORCAMENTOS[endpoint],
+            self.LINHAS,
+        )
@@ -2,7 +2,7 @@
 Admin configuration for AuraMind app.
 """
 from django.contrib import admin
-from .models import SugestaoIa, AnaliseIa, LogIa
+from .models import SugestaoIa, AnaliseIa, LogIa, FilaIa, UsoIa
 
 
 @admin.register(SugestaoIa)
@@ -23,7 +23,31 @@ class AnaliseIaAdmin(admin.ModelAdmin):
 
 @admin.register(LogIa)
 class LogIaAdmin(admin.ModelAdmin):
-    list_display = ['usuario', 'tipo', 'sucesso', 'created_at']
-    list_filter = ['tipo', 'sucesso', 'created_at']
+    list_display = ['usuario', 'tipo', 'sucesso', 'cache_hit', 'created_at']
+    list_filter = ['tipo', 'sucesso', 'cache_hit', 'created_at']
     search_fields = ['usuario__first_name']
     readonly_fields = ['created_at']
+
+
+@admin.register(FilaIa)
+class FilaIaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'professor', 'tipo', 'status', 'tentativas', 'created_at']
+    list_filter = ['tipo', 'status', 'created_at']
+    search_fields = ['professor__first_name']
+    readonly_fields = ['created_at', 'updated_at', 'iniciado_em', 'concluido_em']
+
+
+@admin.register(UsoIa)
+class UsoIaAdmin(admin.ModelAdmin):
+    list_display = [
+        'periodo',
+        'granularidade',
+        'usuario',
+        'tipo',
+        'sucesso',
+        'total',
+        'custo_token',
+    ]
+    list_filter = ['granularidade', 'tipo', 'sucesso', 'periodo']
+    search_fields = ['usuario__first_name']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,202 @@
+"""
+Priority scheduling of agent calls (interactive vs. bulk).
+
+Every POST of ``AuraMindService`` to the agent takes a slot from the
+process-wide ``agendador`` first. At most ``AURAMIND_AGENDADOR_VAGAS`` calls
+are in flight per process; the others wait in one queue per class:
+
+- ``interativa``: teacher requests (views and async jobs);
+- ``lote``: bulk work such as ``reanalisar_planos``.
+
+A freed slot always goes to a waiting interactive call before any queued
+bulk call (calls already in flight are never interrupted). Inside a class,
+calls are served by weighted fair queuing per school: each call gets a
+virtual finish tag ``max(V, last tag of its school) + custo / peso`` and the
+smallest tag goes first, so a school with many queued calls cannot push the
+others to the back of the queue. Weights come from
+``AURAMIND_AGENDADOR_PESOS`` (school id -> weight, default 1).
+
+Bulk work usually runs in another process (a management command), so
+interactive calls also leave a mark in the cache ``AURAMIND_AGENDADOR_CACHE``:
+while an interactive call was seen in the last ``AURAMIND_AGENDADOR_JANELA``
+seconds anywhere, bulk calls hold back, for at most
+``AURAMIND_AGENDADOR_LOTE_ESPERA_MAX`` seconds per call so a busy day cannot
+starve them.
+
+Queue wait times per class are kept for the status endpoint.
+
+The async views (ASGI) take no slot: their calls are bounded by the httpx
+pool (``AURAMIND_ASYNC_POOL_MAXSIZE``) instead, and only leave the
+interactive mark for bulk callers (``asinalizar_interativa``).
+"""
+import heapq
+import itertools
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+INTERATIVA = 'interativa'
+LOTE = 'lote'
+# In priority order
+CLASSES = (INTERATIVA, LOTE)
+
+# Recent waits kept per class for the percentiles
+AMOSTRAS_ESPERA = 1000
+
+
+class _Estatisticas:
+    """Queue wait times of one class."""
+
+    def __init__(self):
+        self.atendidas = 0
+        self.espera_total_ms = 0.0
+        self.espera_max_ms = 0.0
+        self.recentes = deque(maxlen=AMOSTRAS_ESPERA)
+
+    def registrar(self, espera_ms):
+        self.atendidas += 1
+        self.espera_total_ms += espera_ms
+        self.espera_max_ms = max(self.espera_max_ms, espera_ms)
+        self.recentes.append(espera_ms)
+
+    def resumo(self):
+        recentes = sorted(self.recentes)
+        if len(recentes) > 1:
+            p50, p95, p99 = (
+                statistics.quantiles(recentes, n=100, method='inclusive')[i] for i in (49, 94, 98)
+            )
+        else:
+            p50 = p95 = p99 = recentes[0] if recentes else None
+        return {
+            'atendidas': self.atendidas,
+            'espera_media_ms': (
+                round(self.espera_total_ms / self.atendidas, 2) if self.atendidas else None
+            ),
+            'espera_p50_ms': None if p50 is None else round(p50, 2),
+            'espera_p95_ms': None if p95 is None else round(p95, 2),
+            'espera_p99_ms': None if p99 is None else round(p99, 2),
+            'espera_max_ms': round(self.espera_max_ms, 2),
+        }
+
+
+class Agendador:
+    """Slots for agent calls, by priority class and fair per school."""
+
+    def __init__(self, vagas=None, prefixo='auramind:agendador'):
+        self._vagas = vagas
+        self.prefixo = prefixo
+        self.em_execucao = 0
+        self._condicao = threading.Condition()
+        self._filas = {classe: [] for classe in CLASSES}
+        self._virtual = {classe: 0.0 for classe in CLASSES}
+        self._ultima_etiqueta = {}
+        self._sequencia = itertools.count()
+        self._estatisticas = {classe: _Estatisticas() for classe in CLASSES}
+        self._sinalizado_em = 0.0
+
+    @property
+    def vagas(self):
+        return self._vagas or settings.AURAMIND_AGENDADOR_VAGAS
+
+    @property
+    def cache(self):
+        return caches[settings.AURAMIND_AGENDADOR_CACHE]
+
+    def _peso(self, escola_id):
+        return float(settings.AURAMIND_AGENDADOR_PESOS.get(str(escola_id), 1)) or 1.0
+
+    def _proximo(self):
+        for classe in CLASSES:
+            if self._filas[classe]:
+                return self._filas[classe][0]
+        return None
+
+    def _sinalizar_interativa(self):
+        """Tell other processes an interactive call is running (at most every half window)."""
+        agora = time.time()
+        janela = settings.AURAMIND_AGENDADOR_JANELA
+        if agora - self._sinalizado_em >= janela / 2:
+            self._sinalizado_em = agora
+            self.cache.set(f'{self.prefixo}:interativa_em', agora, timeout=max(1, int(janela) + 1))
+
+    async def asinalizar_interativa(self):
+        """``_sinalizar_interativa`` for async callers (skips the thread hop when not due)."""
+        if time.time() - self._sinalizado_em >= settings.AURAMIND_AGENDADOR_JANELA / 2:
+            await sync_to_async(self._sinalizar_interativa)()
+
+    def _ceder_a_interativas(self):
+        """Hold a bulk call back while interactive calls are active in any process."""
+        limite = time.monotonic() + settings.AURAMIND_AGENDADOR_LOTE_ESPERA_MAX
+        while time.monotonic() < limite:
+            visto_em = self.cache.get(f'{self.prefixo}:interativa_em')
+            livre_em = (visto_em or 0) + settings.AURAMIND_AGENDADOR_JANELA
+            if time.time() >= livre_em:
+                return
+            time.sleep(max(0.01, min(livre_em - time.time(), limite - time.monotonic(), 0.25)))
+
+    @contextmanager
+    def vaga(self, classe=INTERATIVA, escola_id=None, custo=1):
+        """
+        Hold one agent call slot for the duration of the block.
+
+        Yields:
+            Time waited for the slot, in ms
+        """
+        inicio = time.perf_counter()
+        if classe == LOTE:
+            self._ceder_a_interativas()
+        else:
+            self._sinalizar_interativa()
+
+        with self._condicao:
+            chave = (classe, escola_id)
+            partida = max(self._virtual[classe], self._ultima_etiqueta.get(chave, 0.0))
+            etiqueta = partida + custo / self._peso(escola_id)
+            self._ultima_etiqueta[chave] = etiqueta
+            pedido = (etiqueta, next(self._sequencia))
+            heapq.heappush(self._filas[classe], pedido)
+            while self.em_execucao >= self.vagas or self._proximo() != pedido:
+                self._condicao.wait()
+            heapq.heappop(self._filas[classe])
+            self._virtual[classe] = etiqueta
+            if not self._filas[classe]:
+                # Idle class: forget the tags so they do not grow forever
+                self._virtual[classe] = 0.0
+                self._ultima_etiqueta = {
+                    k: v for k, v in self._ultima_etiqueta.items() if k[0] != classe
+                }
+            self.em_execucao += 1
+            espera_ms = (time.perf_counter() - inicio) * 1000
+            self._estatisticas[classe].registrar(espera_ms)
+            # Another slot may still be free for the next caller in line
+            self._condicao.notify_all()
+
+        try:
+            yield espera_ms
+        finally:
+            with self._condicao:
+                self.em_execucao -= 1
+                self._condicao.notify_all()
+
+    def resumo(self):
+        """Slots, queue lengths and wait times per class, for the status endpoint."""
+        with self._condicao:
+            return {
+                'vagas': self.vagas,
+                'em_execucao': self.em_execucao,
+                'classes': {
+                    classe: dict(
+                        na_fila=len(self._filas[classe]), **self._estatisticas[classe].resumo()
+                    )
+                    for classe in CLASSES
+                },
+            }
+
+
+agendador = Agendador()
@@ -0,0 +1,110 @@
+"""
+Content-addressed cache for AuraMind responses.
+
+Responses are keyed on a SHA-256 of the normalized request payload, so
+identical requests from different teachers share one agent call. Entries live
+in two Django caches: ``auramind`` (local memory, LRU via ``MAX_ENTRIES``)
+and, optionally, ``auramind_db`` (database table shared by all workers).
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+# Fields that determine the content of a suggestion; plano_id/professor_id do not
+CAMPOS_SUGESTAO = (
+    'nivel_ensino', 'habilidade_foco', 'contexto_previo',
+    'formato_desejado', 'parametros_adicionais',
+)
+# Fields that determine the content of an analysis; the same template shared
+# by many teachers only differs in plano_id
+CAMPOS_ANALISE = (
+    'titulo', 'nivel_ensino', 'habilidades_bncc', 'objetivos_aprendizagem',
+    'atividade_dirigida', 'desenvolvimento', 'avaliacao',
+)
+
+
+def _normalizar(valor):
+    """Normalize strings (case, whitespace) recursively for hashing."""
+    if isinstance(valor, str):
+        return ' '.join(valor.split()).lower()
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    return valor
+
+
+def chave_payload(tipo, payload, campos=None):
+    """
+    Build the canonical cache key for a payload.
+
+    Args:
+        tipo: Call type (``sugestao``, ``analise``...), used as namespace
+        payload: Request data sent to the agent
+        campos: Fields that take part in the key (default: all)
+
+    Returns:
+        Key in the form ``auramind:<tipo>:<sha256>``
+    """
+    dados = {campo: payload.get(campo) for campo in campos} if campos else payload
+    canonico = json.dumps(
+        _normalizar(dados), sort_keys=True, separators=(',', ':'),
+        ensure_ascii=False, default=str
+    )
+    return f"auramind:{tipo}:{hashlib.sha256(canonico.encode()).hexdigest()}"
+
+
+class RespostaCache:
+    """
+    Two-tier (local memory + database) cache of agent responses.
+
+    Values are stored with their absolute expiry so that promoting an entry
+    from the database to local memory keeps the original TTL.
+    """
+
+    def __init__(self):
+        self.ttl = settings.AURAMIND_CACHE_TTL
+        self.local = caches['auramind']
+        self.db = caches['auramind_db'] if 'auramind_db' in settings.CACHES else None
+
+    @property
+    def ativo(self):
+        return self.ttl > 0
+
+    def get(self, chave):
+        """Return the cached response for ``chave`` or None."""
+        if not self.ativo:
+            return None
+        entrada = self.local.get(chave)
+        if entrada is None and self.db is not None:
+            try:
+                entrada = self.db.get(chave)
+            except DatabaseError as e:
+                logger.warning(f"Cache AuraMind em banco indisponível: {str(e)}")
+                return None
+            if entrada is not None:
+                restante = entrada[0] - time.time()
+                if restante > 0:
+                    self.local.set(chave, entrada, restante)
+        if entrada is None or entrada[0] <= time.time():
+            return None
+        return entrada[1]
+
+    def set(self, chave, resposta):
+        """Store ``resposta`` under ``chave`` in both tiers."""
+        if not self.ativo:
+            return
+        entrada = (time.time() + self.ttl, resposta)
+        self.local.set(chave, entrada, self.ttl)
+        if self.db is not None:
+            try:
+                self.db.set(chave, entrada, self.ttl)
+            except DatabaseError as e:
+                logger.warning(f"Cache AuraMind em banco indisponível: {str(e)}")
@@ -0,0 +1,140 @@
+"""
+HTTP client for the AuraMind IA Agent.
+
+Keeps a single pooled ``requests.Session`` per process so that calls to the
+agent reuse keep-alive connections instead of opening a new TCP connection
+for every suggestion or analysis.
+
+Bodies are serialized and parsed with orjson. Request bodies from
+``AURAMIND_COMPRESSAO_MIN_BYTES`` up (batches) are sent gzip-compressed at the
+fastest level (a 500-plan analysis batch goes from ~1.6 MB to ~330 KB in
+~18 ms; level 6 takes ~80 ms, see ``benchmarks/auramind_json_bench.py``), and
+the agent is asked for brotli (when the ``brotli`` package is installed, which
+urllib3 then uses to decode) or gzip responses.
+
+The async views (ASGI) use ``get_async_client`` instead: one pooled
+``httpx.AsyncClient`` per event loop, so a single worker can keep hundreds
+of agent calls in flight (``AURAMIND_ASYNC_POOL_MAXSIZE`` connections).
+"""
+import asyncio
+import gzip
+import threading
+import weakref
+
+import httpx
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode br responses)
+    ACCEPT_ENCODING = 'br, gzip'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip'
+
+NIVEL_GZIP = 1
+
+_session = None
+_session_lock = threading.Lock()
+# Event loop -> AsyncClient (httpx connections belong to the loop that opened them)
+_clientes_async = weakref.WeakKeyDictionary()
+
+
+def _build_session():
+    """Create a session with a connection pool sized from settings."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.AURAMIND_POOL_CONNECTIONS,
+        pool_maxsize=settings.AURAMIND_POOL_MAXSIZE,
+        pool_block=settings.AURAMIND_POOL_BLOCK,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide pooled session, creating it on first use.
+
+    The session is created lazily so that each gunicorn worker builds its own
+    pool after forking.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_timeout():
+    """Return the ``(connect, read)`` timeout tuple for agent calls."""
+    return (settings.AURAMIND_CONNECT_TIMEOUT, settings.AURAMIND_READ_TIMEOUT)
+
+
+def _build_async_client():
+    """Create an AsyncClient with a connection pool sized from settings."""
+    maximo = settings.AURAMIND_ASYNC_POOL_MAXSIZE
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=maximo, max_keepalive_connections=maximo),
+        timeout=httpx.Timeout(
+            settings.AURAMIND_READ_TIMEOUT,
+            connect=settings.AURAMIND_CONNECT_TIMEOUT,
+            pool=settings.AURAMIND_ASYNC_POOL_TIMEOUT,
+        ),
+        headers={'Accept-Encoding': ACCEPT_ENCODING},
+    )
+
+
+def get_async_client():
+    """
+    Return the pooled AsyncClient of the running event loop, creating it on first use.
+
+    Under uvicorn each worker has a single loop, so all its requests share
+    one pool. Under WSGI every async view runs in a fresh loop and gets a
+    fresh client: use the sync endpoints there.
+    """
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_async.get(loop)
+    if cliente is None:
+        cliente = _clientes_async[loop] = _build_async_client()
+    return cliente
+
+
+async def close_async_client():
+    """Close the AsyncClient of the running event loop, if any."""
+    cliente = _clientes_async.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.aclose()
+
+
+def codificar_json(payload):
+    """
+    Serialize an agent request body.
+
+    Returns:
+        ``(body, headers)``: the orjson bytes, gzip-compressed (with a
+        ``Content-Encoding`` header) from ``AURAMIND_COMPRESSAO_MIN_BYTES`` up
+    """
+    corpo = orjson.dumps(payload)
+    minimo = settings.AURAMIND_COMPRESSAO_MIN_BYTES
+    if minimo and len(corpo) >= minimo:
+        return gzip.compress(corpo, compresslevel=NIVEL_GZIP), {'Content-Encoding': 'gzip'}
+    return corpo, {}
+
+
+def ler_json(response):
+    """Parse an agent response body (already decompressed by urllib3 or httpx) with orjson."""
+    return orjson.loads(response.content)
+
+
+def close_session():
+    """Close the pooled session, e.g. on worker shutdown or in tests."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
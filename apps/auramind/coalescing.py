@@ -0,0 +1,268 @@
+"""
+Single-flight coalescing of identical AuraMind calls.
+
+Concurrent callers with the same payload hash share one upstream call:
+
+- within a process, followers wait on the leader's in-flight call;
+- across gunicorn workers (``AURAMIND_COALESCING`` = ``cache`` or ``db``),
+  one worker holds a lock (``cache.add`` or a PostgreSQL advisory lock) and
+  publishes its result in a shared cache, where the other workers pick it up.
+
+``aexecutar`` is the same for the async views: followers await the leader's
+future in the event loop, and the lock and cache calls go through
+``sync_to_async``.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+CONTADORES = ('lider', 'coalescida_local', 'coalescida_distribuida', 'timeout')
+
+
+def _cache_compartilhado():
+    return caches[settings.AURAMIND_COALESCING_CACHE]
+
+
+def _incrementar(contador):
+    """
+    Increment ``auramind:coalescing:<contador>`` in ``AURAMIND_COALESCING_CACHE``.
+
+    With a cache shared by the workers (Redis, or the database cache) the
+    totals cover all of them; with locmem they are per process.
+    """
+    cache = _cache_compartilhado()
+    chave = f'auramind:coalescing:{contador}'
+    try:
+        cache.incr(chave)
+    except ValueError:
+        if not cache.add(chave, 1, timeout=None):
+            cache.incr(chave)
+
+
+def estatisticas():
+    """Return the coalescing counters (see ``_incrementar`` for their scope)."""
+    cache = _cache_compartilhado()
+    valores = cache.get_many([f'auramind:coalescing:{c}' for c in CONTADORES])
+    return {c: valores.get(f'auramind:coalescing:{c}', 0) for c in CONTADORES}
+
+
+class _TravaCache:
+    """Cross-worker lock using the atomic ``cache.add``."""
+
+    def adquirir(self, chave):
+        return _cache_compartilhado().add(
+            f'{chave}:trava', 1, timeout=settings.AURAMIND_COALESCING_LEASE
+        )
+
+    def liberar(self, chave):
+        _cache_compartilhado().delete(f'{chave}:trava')
+
+
+class _TravaAdvisory:
+    """Cross-worker lock using PostgreSQL session-level advisory locks."""
+
+    @staticmethod
+    def _id(chave):
+        # 60 bits of the key hash fit in the signed bigint of pg_advisory_lock
+        return int(hashlib.sha256(chave.encode()).hexdigest()[:15], 16)
+
+    def adquirir(self, chave):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [self._id(chave)])
+            return cursor.fetchone()[0]
+
+    def liberar(self, chave):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [self._id(chave)])
+
+
+class _Chamada:
+    """An in-flight call shared by the callers of one process."""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+
+    ``executar(chave, fn)`` returns ``(resultado, coalescida)`` where
+    ``coalescida`` tells whether the result came from another caller's call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chamadas = {}
+        # (event loop, key) -> future of the leader's result
+        self._chamadas_async = {}
+
+    @property
+    def modo(self):
+        return settings.AURAMIND_COALESCING
+
+    def _trava(self):
+        if self.modo == 'db':
+            if connection.vendor == 'postgresql':
+                return _TravaAdvisory()
+            logger.warning("Coalescing 'db' requer PostgreSQL; usando trava em cache")
+        return _TravaCache()
+
+    def executar(self, chave, fn):
+        if self.modo == 'off':
+            return fn(), False
+
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._chamadas[chave] = _Chamada()
+
+        if not lider:
+            if not chamada.evento.wait(settings.AURAMIND_COALESCING_TIMEOUT):
+                _incrementar('timeout')
+                return fn(), False
+            _incrementar('coalescida_local')
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado, True
+
+        try:
+            if self.modo == 'local':
+                chamada.resultado, coalescida = fn(), False
+            else:
+                chamada.resultado, coalescida = self._executar_distribuido(chave, fn)
+            if not coalescida:
+                _incrementar('lider')
+            return chamada.resultado, coalescida
+        except Exception as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._chamadas[chave]
+            chamada.evento.set()
+
+    def _executar_distribuido(self, chave, fn):
+        """Run ``fn`` once across workers, sharing the result via the cache."""
+        cache = _cache_compartilhado()
+        chave_resultado = f'{chave}:resultado'
+        trava = self._trava()
+        limite = time.monotonic() + settings.AURAMIND_COALESCING_TIMEOUT
+
+        while True:
+            resultado = cache.get(chave_resultado)
+            if resultado is not None:
+                _incrementar('coalescida_distribuida')
+                return resultado, True
+
+            if trava.adquirir(chave):
+                try:
+                    # The previous holder may have published just before releasing
+                    resultado = cache.get(chave_resultado)
+                    if resultado is not None:
+                        _incrementar('coalescida_distribuida')
+                        return resultado, True
+                    resultado = fn()
+                    cache.set(
+                        chave_resultado, resultado,
+                        timeout=settings.AURAMIND_COALESCING_RESULT_TTL
+                    )
+                    return resultado, False
+                finally:
+                    trava.liberar(chave)
+
+            if time.monotonic() >= limite:
+                _incrementar('timeout')
+                return fn(), False
+            time.sleep(settings.AURAMIND_COALESCING_POLL)
+
+    async def aexecutar(self, chave, afn):
+        """Async ``executar``: ``afn`` is a coroutine function."""
+        if self.modo == 'off':
+            return await afn(), False
+
+        loop = asyncio.get_running_loop()
+        futuro = self._chamadas_async.get((loop, chave))
+        if futuro is not None:
+            try:
+                resultado = await asyncio.wait_for(
+                    asyncio.shield(futuro), settings.AURAMIND_COALESCING_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                await sync_to_async(_incrementar)('timeout')
+                return await afn(), False
+            except asyncio.CancelledError:
+                # The leader's request was cancelled (client gone): call the agent ourselves
+                if not futuro.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await afn(), False
+            await sync_to_async(_incrementar)('coalescida_local')
+            return resultado, True
+
+        futuro = self._chamadas_async[(loop, chave)] = loop.create_future()
+        try:
+            if self.modo == 'local':
+                resultado, coalescida = await afn(), False
+            else:
+                resultado, coalescida = await self._aexecutar_distribuido(chave, afn)
+            if not coalescida:
+                await sync_to_async(_incrementar)('lider')
+            futuro.set_result(resultado)
+            return resultado, coalescida
+        except Exception as e:
+            futuro.set_exception(e)
+            # Retrieved here so a leader without followers does not log "never retrieved"
+            futuro.exception()
+            raise
+        finally:
+            del self._chamadas_async[(loop, chave)]
+            if not futuro.done():
+                futuro.cancel()
+
+    async def _aexecutar_distribuido(self, chave, afn):
+        """Async ``_executar_distribuido``."""
+        cache = _cache_compartilhado()
+        chave_resultado = f'{chave}:resultado'
+        trava = self._trava()
+        limite = time.monotonic() + settings.AURAMIND_COALESCING_TIMEOUT
+
+        while True:
+            resultado = await sync_to_async(cache.get)(chave_resultado)
+            if resultado is not None:
+                await sync_to_async(_incrementar)('coalescida_distribuida')
+                return resultado, True
+
+            if await sync_to_async(trava.adquirir)(chave):
+                try:
+                    resultado = await sync_to_async(cache.get)(chave_resultado)
+                    if resultado is not None:
+                        await sync_to_async(_incrementar)('coalescida_distribuida')
+                        return resultado, True
+                    resultado = await afn()
+                    await sync_to_async(cache.set)(
+                        chave_resultado, resultado,
+                        timeout=settings.AURAMIND_COALESCING_RESULT_TTL
+                    )
+                    return resultado, False
+                finally:
+                    await sync_to_async(trava.liberar)(chave)
+
+            if time.monotonic() >= limite:
+                await sync_to_async(_incrementar)('timeout')
+                return await afn(), False
+            await asyncio.sleep(settings.AURAMIND_COALESCING_POLL)
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,216 @@
+"""
+Asynchronous job mode for AuraMind calls.
+
+Requests are stored in the ``FilaIa`` table and processed by a pool of
+worker threads (``python manage.py processar_fila_ia``). No external broker is
+needed: workers claim jobs with a conditional UPDATE, which is atomic on every
+database backend, and jobs left in ``processando`` by a dead worker are
+reclaimed once their lease expires.
+
+While the agent's circuit is open, jobs go back to the queue untouched and
+the workers sleep until the breaker lets a call through again. Clients poll
+``GET jobs/{id}/``, which answers at once; the long-poll (``?aguardar=``) is
+only served by the ASGI view ``aguardar_job_async``, where a wait holds no
+worker thread.
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import SugestaoIa, AnaliseIa, FilaIa
+from .resilience import AgenteIndisponivelError
+from .services import AuraMindService, dados_sugestao, dados_analise
+
+logger = logging.getLogger(__name__)
+
+STATUS_FINAIS = ('concluida', 'erro')
+
+
+def enfileirar_sugestao(professor, plano_data):
+    """Create a SugestaoIa in ``processando`` state and queue its generation."""
+    with transaction.atomic():
+        sugestao = SugestaoIa.objects.create(
+            professor=professor,
+            status='processando',
+            **dados_sugestao(plano_data)
+        )
+        return FilaIa.objects.create(
+            professor=professor,
+            tipo='sugestao',
+            payload=plano_data,
+            sugestao=sugestao
+        )
+
+
+def enfileirar_analise(professor, plano_data):
+    """Create an AnaliseIa in ``pendente`` state and queue the analysis."""
+    with transaction.atomic():
+        analise = AnaliseIa.objects.create(
+            professor=professor,
+            status='pendente',
+            **dados_analise(plano_data)
+        )
+        return FilaIa.objects.create(
+            professor=professor,
+            tipo='analise',
+            payload=plano_data,
+            analise=analise
+        )
+
+
+def reservar_proximo():
+    """
+    Claim the oldest runnable job.
+
+    Returns:
+        The claimed FilaIa, or None if the queue is empty.
+    """
+    expiracao = timezone.now() - timedelta(seconds=settings.AURAMIND_FILA_LEASE)
+    candidatos = FilaIa.objects.filter(
+        Q(status='pendente') | Q(status='processando', iniciado_em__lt=expiracao)
+    ).order_by('created_at').values_list('id', 'status', 'iniciado_em')[:10]
+
+    for job_id, status_atual, iniciado_em in candidatos:
+        reservado = FilaIa.objects.filter(
+            pk=job_id, status=status_atual, iniciado_em=iniciado_em
+        ).update(
+            status='processando',
+            iniciado_em=timezone.now(),
+            tentativas=F('tentativas') + 1
+        )
+        if reservado:
+            return FilaIa.objects.select_related(
+                'professor', 'sugestao', 'analise'
+            ).get(pk=job_id)
+    return None
+
+
+def _marcar_erro(job, mensagem):
+    """Mark a job and its result row as failed."""
+    job.status = 'erro'
+    job.mensagem_erro = mensagem
+    job.concluido_em = timezone.now()
+    job.save(update_fields=['status', 'mensagem_erro', 'concluido_em', 'updated_at'])
+    alvo = job.sugestao or job.analise
+    if alvo is not None:
+        alvo.status = 'erro'
+        alvo.save(update_fields=['status', 'updated_at'])
+
+
+def executar(job, service=None):
+    """
+    Run one claimed job against the agent and store its outcome.
+
+    A job refused by the open circuit is requeued without spending an
+    attempt; it is returned in ``pendente`` state with ``retry_after``, the
+    seconds until the breaker lets a call through again.
+    """
+    if job.tentativas > settings.AURAMIND_FILA_MAX_TENTATIVAS:
+        _marcar_erro(job, 'Número máximo de tentativas excedido')
+        return job
+
+    service = service or AuraMindService()
+    try:
+        if job.tipo == 'sugestao':
+            resultado = service.gerar_sugestao_planejamento(
+                job.professor, job.payload, sugestao=job.sugestao
+            )
+        else:
+            resultado = service.analisar_plano(
+                job.professor, job.payload, analise=job.analise
+            )
+    except AgenteIndisponivelError as e:
+        # Circuit open: give the job back to the queue without spending an attempt
+        FilaIa.objects.filter(pk=job.pk).update(
+            status='pendente', iniciado_em=None, tentativas=F('tentativas') - 1
+        )
+        job.status = 'pendente'
+        job.retry_after = e.retry_after
+        return job
+    except Exception as e:
+        logger.error(f"Job de IA {job.pk} falhou: {str(e)}")
+        _marcar_erro(job, str(e))
+        return job
+
+    job.status = 'concluida'
+    job.resultado = resultado
+    job.concluido_em = timezone.now()
+    job.save(update_fields=['status', 'resultado', 'concluido_em', 'updated_at'])
+    return job
+
+
+def processar_pendentes(limite=None):
+    """Process queued jobs in the current thread until the queue is empty."""
+    processados = 0
+    while limite is None or processados < limite:
+        job = reservar_proximo()
+        if job is None:
+            break
+        if executar(job).status == 'pendente':
+            break
+        processados += 1
+    return processados
+
+
+async def aaguardar_conclusao(job, timeout, intervalo=0.5):
+    """
+    Long-poll helper of the ASGI view: wait up to ``timeout`` seconds for a job to finish.
+
+    Returns:
+        The refreshed job, finished or not.
+    """
+    limite = time.monotonic() + min(timeout, settings.AURAMIND_LONG_POLL_MAX)
+    while job.status not in STATUS_FINAIS and time.monotonic() < limite:
+        await asyncio.sleep(intervalo)
+        await sync_to_async(job.refresh_from_db)()
+    return job
+
+
+class WorkerPool:
+    """
+    Pool of threads draining the FilaIa queue.
+
+    Agent calls are I/O bound, so threads are enough to keep several calls in
+    flight per process.
+    """
+
+    def __init__(self, workers=None, intervalo=None):
+        self.workers = workers or settings.AURAMIND_FILA_WORKERS
+        self.intervalo = intervalo or settings.AURAMIND_FILA_INTERVALO
+        self.parar = threading.Event()
+        self.threads = []
+
+    def _loop(self):
+        while not self.parar.is_set():
+            close_old_connections()
+            try:
+                job = reservar_proximo()
+            except Exception as e:
+                logger.error(f"Erro ao reservar job de IA: {str(e)}")
+                job = None
+            if job is not None:
+                job = executar(job)
+            if job is None or job.status == 'pendente':
+                # Open circuit: sleep until the breaker lets a call through again
+                self.parar.wait(max(self.intervalo, getattr(job, 'retry_after', 0)))
+        close_old_connections()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f'fila-ia-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=None):
+        self.parar.set()
+        for thread in self.threads:
+            thread.join(timeout)
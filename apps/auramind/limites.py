@@ -0,0 +1,302 @@
+"""
+Rate limits and daily token quotas for AI calls.
+
+Every AI action of ``AuraMindAPIViewSet`` is checked before the service calls
+the agent (or queues an async job), in two scopes:
+
+- ``usuario``: the requesting user;
+- ``escola``: the user's school, resolved through ``Funcionario.escola``
+  (users without a Funcionario profile are only limited per user).
+
+Each scope has a token bucket (``RAJADA`` requests of burst, refilled at
+``POR_MINUTO`` requests per minute; a batch costs one token per item) and a
+daily token quota: the sum of ``LogIa.custo_token`` since local midnight. The
+daily consumption is seeded from the daily UsoIa rollups (which aggregate
+LogIa.custo_token) the first time a scope is checked in the day and then
+incremented as each interaction is logged. The call that crosses the quota
+goes through; the next ones are refused until midnight.
+
+State lives in the Django cache ``AURAMIND_LIMITE_CACHE``, shared by all
+gunicorn workers. A bucket is read and written under a short lock taken with
+the atomic ``cache.add`` (per scope, in a fixed order), so concurrent calls
+never take more tokens than the bucket holds. Each lock stores a token of its
+holder: it is only released by that holder, and a holder that outlived
+``TRAVA_DURACAO`` (its lock expired and may be someone else's) writes
+nothing. A lock that stays busy is contention, not a limit: LimiteOcupadoError
+(503). Quotas stay approximate: the call that crosses one goes through, and
+so may calls checked concurrently with it.
+"""
+import math
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.administrativo.models import Funcionario
+
+from .models import UsoIa
+from .rollup import inicio_periodo
+
+# Sentinel cached for users without a Funcionario profile
+SEM_ESCOLA = 0
+
+# Bucket locks: expiry (s) if a worker dies holding one, wait (s) before giving up
+TRAVA_DURACAO = 2
+TRAVA_ESPERA = 1.0
+TRAVA_INTERVALO = 0.005
+
+
+class LimiteExcedidoError(Exception):
+    """A rate limit or daily quota was reached (answered with 429)."""
+
+    def __init__(self, mensagem, codigo_erro, escopo, limite, restante, retry_after):
+        self.codigo_erro = codigo_erro
+        self.escopo = escopo
+        self.limite = limite
+        self.restante = max(0, int(restante))
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"{mensagem} Tente novamente em {self.retry_after} s.")
+
+    def cabecalhos(self):
+        """Standard 429 headers (Retry-After and the IETF RateLimit fields)."""
+        return {
+            'Retry-After': str(self.retry_after),
+            'RateLimit-Limit': str(self.limite),
+            'RateLimit-Remaining': str(self.restante),
+            'RateLimit-Reset': str(self.retry_after),
+        }
+
+
+class LimiteOcupadoError(Exception):
+    """The rate limit state stayed locked by other calls (answered with 503)."""
+
+    retry_after = 1
+
+    def __init__(self, escopo):
+        self.escopo = escopo
+        super().__init__(
+            f"Limites de IA ({escopo}) ocupados por outras requisições. "
+            f"Tente novamente em {self.retry_after} s."
+        )
+
+
+@dataclass(frozen=True)
+class Limites:
+    """Bucket and quota configuration of a scope (0 disables each part)."""
+    rajada: int
+    por_minuto: float
+    quota_dia: int
+
+
+def limites(escopo):
+    """Configured limits of ``usuario`` or ``escola``."""
+    prefixo = f'AURAMIND_LIMITE_{escopo.upper()}'
+    return Limites(
+        rajada=getattr(settings, f'{prefixo}_RAJADA'),
+        por_minuto=getattr(settings, f'{prefixo}_POR_MINUTO'),
+        quota_dia=getattr(settings, f'AURAMIND_QUOTA_{escopo.upper()}_DIA'),
+    )
+
+
+def segundos_ate_meia_noite(agora=None):
+    """Seconds until the next local midnight (when daily quotas reset)."""
+    agora = timezone.localtime(agora or timezone.now())
+    amanha = (agora + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, (amanha - agora).total_seconds())
+
+
+def escola_do_usuario(usuario):
+    """
+    Id of the user's school (``Funcionario.escola``), or None.
+
+    Cached for a few minutes in ``AURAMIND_LIMITE_CACHE``; also used by the
+    scheduler to queue calls per school.
+    """
+    chave = f'auramind:escola_de:{usuario.pk}'
+    cache = caches[settings.AURAMIND_LIMITE_CACHE]
+    escola_id = cache.get(chave)
+    if escola_id is None:
+        escola_id = Funcionario.objects.filter(user_id=usuario.pk).values_list(
+            'escola_id', flat=True
+        ).first() or SEM_ESCOLA
+        cache.set(chave, escola_id, timeout=300)
+    return None if escola_id == SEM_ESCOLA else escola_id
+
+
+class LimitadorIa:
+    """Token buckets and daily quotas per user and per school."""
+
+    def __init__(self, nome='ia'):
+        self.prefixo = f'auramind:limite:{nome}'
+
+    @property
+    def cache(self):
+        return caches[settings.AURAMIND_LIMITE_CACHE]
+
+    def _chave(self, *partes):
+        return ':'.join((self.prefixo, *map(str, partes)))
+
+    def escopos(self, usuario):
+        """``(escopo, id)`` pairs that apply to ``usuario``."""
+        escopos = [('usuario', usuario.pk)]
+        escola_id = escola_do_usuario(usuario)
+        if escola_id is not None:
+            escopos.append(('escola', escola_id))
+        return escopos
+
+    def _chave_consumo(self, escopo, ident, agora):
+        return self._chave(
+            'consumo', escopo, ident, inicio_periodo(agora, 'dia').date().isoformat()
+        )
+
+    def consumo_diario(self, escopo, ident, agora=None):
+        """Tokens (``LogIa.custo_token``) consumed today by the scope."""
+        agora = agora or timezone.now()
+        chave = self._chave_consumo(escopo, ident, agora)
+        consumo = self.cache.get(chave)
+        if consumo is None:
+            filtro = (
+                {'usuario_id': ident}
+                if escopo == 'usuario'
+                else {'usuario__funcionario_profile__escola_id': ident}
+            )
+            consumo = UsoIa.objects.filter(
+                granularidade='dia', periodo=inicio_periodo(agora, 'dia'), **filtro
+            ).aggregate(total=Sum('custo_token'))['total'] or 0
+            self.cache.add(chave, consumo, timeout=int(segundos_ate_meia_noite(agora)) + 60)
+            consumo = self.cache.get(chave, consumo)
+        return consumo
+
+    def registrar_consumo(self, usuario, tokens):
+        """Add the tokens of a logged interaction to today's counters."""
+        if not tokens or usuario is None:
+            return
+        agora = timezone.now()
+        for escopo, ident in self.escopos(usuario):
+            self.consumo_diario(escopo, ident, agora)
+            try:
+                self.cache.incr(self._chave_consumo(escopo, ident, agora), tokens)
+            except ValueError:
+                # Evicted between the read and the increment; reseeded on the next check
+                pass
+
+    @contextmanager
+    def _travas(self, escopos):
+        """
+        Hold the bucket locks of ``escopos`` for a read-modify-write.
+
+        Locks are taken in sorted order, so two calls sharing a school never
+        wait on each other crosswise. Yields a function telling whether every
+        lock is still this call's (none expired and was taken by another).
+
+        Raises:
+            LimiteOcupadoError: If a lock is not free within ``TRAVA_ESPERA``
+        """
+        travas = sorted(
+            (self._chave('trava', escopo, ident), escopo) for escopo, ident, _ in escopos
+        )
+        dono = uuid.uuid4().hex
+        adquiridas = []
+
+        def validas():
+            valores = self.cache.get_many(adquiridas)
+            return len(valores) == len(adquiridas) and all(
+                valor == dono for valor in valores.values()
+            )
+
+        try:
+            for chave, escopo in travas:
+                limite = time.monotonic() + TRAVA_ESPERA
+                while not self.cache.add(chave, dono, timeout=TRAVA_DURACAO):
+                    if time.monotonic() >= limite:
+                        raise LimiteOcupadoError(escopo)
+                    time.sleep(TRAVA_INTERVALO)
+                adquiridas.append(chave)
+            yield validas
+        finally:
+            # Only the locks still holding our token: an expired one may be another call's now
+            minhas = [
+                chave for chave, valor in self.cache.get_many(adquiridas).items() if valor == dono
+            ]
+            if minhas:
+                self.cache.delete_many(minhas)
+
+    def _bucket(self, escopo, ident, config, agora):
+        """Tokens available in the bucket now (refilled since the last call)."""
+        estado = self.cache.get(self._chave('bucket', escopo, ident))
+        if estado is None:
+            return float(config.rajada)
+        tokens, atualizado_em = estado
+        taxa = config.por_minuto / 60
+        return min(float(config.rajada), tokens + max(0.0, agora - atualizado_em) * taxa)
+
+    def consumir(self, usuario, custo=1):
+        """
+        Take ``custo`` tokens from every bucket of the user.
+
+        Nothing is taken unless all buckets and quotas allow the call.
+
+        Returns:
+            The ``RateLimit-*`` headers of the most restrictive bucket
+
+        Raises:
+            LimiteExcedidoError: If a daily quota is exhausted or a bucket is empty
+            LimiteOcupadoError: If the buckets stay locked by concurrent calls
+        """
+        escopos = [(escopo, ident, limites(escopo)) for escopo, ident in self.escopos(usuario)]
+
+        for escopo, ident, config in escopos:
+            if config.quota_dia and self.consumo_diario(escopo, ident) >= config.quota_dia:
+                raise LimiteExcedidoError(
+                    f"Quota diária de tokens de IA ({escopo}) esgotada.",
+                    'QUOTA_DIARIA_EXCEDIDA', escopo, config.quota_dia, 0, segundos_ate_meia_noite()
+                )
+
+        com_bucket = [
+            (escopo, ident, config)
+            for escopo, ident, config in escopos
+            if config.rajada and config.por_minuto
+        ]
+        restantes = []
+        with self._travas(com_bucket) as validas:
+            agora = time.time()
+            for escopo, ident, config in com_bucket:
+                # A batch larger than the burst drains the bucket instead of never fitting
+                necessario = min(custo, config.rajada)
+                tokens = self._bucket(escopo, ident, config, agora)
+                if tokens < necessario:
+                    raise LimiteExcedidoError(
+                        f"Limite de requisições de IA ({escopo}) excedido.",
+                        'LIMITE_TAXA_EXCEDIDO', escopo, config.rajada, tokens,
+                        (necessario - tokens) * 60 / config.por_minuto
+                    )
+                restantes.append((escopo, ident, config, tokens - necessario))
+
+            if not validas():
+                # Held past TRAVA_DURACAO: another call may have read the same buckets
+                raise LimiteOcupadoError(com_bucket[0][0])
+            for escopo, ident, config, tokens in restantes:
+                cheio_em = (config.rajada - tokens) * 60 / config.por_minuto
+                self.cache.set(
+                    self._chave('bucket', escopo, ident),
+                    (tokens, agora),
+                    timeout=math.ceil(cheio_em) + 1,
+                )
+
+        if not restantes:
+            return {}
+        escopo, ident, config, tokens = min(restantes, key=lambda item: item[3])
+        return {
+            'RateLimit-Limit': str(config.rajada),
+            'RateLimit-Remaining': str(int(tokens)),
+            'RateLimit-Reset': str(math.ceil((config.rajada - tokens) * 60 / config.por_minuto)),
+        }
+
+
+limitador = LimitadorIa()
@@ -0,0 +1,165 @@
+"""
+Write-behind sink for LogIa rows.
+
+Interaction logs are collected in memory and written with ``bulk_create``
+once ``AURAMIND_LOG_LOTE`` rows are buffered or the oldest buffered row is
+``AURAMIND_LOG_INTERVALO`` seconds old, instead of one INSERT per request.
+Each written batch is also merged into the UsoIa rollups.
+A daemon thread flushes on the time threshold when traffic stops, and the
+buffer is flushed at interpreter exit (gunicorn worker shutdown) and by
+``processar_fila_ia`` when it stops.
+
+Large ``saida`` bodies (over ``AURAMIND_LOG_SAIDA_MAX_BYTES``) are stored
+compressed (zlib + base64) or truncated, per ``AURAMIND_LOG_SAIDA_MODO``.
+"""
+import atexit
+import base64
+import json
+import logging
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from .models import LogIa
+from .rollup import acumular
+
+logger = logging.getLogger(__name__)
+
+
+def compactar_saida(saida):
+    """
+    Shrink a ``saida`` body larger than ``AURAMIND_LOG_SAIDA_MAX_BYTES``.
+
+    Returns:
+        The original body, or a marker dict with the compressed
+        (``_compactado``) or truncated (``_truncado``) content
+    """
+    limite = settings.AURAMIND_LOG_SAIDA_MAX_BYTES
+    if not limite or not saida:
+        return saida
+    texto = json.dumps(saida, ensure_ascii=False, separators=(',', ':'), default=str)
+    tamanho = len(texto.encode())
+    if tamanho <= limite:
+        return saida
+    if settings.AURAMIND_LOG_SAIDA_MODO == 'truncar':
+        return {
+            '_truncado': True,
+            'tamanho_original': tamanho,
+            'previa': texto.encode()[:limite].decode(errors='ignore'),
+        }
+    return {
+        '_compactado': 'zlib+base64',
+        'tamanho_original': tamanho,
+        'dados': base64.b64encode(zlib.compress(texto.encode(), 6)).decode('ascii'),
+    }
+
+
+def expandir_saida(saida):
+    """Return the original body of a compressed ``saida`` (other bodies as-is)."""
+    if isinstance(saida, dict) and saida.get('_compactado') == 'zlib+base64':
+        return json.loads(zlib.decompress(base64.b64decode(saida['dados'])))
+    return saida
+
+
+class LogSink:
+    """
+    Thread-safe buffer of unsaved LogIa instances.
+
+    With ``AURAMIND_LOG_LOTE`` <= 1 every record is saved immediately, in the
+    caller's thread (the behaviour used by the test suite).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._primeiro = None
+        self._thread = None
+        self._parar = threading.Event()
+
+    @property
+    def pendentes(self):
+        return len(self._buffer)
+
+    def registrar(self, **campos):
+        """Buffer one LogIa row built from ``campos``."""
+        campos['saida'] = compactar_saida(campos.get('saida'))
+        log = LogIa(**campos)
+
+        lote = settings.AURAMIND_LOG_LOTE
+        if lote <= 1:
+            log.save()
+            acumular([log])
+            return
+
+        with self._lock:
+            self._buffer.append(log)
+            if self._primeiro is None:
+                self._primeiro = time.monotonic()
+            cheio = len(self._buffer) >= lote
+            vencido = time.monotonic() - self._primeiro >= settings.AURAMIND_LOG_INTERVALO
+        self._iniciar_thread()
+        if cheio or vencido:
+            self.flush()
+
+    def flush(self):
+        """
+        Write every buffered row with a single ``bulk_create``.
+
+        Returns:
+            Number of rows written
+        """
+        with self._lock:
+            lote, self._buffer = self._buffer, []
+            self._primeiro = None
+        if not lote:
+            return 0
+        try:
+            LogIa.objects.bulk_create(lote, batch_size=500)
+        except DatabaseError as e:
+            logger.error(f"Erro ao gravar {len(lote)} logs de IA: {str(e)}")
+            with self._lock:
+                # Keep the rows for the next flush, up to the buffer limit
+                espaco = settings.AURAMIND_LOG_BUFFER_MAX - len(self._buffer)
+                descartados = max(0, len(lote) - espaco)
+                self._buffer[:0] = lote[descartados:]
+                if self._buffer and self._primeiro is None:
+                    self._primeiro = time.monotonic()
+            if descartados:
+                logger.error(f"{descartados} logs de IA descartados (buffer cheio)")
+            return 0
+        acumular(lote)
+        return len(lote)
+
+    def _iniciar_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='log-ia-sink', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._parar.wait(settings.AURAMIND_LOG_INTERVALO):
+            with self._lock:
+                vencido = (
+                    self._primeiro is not None
+                    and time.monotonic() - self._primeiro >= settings.AURAMIND_LOG_INTERVALO
+                )
+            if vencido:
+                self.flush()
+                close_old_connections()
+
+    def encerrar(self):
+        """Stop the flush thread and write what is left in the buffer."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        return self.flush()
+
+
+log_sink = LogSink()
+atexit.register(log_sink.encerrar)
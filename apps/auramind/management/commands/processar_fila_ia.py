@@ -0,0 +1,51 @@
+"""
+Run the AuraMind background worker pool.
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from apps.auramind.jobs import WorkerPool, processar_pendentes
+from apps.auramind.logsink import log_sink
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de jobs assíncronos do AuraMind (sugestões e análises).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Número de threads de processamento (padrão: AURAMIND_FILA_WORKERS)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=None,
+            help='Intervalo de polling em segundos quando a fila está vazia'
+        )
+        parser.add_argument(
+            '--uma-vez', action='store_true',
+            help='Processa os jobs pendentes e encerra'
+        )
+
+    def handle(self, *args, **options):
+        if options['uma_vez']:
+            total = processar_pendentes()
+            log_sink.encerrar()
+            self.stdout.write(self.style.SUCCESS(f'{total} jobs processados'))
+            return
+
+        pool = WorkerPool(workers=options['workers'], intervalo=options['intervalo'])
+
+        def encerrar(signum, frame):
+            pool.parar.set()
+
+        signal.signal(signal.SIGTERM, encerrar)
+        signal.signal(signal.SIGINT, encerrar)
+
+        pool.start()
+        self.stdout.write(f'Fila de IA: {pool.workers} workers iniciados')
+        while not pool.parar.wait(1):
+            pass
+        pool.stop()
+        # Write the LogIa rows still buffered by the workers
+        log_sink.encerrar()
+        self.stdout.write(self.style.SUCCESS('Fila de IA encerrada'))
@@ -0,0 +1,86 @@
+"""
+Re-run the AuraMind analysis over every lesson plan.
+
+Needed when the agent's scoring model changes. Plans are streamed in chunks,
+scored in batches by the agent and saved with bulk_create; use --retomar to
+continue an interrupted run from its checkpoint.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.auramind.reanalise import FONTES, Reanalise, gravar_checkpoint
+from apps.auramind.resilience import AgenteIndisponivelError
+from apps.auramind.services import AuraMindAPIError
+
+
+class Command(BaseCommand):
+    help = 'Reanalisa todos os planejamentos (templates e planejamentos anuais) com o AuraMind.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fonte', action='append', choices=list(FONTES),
+            help='Restringe a uma fonte (pode ser repetido; padrão: todas)'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=None,
+            help='Planos por chamada ao agente (padrão: AURAMIND_REANALISE_LOTE)'
+        )
+        parser.add_argument(
+            '--chunk', type=int, default=1000,
+            help='Planos lidos do banco por vez'
+        )
+        parser.add_argument(
+            '--checkpoint', default=None,
+            help='Arquivo de checkpoint (padrão: AURAMIND_REANALISE_CHECKPOINT)'
+        )
+        parser.add_argument(
+            '--retomar', action='store_true',
+            help='Continua a partir do checkpoint em vez de recomeçar'
+        )
+        parser.add_argument(
+            '--responsavel', type=int, default=None,
+            help='ID do usuário a quem atribuir templates sem autor (padrão: ignorá-los)'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote'] or settings.AURAMIND_REANALISE_LOTE
+        if lote < 1:
+            raise CommandError('--lote deve ser maior que zero')
+        caminho = options['checkpoint'] or settings.AURAMIND_REANALISE_CHECKPOINT
+        if not options['retomar']:
+            gravar_checkpoint(caminho, {'ultimo_id': {}, 'total': 0})
+
+        reanalise = Reanalise(
+            lote=lote,
+            chunk_size=options['chunk'],
+            responsavel_id=options['responsavel'],
+            checkpoint=caminho
+        )
+        if options['retomar']:
+            self.stdout.write(
+                f"Retomando do checkpoint: {reanalise.checkpoint['ultimo_id'] or 'início'}"
+            )
+
+        inicio = time.perf_counter()
+        planos = falhas = ignorados = 0
+        try:
+            for progresso in reanalise.executar(options['fonte'] or list(FONTES)):
+                planos += progresso['planos']
+                falhas += progresso['falhas']
+                ignorados += progresso['ignorados']
+                decorrido = time.perf_counter() - inicio
+                self.stdout.write(
+                    f"{progresso['fonte']}: {planos} planos até o id {progresso['ultimo_id']} "
+                    f"({planos / decorrido:.1f} planos/s)"
+                )
+        except (AgenteIndisponivelError, AuraMindAPIError) as e:
+            raise CommandError(f'{e}. Execute novamente com --retomar para continuar.')
+
+        decorrido = time.perf_counter() - inicio
+        taxa = planos / decorrido if decorrido else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{planos} planos reanalisados em {decorrido:.1f}s ({taxa:.1f} planos/s); '
+            f'{falhas} com erro, {ignorados} sem professor ignorados'
+        ))
@@ -0,0 +1,55 @@
+"""
+Rebuild the UsoIa rollups from the LogIa table.
+
+Only needed once for logs written before the rollups existed, or after
+changing the histogram buckets; new logs are aggregated as they are written.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.auramind.models import LogIa, UsoIa
+from apps.auramind.rollup import acumular, inicio_periodo
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os agregados de uso de IA (UsoIa) a partir dos logs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=None,
+            help='Reconstrói apenas os últimos N dias (padrão: todo o histórico)'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=2000,
+            help='Logs lidos por lote'
+        )
+
+    def handle(self, *args, **options):
+        logs = LogIa.objects.only(
+            'usuario_id', 'tipo', 'sucesso', 'custo_token', 'tokens_economizados',
+            'cache_hit', 'tempo_resposta_ms', 'created_at'
+        ).order_by('created_at')
+        usos = UsoIa.objects.all()
+        if options['dias']:
+            # Start on a day boundary so no rollup row is partially rebuilt
+            desde = inicio_periodo(timezone.now() - timedelta(days=options['dias']), 'dia')
+            logs = logs.filter(created_at__gte=desde)
+            usos = usos.filter(periodo__gte=desde)
+
+        with transaction.atomic():
+            usos.delete()
+            total = 0
+            lote = []
+            for log in logs.iterator(chunk_size=options['lote']):
+                lote.append(log)
+                if len(lote) >= options['lote']:
+                    acumular(lote)
+                    total += len(lote)
+                    lote = []
+            acumular(lote)
+            total += len(lote)
+
+        self.stdout.write(self.style.SUCCESS(f'{total} logs agregados em UsoIa'))
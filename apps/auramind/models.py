@@ -200,6 +200,15 @@ class LogIa(models.Model):
         blank=True,
         verbose_name=_('Mensagem de Erro')
     )
+    cache_hit = models.BooleanField(
+        default=False,
+        verbose_name=_('Resposta do Cache')
+    )
+    tokens_economizados = models.IntegerField(
+        default=0,
+        verbose_name=_('Tokens Economizados'),
+        help_text=_('Custo original da resposta servida pelo cache')
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Criado em'))
     
     class Meta:
@@ -209,7 +218,186 @@ class LogIa(models.Model):
         indexes = [
             models.Index(fields=['usuario', '-created_at']),
             models.Index(fields=['tipo', 'sucesso']),
+            # Cursor pagination (apps.core.paginacao)
+            models.Index(fields=['-created_at', '-id']),
         ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.created_at}"
+
+
+class FilaIa(models.Model):
+    """
+    Database-backed job queue for asynchronous AuraMind calls.
+
+    Each job points to the SugestaoIa/AnaliseIa row it fills in, so clients
+    can poll either the job or the result row.
+    """
+    TIPO_CHOICES = [
+        ('sugestao', _('Sugestão')),
+        ('analise', _('Análise')),
+    ]
+
+    STATUS_CHOICES = [
+        ('pendente', _('Pendente')),
+        ('processando', _('Processando')),
+        ('concluida', _('Concluída')),
+        ('erro', _('Erro')),
+    ]
+
+    professor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='fila_ia',
+        verbose_name=_('Professor')
+    )
+    tipo = models.CharField(
+        max_length=20,
+        choices=TIPO_CHOICES,
+        verbose_name=_('Tipo')
+    )
+    payload = models.JSONField(
+        verbose_name=_('Dados da Requisição')
+    )
+    sugestao = models.ForeignKey(
+        SugestaoIa,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name=_('Sugestão')
+    )
+    analise = models.ForeignKey(
+        AnaliseIa,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name=_('Análise')
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pendente',
+        verbose_name=_('Status')
+    )
+    resultado = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('Resultado')
+    )
+    tentativas = models.IntegerField(
+        default=0,
+        verbose_name=_('Tentativas')
+    )
+    mensagem_erro = models.TextField(
+        blank=True,
+        verbose_name=_('Mensagem de Erro')
+    )
+    iniciado_em = models.DateTimeField(null=True, blank=True, verbose_name=_('Iniciado em'))
+    concluido_em = models.DateTimeField(null=True, blank=True, verbose_name=_('Concluído em'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Criado em'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Atualizado em'))
+
+    class Meta:
+        verbose_name = _('Job de IA')
+        verbose_name_plural = _('Fila de IA')
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['professor', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} - {self.get_status_display()}"
+
+
+class UsoIa(models.Model):
+    """
+    Pre-aggregated AI usage per hour/day, user, type and outcome.
+
+    Maintained incrementally as LogIa rows are written (see ``rollup``), so
+    usage dashboards never scan the log table.
+    """
+    GRANULARIDADE_CHOICES = [
+        ('hora', _('Hora')),
+        ('dia', _('Dia')),
+    ]
+
+    granularidade = models.CharField(
+        max_length=4,
+        choices=GRANULARIDADE_CHOICES,
+        verbose_name=_('Granularidade')
+    )
+    periodo = models.DateTimeField(
+        verbose_name=_('Início do Período')
+    )
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='uso_ia',
+        verbose_name=_('Usuário')
+    )
+    tipo = models.CharField(
+        max_length=20,
+        choices=LogIa.TIPO_CHOICES,
+        verbose_name=_('Tipo')
+    )
+    sucesso = models.BooleanField(
+        verbose_name=_('Sucesso')
+    )
+    total = models.IntegerField(
+        default=0,
+        verbose_name=_('Interações')
+    )
+    custo_token = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Custo em Tokens')
+    )
+    tokens_economizados = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Tokens Economizados')
+    )
+    cache_hits = models.IntegerField(
+        default=0,
+        verbose_name=_('Respostas do Cache')
+    )
+    tempo_total_ms = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Tempo Total (ms)')
+    )
+    tempo_max_ms = models.IntegerField(
+        default=0,
+        verbose_name=_('Tempo Máximo (ms)')
+    )
+    histograma = models.JSONField(
+        default=list,
+        verbose_name=_('Histograma de Latência'),
+        help_text=_('Contagem por faixa de rollup.LIMITES_LATENCIA_MS')
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Atualizado em'))
+
+    class Meta:
+        verbose_name = _('Uso de IA')
+        verbose_name_plural = _('Uso de IA')
+        ordering = ['-periodo']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularidade', 'periodo', 'usuario', 'tipo', 'sucesso'],
+                name='uso_ia_unico'
+            ),
+            # NULLs are distinct in the constraint above: one row for the logs without a user
+            models.UniqueConstraint(
+                fields=['granularidade', 'periodo', 'tipo', 'sucesso'],
+                condition=models.Q(usuario__isnull=True),
+                name='uso_ia_unico_sem_usuario'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularidade', '-periodo']),
+            models.Index(fields=['usuario', 'granularidade', '-periodo']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_granularidade_display()} {self.periodo} - {self.get_tipo_display()}"
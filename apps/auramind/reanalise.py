@@ -0,0 +1,214 @@
+"""
+Bulk re-analysis of lesson plans (after the agent's scoring model changes).
+
+Plans are streamed from the database in primary-key order with
+``iterator()``, sent to the agent's batch endpoint ``lote`` at a time and
+saved as AnaliseIa rows with one ``bulk_create`` per batch. After each batch
+the last primary key of every source is written to a checkpoint file, so an
+interrupted run resumes where it stopped; at most the batch in flight is
+analysed twice.
+
+Sources:
+    template: every PlanejamentoTemplate (tipo_analise ``aderencia_template``)
+    anual: every PlanejamentoAnual with its UnidadeTematica rows
+        (tipo_analise ``aderencia_planejamento_anual``)
+"""
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from apps.pedagogico.models import PlanejamentoAnual, UnidadeTematica
+from apps.planejamentos.models import PlanejamentoTemplate
+
+from .models import AnaliseIa
+from .agendamento import LOTE
+from .services import AuraMindService, campos_analise
+
+logger = logging.getLogger(__name__)
+
+
+def payload_template(template):
+    """Agent ``RequisicaoAnalise`` payload of a PlanejamentoTemplate."""
+    return {
+        'plano_id': template.pk,
+        'titulo': template.titulo,
+        'nivel_ensino': template.nivel_ensino,
+        'habilidades_bncc': list(template.habilidades_bncc or []),
+        'objetivos_aprendizagem': template.objetivos_aprendizagem or '',
+        'atividade_dirigida': template.atividade_dirigida or '',
+        'desenvolvimento': template.desenvolvimento or '',
+        'avaliacao': template.avaliacao or '',
+    }
+
+
+def payload_planejamento_anual(planejamento):
+    """
+    Agent ``RequisicaoAnalise`` payload of a PlanejamentoAnual.
+
+    The plan has no activity or assessment sections: the general
+    introduction stands for the objectives and the thematic units (in
+    ``ordem``) for the development; the declared skills are those of all units.
+    """
+    unidades = list(planejamento.unidades_tematicas.all())
+    habilidades = []
+    for unidade in unidades:
+        for codigo in unidade.habilidades_bncc or []:
+            if codigo not in habilidades:
+                habilidades.append(codigo)
+    return {
+        'plano_id': planejamento.pk,
+        'titulo': planejamento.titulo,
+        'nivel_ensino': planejamento.turma.nivel_ensino,
+        'habilidades_bncc': habilidades,
+        'objetivos_aprendizagem': planejamento.introducao_geral or '',
+        'atividade_dirigida': '',
+        'desenvolvimento': '\n'.join(
+            f"{unidade.titulo}: {unidade.descricao}" for unidade in unidades
+        ),
+        'avaliacao': '',
+    }
+
+
+@dataclass(frozen=True)
+class Fonte:
+    """A kind of plan that can be re-analysed."""
+    tipo_analise: str
+    queryset: Callable
+    payload: Callable
+    professor_id: Callable
+
+
+FONTES = {
+    'template': Fonte(
+        tipo_analise='aderencia_template',
+        queryset=lambda: PlanejamentoTemplate.objects.only(
+            'titulo', 'nivel_ensino', 'habilidades_bncc', 'objetivos_aprendizagem',
+            'atividade_dirigida', 'desenvolvimento', 'avaliacao', 'autor'
+        ),
+        payload=payload_template,
+        professor_id=lambda template: template.autor_id,
+    ),
+    'anual': Fonte(
+        tipo_analise='aderencia_planejamento_anual',
+        queryset=lambda: PlanejamentoAnual.objects.select_related('turma').only(
+            'titulo', 'introducao_geral', 'professor', 'turma', 'turma__nivel_ensino'
+        ).prefetch_related(
+            Prefetch(
+                'unidades_tematicas',
+                queryset=UnidadeTematica.objects.only(
+                    'planejamento', 'titulo', 'descricao', 'habilidades_bncc', 'ordem'
+                ).order_by('ordem')
+            )
+        ),
+        payload=payload_planejamento_anual,
+        professor_id=lambda planejamento: planejamento.professor_id,
+    ),
+}
+
+
+def ler_checkpoint(caminho):
+    """Checkpoint saved by a previous run, or an empty one."""
+    if not caminho or not os.path.exists(caminho):
+        return {'ultimo_id': {}, 'total': 0}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def gravar_checkpoint(caminho, checkpoint):
+    """Write the checkpoint atomically (temporary file + rename)."""
+    if not caminho:
+        return
+    checkpoint['atualizado_em'] = timezone.now().isoformat()
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(checkpoint, arquivo)
+    os.replace(temporario, caminho)
+
+
+class Reanalise:
+    """
+    Re-analyse every plan of the given sources.
+
+    ``executar`` is a generator yielding one progress dict per batch, after
+    the batch is saved and the checkpoint written.
+    """
+
+    def __init__(
+        self, lote=200, chunk_size=1000, responsavel_id=None, checkpoint=None, servico=None
+    ):
+        self.lote = lote
+        self.chunk_size = chunk_size
+        # Templates without an author are attributed to this user (or skipped)
+        self.responsavel_id = responsavel_id
+        self.caminho_checkpoint = checkpoint
+        self.checkpoint = ler_checkpoint(checkpoint)
+        # Bulk priority: interactive calls go first (see agendamento)
+        self.servico = servico or AuraMindService(prioridade=LOTE)
+
+    def executar(self, fontes):
+        for nome in fontes:
+            fonte = FONTES[nome]
+            apos = self.checkpoint['ultimo_id'].get(nome, 0)
+            planos = fonte.queryset().filter(pk__gt=apos).order_by('pk')
+
+            pendentes = []
+            ignorados = 0
+            for plano in planos.iterator(chunk_size=self.chunk_size):
+                professor_id = fonte.professor_id(plano) or self.responsavel_id
+                if professor_id is None:
+                    ignorados += 1
+                    continue
+                pendentes.append((plano.pk, professor_id, fonte.payload(plano)))
+                if len(pendentes) >= self.lote:
+                    yield self._processar(nome, fonte, pendentes, ignorados)
+                    pendentes, ignorados = [], 0
+            if pendentes or ignorados:
+                yield self._processar(nome, fonte, pendentes, ignorados)
+
+    def _processar(self, nome, fonte, pendentes, ignorados):
+        inicio = time.perf_counter()
+        resultados = (
+            self.servico.analisar_planos_em_lote([payload for _, _, payload in pendentes])
+            if pendentes
+            else []
+        )
+
+        analises = []
+        falhas = 0
+        for (plano_id, professor_id, _), resultado in zip(pendentes, resultados):
+            if resultado['sucesso']:
+                campos = campos_analise(resultado['analise'])
+            else:
+                falhas += 1
+                logger.warning(f"Reanálise do plano {nome} {plano_id} falhou: {resultado['erro']}")
+                campos = dict(status='erro', recomendacoes=resultado['erro'])
+            analises.append(AnaliseIa(
+                professor_id=professor_id,
+                plano_id=plano_id,
+                tipo_analise=fonte.tipo_analise,
+                **campos
+            ))
+
+        with transaction.atomic():
+            AnaliseIa.objects.bulk_create(analises, batch_size=500)
+
+        if pendentes:
+            self.checkpoint['ultimo_id'][nome] = pendentes[-1][0]
+        self.checkpoint['total'] = self.checkpoint.get('total', 0) + len(pendentes)
+        gravar_checkpoint(self.caminho_checkpoint, self.checkpoint)
+
+        return {
+            'fonte': nome,
+            'planos': len(pendentes),
+            'falhas': falhas,
+            'ignorados': ignorados,
+            'ultimo_id': self.checkpoint['ultimo_id'].get(nome),
+            'tempo_s': time.perf_counter() - inicio,
+        }
@@ -0,0 +1,149 @@
+"""
+Circuit breaker and adaptive retry around the AuraMind agent.
+
+The breaker state lives in a Django cache shared by all gunicorn workers
+(``AURAMIND_BREAKER_CACHE``), so once the agent is seen as down every worker
+fails fast instead of waiting out the read timeout:
+
+- ``fechado``: calls go through; consecutive failures are counted;
+- ``aberto``: calls fail immediately with AgenteIndisponivelError (503);
+- ``meio_aberto``: after ``AURAMIND_BREAKER_RESET`` seconds a single probe
+  call is let through; its outcome closes or re-opens the circuit.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class AgenteIndisponivelError(Exception):
+    """The circuit is open: the agent is considered unavailable."""
+
+    def __init__(self, retry_after):
+        self.retry_after = max(1, int(retry_after))
+        super().__init__(
+            f"Agente AuraMind indisponível. Tente novamente em {self.retry_after} s."
+        )
+
+
+class CircuitBreaker:
+    """Circuit breaker with half-open probing and state shared through the cache."""
+
+    def __init__(self, nome='agente'):
+        self.prefixo = f'auramind:breaker:{nome}'
+
+    @property
+    def cache(self):
+        return caches[settings.AURAMIND_BREAKER_CACHE]
+
+    def _chave(self, nome):
+        return f'{self.prefixo}:{nome}'
+
+    def estado(self):
+        """Return ``fechado``, ``aberto`` or ``meio_aberto``."""
+        aberto_ate = self.cache.get(self._chave('aberto_ate'))
+        if aberto_ate is None:
+            return 'fechado'
+        if time.time() < aberto_ate:
+            return 'aberto'
+        return 'meio_aberto'
+
+    def permitir(self):
+        """
+        Check whether a call may go to the agent.
+
+        Returns:
+            True if the call is the half-open probe, False for a normal call
+
+        Raises:
+            AgenteIndisponivelError: If the circuit is open
+        """
+        aberto_ate = self.cache.get(self._chave('aberto_ate'))
+        if aberto_ate is None:
+            return False
+        agora = time.time()
+        if agora < aberto_ate:
+            raise AgenteIndisponivelError(aberto_ate - agora)
+        # Half-open: only the worker that wins the probe slot calls the agent
+        if self.cache.add(self._chave('sonda'), 1, timeout=settings.AURAMIND_READ_TIMEOUT + 5):
+            return True
+        raise AgenteIndisponivelError(settings.AURAMIND_BREAKER_RESET)
+
+    def registrar_sucesso(self):
+        """Close the circuit after a successful call."""
+        chaves = [self._chave('aberto_ate'), self._chave('sonda'), self._chave('falhas')]
+        if self.cache.get_many(chaves):
+            self.cache.delete_many(chaves)
+
+    def liberar_sonda(self):
+        """Give back the half-open probe slot of a call that never reached the agent."""
+        self.cache.delete(self._chave('sonda'))
+
+    def registrar_falha(self, sonda=False):
+        """Count a failure and open the circuit past the threshold."""
+        chave = self._chave('falhas')
+        try:
+            falhas = self.cache.incr(chave)
+        except ValueError:
+            self.cache.add(chave, 0, timeout=None)
+            falhas = self.cache.incr(chave)
+        if sonda or falhas >= settings.AURAMIND_BREAKER_FALHAS:
+            self.cache.set(
+                self._chave('aberto_ate'),
+                time.time() + settings.AURAMIND_BREAKER_RESET,
+                timeout=None
+            )
+            self.cache.delete(self._chave('sonda'))
+
+    def resumo(self):
+        """Breaker state for the status endpoint."""
+        aberto_ate = self.cache.get(self._chave('aberto_ate'))
+        return {
+            'estado': self.estado(),
+            'falhas_consecutivas': self.cache.get(self._chave('falhas'), 0),
+            'limite_falhas': settings.AURAMIND_BREAKER_FALHAS,
+            'reabre_em_s': max(0, round(aberto_ate - time.time(), 1)) if aberto_ate else None,
+        }
+
+
+class RetryBudget:
+    """
+    Per-process retry throttling (token bucket, as in gRPC retry throttling).
+
+    Each failure spends one token and each success earns a fraction of one;
+    retries are only allowed while more than half of the bucket is left, so
+    retries back off automatically when the agent is failing a lot.
+    """
+
+    def __init__(self, max_tokens=10, ganho_sucesso=0.1):
+        self.max_tokens = max_tokens
+        self.ganho_sucesso = ganho_sucesso
+        self.tokens = float(max_tokens)
+        self._lock = threading.Lock()
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ganho_sucesso)
+
+    def registrar_falha(self):
+        with self._lock:
+            self.tokens = max(0.0, self.tokens - 1)
+
+    def pode_repetir(self):
+        with self._lock:
+            return self.tokens > self.max_tokens / 2
+
+
+def atraso_backoff(tentativa):
+    """Exponential backoff with full jitter for retry number ``tentativa`` (0-based)."""
+    teto = min(
+        settings.AURAMIND_RETRY_MAX_DELAY,
+        settings.AURAMIND_RETRY_BASE_DELAY * (2 ** tentativa)
+    )
+    return random.uniform(0, teto)
+
+
+breaker = CircuitBreaker()
+retry_budget = RetryBudget()
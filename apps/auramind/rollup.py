@@ -0,0 +1,181 @@
+"""
+Incremental hourly/daily rollups of LogIa (``UsoIa``).
+
+Every batch of logs written by the log sink is aggregated in memory by
+(granularity, period, user, tipo, sucesso) and merged into the matching
+UsoIa rows, so the number of rollup rows read by a dashboard depends on the
+time range and users, never on the log volume. Latency is kept as a
+fixed-bucket histogram, from which percentiles are estimated. Summaries are
+summed in the database (histogram buckets included): one row per group
+comes back, whatever the range.
+"""
+import bisect
+import logging
+from collections import defaultdict
+
+from django.db import DatabaseError, transaction
+from django.db.models import BigIntegerField, F, Max, Q, Sum
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import UsoIa
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency buckets; the last bucket is open-ended
+LIMITES_LATENCIA_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+GRANULARIDADES = ('hora', 'dia')
+
+
+def inicio_periodo(data, granularidade):
+    """Start of the (local time) hour or day containing ``data``."""
+    local = timezone.localtime(data).replace(minute=0, second=0, microsecond=0)
+    if granularidade == 'dia':
+        local = local.replace(hour=0)
+    return local
+
+
+def faixa_latencia(tempo_ms):
+    """Index of the histogram bucket for ``tempo_ms``."""
+    return bisect.bisect_left(LIMITES_LATENCIA_MS, tempo_ms)
+
+
+def somar_histogramas(*histogramas):
+    """Element-wise sum of histograms (missing buckets count as zero)."""
+    soma = [0] * (len(LIMITES_LATENCIA_MS) + 1)
+    for histograma in histogramas:
+        for i, valor in enumerate(histograma or []):
+            soma[i] += valor
+    return soma
+
+
+def percentil(histograma, p):
+    """
+    Estimate the ``p`` percentile (0-100) of a latency histogram.
+
+    Returns:
+        Upper bound (ms) of the bucket holding the percentile, the last bound
+        for the open-ended bucket, or None for an empty histogram
+    """
+    total = sum(histograma or [])
+    if not total:
+        return None
+    alvo = total * p / 100
+    acumulado = 0
+    for i, valor in enumerate(histograma):
+        acumulado += valor
+        if acumulado >= alvo:
+            return LIMITES_LATENCIA_MS[min(i, len(LIMITES_LATENCIA_MS) - 1)]
+    return LIMITES_LATENCIA_MS[-1]
+
+
+def _agregar(logs):
+    agregados = defaultdict(lambda: {
+        'total': 0, 'custo_token': 0, 'tokens_economizados': 0, 'cache_hits': 0,
+        'tempo_total_ms': 0, 'tempo_max_ms': 0,
+        'histograma': [0] * (len(LIMITES_LATENCIA_MS) + 1),
+    })
+    for log in logs:
+        criado = log.created_at or timezone.now()
+        for granularidade in GRANULARIDADES:
+            chave = (
+                granularidade, inicio_periodo(criado, granularidade),
+                log.usuario_id, log.tipo, log.sucesso
+            )
+            agregado = agregados[chave]
+            agregado['total'] += 1
+            agregado['custo_token'] += log.custo_token or 0
+            agregado['tokens_economizados'] += log.tokens_economizados or 0
+            agregado['cache_hits'] += int(log.cache_hit)
+            agregado['tempo_total_ms'] += log.tempo_resposta_ms or 0
+            agregado['tempo_max_ms'] = max(agregado['tempo_max_ms'], log.tempo_resposta_ms or 0)
+            agregado['histograma'][faixa_latencia(log.tempo_resposta_ms or 0)] += 1
+    return agregados
+
+
+def acumular(logs):
+    """
+    Merge a batch of saved LogIa rows into the UsoIa rollups.
+
+    Rollup errors are logged and never propagate to the request path.
+    """
+    try:
+        with transaction.atomic():
+            for chave, agregado in _agregar(logs).items():
+                granularidade, periodo, usuario_id, tipo, sucesso = chave
+                uso, _ = UsoIa.objects.select_for_update().get_or_create(
+                    granularidade=granularidade,
+                    periodo=periodo,
+                    usuario_id=usuario_id,
+                    tipo=tipo,
+                    sucesso=sucesso
+                )
+                uso.total += agregado['total']
+                uso.custo_token += agregado['custo_token']
+                uso.tokens_economizados += agregado['tokens_economizados']
+                uso.cache_hits += agregado['cache_hits']
+                uso.tempo_total_ms += agregado['tempo_total_ms']
+                uso.tempo_max_ms = max(uso.tempo_max_ms, agregado['tempo_max_ms'])
+                uso.histograma = somar_histogramas(uso.histograma, agregado['histograma'])
+                uso.save()
+    except DatabaseError as e:
+        logger.error(f"Erro ao atualizar rollup de uso de IA: {str(e)}")
+
+
+def resumir(usos, campo_grupo=None):
+    """
+    Sum UsoIa rollups in the database, optionally grouped by ``campo_grupo``.
+
+    Args:
+        usos: UsoIa queryset
+        campo_grupo: Field (or annotation) to group by
+
+    Returns:
+        List of dicts with totals, mean latency and p50/p95/p99 estimates
+        (from the summed histogram), one per group
+    """
+    # Aliases can't shadow the summed model fields, hence the ``soma_`` prefix.
+    faixas = [f'faixa_{i}' for i in range(len(LIMITES_LATENCIA_MS) + 1)]
+    somas = {
+        'soma_total': Sum('total'),
+        'soma_sucesso': Sum('total', filter=Q(sucesso=True)),
+        'soma_custo_token': Sum('custo_token'),
+        'soma_tokens_economizados': Sum('tokens_economizados'),
+        'soma_cache_hits': Sum('cache_hits'),
+        'soma_tempo_total_ms': Sum('tempo_total_ms'),
+        'soma_tempo_max_ms': Max('tempo_max_ms'),
+    }
+    for i, faixa in enumerate(faixas):
+        somas[faixa] = Sum(
+            Coalesce(Cast(KeyTextTransform(str(i), 'histograma'), BigIntegerField()), 0)
+        )
+
+    if campo_grupo:
+        linhas = usos.order_by().values(grupo=F(campo_grupo)).annotate(**somas)
+    else:
+        linhas = [dict(usos.aggregate(**somas), grupo=None)]
+
+    resultado = []
+    for linha in linhas:
+        total = linha['soma_total']
+        if not total:
+            continue
+        sucesso = linha['soma_sucesso'] or 0
+        histograma = [linha[faixa] for faixa in faixas]
+        resultado.append({
+            'grupo': linha['grupo'],
+            'total': total,
+            'sucesso': sucesso,
+            'erros': total - sucesso,
+            'custo_token': linha['soma_custo_token'],
+            'tokens_economizados': linha['soma_tokens_economizados'],
+            'cache_hits': linha['soma_cache_hits'],
+            'tempo_medio_ms': round(linha['soma_tempo_total_ms'] / total),
+            'tempo_max_ms': linha['soma_tempo_max_ms'],
+            'p50_ms': percentil(histograma, 50),
+            'p95_ms': percentil(histograma, 95),
+            'p99_ms': percentil(histograma, 99),
+        })
+    return sorted(resultado, key=lambda linha: (linha['grupo'] is None, str(linha['grupo'])))
@@ -0,0 +1,239 @@
+"""
+Near-duplicate cache of AI suggestions (MinHash + LSH over SugestaoIa).
+
+The exact cache (``cache.py``) misses requests whose ``contexto_previo`` only
+differs in wording or word order ("turma agitada, 25 alunos" vs "25 alunos,
+turma agitada"). ``IndiceSemantico`` keeps past suggestions in memory:
+
+- shingles: the set of words of ``contexto_previo``, lowercased, without
+  accents, punctuation and stop words;
+- MinHash signature of ``PERMUTACOES`` multiply-shift hashes, split in
+  ``BANDAS`` LSH bands; rows sharing a band are candidates, and a candidate
+  is served only if the exact Jaccard similarity of the shingles reaches
+  ``AURAMIND_CACHE_SEMANTICO_LIMIAR``;
+- partitions: only suggestions with the same ``nivel_ensino``,
+  ``habilidade_foco`` and format (``tipo``) are compared. Requests with
+  ``parametros_adicionais`` (not stored in SugestaoIa) never use the index.
+
+The index is per process and incremental: it loads the suggestions of the
+last ``AURAMIND_CACHE_TTL`` seconds on first use and, at most every
+``AURAMIND_CACHE_SEMANTICO_ATUALIZACAO`` seconds, only the rows created since
+(``pk`` above the last one seen), dropping the oldest beyond
+``AURAMIND_CACHE_SEMANTICO_MAX_ENTRADAS`` or the TTL. Only rows that came from
+the agent (``custo_token > 0``) are indexed, not copies served from a cache.
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import SugestaoIa
+
+PERMUTACOES = 64
+BANDAS = 16
+LINHAS = PERMUTACOES // BANDAS
+
+PALAVRAS_VAZIAS = frozenset((
+    'a ao aos as com como da das de do dos e em na nas no nos o os ou '
+    'para pela pelo por que se um uma'
+).split())
+
+_aleatorio = np.random.default_rng(20240501)
+# Multiply-shift hashing: (a * x + b) mod 2**64, keeping the high 32 bits
+_A = _aleatorio.integers(1, 2 ** 63, size=PERMUTACOES, dtype=np.uint64) | np.uint64(1)
+_B = _aleatorio.integers(0, 2 ** 63, size=PERMUTACOES, dtype=np.uint64)
+
+
+def shingles(texto):
+    """Set of normalized words of ``texto``."""
+    sem_acentos = unicodedata.normalize('NFKD', (texto or '').lower())
+    sem_acentos = ''.join(c for c in sem_acentos if not unicodedata.combining(c))
+    return frozenset(p for p in re.findall(r'\w+', sem_acentos) if p not in PALAVRAS_VAZIAS)
+
+
+def assinatura(conjunto):
+    """MinHash signature (``PERMUTACOES`` values) of a non-empty shingle set."""
+    valores = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), 'little')
+            for s in conjunto
+        ),
+        dtype=np.uint64,
+        count=len(conjunto),
+    )
+    with np.errstate(over='ignore'):
+        return ((valores[:, None] * _A + _B) >> np.uint64(32)).min(axis=0)
+
+
+def bandas(sig):
+    """LSH band keys of a signature."""
+    return [(i, sig[i * LINHAS:(i + 1) * LINHAS].tobytes()) for i in range(BANDAS)]
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def particao(nivel_ensino, habilidade_foco, tipo):
+    return (
+        str(nivel_ensino or '').strip().lower(),
+        str(habilidade_foco or '').strip().upper(),
+        tipo or 'atividade',
+    )
+
+
+def resposta_de(sugestao, similaridade):
+    """Agent-shaped response rebuilt from a stored SugestaoIa."""
+    return {
+        'dados_sugeridos': {
+            'titulo': sugestao.titulo_sugestao,
+            'sugestao_texto': sugestao.conteudo_sugestao,
+            'habilidades_sugeridas': sugestao.habilidades_sugeridas,
+        },
+        'metadata': {
+            'custo_token': sugestao.custo_token,
+            'modelo_ia': sugestao.modelo_ia,
+            'tempo_processamento_ms': sugestao.tempo_processamento_ms,
+            'cache_semantico': {'sugestao_id': sugestao.pk, 'similaridade': round(similaridade, 3)},
+        },
+    }
+
+
+class IndiceSemantico:
+    """In-memory LSH index of past suggestions, refreshed incrementally."""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        # pk -> (partição, shingles, criada em, bandas), oldest first
+        self._entradas = OrderedDict()
+        self._baldes = defaultdict(set)
+        self._ultimo_id = 0
+        self._atualizado_em = None
+        self.consultas = 0
+        self.acertos = 0
+
+    @property
+    def ativo(self):
+        return settings.AURAMIND_CACHE_SEMANTICO and settings.AURAMIND_CACHE_TTL > 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _adicionar(self, pk, chave, conjunto, criada_em):
+        if not conjunto or pk in self._entradas:
+            return
+        chaves_bandas = bandas(assinatura(conjunto))
+        self._entradas[pk] = (chave, conjunto, criada_em, chaves_bandas)
+        for banda in chaves_bandas:
+            self._baldes[(chave, banda)].add(pk)
+
+    def _remover_primeira(self):
+        pk, (chave, _, _, chaves_bandas) = self._entradas.popitem(last=False)
+        for banda in chaves_bandas:
+            balde = self._baldes.get((chave, banda))
+            if balde is not None:
+                balde.discard(pk)
+                if not balde:
+                    del self._baldes[(chave, banda)]
+
+    def limpar(self):
+        """Forget every entry (the next lookup reloads from the database)."""
+        with self._trava:
+            self._entradas.clear()
+            self._baldes.clear()
+            self._ultimo_id = 0
+            self._atualizado_em = None
+
+    def atualizar(self, forcar=False):
+        """Index the suggestions created since the last refresh and drop expired ones."""
+        agora = time.monotonic()
+        if not forcar and self._atualizado_em is not None and \
+                agora - self._atualizado_em < settings.AURAMIND_CACHE_SEMANTICO_ATUALIZACAO:
+            return
+        self._atualizado_em = agora
+
+        validade = timezone.now() - timedelta(seconds=settings.AURAMIND_CACHE_TTL)
+        maximo = settings.AURAMIND_CACHE_SEMANTICO_MAX_ENTRADAS
+        novas = (
+            SugestaoIa.objects.filter(
+                pk__gt=self._ultimo_id,
+                status='concluida',
+                custo_token__gt=0,
+                created_at__gte=validade,
+            )
+            .order_by('-pk')
+            .values_list(
+                'pk', 'nivel_ensino', 'habilidade_foco', 'tipo', 'contexto_previo', 'created_at'
+            )
+        )
+        # Newest first, so a first load of a large table keeps the most recent rows
+        linhas = list(novas[:maximo])
+        for pk, nivel, habilidade, tipo, contexto, criada_em in reversed(linhas):
+            self._adicionar(pk, particao(nivel, habilidade, tipo), shingles(contexto), criada_em)
+            self._ultimo_id = max(self._ultimo_id, pk)
+        while self._entradas and (
+            len(self._entradas) > maximo or next(iter(self._entradas.values()))[2] < validade
+        ):
+            self._remover_primeira()
+
+    def buscar(self, plano_data):
+        """
+        Most similar stored suggestion for a request, if above the threshold.
+
+        Returns:
+            Agent-shaped response of the stored suggestion, or None
+        """
+        if not self.ativo or plano_data.get('parametros_adicionais'):
+            return None
+        conjunto = shingles(plano_data.get('contexto_previo'))
+        if not conjunto:
+            return None
+        chave = particao(
+            plano_data.get('nivel_ensino'), plano_data.get('habilidade_foco'),
+            plano_data.get('formato_desejado', 'atividade')
+        )
+
+        with self._trava:
+            self.atualizar()
+            self.consultas += 1
+            candidatos = set()
+            for banda in bandas(assinatura(conjunto)):
+                candidatos |= self._baldes.get((chave, banda), set())
+            melhor, similaridade = None, 0.0
+            for pk in candidatos:
+                valor = jaccard(conjunto, self._entradas[pk][1])
+                if valor > similaridade or (
+                    valor == similaridade and melhor is not None and pk > melhor
+                ):
+                    melhor, similaridade = pk, valor
+            if melhor is None or similaridade < settings.AURAMIND_CACHE_SEMANTICO_LIMIAR:
+                return None
+
+        sugestao = SugestaoIa.objects.filter(
+            pk=melhor, status='concluida', nivel_ensino=plano_data.get('nivel_ensino'),
+            habilidade_foco=plano_data.get('habilidade_foco')
+        ).first()
+        if sugestao is None:
+            return None
+        self.acertos += 1
+        return resposta_de(sugestao, similaridade)
+
+    def resumo(self):
+        """Index size and hit rate, for the status endpoint."""
+        return {
+            'ativo': self.ativo,
+            'entradas': len(self._entradas),
+            'limiar': settings.AURAMIND_CACHE_SEMANTICO_LIMIAR,
+            'consultas': self.consultas,
+            'acertos': self.acertos,
+        }
+
+
+indice_semantico = IndiceSemantico()
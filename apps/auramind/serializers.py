@@ -2,7 +2,9 @@
 Serializers for AuraMind app.
 """
 from rest_framework import serializers
-from .models import SugestaoIa, AnaliseIa, LogIa
+from .logsink import expandir_saida
+from .models import SugestaoIa, AnaliseIa, LogIa, FilaIa, UsoIa
+from .rollup import percentil
 
 
 class SugestaoIaSerializer(serializers.ModelSerializer):
@@ -38,6 +40,44 @@ class LogIaSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'usuario', 'tipo', 'entrada', 'saida',
             'custo_token', 'tempo_resposta_ms', 'sucesso',
-            'mensagem_erro', 'created_at'
+            'mensagem_erro', 'cache_hit', 'tokens_economizados', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['saida'] = expandir_saida(data['saida'])
+        return data
+
+
+class FilaIaSerializer(serializers.ModelSerializer):
+    """Serializer for FilaIa model (async job status)."""
+    class Meta:
+        model = FilaIa
+        fields = [
+            'id', 'tipo', 'status', 'sugestao', 'analise', 'resultado',
+            'tentativas', 'mensagem_erro', 'iniciado_em', 'concluido_em',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class UsoIaSerializer(serializers.ModelSerializer):
+    """Serializer for UsoIa rollups (read-only)."""
+    tempo_medio_ms = serializers.SerializerMethodField()
+    p95_ms = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UsoIa
+        fields = [
+            'id', 'granularidade', 'periodo', 'usuario', 'tipo', 'sucesso',
+            'total', 'custo_token', 'tokens_economizados', 'cache_hits',
+            'tempo_medio_ms', 'tempo_max_ms', 'p95_ms', 'histograma'
+        ]
+        read_only_fields = fields
+
+    def get_tempo_medio_ms(self, obj):
+        return round(obj.tempo_total_ms / obj.total) if obj.total else None
+
+    def get_p95_ms(self, obj):
+        return percentil(obj.histograma, 95)
@@ -1,24 +1,197 @@
 """
 Services for AuraMind app - IA Integration.
 """
-import requests
+import asyncio
 import time
 import logging
+import httpx
+import requests
+import orjson
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from .models import SugestaoIa, AnaliseIa, LogIa
+from django.db import connection
+from .agendamento import INTERATIVA, agendador
+from .cache import CAMPOS_ANALISE, CAMPOS_SUGESTAO, RespostaCache, chave_payload
+from .client import codificar_json, get_async_client, get_session, get_timeout, ler_json
+from .coalescing import single_flight
+from .limites import escola_do_usuario, limitador
+from .logsink import log_sink
+from .models import SugestaoIa, AnaliseIa
+from .semantico import indice_semantico
+from .streaming import formatar_evento, ler_eventos, resultado_do_stream, resultado_sugestao
+from .resilience import AgenteIndisponivelError, atraso_backoff, breaker, retry_budget
 
 logger = logging.getLogger(__name__)
 
 
+def dados_sugestao(plano_data):
+    """Map request data to the descriptive fields of a SugestaoIa row."""
+    return {
+        'plano_id': plano_data.get('plano_id'),
+        'habilidade_foco': plano_data.get('habilidade_foco'),
+        'nivel_ensino': plano_data.get('nivel_ensino'),
+        'tipo': plano_data.get('formato_desejado', 'atividade'),
+        'contexto_previo': plano_data.get('contexto_previo'),
+    }
+
+
+def payload_sugestao(professor, plano_data):
+    """
+    Build the agent payload of a suggestion request.
+
+    The agent reads ``SolicitacaoSugestao``: ``tema`` (the ``tema`` extra
+    parameter or, failing that, the previous context), ``habilidades_bncc``
+    (the extra parameter or the focus skill), ``duracao_semanas`` and
+    ``contexto_turma``. The request fields are sent as well, for the logs.
+    """
+    parametros = plano_data.get('parametros_adicionais') or {}
+    habilidade_foco = plano_data.get('habilidade_foco')
+    contexto_previo = plano_data.get('contexto_previo')
+    return {
+        'tema': parametros.get('tema') or contexto_previo or habilidade_foco or '',
+        'habilidades_bncc': (
+            parametros.get('habilidades_bncc') or ([habilidade_foco] if habilidade_foco else [])
+        ),
+        'duracao_semanas': parametros.get('duracao_semanas') or 4,
+        'contexto_turma': contexto_previo,
+        'plano_id': plano_data.get('plano_id'),
+        'professor_id': professor.id,
+        'nivel_ensino': plano_data.get('nivel_ensino'),
+        'habilidade_foco': plano_data.get('habilidade_foco'),
+        'contexto_previo': plano_data.get('contexto_previo'),
+        'formato_desejado': plano_data.get('formato_desejado', 'atividade'),
+        'parametros_adicionais': plano_data.get('parametros_adicionais', {}),
+    }
+
+
+def campos_sugestao(resultado, custo_token, tempo_ms, compartilhada=False):
+    """Map an agent response to the result fields of a SugestaoIa row."""
+    dados = resultado.get('dados_sugeridos', {})
+    metadata = resultado.get('metadata', {})
+    return dict(
+        status='concluida',
+        titulo_sugestao=dados.get('titulo'),
+        conteudo_sugestao=dados.get('sugestao_texto'),
+        habilidades_sugeridas=dados.get('habilidades_sugeridas', []),
+        custo_token=custo_token,
+        tempo_processamento_ms=(
+            tempo_ms if compartilhada else metadata.get('tempo_processamento_ms', tempo_ms)
+        ),
+        modelo_ia=metadata.get('modelo_ia', 'AuraMind-v3'),
+    )
+
+
+def dados_planejamento_anual(planejamento):
+    """
+    One suggestion request per UnidadeTematica of a PlanejamentoAnual.
+
+    Used with ``AuraMindService.gerar_sugestoes_em_lote`` to fill a whole
+    plan in a single agent call.
+    """
+    itens = []
+    for unidade in planejamento.unidades_tematicas.all():
+        habilidades = unidade.habilidades_bncc or []
+        itens.append({
+            'plano_id': planejamento.id,
+            'nivel_ensino': planejamento.turma.nivel_ensino,
+            'habilidade_foco': habilidades[0] if habilidades else '',
+            'contexto_previo': f"{unidade.titulo}: {unidade.descricao}",
+            'formato_desejado': 'atividade',
+            'parametros_adicionais': {
+                'unidade_tematica_id': unidade.id,
+                'tema': unidade.titulo,
+                'habilidades_bncc': habilidades,
+                'duracao_semanas': unidade.duracao_semanas,
+            },
+        })
+    return itens
+
+
+def campos_analise(analise):
+    """
+    Map an ``analise_plano`` agent answer to the result fields of an AnaliseIa row.
+
+    ``score_aderencia`` keeps one decimal, so the 0-1 agent score is stored
+    on a 0-10 scale.
+    """
+    aderencia = analise.get('aderencia_bncc')
+    recomendacoes = [analise.get('recomendacao_final', '')] + list(
+        analise.get('sugestoes_melhoria', [])
+    )
+    return dict(
+        status='concluida',
+        pontos_fortes=analise.get('pontos_fortes', []),
+        pontos_a_revisar=analise.get('pontos_revisar', []),
+        recomendacoes='\n'.join(filter(None, recomendacoes)),
+        score_aderencia=None if aderencia is None else round(aderencia * 10, 1),
+    )
+
+
+def payload_analise(plano_data):
+    """
+    Build the agent ``RequisicaoAnalise`` payload of an analysis request.
+
+    Plans in the agent shape (``titulo``, ``habilidades_bncc``,
+    ``objetivos_aprendizagem``...) are sent as they are. An annual plan
+    (``introducao_geral`` and ``unidades_tematicas``) is mapped as the bulk
+    re-analysis does: the introduction stands for the objectives, the units
+    for the development and their skills are the declared ones.
+    """
+    unidades = plano_data.get('unidades_tematicas') or []
+    habilidades = list(plano_data.get('habilidades_bncc') or [])
+    for unidade in unidades:
+        for codigo in unidade.get('habilidades_bncc') or []:
+            if codigo not in habilidades:
+                habilidades.append(codigo)
+    desenvolvimento = plano_data.get('desenvolvimento') or '\n'.join(
+        f"{unidade.get('titulo', '')}: {unidade.get('descricao', '')}" for unidade in unidades
+    )
+    return {
+        'plano_id': plano_data.get('plano_id'),
+        'titulo': plano_data.get('titulo') or '',
+        'nivel_ensino': plano_data.get('nivel_ensino') or '',
+        'habilidades_bncc': habilidades,
+        'objetivos_aprendizagem': (
+            plano_data.get('objetivos_aprendizagem') or plano_data.get('introducao_geral') or ''
+        ),
+        'atividade_dirigida': plano_data.get('atividade_dirigida') or '',
+        'desenvolvimento': desenvolvimento,
+        'avaliacao': plano_data.get('avaliacao') or '',
+    }
+
+
+def dados_analise(plano_data):
+    """Map request data to the descriptive fields of an AnaliseIa row."""
+    return {
+        'plano_id': plano_data.get('plano_id'),
+        'tipo_analise': 'aderencia_curricular',
+    }
+
+
+class AuraMindAPIError(Exception):
+    """Non-200 answer from the AuraMind agent."""
+
+    def __init__(self, status_code, texto=''):
+        self.status_code = status_code
+        self.texto = texto
+        super().__init__(f"Erro na API AuraMind: {status_code}")
+
+
 class AuraMindService:
     """
     Service to interact with AuraMind IA Agent.
+
+    ``prioridade`` is the scheduler class of its agent calls (``interativa``
+    or ``lote``, see ``agendamento``).
     """
     
-    def __init__(self):
+    def __init__(self, prioridade=INTERATIVA):
+        self.prioridade = prioridade
         self.base_url = settings.AURAMIND_API_URL
         self.api_key = settings.AURAMIND_API_KEY
-        self.timeout = 60
+        self.session = get_session()
+        self.timeout = get_timeout()
+        self.cache = RespostaCache()
     
     def _get_headers(self):
         """Get request headers with authentication."""
@@ -27,9 +200,183 @@ class AuraMindService:
             'Content-Type': 'application/json'
         }
     
-    def _log_interaction(self, usuario, tipo, entrada, saida, sucesso, tempo_ms, custo_token=0, erro=None):
-        """Log IA interaction."""
-        LogIa.objects.create(
+    def _resposta_cacheada(self, chave, payload):
+        """
+        Cached response of a suggestion payload: an exact cache hit or, failing
+        that, a stored near-duplicate suggestion (then also cached under ``chave``).
+        """
+        resultado = self.cache.get(chave)
+        if resultado is None:
+            resultado = indice_semantico.buscar(payload)
+            if resultado is not None:
+                self.cache.set(chave, resultado)
+        return resultado
+
+    def _chamar_agente(self, endpoint, payload, headers, stream=False, usuario=None):
+        """
+        POST ``payload`` to an agent endpoint through the circuit breaker.
+
+        Each attempt waits for a scheduler slot of the service's priority
+        class, queued fairly with the other calls of ``usuario``'s school.
+
+        5xx answers and connection errors are retried with jittered
+        exponential backoff while the retry budget allows it; read timeouts
+        and 4xx answers are not retried. With ``stream=True`` the open
+        response is returned instead of its JSON body; the caller consumes
+        and closes it.
+
+        A half-open probe that ends without an outcome for the breaker (the
+        scheduler wait timed out, an unexpected error...) gives its slot back.
+
+        Raises:
+            AgenteIndisponivelError: If the circuit is open
+            AuraMindAPIError: If the agent answers with a non-200 status
+        """
+        escola_id = escola_do_usuario(usuario) if usuario is not None else None
+        corpo, cabecalhos = codificar_json(payload)
+        headers = {**headers, **cabecalhos}
+        sonda = breaker.permitir()
+        # The half-open probe gets a single attempt
+        max_retries = 0 if sonda else settings.AURAMIND_RETRY_MAX
+        # Whether the breaker got this call's outcome; a probe without one gives its slot back
+        registrado = False
+
+        try:
+            for tentativa in range(max_retries + 1):
+                try:
+                    with agendador.vaga(self.prioridade, escola_id):
+                        response = self.session.post(
+                            f'{self.base_url}{endpoint}',
+                            data=corpo,
+                            headers=headers,
+                            timeout=self.timeout,
+                            stream=stream
+                        )
+                except requests.ConnectionError as e:
+                    erro = e
+                except requests.Timeout:
+                    registrado = True
+                    breaker.registrar_falha(sonda=sonda)
+                    retry_budget.registrar_falha()
+                    raise
+                else:
+                    if response.status_code < 500:
+                        registrado = True
+                        breaker.registrar_sucesso()
+                        retry_budget.registrar_sucesso()
+                        if response.status_code != 200:
+                            raise AuraMindAPIError(response.status_code, response.text)
+                        return response if stream else ler_json(response)
+                    erro = AuraMindAPIError(response.status_code, response.text)
+                    response.close()
+
+                retry_budget.registrar_falha()
+                if tentativa == max_retries or not retry_budget.pode_repetir():
+                    break
+                logger.warning(f"Repetindo chamada ao AuraMind ({endpoint}) após erro: {erro}")
+                time.sleep(atraso_backoff(tentativa))
+
+            registrado = True
+            breaker.registrar_falha(sonda=sonda)
+            raise erro
+        finally:
+            # e.g. the scheduler wait timed out: the probe never reached the agent
+            if sonda and not registrado:
+                breaker.liberar_sonda()
+
+    def _antes_da_chamada(self, usuario):
+        """
+        Breaker check and school lookup of an async agent call, in one sync hop.
+
+        Also closes this thread's database connection (the async views would
+        otherwise hold one per in-flight call while awaiting the agent),
+        unless a transaction or a ``db`` coalescing advisory lock needs it.
+
+        Returns:
+            ``(sonda, escola_id)``
+        """
+        escola_id = escola_do_usuario(usuario) if usuario is not None else None
+        sonda = breaker.permitir()
+        if not connection.in_atomic_block and single_flight.modo != 'db':
+            connection.close()
+        return sonda, escola_id
+
+    async def _achamar_agente(self, endpoint, payload, headers, usuario=None):
+        """
+        Async ``_chamar_agente`` (no streaming), through the httpx pool of the event loop.
+
+        Takes no scheduler slot (the pool bounds the calls in flight) but
+        marks interactive activity for bulk callers. Pool timeouts (no free
+        connection in ``AURAMIND_ASYNC_POOL_TIMEOUT``) are local overload and
+        do not count as agent failures. A half-open probe that ends without
+        an outcome for the breaker (a pool timeout, a cancelled request...)
+        gives its slot back for the next call.
+        """
+        sonda, escola_id = await sync_to_async(self._antes_da_chamada)(usuario)
+        max_retries = 0 if sonda else settings.AURAMIND_RETRY_MAX
+        registrado = False
+
+        try:
+            corpo, cabecalhos = codificar_json(payload)
+            headers = {**headers, **cabecalhos}
+            cliente = get_async_client()
+
+            for tentativa in range(max_retries + 1):
+                if self.prioridade == INTERATIVA:
+                    await agendador.asinalizar_interativa()
+                try:
+                    response = await cliente.post(
+                        f'{self.base_url}{endpoint}', content=corpo, headers=headers
+                    )
+                except httpx.PoolTimeout:
+                    # Local overload, not an agent failure
+                    raise
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                    erro = e
+                except httpx.TimeoutException:
+                    registrado = True
+                    await sync_to_async(breaker.registrar_falha)(sonda=sonda)
+                    retry_budget.registrar_falha()
+                    raise
+                else:
+                    if response.status_code < 500:
+                        registrado = True
+                        await sync_to_async(breaker.registrar_sucesso)()
+                        retry_budget.registrar_sucesso()
+                        if response.status_code != 200:
+                            raise AuraMindAPIError(response.status_code, response.text)
+                        return ler_json(response)
+                    erro = AuraMindAPIError(response.status_code, response.text)
+
+                retry_budget.registrar_falha()
+                if tentativa == max_retries or not retry_budget.pode_repetir():
+                    break
+                logger.warning(f"Repetindo chamada ao AuraMind ({endpoint}) após erro: {erro}")
+                await asyncio.sleep(atraso_backoff(tentativa))
+
+            registrado = True
+            await sync_to_async(breaker.registrar_falha)(sonda=sonda)
+            raise erro
+        finally:
+            if sonda and not registrado:
+                await sync_to_async(breaker.liberar_sonda)()
+
+    def _log_interaction(
+        self,
+        usuario,
+        tipo,
+        entrada,
+        saida,
+        sucesso,
+        tempo_ms,
+        custo_token=0,
+        erro=None,
+        cache_hit=False,
+        tokens_economizados=0,
+    ):
+        """Log IA interaction (buffered, written in batches by the log sink)."""
+        limitador.registrar_consumo(usuario, custo_token)
+        log_sink.registrar(
             usuario=usuario,
             tipo=tipo,
             entrada=entrada,
@@ -37,177 +384,496 @@ class AuraMindService:
             sucesso=sucesso,
             tempo_resposta_ms=tempo_ms,
             custo_token=custo_token,
-            mensagem_erro=erro or ''
+            mensagem_erro=erro or '',
+            cache_hit=cache_hit,
+            tokens_economizados=tokens_economizados
         )
     
-    def gerar_sugestao_planejamento(self, professor, plano_data):
+    def _concluir_sugestao(self, professor, plano_data, payload, resultado, inicio, chave,
+                           cache_hit=False, coalescida=False, sugestao=None):
+        """Cache, save and log a suggestion answered by the agent or a cache."""
+        tempo_ms = int((time.time() - inicio) * 1000)
+        metadata = resultado.get('metadata', {})
+        # Cache hits and coalesced calls cost nothing; the original cost is logged as tokens saved
+        compartilhada = cache_hit or coalescida
+        custo_token = 0 if compartilhada else metadata.get('custo_token', 0)
+        if not compartilhada:
+            self.cache.set(chave, resultado)
+
+        # Save suggestion to database
+        campos = campos_sugestao(resultado, custo_token, tempo_ms, compartilhada)
+        if sugestao is None:
+            sugestao = SugestaoIa.objects.create(
+                professor=professor,
+                **dados_sugestao(plano_data),
+                **campos
+            )
+        else:
+            for campo, valor in campos.items():
+                setattr(sugestao, campo, valor)
+            sugestao.save()
+
+        # Log interaction
+        self._log_interaction(
+            usuario=professor,
+            tipo='sugestao',
+            entrada=payload,
+            saida=resultado,
+            sucesso=True,
+            tempo_ms=tempo_ms,
+            custo_token=custo_token,
+            cache_hit=cache_hit,
+            tokens_economizados=metadata.get('custo_token', 0) if compartilhada else 0
+        )
+
+        logger.info(
+            f"Sugestão gerada com sucesso para professor {professor.id}"
+            f"{' (cache)' if cache_hit else ''}{' (coalescida)' if coalescida else ''}"
+        )
+
+    def _registrar_falha(self, usuario, tipo, payload, erro, inicio):
+        """Single failure log per interaction, whatever step failed."""
+        tempo_ms = int((time.time() - inicio) * 1000)
+        self._log_interaction(
+            usuario=usuario,
+            tipo=tipo,
+            entrada=payload,
+            saida={'error': erro.texto} if isinstance(erro, AuraMindAPIError) else {},
+            sucesso=False,
+            tempo_ms=tempo_ms,
+            erro=str(erro)
+        )
+        acao = 'gerar sugestão' if tipo == 'sugestao' else 'analisar plano'
+        logger.error(f"Erro ao {acao}: {str(erro)}")
+
+    def gerar_sugestao_planejamento(self, professor, plano_data, sugestao=None):
         """
         Generate pedagogical suggestion using AuraMind.
+
+        If ``sugestao`` is given (a row created in ``processando`` state by the
+        async job mode), it is filled in instead of creating a new row; a call
+        refused by the open circuit is then not logged, as the job is requeued.
         """
         inicio = time.time()
+        payload = payload_sugestao(professor, plano_data)
         
         try:
             headers = self._get_headers()
             
-            payload = {
-                'plano_id': plano_data.get('plano_id'),
-                'professor_id': professor.id,
-                'nivel_ensino': plano_data.get('nivel_ensino'),
-                'habilidade_foco': plano_data.get('habilidade_foco'),
-                'contexto_previo': plano_data.get('contexto_previo'),
-                'formato_desejado': plano_data.get('formato_desejado', 'atividade'),
-                'parametros_adicionais': plano_data.get('parametros_adicionais', {})
-            }
+            chave = chave_payload('sugestao', payload, CAMPOS_SUGESTAO)
+            resultado = self._resposta_cacheada(chave, payload)
+            cache_hit = resultado is not None
             
-            response = requests.post(
-                f'{self.base_url}sugestoes_planejamento/',
-                json=payload,
-                headers=headers,
-                timeout=self.timeout
+            coalescida = False
+            if not cache_hit:
+                resultado, coalescida = single_flight.executar(
+                    chave,
+                    lambda: resultado_sugestao(
+                        self._chamar_agente(
+                            'sugestoes_planejamento/', payload, headers, usuario=professor
+                        )
+                    ),
+                )
+
+            self._concluir_sugestao(
+                professor,
+                plano_data,
+                payload,
+                resultado,
+                inicio,
+                chave,
+                cache_hit,
+                coalescida,
+                sugestao,
             )
-            
-            tempo_ms = int((time.time() - inicio) * 1000)
-            
-            if response.status_code == 200:
-                resultado = response.json()
-                
-                # Save suggestion to database
-                sugestao = SugestaoIa.objects.create(
-                    professor=professor,
-                    plano_id=plano_data.get('plano_id'),
-                    habilidade_foco=plano_data.get('habilidade_foco'),
-                    nivel_ensino=plano_data.get('nivel_ensino'),
-                    tipo=plano_data.get('formato_desejado', 'atividade'),
-                    contexto_previo=plano_data.get('contexto_previo'),
-                    status='concluida',
-                    titulo_sugestao=resultado.get('dados_sugeridos', {}).get('titulo'),
-                    conteudo_sugestao=resultado.get('dados_sugeridos', {}).get('sugestao_texto'),
-                    habilidades_sugeridas=resultado.get('dados_sugeridos', {}).get('habilidades_sugeridas', []),
-                    custo_token=resultado.get('metadata', {}).get('custo_token', 0),
-                    tempo_processamento_ms=resultado.get('metadata', {}).get('tempo_processamento_ms', tempo_ms),
-                    modelo_ia=resultado.get('metadata', {}).get('modelo_ia', 'AuraMind-v3')
+            return resultado
+
+        except Exception as e:
+            if sugestao is None or not isinstance(e, AgenteIndisponivelError):
+                self._registrar_falha(professor, 'sugestao', payload, e, inicio)
+            raise
+
+    async def _asugerir(self, payload, professor):
+        """Async agent suggestion call, mapped with ``resultado_sugestao``."""
+        return resultado_sugestao(await self._achamar_agente(
+            'sugestoes_planejamento/', payload, self._get_headers(), usuario=professor
+        ))
+
+    async def agerar_sugestao_planejamento(self, professor, plano_data):
+        """
+        Async ``gerar_sugestao_planejamento``, for the ASGI views.
+
+        The agent call goes through the pooled httpx client; cache and
+        database work runs in ``sync_to_async`` (one hop before and one after
+        the call).
+        """
+        inicio = time.time()
+        payload = payload_sugestao(professor, plano_data)
+
+        try:
+            chave = chave_payload('sugestao', payload, CAMPOS_SUGESTAO)
+            resultado = await sync_to_async(self._resposta_cacheada)(chave, payload)
+            cache_hit = resultado is not None
+
+            coalescida = False
+            if not cache_hit:
+                resultado, coalescida = await single_flight.aexecutar(
+                    chave,
+                    lambda: self._asugerir(payload, professor)
                 )
-                
-                # Log interaction
-                self._log_interaction(
-                    usuario=professor,
-                    tipo='sugestao',
-                    entrada=payload,
-                    saida=resultado,
-                    sucesso=True,
-                    tempo_ms=tempo_ms,
-                    custo_token=resultado.get('metadata', {}).get('custo_token', 0)
+
+            await sync_to_async(self._concluir_sugestao)(
+                professor, plano_data, payload, resultado, inicio, chave, cache_hit, coalescida
+            )
+            return resultado
+        
+        except Exception as e:
+            await sync_to_async(self._registrar_falha)(professor, 'sugestao', payload, e, inicio)
+            raise
+    
+    def gerar_sugestao_stream(self, professor, plano_data):
+        """
+        Generate a suggestion in streaming mode (Server-Sent Events).
+
+        The agent connection is opened before returning, so an open circuit or
+        an agent error is raised to the caller instead of inside the stream.
+
+        Returns:
+            Iterator of SSE-encoded bytes: the agent events as they arrive,
+            then ``salvo`` with the id of the persisted SugestaoIa (or
+            ``erro`` if the stream fails)
+
+        Raises:
+            AgenteIndisponivelError: If the circuit is open
+            AuraMindAPIError: If the agent answers with a non-200 status
+        """
+        inicio = time.time()
+        payload = payload_sugestao(professor, plano_data)
+        chave = chave_payload('sugestao', payload, CAMPOS_SUGESTAO)
+
+        resultado = self._resposta_cacheada(chave, payload)
+        if resultado is not None:
+            return self._replay_cache(professor, plano_data, payload, resultado, inicio)
+
+        try:
+            response = self._chamar_agente(
+                'sugestoes_planejamento/stream/',
+                payload,
+                self._get_headers(),
+                stream=True,
+                usuario=professor,
+            )
+        except Exception as e:
+            self._log_interaction(
+                usuario=professor,
+                tipo='sugestao',
+                entrada=payload,
+                saida={'error': e.texto} if isinstance(e, AuraMindAPIError) else {},
+                sucesso=False,
+                tempo_ms=int((time.time() - inicio) * 1000),
+                erro=str(e)
+            )
+            logger.error(f"Erro ao iniciar sugestão em streaming: {str(e)}")
+            raise
+        return self._relay_stream(professor, plano_data, payload, chave, response, inicio)
+
+    def _relay_stream(self, professor, plano_data, payload, chave, response, inicio):
+        """Relay agent events and persist the suggestion when ``fim`` arrives."""
+        secoes = {}
+        try:
+            # chunk_size=None yields each chunk as soon as it is received
+            for evento, dados in ler_eventos(
+                response.iter_lines(chunk_size=None, decode_unicode=True)
+            ):
+                secoes[evento] = orjson.loads(dados)
+                if evento == 'erro':
+                    raise AuraMindAPIError(response.status_code, dados)
+                yield f"event: {evento}\ndata: {dados}\n\n".encode()
+            if 'fim' not in secoes:
+                raise AuraMindAPIError(response.status_code, 'Stream encerrado antes do evento fim')
+
+            resultado = resultado_do_stream(secoes)
+            self.cache.set(chave, resultado)
+            tempo_ms = int((time.time() - inicio) * 1000)
+            custo_token = resultado['metadata'].get('custo_token', 0)
+            sugestao = SugestaoIa.objects.create(
+                professor=professor,
+                **dados_sugestao(plano_data),
+                **campos_sugestao(resultado, custo_token, tempo_ms)
+            )
+            self._log_interaction(
+                usuario=professor,
+                tipo='sugestao',
+                entrada=payload,
+                saida=resultado,
+                sucesso=True,
+                tempo_ms=tempo_ms,
+                custo_token=custo_token
+            )
+            logger.info(f"Sugestão em streaming gerada para professor {professor.id}")
+            yield formatar_evento('salvo', {'sugestao_id': sugestao.pk})
+        except Exception as e:
+            self._log_interaction(
+                usuario=professor,
+                tipo='sugestao',
+                entrada=payload,
+                saida={'error': e.texto} if isinstance(e, AuraMindAPIError) else {},
+                sucesso=False,
+                tempo_ms=int((time.time() - inicio) * 1000),
+                erro=str(e)
+            )
+            logger.error(f"Erro na sugestão em streaming: {str(e)}")
+            yield formatar_evento('erro', {'error': str(e)})
+        finally:
+            response.close()
+
+    def _replay_cache(self, professor, plano_data, payload, resultado, inicio):
+        """Stream a cached response as a single ``resultado`` event."""
+        tempo_ms = int((time.time() - inicio) * 1000)
+        custo_original = resultado.get('metadata', {}).get('custo_token', 0)
+        sugestao = SugestaoIa.objects.create(
+            professor=professor,
+            **dados_sugestao(plano_data),
+            **campos_sugestao(resultado, 0, tempo_ms, compartilhada=True)
+        )
+        self._log_interaction(
+            usuario=professor,
+            tipo='sugestao',
+            entrada=payload,
+            saida=resultado,
+            sucesso=True,
+            tempo_ms=tempo_ms,
+            cache_hit=True,
+            tokens_economizados=custo_original
+        )
+        yield formatar_evento('resultado', resultado)
+        yield formatar_evento('salvo', {'sugestao_id': sugestao.pk})
+
+    def gerar_sugestoes_em_lote(self, professor, itens):
+        """
+        Generate several suggestions (e.g. every unit of a plan) in one agent call.
+
+        Items found in the response cache are not sent to the agent. Results
+        keep the order of ``itens`` and one failing item does not fail the
+        others; successful items are saved with a single ``bulk_create``.
+
+        Returns:
+            List of ``{'indice', 'sucesso', 'resultado', 'sugestao_id'}`` or
+            ``{'indice', 'sucesso', 'erro'}`` dicts, one per item
+
+        Raises:
+            AgenteIndisponivelError: If the circuit is open
+            AuraMindAPIError: If the batch call itself fails
+        """
+        inicio = time.time()
+        payloads = [payload_sugestao(professor, item) for item in itens]
+        chaves = [chave_payload('sugestao', payload, CAMPOS_SUGESTAO) for payload in payloads]
+        respostas = [
+            self._resposta_cacheada(chave, payload) for chave, payload in zip(chaves, payloads)
+        ]
+        pendentes = [i for i, resposta in enumerate(respostas) if resposta is None]
+        erros = {}
+
+        if pendentes:
+            try:
+                lote = self._chamar_agente(
+                    'sugestoes_planejamento/batch/',
+                    {'itens': [payloads[i] for i in pendentes]},
+                    self._get_headers(),
+                    usuario=professor
                 )
-                
-                logger.info(f"Sugestão gerada com sucesso para professor {professor.id}")
-                return resultado
-            else:
-                erro_msg = f"Erro na API AuraMind: {response.status_code}"
+            except Exception as e:
+                tempo_ms = int((time.time() - inicio) * 1000)
+                for i in pendentes:
+                    self._log_interaction(
+                        usuario=professor,
+                        tipo='sugestao',
+                        entrada=payloads[i],
+                        saida={'error': e.texto} if isinstance(e, AuraMindAPIError) else {},
+                        sucesso=False,
+                        tempo_ms=tempo_ms,
+                        erro=str(e)
+                    )
+                logger.error(f"Erro ao gerar lote de sugestões: {str(e)}")
+                raise
+
+            for item in lote.get('resultados', []):
+                i = pendentes[item['indice']]
+                if item.get('sucesso'):
+                    respostas[i] = resultado_sugestao(item.get('sugestao') or {})
+                    self.cache.set(chaves[i], respostas[i])
+                else:
+                    erros[i] = item.get('erro') or 'Erro desconhecido'
+            for i in pendentes:
+                if respostas[i] is None and i not in erros:
+                    erros[i] = 'Item ausente na resposta do agente'
+
+        tempo_ms = int((time.time() - inicio) * 1000)
+        resultados = []
+        novas = []
+        for i, (item, payload) in enumerate(zip(itens, payloads)):
+            if i in erros:
                 self._log_interaction(
                     usuario=professor,
                     tipo='sugestao',
                     entrada=payload,
-                    saida={'error': response.text},
+                    saida={'error': erros[i]},
                     sucesso=False,
                     tempo_ms=tempo_ms,
-                    erro=erro_msg
+                    erro=erros[i]
                 )
-                logger.error(erro_msg)
-                raise Exception(erro_msg)
-        
-        except Exception as e:
-            tempo_ms = int((time.time() - inicio) * 1000)
+                resultados.append({'indice': i, 'sucesso': False, 'erro': erros[i]})
+                continue
+
+            resultado = respostas[i]
+            cache_hit = i not in pendentes
+            custo_original = resultado.get('metadata', {}).get('custo_token', 0)
+            custo_token = 0 if cache_hit else custo_original
+            novas.append(SugestaoIa(
+                professor=professor,
+                **dados_sugestao(item),
+                **campos_sugestao(resultado, custo_token, tempo_ms, cache_hit)
+            ))
             self._log_interaction(
                 usuario=professor,
                 tipo='sugestao',
-                entrada=plano_data,
-                saida={},
-                sucesso=False,
+                entrada=payload,
+                saida=resultado,
+                sucesso=True,
                 tempo_ms=tempo_ms,
-                erro=str(e)
+                custo_token=custo_token,
+                cache_hit=cache_hit,
+                tokens_economizados=custo_original if cache_hit else 0
             )
-            logger.error(f"Erro ao gerar sugestão: {str(e)}")
-            raise
-    
-    def analisar_plano(self, professor, plano_data):
+            resultados.append({'indice': i, 'sucesso': True, 'resultado': resultado})
+
+        criadas = SugestaoIa.objects.bulk_create(novas)
+        for resultado, sugestao in zip((r for r in resultados if r['sucesso']), criadas):
+            resultado['sugestao_id'] = sugestao.pk
+
+        logger.info(
+            f"Lote de sugestões para professor {professor.id}: "
+            f"{len(novas)}/{len(itens)} geradas, {len(itens) - len(pendentes)} do cache"
+        )
+        return resultados
+
+    def analisar_planos_em_lote(self, planos):
+        """
+        Score several plans in one agent call (``analise_plano/batch/``).
+
+        ``planos`` are agent ``RequisicaoAnalise`` payloads. Nothing is saved
+        here; callers such as the bulk re-analysis write the AnaliseIa rows.
+
+        Returns:
+            One ``{'sucesso': True, 'analise': ...}`` or
+            ``{'sucesso': False, 'erro': ...}`` dict per plan, in order
+
+        Raises:
+            AgenteIndisponivelError: If the circuit is open
+            AuraMindAPIError: If the batch call itself fails
+        """
+        lote = self._chamar_agente(
+            'analise_plano/batch/', {'planos': list(planos)}, self._get_headers()
+        )
+        resultados = [
+            {'sucesso': False, 'erro': 'Plano ausente na resposta do agente'} for _ in planos
+        ]
+        for item in lote.get('resultados', []):
+            if item.get('sucesso'):
+                resultados[item['indice']] = {'sucesso': True, 'analise': item.get('analise') or {}}
+            else:
+                resultados[item['indice']] = {
+                    'sucesso': False,
+                    'erro': item.get('erro') or 'Erro desconhecido',
+                }
+        return resultados
+
+    def _concluir_analise(
+        self, professor, plano_data, payload, resultado, inicio, coalescida=False, analise=None
+    ):
+        """Save and log an analysis answered by the agent."""
+        tempo_ms = int((time.time() - inicio) * 1000)
+        # Coalesced callers share the leader's response at no extra cost
+        custo_original = resultado.get('metadata', {}).get('custo_token', 0)
+        custo_token = 0 if coalescida else custo_original
+
+        # Save analysis to database
+        campos = dict(campos_analise(resultado), custo_token=custo_token)
+        if analise is None:
+            analise = AnaliseIa.objects.create(
+                professor=professor,
+                **dados_analise(plano_data),
+                **campos
+            )
+        else:
+            for campo, valor in campos.items():
+                setattr(analise, campo, valor)
+            analise.save()
+
+        # Log interaction
+        self._log_interaction(
+            usuario=professor,
+            tipo='analise',
+            entrada=payload,
+            saida=resultado,
+            sucesso=True,
+            tempo_ms=tempo_ms,
+            custo_token=custo_token,
+            tokens_economizados=custo_original if coalescida else 0
+        )
+
+        logger.info(
+            f"Análise realizada com sucesso para professor {professor.id}"
+            f"{' (coalescida)' if coalescida else ''}"
+        )
+
+    def analisar_plano(self, professor, plano_data, analise=None):
         """
         Analyze planning using AuraMind.
+
+        If ``analise`` is given (a row created in ``pendente`` state by the
+        async job mode), it is filled in instead of creating a new row; a call
+        refused by the open circuit is then not logged, as the job is requeued.
         """
         inicio = time.time()
+        payload = payload_analise(plano_data)
         
         try:
             headers = self._get_headers()
             
-            payload = {
-                'plano_id': plano_data.get('plano_id'),
-                'nivel_ensino': plano_data.get('nivel_ensino'),
-                'introducao_geral': plano_data.get('introducao_geral'),
-                'unidades_tematicas': plano_data.get('unidades_tematicas', []),
-                'instrucao_analise': 'Analise a aderência curricular (BNCC) e o nível de profundidade pedagógica. Gere um resumo com 3 pontos fortes e 3 pontos a revisar.'
-            }
-            
-            response = requests.post(
-                f'{self.base_url}analise_plano/',
-                json=payload,
-                headers=headers,
-                timeout=self.timeout
+            resultado, coalescida = single_flight.executar(
+                chave_payload('analise', payload, CAMPOS_ANALISE),
+                lambda: self._chamar_agente('analise_plano/', payload, headers, usuario=professor)
             )
-            
-            tempo_ms = int((time.time() - inicio) * 1000)
-            
-            if response.status_code == 200:
-                resultado = response.json()
-                
-                # Save analysis to database
-                analise = AnaliseIa.objects.create(
-                    professor=professor,
-                    plano_id=plano_data.get('plano_id'),
-                    tipo_analise='aderencia_curricular',
-                    status='concluida',
-                    pontos_fortes=resultado.get('analise', {}).get('pontos_fortes', []),
-                    pontos_a_revisar=resultado.get('analise', {}).get('pontos_a_revisar', []),
-                    recomendacoes=resultado.get('analise', {}).get('recomendacoes', ''),
-                    score_aderencia=resultado.get('analise', {}).get('score_aderencia'),
-                    custo_token=resultado.get('custo_token', 0)
-                )
-                
-                # Log interaction
-                self._log_interaction(
-                    usuario=professor,
-                    tipo='analise',
-                    entrada=payload,
-                    saida=resultado,
-                    sucesso=True,
-                    tempo_ms=tempo_ms,
-                    custo_token=resultado.get('custo_token', 0)
-                )
-                
-                logger.info(f"Análise realizada com sucesso para professor {professor.id}")
-                return resultado
-            else:
-                erro_msg = f"Erro na API AuraMind: {response.status_code}"
-                self._log_interaction(
-                    usuario=professor,
-                    tipo='analise',
-                    entrada=payload,
-                    saida={'error': response.text},
-                    sucesso=False,
-                    tempo_ms=tempo_ms,
-                    erro=erro_msg
-                )
-                logger.error(erro_msg)
-                raise Exception(erro_msg)
-        
+
+            self._concluir_analise(
+                professor, plano_data, payload, resultado, inicio, coalescida, analise
+            )
+            return resultado
+
         except Exception as e:
-            tempo_ms = int((time.time() - inicio) * 1000)
-            self._log_interaction(
-                usuario=professor,
-                tipo='analise',
-                entrada=plano_data,
-                saida={},
-                sucesso=False,
-                tempo_ms=tempo_ms,
-                erro=str(e)
+            if analise is None or not isinstance(e, AgenteIndisponivelError):
+                self._registrar_falha(professor, 'analise', payload, e, inicio)
+            raise
+
+    async def aanalisar_plano(self, professor, plano_data):
+        """Async ``analisar_plano``, for the ASGI views."""
+        inicio = time.time()
+        payload = payload_analise(plano_data)
+
+        try:
+            resultado, coalescida = await single_flight.aexecutar(
+                chave_payload('analise', payload, CAMPOS_ANALISE),
+                lambda: self._achamar_agente(
+                    'analise_plano/', payload, self._get_headers(), usuario=professor
+                ),
+            )
+
+            await sync_to_async(self._concluir_analise)(
+                professor, plano_data, payload, resultado, inicio, coalescida
             )
-            logger.error(f"Erro ao analisar plano: {str(e)}")
+            return resultado
+        
+        except Exception as e:
+            await sync_to_async(self._registrar_falha)(professor, 'analise', payload, e, inicio)
             raise
@@ -0,0 +1,99 @@
+"""
+Server-Sent Events helpers for the streaming suggestion mode.
+
+The agent emits one event per section of the suggestion; Django relays each
+event to the client as it arrives and rebuilds the full response from the
+sections to persist it once the ``fim`` event is received.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def formatar_evento(evento, dados):
+    """Encode one SSE event (``dados`` is JSON-serialized)."""
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n".encode()
+
+
+def ler_eventos(linhas):
+    """
+    Parse SSE lines into ``(evento, dados)`` pairs.
+
+    Multi-line ``data`` fields are joined with newlines; events without a name
+    are reported as ``message``, as in the SSE spec.
+    """
+    evento, dados = None, []
+    for linha in linhas:
+        if isinstance(linha, bytes):
+            linha = linha.decode('utf-8')
+        if not linha:
+            if dados:
+                yield evento or 'message', '\n'.join(dados)
+            evento, dados = None, []
+        elif linha.startswith(':'):
+            continue
+        else:
+            campo, _, valor = linha.partition(':')
+            valor = valor[1:] if valor.startswith(' ') else valor
+            if campo == 'event':
+                evento = valor
+            elif campo == 'data':
+                dados.append(valor)
+    if dados:
+        yield evento or 'message', '\n'.join(dados)
+
+
+def resultado_sugestao(resposta):
+    """
+    Map an agent ``SugestaoResposta`` (flat) to the response shape of the
+    Django API: ``dados_sugeridos`` + ``metadata``.
+
+    The suggested skills are those of the thematic units, in order.
+    """
+    unidades = resposta.get('unidades_tematicas', [])
+    habilidades = []
+    for unidade in unidades:
+        for codigo in unidade.get('habilidades', []):
+            if codigo not in habilidades:
+                habilidades.append(codigo)
+    return {
+        'dados_sugeridos': {
+            'titulo': resposta.get('titulo'),
+            'sugestao_texto': resposta.get('introducao', ''),
+            'habilidades_sugeridas': habilidades,
+            'unidades_tematicas': unidades,
+            'atividades_sugeridas': resposta.get('atividades_sugeridas', []),
+            'recursos_necessarios': resposta.get('recursos_necessarios', []),
+            'avaliacoes_propostas': resposta.get('avaliacoes_propostas', []),
+            'score_aderencia_bncc': resposta.get('score_aderencia_bncc'),
+            'observacoes': resposta.get('observacoes', ''),
+        },
+        'metadata': resposta.get('metadata', {}),
+    }
+
+
+def resultado_do_stream(secoes):
+    """
+    Rebuild the agent response from the streamed sections, in the shape used
+    by the non-streaming endpoint (``resultado_sugestao``).
+    """
+    return resultado_sugestao({
+        **secoes.get('inicio', {}),
+        **{secao: dados for secao, dados in secoes.items() if secao not in ('inicio', 'fim')},
+        **secoes.get('fim', {}),
+    })
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Accept ``text/event-stream`` on the streaming action.
+
+    The stream itself is a StreamingHttpResponse; this renderer is only used
+    for error responses, which are sent as a single ``erro`` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return formatar_evento('erro', data)
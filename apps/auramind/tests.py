@@ -0,0 +1,1493 @@
+"""
+Tests for AuraMind app.
+"""
+import asyncio
+import gzip
+import io
+import json
+import threading
+import time
+from unittest import mock
+
+import httpx
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.models import User
+from .agendamento import INTERATIVA, LOTE, Agendador
+from .client import get_session
+from .coalescing import SingleFlight, estatisticas
+from .jobs import enfileirar_analise, executar, processar_pendentes, reservar_proximo
+from .limites import LimiteExcedidoError, LimiteOcupadoError, LimitadorIa, limitador
+from .logsink import LogSink, expandir_saida
+from apps.administrativo.models import Escola, Funcionario
+from apps.pedagogico.models import PlanejamentoAnual, Turma, UnidadeTematica
+from apps.planejamentos.models import PlanejamentoTemplate
+from .models import AnaliseIa, SugestaoIa, LogIa, FilaIa, UsoIa
+from .reanalise import Reanalise
+from .resilience import AgenteIndisponivelError, breaker, retry_budget
+from .rollup import inicio_periodo, percentil
+from .semantico import indice_semantico
+from .services import AuraMindService, payload_sugestao
+
+
+def _resposta_agente(status_code=200, payload=None):
+    """Build a fake agent response."""
+    response = mock.Mock()
+    response.status_code = status_code
+    response.content = json.dumps(payload or {
+        'titulo': 'Sugestão', 'introducao': 'Texto',
+        'metadata': {'custo_token': 100},
+    }).encode()
+    response.text = ''
+    return response
+
+
+def _corpo_enviado(data, headers=None, **kwargs):
+    """Decode the JSON body of a fake agent POST (gzip-compressed or not)."""
+    if (headers or {}).get('Content-Encoding') == 'gzip':
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+def _encaminhar_ao_agente(agente):
+    """Fake ``session.post`` that sends the request to the real agent app (``agente`` fixture)."""
+    def post(url, data=None, headers=None, stream=False, **kwargs):
+        response = agente.post(
+            '/api/v1/auramind/' + url.split('/api/v1/auramind/', 1)[1],
+            content=data,
+            headers=headers,
+        )
+        if stream:
+            linhas = list(response.iter_lines())
+            response = mock.Mock(status_code=response.status_code, text=response.text)
+            response.iter_lines.return_value = iter(linhas)
+        return response
+    return post
+
+
+@pytest.mark.django_db
+class TestAuraMindService:
+    """Test AuraMindService integration with the agent."""
+
+    def setup_method(self):
+        """Setup test user and suggestion payload."""
+        caches['auramind'].clear()
+        self.professor = User.objects.create_user(
+            username='prof_ia',
+            email='prof_ia@example.com',
+            password='pass123',
+        )
+        self.plano_data = {
+            'plano_id': 1,
+            'nivel_ensino': '5ef',
+            'habilidade_foco': 'EF05LP01',
+            'contexto_previo': 'Turma com 25 alunos',
+            'formato_desejado': 'atividade',
+        }
+
+    def test_services_share_pooled_session(self):
+        """Test that every service instance reuses the process-wide session."""
+        assert AuraMindService().session is AuraMindService().session
+        assert AuraMindService().session is get_session()
+
+    def test_separate_connect_and_read_timeouts(self):
+        """Test that the agent is called with a (connect, read) timeout tuple."""
+        service = AuraMindService()
+        with mock.patch.object(service.session, 'post', return_value=_resposta_agente()) as post:
+            service.gerar_sugestao_planejamento(self.professor, self.plano_data)
+
+        connect, read = post.call_args.kwargs['timeout']
+        assert connect < read
+        assert SugestaoIa.objects.filter(professor=self.professor, status='concluida').count() == 1
+        assert LogIa.objects.filter(usuario=self.professor, sucesso=True).count() == 1
+
+    def test_identical_requests_hit_cache(self):
+        """Test that a normalized identical payload is served from the cache at zero cost."""
+        service = AuraMindService()
+        variante = dict(self.plano_data, plano_id=2, contexto_previo='  turma com 25   ALUNOS ')
+        with mock.patch.object(service.session, 'post', return_value=_resposta_agente()) as post:
+            service.gerar_sugestao_planejamento(self.professor, self.plano_data)
+            service.gerar_sugestao_planejamento(self.professor, variante)
+
+        assert post.call_count == 1
+        hit = LogIa.objects.get(usuario=self.professor, cache_hit=True)
+        assert hit.custo_token == 0
+        assert hit.tokens_economizados == 100
+        assert SugestaoIa.objects.filter(professor=self.professor, custo_token=0).count() == 1
+
+    def test_cache_falls_back_to_database(self):
+        """Test that entries evicted from local memory are recovered from the DB tier."""
+        service = AuraMindService()
+        with mock.patch.object(service.session, 'post', return_value=_resposta_agente()) as post:
+            service.gerar_sugestao_planejamento(self.professor, self.plano_data)
+            caches['auramind'].clear()
+            service.gerar_sugestao_planejamento(self.professor, self.plano_data)
+
+        assert post.call_count == 1
+
+
+@pytest.mark.django_db
+class TestAuraMindAsyncViews:
+    """Test the async views (ASGI) and the httpx path of AuraMindService."""
+
+    URL = '/api/v1/auramind/async/sugestoes_planejamento/'
+
+    def setup_method(self):
+        """Setup test client, test user and suggestion payload."""
+        caches['auramind'].clear()
+        self.client = APIClient()
+        self.professor = User.objects.create_user(
+            username='prof_asgi',
+            email='prof_asgi@example.com',
+            password='pass123',
+        )
+        self.plano_data = {
+            'plano_id': 8,
+            'nivel_ensino': '5ef',
+            'habilidade_foco': 'EF05CI02',
+            'contexto_previo': 'Turma curiosa sobre o ciclo da água',
+            'formato_desejado': 'atividade',
+        }
+
+    @staticmethod
+    def _resposta(status_code=200, payload=None):
+        return httpx.Response(status_code, json=payload or {
+            'titulo': 'Sugestão async', 'introducao': 'Texto',
+            'metadata': {'custo_token': 80},
+        })
+
+    def test_async_view_saves_suggestion(self):
+        """Test that the async view calls the agent through httpx and saves the suggestion."""
+        self.client.force_authenticate(user=self.professor)
+        with mock.patch.object(httpx.AsyncClient, 'post', return_value=self._resposta()) as post:
+            response = self.client.post(self.URL, self.plano_data, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['dados_sugeridos']['titulo'] == 'Sugestão async'
+        assert 'RateLimit-Remaining' in response
+        assert post.call_args.args[0].endswith('sugestoes_planejamento/')
+        assert json.loads(post.call_args.kwargs['content'])['habilidade_foco'] == 'EF05CI02'
+        assert SugestaoIa.objects.filter(professor=self.professor, custo_token=80).count() == 1
+        assert (
+            LogIa.objects.filter(usuario=self.professor, sucesso=True, custo_token=80).count() == 1
+        )
+
+    def test_async_view_requires_authentication_and_json(self):
+        """Test the 401, 405 and 400 answers of the async view."""
+        assert (
+            self.client.post(self.URL, self.plano_data, format='json').status_code
+            == status.HTTP_401_UNAUTHORIZED
+        )
+        self.client.force_authenticate(user=self.professor)
+        assert self.client.get(self.URL).status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+        response = self.client.post(self.URL, '[1, 2]', content_type='application/json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_agent_error_is_logged_once(self):
+        """Test that a 4xx agent answer returns 500 with a single failure log."""
+        self.client.force_authenticate(user=self.professor)
+        with mock.patch.object(
+            httpx.AsyncClient, 'post', return_value=self._resposta(422, {'detail': 'x'})
+        ) as post:
+            response = self.client.post(self.URL, self.plano_data, format='json')
+
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert post.call_count == 1
+        assert LogIa.objects.filter(usuario=self.professor, sucesso=False).count() == 1
+
+    def test_exhausted_pool_returns_503(self):
+        """Test that a pool timeout answers 503 without retrying the agent call."""
+        self.client.force_authenticate(user=self.professor)
+        with mock.patch.object(
+            httpx.AsyncClient, 'post', side_effect=httpx.PoolTimeout('')
+        ) as post:
+            response = self.client.post(self.URL, self.plano_data, format='json')
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()['codigo_erro'] == 'AGENTE_OCUPADO'
+        assert response['Retry-After'] == '1'
+        assert post.call_count == 1
+
+    def test_pool_timeout_releases_half_open_probe(self):
+        """Test that a probe that never left the pool frees its slot and counts no failure."""
+        self.client.force_authenticate(user=self.professor)
+        breaker.cache.set(breaker._chave('aberto_ate'), time.time() - 1, timeout=None)
+        try:
+            with mock.patch.object(httpx.AsyncClient, 'post', side_effect=httpx.PoolTimeout('')):
+                response = self.client.post(self.URL, self.plano_data, format='json')
+
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert response.json()['codigo_erro'] == 'AGENTE_OCUPADO'
+            assert breaker.estado() == 'meio_aberto'
+            assert breaker.resumo()['falhas_consecutivas'] == 0
+            assert breaker.permitir() is True
+        finally:
+            breaker.registrar_sucesso()
+
+    def test_concurrent_identical_calls_share_one_agent_call(self, settings):
+        """Test that identical calls in flight on the event loop are coalesced."""
+        settings.AURAMIND_COALESCING = 'local'
+
+        async def responder(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return self._resposta()
+
+        async def duas_chamadas():
+            service = AuraMindService()
+            return await asyncio.gather(
+                service.agerar_sugestao_planejamento(self.professor, self.plano_data),
+                service.agerar_sugestao_planejamento(self.professor, self.plano_data),
+            )
+
+        with mock.patch.object(httpx.AsyncClient, 'post', side_effect=responder) as post:
+            resultados = async_to_sync(duas_chamadas)()
+
+        assert post.call_count == 1
+        assert resultados[0] == resultados[1]
+        assert sorted(SugestaoIa.objects.values_list('custo_token', flat=True)) == [0, 80]
+
+
+@pytest.mark.django_db
+class TestAuraMindAsyncJobs:
+    """Test the async job mode of AuraMindAPIViewSet."""
+
+    def setup_method(self):
+        """Setup test client and test user."""
+        caches['auramind'].clear()
+        self.client = APIClient()
+        self.professor = User.objects.create_user(
+            username='prof_async',
+            email='prof_async@example.com',
+            password='pass123',
+        )
+        self.client.force_authenticate(user=self.professor)
+        self.plano_data = {
+            'plano_id': 7,
+            'nivel_ensino': '4ef',
+            'habilidade_foco': 'EF04CI02',
+            'contexto_previo': 'Ciclo da água',
+            'formato_desejado': 'atividade',
+        }
+
+    def test_async_request_returns_202_with_job(self):
+        """Test that async mode queues the job without calling the agent."""
+        with mock.patch(
+            'apps.auramind.services.AuraMindService.gerar_sugestao_planejamento'
+        ) as gerar:
+            response = self.client.post(
+                '/api/v1/auramind/api/sugestoes_planejamento/?assincrono=true',
+                self.plano_data, format='json'
+            )
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == 'pendente'
+        assert response['Location'].endswith(f"/jobs/{response.data['id']}/")
+        gerar.assert_not_called()
+        sugestao = SugestaoIa.objects.get(pk=response.data['sugestao'])
+        assert sugestao.status == 'processando'
+
+    def test_worker_completes_job(self):
+        """Test that a worker fills in the suggestion and finishes the job."""
+        response = self.client.post(
+            '/api/v1/auramind/api/sugestoes_planejamento/',
+            self.plano_data, format='json', HTTP_PREFER='respond-async'
+        )
+        job_id = response.data['id']
+
+        with mock.patch.object(get_session(), 'post', return_value=_resposta_agente()):
+            assert processar_pendentes() == 1
+
+        response = self.client.get(f'/api/v1/auramind/jobs/{job_id}/')
+        assert response.data['status'] == 'concluida'
+        sugestao = SugestaoIa.objects.get(pk=response.data['sugestao'])
+        assert sugestao.status == 'concluida'
+        assert sugestao.titulo_sugestao == 'Sugestão'
+
+    def test_long_poll_is_served_by_the_async_view(self):
+        """Test that the ASGI view waits for the job while the sync status answers at once."""
+        job = enfileirar_analise(self.professor, {'plano_id': 3, 'nivel_ensino': '5ef'})
+        url = f'/api/v1/auramind/async/jobs/{job.pk}/'
+
+        inicio = time.monotonic()
+        response = self.client.get(f'/api/v1/auramind/jobs/{job.pk}/?aguardar=5')
+        assert time.monotonic() - inicio < 1
+        assert response.data['status'] == 'pendente'
+
+        inicio = time.monotonic()
+        response = self.client.get(f'{url}?aguardar=0.6')
+        assert time.monotonic() - inicio >= 0.5
+        assert response.json()['status'] == 'pendente'
+
+        FilaIa.objects.filter(pk=job.pk).update(status='concluida')
+        assert self.client.get(f'{url}?aguardar=5').json()['status'] == 'concluida'
+        outro = User.objects.create_user(username='prof_outro', password='pass123')
+        self.client.force_authenticate(user=outro)
+        assert self.client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_open_circuit_requeues_job_without_logging(self):
+        """Test that an open circuit requeues the job unlogged, with the breaker's wait."""
+        job = enfileirar_analise(self.professor, {'plano_id': 3, 'nivel_ensino': '5ef'})
+        breaker.cache.set(breaker._chave('aberto_ate'), time.time() + 30, timeout=None)
+        try:
+            with mock.patch.object(get_session(), 'post') as post:
+                assert processar_pendentes() == 0
+                resultado = executar(reservar_proximo())
+        finally:
+            breaker.registrar_sucesso()
+
+        post.assert_not_called()
+        assert resultado.status == 'pendente'
+        assert 25 <= resultado.retry_after <= 30
+        job.refresh_from_db()
+        assert (job.status, job.tentativas) == ('pendente', 0)
+        assert job.analise.status == 'pendente'
+        assert not LogIa.objects.exists()
+
+    def test_analysis_end_to_end_with_agent(self, agente):
+        """Test that an annual plan is scored by the real agent, synchronously and as a job."""
+        plano = {
+            'plano_id': 12,
+            'titulo': 'Ciclo da água',
+            'nivel_ensino': '5ef',
+            'introducao_geral': 'Mudanças de estado físico da água e o ciclo hidrológico.',
+            'unidades_tematicas': [{
+                'titulo': 'Estados da água',
+                'descricao': 'Explicar o ciclo hidrológico pelas mudanças de estado da água.',
+                'habilidades_bncc': ['EF05CI02'],
+            }],
+        }
+        with mock.patch.object(get_session(), 'post', side_effect=_encaminhar_ao_agente(agente)):
+            response = self.client.post('/api/v1/auramind/api/analise_plano/', plano, format='json')
+            assert response.status_code == status.HTTP_200_OK, response.data
+            job = self.client.post(
+                '/api/v1/auramind/api/analise_plano/?assincrono=true', plano, format='json'
+            )
+            assert processar_pendentes() == 1
+
+        assert [c['codigo'] for c in response.data['cobertura_habilidades']] == ['EF05CI02']
+        sincrona, assincrona = AnaliseIa.objects.filter(professor=self.professor).order_by('pk')
+        assert sincrona.status == assincrona.status == 'concluida'
+        assert float(sincrona.score_aderencia) == round(response.data['aderencia_bncc'] * 10, 1) > 0
+        assert sincrona.recomendacoes.startswith(response.data['recomendacao_final'])
+        assert sincrona.custo_token == response.data['metadata']['custo_token'] > 0
+        assert assincrona.pk == job.data['analise']
+        assert assincrona.score_aderencia == sincrona.score_aderencia
+
+    @override_settings(AURAMIND_RETRY_MAX=0)
+    def test_failed_job_marks_result_row(self):
+        """Test that agent failures mark both the job and the analysis as erro."""
+        job = enfileirar_analise(self.professor, {'plano_id': 3, 'nivel_ensino': '5ef'})
+
+        with mock.patch.object(
+            get_session(), 'post', return_value=_resposta_agente(status_code=502)
+        ):
+            processar_pendentes()
+
+        job.refresh_from_db()
+        assert job.status == 'erro'
+        assert job.analise.status == 'erro'
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent identical calls."""
+
+    @pytest.fixture(autouse=True)
+    def cache_sem_banco(self, settings):
+        """Keep locks and counters in locmem: these tests run without a database."""
+        settings.AURAMIND_COALESCING_CACHE = 'default'
+
+    def setup_method(self):
+        """Reset shared counters."""
+        caches['default'].clear()
+
+    def _chamar_em_paralelo(self, flights, fn, n=8):
+        resultados = []
+
+        def chamar(flight):
+            resultados.append(flight.executar('chave', fn))
+
+        threads = [
+            threading.Thread(target=chamar, args=(flights[i % len(flights)],))
+            for i in range(n)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return resultados
+
+    @override_settings(AURAMIND_COALESCING='local')
+    def test_concurrent_callers_share_one_call(self):
+        """Test that followers in one process wait on the leader's call."""
+        chamadas = []
+
+        def upstream():
+            chamadas.append(1)
+            time.sleep(0.2)
+            return {'score': 0.9}
+
+        resultados = self._chamar_em_paralelo([SingleFlight()], upstream)
+
+        assert len(chamadas) == 1
+        assert all(resultado == {'score': 0.9} for resultado, _ in resultados)
+        assert sum(coalescida for _, coalescida in resultados) == 7
+        assert estatisticas()['coalescida_local'] == 7
+
+    @override_settings(AURAMIND_COALESCING='cache', AURAMIND_COALESCING_CACHE='default')
+    def test_coalescing_across_workers_with_cache_lock(self):
+        """Test that separate workers share one call through the cache lock."""
+        chamadas = []
+
+        def upstream():
+            chamadas.append(1)
+            time.sleep(0.3)
+            return {'score': 0.8}
+
+        # One SingleFlight per simulated gunicorn worker
+        resultados = self._chamar_em_paralelo([SingleFlight() for _ in range(4)], upstream)
+
+        assert len(chamadas) == 1
+        assert all(resultado == {'score': 0.8} for resultado, _ in resultados)
+        assert estatisticas()['coalescida_distribuida'] == 3
+
+    @override_settings(AURAMIND_COALESCING='local', AURAMIND_COALESCING_CACHE='auramind')
+    def test_counters_live_in_coalescing_cache(self):
+        """Test that counters go to the shared AURAMIND_COALESCING_CACHE, not a per-process one."""
+        caches['auramind'].clear()
+        SingleFlight().executar('chave', lambda: {'score': 1})
+
+        assert caches['auramind'].get('auramind:coalescing:lider') == 1
+        assert caches['default'].get('auramind:coalescing:lider') is None
+        assert estatisticas()['lider'] == 1
+
+    @override_settings(AURAMIND_COALESCING='local')
+    def test_leader_error_is_shared(self):
+        """Test that followers receive the leader's error instead of retrying."""
+        chamadas = []
+
+        def upstream():
+            chamadas.append(1)
+            time.sleep(0.2)
+            raise RuntimeError('agente indisponível')
+
+        flight = SingleFlight()
+        erros = []
+
+        def chamar():
+            try:
+                flight.executar('chave', upstream)
+            except RuntimeError as e:
+                erros.append(e)
+
+        threads = [threading.Thread(target=chamar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(chamadas) == 1
+        assert len(erros) == 4
+
+
+@pytest.mark.django_db
+class TestAuraMindResilience:
+    """Test circuit breaker and retry around the agent."""
+
+    @pytest.fixture(autouse=True)
+    def configuracao(self, settings):
+        """Low failure threshold and no backoff delay."""
+        settings.AURAMIND_BREAKER_FALHAS = 2
+        settings.AURAMIND_RETRY_BASE_DELAY = 0
+
+    def setup_method(self):
+        """Setup service, user and a full retry budget."""
+        caches['auramind'].clear()
+        retry_budget.tokens = retry_budget.max_tokens
+        self.client = APIClient()
+        self.professor = User.objects.create_user(
+            username='prof_breaker',
+            email='prof_breaker@example.com',
+            password='pass123',
+        )
+        self.client.force_authenticate(user=self.professor)
+        self.analise = {'plano_id': 9, 'nivel_ensino': '5ef', 'introducao_geral': 'Plano'}
+
+    def test_retries_5xx_then_succeeds(self):
+        """Test that a 5xx answer is retried with backoff."""
+        service = AuraMindService()
+        respostas = [
+            _resposta_agente(status_code=502),
+            _resposta_agente(payload={'aderencia_bncc': 0.5}),
+        ]
+        with mock.patch.object(service.session, 'post', side_effect=respostas) as post:
+            service.analisar_plano(self.professor, self.analise)
+
+        assert post.call_count == 2
+        assert breaker.estado() == 'fechado'
+
+    def test_client_errors_are_not_retried(self):
+        """Test that 4xx answers fail without retry and do not trip the breaker."""
+        service = AuraMindService()
+        with mock.patch.object(
+            service.session, 'post', return_value=_resposta_agente(status_code=422)
+        ) as post:
+            with pytest.raises(Exception):
+                service.analisar_plano(self.professor, self.analise)
+
+        assert post.call_count == 1
+        assert breaker.resumo()['falhas_consecutivas'] == 0
+
+    def test_probe_without_outcome_releases_its_slot(self):
+        """Test that a probe failing before the agent answers frees its slot, sync and async."""
+        breaker.cache.set(breaker._chave('aberto_ate'), time.time() - 1, timeout=None)
+        service = AuraMindService()
+        try:
+            with mock.patch.object(Agendador, 'vaga', side_effect=RuntimeError('vaga')):
+                with pytest.raises(RuntimeError):
+                    service.analisar_plano(self.professor, self.analise)
+            assert breaker.estado() == 'meio_aberto'
+            assert breaker.resumo()['falhas_consecutivas'] == 0
+
+            with mock.patch.object(httpx.AsyncClient, 'post', side_effect=RuntimeError('cliente')):
+                with pytest.raises(RuntimeError):
+                    async_to_sync(service.aanalisar_plano)(self.professor, self.analise)
+            assert breaker.estado() == 'meio_aberto'
+            assert breaker.permitir() is True
+        finally:
+            breaker.registrar_sucesso()
+
+    @override_settings(AURAMIND_RETRY_MAX=0)
+    def test_open_circuit_fails_fast_with_503(self):
+        """Test that the circuit opens after repeated failures and answers 503."""
+        url = '/api/v1/auramind/api/analise_plano/'
+        with mock.patch.object(
+            get_session(), 'post', return_value=_resposta_agente(status_code=503)
+        ) as post:
+            for _ in range(2):
+                assert self.client.post(url, self.analise, format='json').status_code == 500
+            response = self.client.post(url, self.analise, format='json')
+
+        assert post.call_count == 2
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert int(response['Retry-After']) >= 1
+        status_api = self.client.get('/api/v1/auramind/api/status/')
+        assert status_api.data['circuit_breaker']['estado'] == 'aberto'
+
+    def test_half_open_probe_closes_circuit(self):
+        """Test that a successful probe after the reset period closes the circuit."""
+        breaker.cache.set(breaker._chave('aberto_ate'), time.time() - 1, timeout=None)
+        assert breaker.estado() == 'meio_aberto'
+
+        assert breaker.permitir() is True
+        with pytest.raises(AgenteIndisponivelError):
+            breaker.permitir()
+
+        breaker.registrar_sucesso()
+        assert breaker.estado() == 'fechado'
+
+
+@pytest.mark.django_db
+class TestLogSink:
+    """Test write-behind batching of LogIa rows."""
+
+    @pytest.fixture(autouse=True)
+    def configuracao(self, settings):
+        """Batch of 3 rows, no time-based flush during the test."""
+        settings.AURAMIND_LOG_LOTE = 3
+        settings.AURAMIND_LOG_INTERVALO = 60
+        settings.AURAMIND_LOG_SAIDA_MAX_BYTES = 200
+
+    def setup_method(self):
+        """Setup test user."""
+        caches['auramind'].clear()
+        self.professor = User.objects.create_user(
+            username='prof_log',
+            email='prof_log@example.com',
+            password='pass123',
+        )
+
+    def _registrar(self, sink, **campos):
+        dados = dict(usuario=self.professor, tipo='sugestao', entrada={}, saida={'ok': True})
+        dados.update(campos)
+        sink.registrar(**dados)
+
+    def test_rows_written_in_one_bulk_insert(self):
+        """Test that rows are buffered until the batch size and then bulk inserted."""
+        sink = LogSink()
+        self._registrar(sink)
+        self._registrar(sink)
+        assert LogIa.objects.count() == 0
+
+        with CaptureQueriesContext(connection) as consultas:
+            self._registrar(sink)
+        inserts = [
+            q
+            for q in consultas.captured_queries
+            if q['sql'].startswith('INSERT INTO "auramind_logia"')
+        ]
+        assert len(inserts) == 1
+        assert LogIa.objects.count() == 3
+        assert sink.pendentes == 0
+
+    def test_shutdown_flushes_buffer(self):
+        """Test that stopping the sink writes the partial batch."""
+        sink = LogSink()
+        self._registrar(sink)
+        assert sink.encerrar() == 1
+        assert LogIa.objects.count() == 1
+
+    def test_large_output_is_compressed(self, settings):
+        """Test that large saida bodies are compressed and can be expanded back."""
+        sink = LogSink()
+        saida = {'texto': 'atividade ' * 100}
+        self._registrar(sink, saida=saida)
+        sink.flush()
+
+        log = LogIa.objects.get()
+        assert log.saida['_compactado'] == 'zlib+base64'
+        assert expandir_saida(log.saida) == saida
+
+        settings.AURAMIND_LOG_SAIDA_MODO = 'truncar'
+        self._registrar(sink, saida=saida)
+        sink.flush()
+        truncado = LogIa.objects.latest('id').saida
+        assert truncado['_truncado'] is True
+        assert len(truncado['previa']) <= 200
+
+    def test_failed_call_logs_once(self, settings):
+        """Test that an agent error produces exactly one log row."""
+        settings.AURAMIND_LOG_LOTE = 1
+        service = AuraMindService()
+        plano_data = {'plano_id': 1, 'nivel_ensino': '5ef', 'habilidade_foco': 'EF05LP02'}
+        with mock.patch.object(
+            service.session, 'post', return_value=_resposta_agente(status_code=422)
+        ):
+            with pytest.raises(Exception):
+                service.gerar_sugestao_planejamento(self.professor, plano_data)
+
+        log = LogIa.objects.get(usuario=self.professor)
+        assert log.sucesso is False
+        assert log.entrada['habilidade_foco'] == 'EF05LP02'
+        assert 'error' in log.saida
+
+
+@pytest.mark.django_db
+class TestUsoIaRollup:
+    """Test incremental usage rollups and the usage endpoint."""
+
+    def setup_method(self):
+        """Setup test client and test user."""
+        self.client = APIClient()
+        self.professor = User.objects.create_user(
+            username='prof_uso',
+            email='prof_uso@example.com',
+            password='pass123',
+        )
+        self.client.force_authenticate(user=self.professor)
+
+    def _registrar(self, sink, tempo_ms, sucesso=True, tipo='sugestao'):
+        sink.registrar(
+            usuario=self.professor, tipo=tipo, entrada={}, saida={},
+            sucesso=sucesso, tempo_resposta_ms=tempo_ms, custo_token=10 if sucesso else 0
+        )
+
+    def test_logs_update_hourly_and_daily_rollups(self, settings):
+        """Test that a written batch is merged into one row per granularity."""
+        settings.AURAMIND_LOG_LOTE = 3
+        settings.AURAMIND_LOG_INTERVALO = 60
+        sink = LogSink()
+        for tempo_ms in (80, 120, 4000):
+            self._registrar(sink, tempo_ms)
+
+        for granularidade in ('hora', 'dia'):
+            uso = UsoIa.objects.get(granularidade=granularidade, usuario=self.professor)
+            assert uso.total == 3
+            assert uso.custo_token == 30
+            assert uso.tempo_max_ms == 4000
+            assert sum(uso.histograma) == 3
+        assert percentil(uso.histograma, 50) == 250
+
+    def test_resumo_reads_only_rollups(self, django_assert_max_num_queries):
+        """Test that the summary groups rollups in a constant number of queries."""
+        sink = LogSink()
+        for tempo_ms in range(100, 2100, 100):
+            self._registrar(sink, tempo_ms)
+        self._registrar(sink, 30000, sucesso=False, tipo='analise')
+
+        with django_assert_max_num_queries(3):
+            response = self.client.get('/api/v1/auramind/uso/resumo/?agrupar=tipo')
+
+        assert response.status_code == status.HTTP_200_OK
+        grupos = {linha['grupo']: linha for linha in response.data['resultados']}
+        assert grupos['sugestao']['total'] == 20
+        assert grupos['sugestao']['custo_token'] == 200
+        assert grupos['sugestao']['p95_ms'] == 2500
+        assert grupos['analise']['erros'] == 1
+
+    def test_resumo_sums_in_the_database(self, django_assert_max_num_queries):
+        """Test that rollups are summed by the database, not loaded row by row."""
+        sink = LogSink()
+        for tempo_ms in (100, 300, 900):
+            self._registrar(sink, tempo_ms)
+        self._registrar(sink, 100, sucesso=False)
+
+        with django_assert_max_num_queries(3) as consultas:
+            response = self.client.get('/api/v1/auramind/uso/resumo/?agrupar=usuario')
+
+        sql = consultas.captured_queries[-1]['sql'].upper()
+        assert 'SUM(' in sql and 'GROUP BY' in sql
+        [linha] = response.data['resultados']
+        assert linha['grupo'] == self.professor.id
+        assert (linha['total'], linha['sucesso'], linha['erros']) == (4, 3, 1)
+        assert linha['custo_token'] == 30
+        assert linha['tempo_max_ms'] == 900
+        assert linha['tempo_medio_ms'] == 350
+
+        for consulta in ('', '?agrupar=escola'):
+            response = self.client.get(f'/api/v1/auramind/uso/resumo/{consulta}')
+            [linha] = response.data['resultados']
+            assert linha['grupo'] is None
+            assert linha['total'] == 4
+
+    def test_logs_without_user_share_one_rollup_row(self):
+        """Test that logs without a user share one rollup key (NULLs would be distinct)."""
+        sink = LogSink()
+        for tempo_ms in (100, 200):
+            sink.registrar(
+                usuario=None,
+                tipo='sugestao',
+                entrada={},
+                saida={},
+                sucesso=True,
+                tempo_resposta_ms=tempo_ms,
+            )
+        uso = UsoIa.objects.get(granularidade='dia', usuario=None)
+        assert uso.total == 2
+
+        with pytest.raises(IntegrityError), transaction.atomic():
+            UsoIa.objects.create(
+                granularidade='dia',
+                periodo=uso.periodo,
+                usuario=None,
+                tipo='sugestao',
+                sucesso=True,
+            )
+
+
+@pytest.mark.django_db
+class TestSugestoesEmLote:
+    """Test batch suggestion generation in one agent call."""
+
+    def setup_method(self):
+        """Setup test client, user and three unit requests."""
+        caches['auramind'].clear()
+        self.client = APIClient()
+        self.professor = User.objects.create_user(
+            username='prof_lote',
+            email='prof_lote@example.com',
+            password='pass123',
+        )
+        self.client.force_authenticate(user=self.professor)
+        self.itens = [
+            {'plano_id': 4, 'nivel_ensino': '5ef', 'habilidade_foco': f'EF05CI0{i}',
+             'contexto_previo': f'Unidade {i}'}
+            for i in range(1, 4)
+        ]
+
+    def _resposta_lote(self, *itens):
+        return _resposta_agente(
+            payload={
+                'resultados': [
+                    {
+                        'indice': i,
+                        'sucesso': sucesso,
+                        'sugestao': sugestao,
+                        'erro': None if sucesso else 'Requisição inválida',
+                    }
+                    for i, (sucesso, sugestao) in enumerate(itens)
+                ]
+            }
+        )
+
+    def test_batch_keeps_order_and_skips_cached_items(self):
+        """Test that cached items are not resent and results keep request order."""
+        service = AuraMindService()
+        with mock.patch.object(service.session, 'post', return_value=_resposta_agente()):
+            service.gerar_sugestao_planejamento(self.professor, self.itens[1])
+
+        sugestao = {'titulo': 'Lote', 'introducao': 'Texto', 'metadata': {'custo_token': 50}}
+        resposta = self._resposta_lote((True, sugestao), (False, None))
+        with mock.patch.object(service.session, 'post', return_value=resposta) as post:
+            resultados = service.gerar_sugestoes_em_lote(self.professor, self.itens)
+
+        assert post.call_count == 1
+        assert post.call_args.args[0].endswith('sugestoes_planejamento/batch/')
+        enviados = _corpo_enviado(**post.call_args.kwargs)['itens']
+        assert [item['habilidade_foco'] for item in enviados] == ['EF05CI01', 'EF05CI03']
+        assert [r['sucesso'] for r in resultados] == [True, True, False]
+        assert resultados[0]['resultado']['dados_sugeridos']['titulo'] == 'Lote'
+        assert resultados[2]['erro'] == 'Requisição inválida'
+        assert SugestaoIa.objects.filter(pk=resultados[0]['sugestao_id'], custo_token=50).exists()
+        assert LogIa.objects.filter(usuario=self.professor).count() == 4
+
+    def test_batch_endpoint_validates_items(self):
+        """Test the Django batch endpoint response and input validation."""
+        url = '/api/v1/auramind/api/sugestoes_planejamento/lote/'
+        assert (
+            self.client.post(url, {'itens': []}, format='json').status_code
+            == status.HTTP_400_BAD_REQUEST
+        )
+
+        sugestao = {'titulo': 'Lote', 'introducao': 'Texto', 'metadata': {}}
+        resposta = self._resposta_lote(*[(True, sugestao)] * 3)
+        with mock.patch.object(get_session(), 'post', return_value=resposta):
+            response = self.client.post(url, {'itens': self.itens}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['sucessos'] == 3
+        assert [r['indice'] for r in response.data['resultados']] == [0, 1, 2]
+
+    def test_payloads_are_accepted_by_agent(self, agente):
+        """Test the suggestion payload against the real agent endpoints, unmocked."""
+        payload = payload_sugestao(self.professor, self.itens[0])
+        resposta = agente.post('/api/v1/auramind/sugestoes_planejamento/', json=payload)
+        assert resposta.status_code == 200, resposta.text
+        assert 'Unidade 1' in resposta.json()['titulo']
+
+        resposta = agente.post(
+            '/api/v1/auramind/sugestoes_planejamento/batch/',
+            json={'itens': [payload_sugestao(self.professor, item) for item in self.itens]}
+        )
+        assert resposta.status_code == 200, resposta.text
+        assert resposta.json()['sucessos'] == 3
+
+    def test_batch_end_to_end_with_agent(self, agente):
+        """Test that the agent's batch answer is mapped to saved suggestions."""
+        service = AuraMindService()
+        with mock.patch.object(service.session, 'post', side_effect=_encaminhar_ao_agente(agente)):
+            resultados = service.gerar_sugestoes_em_lote(self.professor, self.itens)
+
+        assert [r['sucesso'] for r in resultados] == [True, True, True]
+        for i, resultado in enumerate(resultados, start=1):
+            dados = resultado['resultado']['dados_sugeridos']
+            assert f'Unidade {i}' in dados['titulo']
+            assert dados['habilidades_sugeridas'] == [f'EF05CI0{i}']
+            sugestao = SugestaoIa.objects.get(pk=resultado['sugestao_id'])
+            assert sugestao.titulo_sugestao == dados['titulo']
+            assert sugestao.conteudo_sugestao == dados['sugestao_texto'] != ''
+            assert sugestao.custo_token == resultado['resultado']['metadata']['custo_token'] > 0
+
+    def test_large_batch_body_is_gzipped(self, settings):
+        """Test that batch bodies above the threshold are sent gzip-compressed."""
+        settings.AURAMIND_COMPRESSAO_MIN_BYTES = 500
+        service = AuraMindService()
+        sugestao = {'titulo': 'Lote', 'introducao': 'Texto', 'metadata': {}}
+        with mock.patch.object(
+            service.session, 'post', return_value=self._resposta_lote(*[(True, sugestao)] * 3)
+        ) as post:
+            service.gerar_sugestoes_em_lote(self.professor, self.itens)
+
+        kwargs = post.call_args.kwargs
+        assert kwargs['headers']['Content-Encoding'] == 'gzip'
+        assert kwargs['headers']['Content-Type'] == 'application/json'
+        assert len(_corpo_enviado(**kwargs)['itens']) == 3
+
+        with mock.patch.object(service.session, 'post', return_value=_resposta_agente()) as post:
+            service.gerar_sugestao_planejamento(
+                self.professor, dict(self.itens[0], contexto_previo='Outra unidade')
+            )
+        assert 'Content-Encoding' not in post.call_args.kwargs['headers']
+
+
+@pytest.mark.django_db
+class TestSugestaoStreaming:
+    """Test SSE relay of streamed suggestions."""
+
+    URL = '/api/v1/auramind/api/sugestoes_planejamento/stream/'
+
+    def setup_method(self):
+        """Setup test client, user and payload."""
+        caches['auramind'].clear()
+        self.client = APIClient()
+        self.professor = User.objects.create_user(
+            username='prof_stream',
+            email='prof_stream@example.com',
+            password='pass123',
+        )
+        self.client.force_authenticate(user=self.professor)
+        self.plano_data = {
+            'plano_id': 5, 'nivel_ensino': '3ef', 'habilidade_foco': 'EF03MA01',
+            'contexto_previo': 'Números até 1000',
+        }
+
+    def _resposta_stream(self, *eventos):
+        linhas = []
+        for evento, dados in eventos:
+            linhas += [f'event: {evento}', f'data: {json.dumps(dados)}', '']
+        response = _resposta_agente()
+        response.iter_lines.return_value = iter(linhas)
+        return response
+
+    def test_events_are_relayed_and_suggestion_saved_at_end(self):
+        """Test that sections are relayed in order and the row is saved on fim."""
+        resposta = self._resposta_stream(
+            ('inicio', {'titulo': 'Plano', 'introducao': 'Intro'}),
+            ('unidades_tematicas', [{'titulo': 'U1', 'habilidades': ['EF03MA01']}]),
+            ('fim', {'score_aderencia_bncc': 0.9, 'metadata': {'custo_token': 70}}),
+        )
+        with mock.patch.object(get_session(), 'post', return_value=resposta) as post:
+            response = self.client.post(self.URL, self.plano_data, format='json')
+            assert response['Content-Type'] == 'text/event-stream'
+            assert post.call_args.kwargs['stream'] is True
+            assert not SugestaoIa.objects.exists()
+            corpo = b''.join(response.streaming_content).decode()
+
+        eventos = [linha[7:] for linha in corpo.splitlines() if linha.startswith('event: ')]
+        assert eventos == ['inicio', 'unidades_tematicas', 'fim', 'salvo']
+        sugestao = SugestaoIa.objects.get(professor=self.professor)
+        assert sugestao.titulo_sugestao == 'Plano'
+        assert sugestao.habilidades_sugeridas == ['EF03MA01']
+        assert sugestao.custo_token == 70
+        assert f'"sugestao_id": {sugestao.pk}' in corpo
+
+    def test_stream_end_to_end_with_agent(self, agente):
+        """Test the relay against the real agent stream endpoint, unmocked."""
+        with mock.patch.object(
+            get_session(), 'post', side_effect=_encaminhar_ao_agente(agente)
+        ) as post:
+            response = self.client.post(self.URL, self.plano_data, format='json')
+            corpo = b''.join(response.streaming_content).decode()
+
+        assert post.call_args.args[0].endswith('sugestoes_planejamento/stream/')
+        eventos = [linha[7:] for linha in corpo.splitlines() if linha.startswith('event: ')]
+        assert eventos == [
+            'inicio', 'unidades_tematicas', 'atividades_sugeridas', 'recursos_necessarios',
+            'avaliacoes_propostas', 'fim', 'salvo'
+        ]
+        sugestao = SugestaoIa.objects.get(professor=self.professor)
+        assert 'Números até 1000' in sugestao.titulo_sugestao
+        assert sugestao.conteudo_sugestao
+        assert sugestao.habilidades_sugeridas == ['EF03MA01']
+        assert sugestao.custo_token > 0
+
+    def test_truncated_stream_reports_error_and_logs_once(self):
+        """Test that a stream ending without fim emits erro and saves nothing."""
+        resposta = self._resposta_stream(('inicio', {'titulo': 'Plano', 'introducao': 'Intro'}))
+        with mock.patch.object(get_session(), 'post', return_value=resposta):
+            response = self.client.post(self.URL, self.plano_data, format='json')
+            corpo = b''.join(response.streaming_content).decode()
+
+        assert 'event: erro' in corpo
+        assert not SugestaoIa.objects.exists()
+        assert LogIa.objects.get(usuario=self.professor).sucesso is False
+
+
+@pytest.mark.django_db
+class TestReanalise:
+    """Test the bulk re-analysis pipeline."""
+
+    def setup_method(self):
+        """Setup four templates (one without author) and an annual plan."""
+        self.professor = User.objects.create_user(
+            username='prof_reanalise',
+            email='prof_reanalise@example.com',
+            password='pass123',
+        )
+        self.templates = [
+            PlanejamentoTemplate.objects.create(
+                titulo=f'Plano {i}',
+                nivel_ensino='5ef',
+                habilidades_bncc=['EF05CI02'],
+                objetivos_aprendizagem='Compreender o ciclo da água',
+                desenvolvimento='Experimento de evaporação',
+                avaliacao='Cartaz',
+                autor=None if i == 3 else self.professor
+            )
+            for i in range(4)
+        ]
+        escola = Escola.objects.create(nome='Escola Reanálise', cnpj='00.000.000/0001-91')
+        turma = Turma.objects.create(
+            escola=escola, nome='5º Ano A', nivel_ensino='5ef', ano_letivo=2025, semestre=1
+        )
+        self.anual = PlanejamentoAnual.objects.create(
+            professor=self.professor,
+            turma=turma,
+            titulo='Anual',
+            introducao_geral='Ano de ciências',
+        )
+        for ordem, codigo in enumerate(['EF05CI02', 'EF05CI03', 'EF05CI02']):
+            UnidadeTematica.objects.create(
+                planejamento=self.anual, titulo=f'Unidade {ordem}', descricao='Água',
+                habilidades_bncc=[codigo], duracao_semanas=2, ordem=ordem
+            )
+
+    def _agente(self, url, **kwargs):
+        """Fake batch endpoint: the first plan of every batch fails."""
+        planos = _corpo_enviado(**kwargs)['planos']
+
+        def analise(plano):
+            return {
+                'plano_id': plano['plano_id'],
+                'aderencia_bncc': 0.81,
+                'pontos_fortes': [],
+                'pontos_revisar': [{'aspecto': 'A', 'descricao': 'B', 'impacto': 'alto'}],
+                'sugestoes_melhoria': ['Sugestão'],
+                'recomendacao_final': 'APROVADO',
+            }
+
+        return _resposta_agente(
+            payload={
+                'resultados': [
+                    (
+                        {'indice': i, 'sucesso': False, 'erro': 'Requisição inválida'}
+                        if i == 0
+                        else {'indice': i, 'sucesso': True, 'analise': analise(plano)}
+                    )
+                    for i, plano in enumerate(planos)
+                ]
+            }
+        )
+
+    def test_batches_and_bulk_creates_analyses(self, tmp_path):
+        """Test that plans are sent in batches and saved with the agent scores."""
+        service = AuraMindService()
+        reanalise = Reanalise(lote=2, servico=service, checkpoint=str(tmp_path / 'checkpoint.json'))
+        with mock.patch.object(service.session, 'post', side_effect=self._agente) as post:
+            progresso = list(reanalise.executar(['template', 'anual']))
+
+        assert post.call_count == 3
+        assert all(
+            chamada.args[0].endswith('analise_plano/batch/') for chamada in post.call_args_list
+        )
+        anual = _corpo_enviado(**post.call_args_list[-1].kwargs)['planos'][0]
+        assert anual['habilidades_bncc'] == ['EF05CI02', 'EF05CI03']
+        assert anual['nivel_ensino'] == '5ef'
+        assert sum(p['ignorados'] for p in progresso) == 1
+
+        templates = AnaliseIa.objects.filter(tipo_analise='aderencia_template')
+        assert templates.count() == 3
+        assert templates.filter(status='erro').count() == 2
+        concluida = templates.get(status='concluida')
+        assert float(concluida.score_aderencia) == 8.1
+        assert concluida.pontos_a_revisar[0]['impacto'] == 'alto'
+        assert AnaliseIa.objects.filter(
+            tipo_analise='aderencia_planejamento_anual', plano_id=self.anual.pk
+        ).exists()
+
+    def test_resumes_from_checkpoint(self, tmp_path):
+        """Test that a new run with the same checkpoint skips the saved batches."""
+        caminho = str(tmp_path / 'checkpoint.json')
+        service = AuraMindService()
+        with mock.patch.object(service.session, 'post', side_effect=self._agente):
+            primeiro_lote = next(
+                Reanalise(lote=2, servico=service, checkpoint=caminho).executar(['template'])
+            )
+            assert primeiro_lote['ultimo_id'] == self.templates[1].pk
+
+            with mock.patch.object(service.session, 'post', side_effect=self._agente) as post:
+                list(Reanalise(lote=2, servico=service, checkpoint=caminho).executar(['template']))
+
+        enviados = [
+            plano['plano_id'] for plano in _corpo_enviado(**post.call_args.kwargs)['planos']
+        ]
+        assert enviados == [self.templates[2].pk]
+        assert AnaliseIa.objects.filter(tipo_analise='aderencia_template').count() == 3
+
+    def test_command_reports_throughput(self, tmp_path):
+        """Test the management command output and the author fallback."""
+        saida = io.StringIO()
+        with mock.patch.object(get_session(), 'post', side_effect=self._agente):
+            call_command(
+                'reanalisar_planos', '--fonte', 'template', '--lote', '10',
+                '--responsavel', str(self.professor.pk),
+                '--checkpoint', str(tmp_path / 'checkpoint.json'), stdout=saida
+            )
+
+        assert '4 planos reanalisados' in saida.getvalue()
+        assert 'planos/s' in saida.getvalue()
+        assert AnaliseIa.objects.filter(tipo_analise='aderencia_template').count() == 4
+
+
+@pytest.mark.django_db
+class TestLimitesIa:
+    """Test the per-user and per-school rate limits and daily quotas."""
+
+    URL = '/api/v1/auramind/api/sugestoes_planejamento/'
+
+    @pytest.fixture(autouse=True)
+    def configuracao(self, settings):
+        """Small buckets with a slow refill."""
+        settings.AURAMIND_LIMITE_USUARIO_RAJADA = 2
+        settings.AURAMIND_LIMITE_USUARIO_POR_MINUTO = 1
+        settings.AURAMIND_LIMITE_ESCOLA_RAJADA = 3
+        settings.AURAMIND_LIMITE_ESCOLA_POR_MINUTO = 1
+        settings.AURAMIND_QUOTA_USUARIO_DIA = 0
+        settings.AURAMIND_QUOTA_ESCOLA_DIA = 0
+
+    def setup_method(self):
+        """Setup two teachers of the same school."""
+        caches['auramind'].clear()
+        self.client = APIClient()
+        self.escola = Escola.objects.create(nome='Escola Limites', cnpj='00.000.000/0001-17')
+        self.professores = []
+        for numero in range(2):
+            professor = User.objects.create_user(
+                username=f'prof_limite{numero}',
+                email=f'prof_limite{numero}@example.com',
+                password='pass123',
+            )
+            Funcionario.objects.create(
+                escola=self.escola, user=professor, matricula_funcional=f'LIM-{numero}',
+                cargo='professor', data_admissao='2024-02-01', salario='3500.00'
+            )
+            self.professores.append(professor)
+        self.plano_data = {
+            'plano_id': 1, 'nivel_ensino': '5ef', 'habilidade_foco': 'EF05MA03',
+            'contexto_previo': 'Frações', 'formato_desejado': 'atividade',
+        }
+
+    def _sugerir(self, professor, plano_id=1):
+        self.client.force_authenticate(user=professor)
+        dados = dict(self.plano_data, plano_id=plano_id, contexto_previo=f'Plano {plano_id}')
+        return self.client.post(self.URL, dados, format='json')
+
+    def test_user_bucket_answers_429_before_calling_agent(self):
+        """Test that an empty user bucket answers 429 with the rate limit headers."""
+        with mock.patch.object(get_session(), 'post', return_value=_resposta_agente()) as post:
+            primeira = self._sugerir(self.professores[0], plano_id=1)
+            self._sugerir(self.professores[0], plano_id=2)
+            recusada = self._sugerir(self.professores[0], plano_id=3)
+
+        assert primeira.status_code == status.HTTP_200_OK
+        assert primeira['RateLimit-Limit'] == '2'
+        assert primeira['RateLimit-Remaining'] == '1'
+        assert post.call_count == 2
+        assert recusada.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert recusada.data['codigo_erro'] == 'LIMITE_TAXA_EXCEDIDO'
+        assert recusada.data['escopo'] == 'usuario'
+        assert int(recusada['Retry-After']) >= 1
+        assert recusada['RateLimit-Remaining'] == '0'
+
+    def test_concurrent_calls_never_overdraw_the_bucket(self, settings):
+        """Test that concurrent workers take exactly the burst from a shared bucket."""
+        # Shared by the threads like Redis by the workers (SQLite would lock the cache table)
+        settings.AURAMIND_LIMITE_CACHE = 'auramind'
+        professor = self.professores[0]
+        limitador.escopos(professor)  # School lookup cached before the threads start
+        lento = LimitadorIa._bucket
+
+        def bucket(*args):
+            # Widen the read-modify-write window so unsynchronized updates would overlap
+            tokens = lento(limitador, *args)
+            time.sleep(0.02)
+            return tokens
+
+        aceitas, recusadas = [], []
+        barreira = threading.Barrier(6)
+
+        def consumir():
+            barreira.wait()
+            try:
+                aceitas.append(limitador.consumir(professor))
+            except LimiteExcedidoError as e:
+                recusadas.append(e)
+
+        with mock.patch.object(LimitadorIa, '_bucket', side_effect=bucket):
+            threads = [threading.Thread(target=consumir) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert len(aceitas) == 2
+        assert sorted(cabecalhos['RateLimit-Remaining'] for cabecalhos in aceitas) == ['0', '1']
+        assert len(recusadas) == 4
+        assert {e.escopo for e in recusadas} == {'usuario'}
+
+    def test_busy_lock_answers_503_not_429(self):
+        """Test that a bucket lock held by another call is contention (503), not a rate limit."""
+        professor = self.professores[0]
+        chave = limitador._chave('trava', 'usuario', professor.pk)
+        limitador.cache.set(chave, 'outra-chamada', timeout=30)
+        with mock.patch('apps.auramind.limites.TRAVA_ESPERA', 0.05):
+            with mock.patch.object(get_session(), 'post') as post:
+                response = self._sugerir(professor)
+
+        post.assert_not_called()
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.data['codigo_erro'] == 'LIMITE_OCUPADO'
+        assert response['Retry-After'] == '1'
+        assert 'RateLimit-Remaining' not in response
+        assert limitador.cache.get(chave) == 'outra-chamada'
+
+    def test_expired_lock_is_neither_written_through_nor_released(self):
+        """Test that a holder whose lock expired and was retaken writes nothing and keeps it."""
+        professor = self.professores[0]
+        chave = limitador._chave('trava', 'usuario', professor.pk)
+        lento = LimitadorIa._bucket
+
+        def bucket(*args):
+            # The lock expires mid-update and another call takes it
+            limitador.cache.set(chave, 'outra-chamada', timeout=30)
+            return lento(limitador, *args)
+
+        with mock.patch.object(LimitadorIa, '_bucket', side_effect=bucket):
+            with pytest.raises(LimiteOcupadoError):
+                limitador.consumir(professor)
+
+        assert limitador.cache.get(chave) == 'outra-chamada'
+        assert limitador.cache.get(limitador._chave('bucket', 'usuario', professor.pk)) is None
+
+    def test_school_bucket_is_shared_by_its_staff(self):
+        """Test that teachers of the same school draw from one school bucket."""
+        with mock.patch.object(get_session(), 'post', return_value=_resposta_agente()):
+            for plano_id in (1, 2):
+                assert (
+                    self._sugerir(self.professores[0], plano_id).status_code == status.HTTP_200_OK
+                )
+            assert self._sugerir(self.professores[1], 3).status_code == status.HTTP_200_OK
+            recusada = self._sugerir(self.professores[1], 4)
+
+        assert recusada.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert recusada.data['escopo'] == 'escola'
+        assert recusada['RateLimit-Limit'] == '3'
+
+    def test_daily_quota_counts_logged_tokens(self, settings):
+        """Test that the quota is seeded from the daily rollups and grows with LogIa.custo_token."""
+        settings.AURAMIND_QUOTA_ESCOLA_DIA = 1000
+        UsoIa.objects.create(
+            granularidade='dia',
+            periodo=inicio_periodo(timezone.now(), 'dia'),
+            usuario=self.professores[1],
+            tipo='sugestao',
+            sucesso=True,
+            total=3,
+            custo_token=950,
+        )
+        assert limitador.consumo_diario('escola', self.escola.pk) == 950
+
+        with mock.patch.object(get_session(), 'post', return_value=_resposta_agente()) as post:
+            assert self._sugerir(self.professores[0]).status_code == status.HTTP_200_OK
+            recusada = self._sugerir(self.professores[0], plano_id=2)
+
+        assert post.call_count == 1
+        assert limitador.consumo_diario('escola', self.escola.pk) == 1050
+        assert recusada.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert recusada.data['codigo_erro'] == 'QUOTA_DIARIA_EXCEDIDA'
+        assert recusada['RateLimit-Limit'] == '1000'
+
+
+class TestAgendador:
+    """Test the priority classes and fair queuing of agent calls."""
+
+    @pytest.fixture(autouse=True)
+    def configuracao(self, settings):
+        """Local cache and no cross-process back-off unless a test asks for it."""
+        settings.AURAMIND_AGENDADOR_CACHE = 'default'
+        settings.AURAMIND_AGENDADOR_LOTE_ESPERA_MAX = 0
+        settings.AURAMIND_AGENDADOR_PESOS = {}
+        caches['default'].clear()
+
+    def _enfileirar(self, agendador, ordem, nome, classe, escola_id=None):
+        """Start a call in a thread and wait until it is queued."""
+        na_fila = sum(c['na_fila'] for c in agendador.resumo()['classes'].values())
+
+        def chamar():
+            with agendador.vaga(classe, escola_id):
+                ordem.append(nome)
+
+        thread = threading.Thread(target=chamar)
+        thread.start()
+        while sum(c['na_fila'] for c in agendador.resumo()['classes'].values()) == na_fila:
+            time.sleep(0.001)
+        return thread
+
+    def _drenar(self, agendador, chamadas, segurar=0):
+        """Queue the calls behind a slot held ``segurar`` s more; return the serving order."""
+        ordem = []
+        with agendador.vaga(INTERATIVA):
+            threads = [self._enfileirar(agendador, ordem, *chamada) for chamada in chamadas]
+            time.sleep(segurar)
+        for thread in threads:
+            thread.join(timeout=5)
+        return ordem
+
+    def test_interactive_calls_go_before_queued_bulk(self):
+        """Test that a waiting interactive call takes the next slot before queued bulk calls."""
+        agendador = Agendador(vagas=1)
+        ordem = self._drenar(agendador, [
+            ('lote-1', LOTE), ('lote-2', LOTE), ('sugerir', INTERATIVA),
+        ], segurar=0.05)
+
+        assert ordem == ['sugerir', 'lote-1', 'lote-2']
+        resumo = agendador.resumo()['classes']
+        assert resumo['interativa']['atendidas'] == 2
+        assert resumo['lote']['atendidas'] == 2
+        assert resumo['lote']['na_fila'] == 0
+        # Both bulk calls were queued before the 50 ms the slot was still held
+        assert resumo['lote']['espera_p50_ms'] >= 50
+
+    def test_fair_queuing_between_schools(self, settings):
+        """Test that a school with a backlog does not push other schools to the back."""
+        ordem = self._drenar(
+            Agendador(vagas=1),
+            [
+                ('a1', INTERATIVA, 1),
+                ('a2', INTERATIVA, 1),
+                ('a3', INTERATIVA, 1),
+                ('b1', INTERATIVA, 2),
+            ],
+        )
+        assert ordem == ['a1', 'b1', 'a2', 'a3']
+
+        settings.AURAMIND_AGENDADOR_PESOS = {'2': 3.0}
+        ordem = self._drenar(Agendador(vagas=1), [
+            ('a1', INTERATIVA, 1), ('a2', INTERATIVA, 1),
+            ('b1', INTERATIVA, 2), ('b2', INTERATIVA, 2), ('b3', INTERATIVA, 2),
+        ])
+        # Tags: b 1/3, 2/3, 1 and a 1, 2 (ties go to the call queued first)
+        assert ordem == ['b1', 'b2', 'a1', 'b3', 'a2']
+
+    def test_bulk_yields_to_interactive_calls_of_other_processes(self, settings):
+        """Test that bulk calls hold back while an interactive call was seen recently."""
+        settings.AURAMIND_AGENDADOR_JANELA = 0.2
+        settings.AURAMIND_AGENDADOR_LOTE_ESPERA_MAX = 5
+        agendador = Agendador(vagas=4)
+        with agendador.vaga(INTERATIVA) as espera_interativa:
+            pass
+        with agendador.vaga(LOTE) as espera_lote:
+            pass
+
+        assert espera_interativa < 50
+        assert espera_lote >= 150
+
+
+@pytest.mark.django_db
+class TestCacheSemantico:
+    """Test the near-duplicate suggestion cache."""
+
+    @pytest.fixture(autouse=True)
+    def configuracao(self, settings):
+        """Refresh the index on every lookup."""
+        settings.AURAMIND_CACHE_SEMANTICO_ATUALIZACAO = 0
+        settings.AURAMIND_CACHE_SEMANTICO_LIMIAR = 0.85
+
+    def setup_method(self):
+        """Setup user and a suggestion already generated by the agent."""
+        caches['auramind'].clear()
+        caches['auramind_db'].clear()
+        self.professor = User.objects.create_user(
+            username='prof_semantico',
+            email='prof_semantico@example.com',
+            password='pass123',
+        )
+        self.plano_data = {
+            'plano_id': 1,
+            'nivel_ensino': '5ef',
+            'habilidade_foco': 'EF05MA03',
+            'contexto_previo': 'Turma agitada, 25 alunos',
+            'formato_desejado': 'atividade',
+        }
+        self.service = AuraMindService()
+        with mock.patch.object(self.service.session, 'post', return_value=_resposta_agente()):
+            self.service.gerar_sugestao_planejamento(self.professor, self.plano_data)
+
+    def _sugerir(self, **alteracoes):
+        with mock.patch.object(
+            self.service.session, 'post', return_value=_resposta_agente()
+        ) as post:
+            resultado = self.service.gerar_sugestao_planejamento(
+                self.professor, dict(self.plano_data, **alteracoes)
+            )
+        return resultado, post.call_count
+
+    def test_reworded_context_is_served_from_stored_suggestion(self):
+        """Test that a reordered contexto_previo reuses the stored suggestion at zero cost."""
+        resultado, chamadas = self._sugerir(plano_id=2, contexto_previo='25 alunos; turma AGITADA')
+
+        assert chamadas == 0
+        assert resultado['dados_sugeridos']['titulo'] == 'Sugestão'
+        assert resultado['metadata']['cache_semantico']['similaridade'] == 1.0
+        hit = LogIa.objects.get(usuario=self.professor, cache_hit=True)
+        assert hit.custo_token == 0
+        assert hit.tokens_economizados == 100
+        assert indice_semantico.resumo()['acertos'] == 1
+
+    def test_other_skill_or_context_calls_agent(self):
+        """Test that the lookup is filtered by skill and needs similar wording."""
+        assert self._sugerir(habilidade_foco='EF05MA04')[1] == 1
+        assert self._sugerir(contexto_previo='Turma calma, 12 alunos com leitura fluente')[1] == 1
+        assert self._sugerir(formato_desejado='ideia_avaliacao')[1] == 1
+
+    def test_threshold_is_configurable(self, settings):
+        """Test that a near duplicate below the threshold goes to the agent."""
+        variante = 'Turma agitada com 25 alunos e dois monitores'
+        settings.AURAMIND_CACHE_SEMANTICO_LIMIAR = 0.9
+        assert self._sugerir(contexto_previo=variante)[1] == 1
+
+        settings.AURAMIND_CACHE_SEMANTICO_LIMIAR = 0.5
+        resultado, chamadas = self._sugerir(contexto_previo=f'{variante} de apoio')
+        assert chamadas == 0
+        assert 0.5 <= resultado['metadata']['cache_semantico']['similaridade'] < 0.9
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    """Query-count budget of the AuraMind list and detail endpoints."""
+
+    LINHAS = 5
+    # Max queries of a list page, checked by the orcamento_lista_detalhe fixture
+    ORCAMENTOS = {
+        'sugestoes': 2,
+        'analises': 2,
+        'logs': 2,
+        'jobs': 2,
+        'uso': 2,
+    }
+
+    def setup_method(self):
+        """Setup LINHAS rows of every model, each by its own teacher (jobs: the logged-in one)."""
+        self.client = APIClient()
+        self.professor = User.objects.create(username='prof_orcamento')
+        periodo = inicio_periodo(timezone.now(), 'dia')
+        for i in range(self.LINHAS):
+            professor = User.objects.create(username=f'prof_orcamento{i}')
+            sugestao = SugestaoIa.objects.create(
+                professor=professor, plano_id=i, habilidade_foco='EF05CI02', nivel_ensino='5ef',
+                contexto_previo='Turma do 5º ano'
+            )
+            AnaliseIa.objects.create(professor=professor, plano_id=i, tipo_analise='aderencia_bncc')
+            LogIa.objects.create(
+                usuario=professor, tipo='sugestao', entrada={'plano_id': i}, saida={}
+            )
+            UsoIa.objects.create(
+                granularidade='dia',
+                periodo=periodo,
+                usuario=professor,
+                tipo='sugestao',
+                sucesso=True,
+                total=1,
+            )
+            FilaIa.objects.create(
+                professor=self.professor,
+                tipo='sugestao',
+                payload={'plano_id': i},
+                sugestao=sugestao,
+            )
+        self.client.force_authenticate(user=self.professor)
+
+    @pytest.mark.parametrize('endpoint', sorted(ORCAMENTOS))
+    def test_list_and_detail_within_budget(self, endpoint, orcamento_lista_detalhe):
+        """Test that list and detail cost the same few queries whatever the number of rows."""
+        orcamento_lista_detalhe(
+            self.client, f'/api/v1/auramind/{endpoint}/', self.ORCAMENTOS[endpoint], self.LINHAS
+        )
@@ -5,15 +5,26 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     SugestaoIaViewSet, AnaliseIaViewSet, LogIaViewSet,
-    AuraMindAPIViewSet
+    FilaIaViewSet, UsoIaViewSet, AuraMindAPIViewSet,
+    sugestoes_planejamento_async, analise_plano_async, aguardar_job_async
 )
 
 router = DefaultRouter()
 router.register(r'sugestoes', SugestaoIaViewSet, basename='sugestao-ia')
 router.register(r'analises', AnaliseIaViewSet, basename='analise-ia')
 router.register(r'logs', LogIaViewSet, basename='log-ia')
+router.register(r'jobs', FilaIaViewSet, basename='fila-ia')
+router.register(r'uso', UsoIaViewSet, basename='uso-ia')
 router.register(r'api', AuraMindAPIViewSet, basename='auramind-api')
 
 urlpatterns = [
+    # Async views, served by config/asgi.py
+    path(
+        'async/sugestoes_planejamento/',
+        sugestoes_planejamento_async,
+        name='auramind-async-sugestoes',
+    ),
+    path('async/analise_plano/', analise_plano_async, name='auramind-async-analise'),
+    path('async/jobs/<int:pk>/', aguardar_job_async, name='auramind-async-job'),
     path('', include(router.urls)),
 ]
@@ -1,15 +1,61 @@
 """
 Views for AuraMind app.
 """
+from datetime import datetime
+
+import httpx
+import orjson
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.reverse import reverse
+from rest_framework.exceptions import APIException, NotAuthenticated, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .models import SugestaoIa, AnaliseIa, LogIa
-from .serializers import SugestaoIaSerializer, AnaliseIaSerializer, LogIaSerializer
-from .services import AuraMindService
+from apps.core.paginacao import paginacao_cursor
+from apps.pedagogico.models import PlanejamentoAnual
+
+from .models import SugestaoIa, AnaliseIa, LogIa, FilaIa, UsoIa
+from .serializers import (
+    SugestaoIaSerializer, AnaliseIaSerializer, LogIaSerializer, FilaIaSerializer,
+    UsoIaSerializer
+)
+from .services import AuraMindService, dados_planejamento_anual
+from .jobs import enfileirar_sugestao, enfileirar_analise, aaguardar_conclusao
+from .agendamento import agendador
+from .coalescing import single_flight, estatisticas as coalescing_estatisticas
+from .limites import LimiteExcedidoError, LimiteOcupadoError, limitador
+from .resilience import AgenteIndisponivelError, breaker
+from .rollup import resumir
+from .semantico import indice_semantico
+from .streaming import EventStreamRenderer
+
+
+def _modo_assincrono(request):
+    """Whether the client asked for the async job mode."""
+    if request.query_params.get('assincrono', '').lower() in ('1', 'true', 'sim'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def _resposta_job(request, job):
+    """202 response pointing to the job status endpoint."""
+    return Response(
+        FilaIaSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': reverse('fila-ia-detail', args=[job.pk], request=request)}
+    )
 
 
 class SugestaoIaViewSet(viewsets.ModelViewSet):
@@ -35,19 +81,170 @@ class LogIaViewSet(viewsets.ModelViewSet):
     queryset = LogIa.objects.all()
     serializer_class = LogIaSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-created_at', '-id')
+    pagination_class = paginacao_cursor(*ordering)
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['tipo', 'sucesso', 'cache_hit']
+
+
+def _parse_data(valor, nome):
+    """Parse a ``desde``/``ate`` query param (date or datetime)."""
+    data = parse_datetime(valor)
+    if data is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValidationError({nome: 'Data inválida'})
+        data = datetime.combine(dia, datetime.min.time())
+    if timezone.is_naive(data):
+        data = timezone.make_aware(data)
+    return data
+
+
+class UsoIaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Pre-aggregated AI usage for dashboards.
+
+    Reads only UsoIa rollups, never LogIa. Query params: ``granularidade``
+    (``hora``/``dia``, default ``dia``), ``desde``, ``ate``, ``usuario``,
+    ``escola``, ``tipo``, ``sucesso``.
+    """
+    serializer_class = UsoIaSerializer
+    permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['tipo', 'sucesso']
+    filterset_fields = ['tipo', 'sucesso', 'usuario']
+
+    AGRUPAMENTOS = ('periodo', 'usuario', 'escola', 'tipo', 'sucesso')
+
+    def get_queryset(self):
+        params = self.request.query_params
+        granularidade = params.get('granularidade', 'dia')
+        if granularidade not in ('hora', 'dia'):
+            raise ValidationError({'granularidade': "Use 'hora' ou 'dia'"})
+        queryset = UsoIa.objects.filter(granularidade=granularidade)
+        if params.get('desde'):
+            queryset = queryset.filter(periodo__gte=_parse_data(params['desde'], 'desde'))
+        if params.get('ate'):
+            queryset = queryset.filter(periodo__lt=_parse_data(params['ate'], 'ate'))
+        if params.get('escola'):
+            queryset = queryset.filter(usuario__funcionario_profile__escola=params['escola'])
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def resumo(self, request):
+        """
+        Totals, mean latency and p50/p95/p99 of the filtered rollups.
+
+        ``?agrupar=periodo|usuario|escola|tipo|sucesso`` returns one entry
+        per group.
+        """
+        agrupar = request.query_params.get('agrupar')
+        if agrupar and agrupar not in self.AGRUPAMENTOS:
+            raise ValidationError({'agrupar': f"Use um de: {', '.join(self.AGRUPAMENTOS)}"})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if agrupar == 'escola':
+            queryset = queryset.annotate(escola=F('usuario__funcionario_profile__escola'))
+        campo = 'usuario_id' if agrupar == 'usuario' else agrupar
+
+        return Response({
+            'granularidade': request.query_params.get('granularidade', 'dia'),
+            'agrupar': agrupar,
+            'resultados': resumir(queryset, campo),
+        })
+
+
+def _resposta_indisponivel(erro):
+    """503 answered while the circuit breaker is open."""
+    return Response(
+        {'error': str(erro), 'codigo_erro': 'AGENTE_INDISPONIVEL'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(erro.retry_after)}
+    )
+
+
+class FilaIaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status of async AuraMind jobs.
+
+    ``GET jobs/{id}/`` answers at once; clients poll it, or long-poll the
+    ASGI view ``aguardar_job_async`` instead.
+    """
+    serializer_class = FilaIaSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['tipo', 'status']
+
+    def get_queryset(self):
+        # payload is only read by the queue worker
+        return FilaIa.objects.filter(professor=self.request.user).defer('payload')
 
 
 class AuraMindAPIViewSet(viewsets.ViewSet):
-    """ViewSet for AuraMind API interactions."""
+    """
+    ViewSet for AuraMind API interactions.
+
+    Every AI action first takes a token from the user's and the school's
+    rate limit buckets (see ``limites``); over a limit or daily quota it
+    answers 429 without calling the agent.
+    """
     permission_classes = [IsAuthenticated]
+
+    def limitar(self, request, custo=1):
+        """
+        Enforce the rate limits and quotas.
+
+        Raises LimiteExcedidoError (429) or LimiteOcupadoError (503).
+        """
+        self.cabecalhos_limite = limitador.consumir(request.user, custo)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, LimiteExcedidoError):
+            return Response(
+                {'error': str(exc), 'codigo_erro': exc.codigo_erro, 'escopo': exc.escopo},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers=exc.cabecalhos()
+            )
+        if isinstance(exc, LimiteOcupadoError):
+            return Response(
+                {'error': str(exc), 'codigo_erro': 'LIMITE_OCUPADO', 'escopo': exc.escopo},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(exc.retry_after)}
+            )
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        for nome, valor in getattr(self, 'cabecalhos_limite', {}).items():
+            response[nome] = valor
+        return response
     
+    @action(detail=False, methods=['get'], url_path='status')
+    def status_integracao(self, request):
+        """
+        Status of the integration with the AuraMind agent.
+        """
+        return Response({
+            'circuit_breaker': breaker.resumo(),
+            'agendador': agendador.resumo(),
+            'coalescing': {
+                'modo': single_flight.modo,
+                'contadores': coalescing_estatisticas(),
+            },
+            'cache_semantico': indice_semantico.resumo(),
+        })
+
     @action(detail=False, methods=['post'])
     def sugestoes_planejamento(self, request):
         """
         Generate pedagogical suggestion.
+
+        With ``?assincrono=true`` (or ``Prefer: respond-async``) the request is
+        queued and answered with 202 and the job id.
         """
+        self.limitar(request)
+        if _modo_assincrono(request):
+            return _resposta_job(request, enfileirar_sugestao(request.user, request.data))
+
         try:
             service = AuraMindService()
             plano_data = request.data
@@ -59,17 +256,99 @@ class AuraMindAPIViewSet(viewsets.ViewSet):
             
             return Response(resultado, status=status.HTTP_200_OK)
         
+        except AgenteIndisponivelError as e:
+            return _resposta_indisponivel(e)
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['post'], url_path='sugestoes_planejamento/stream',
+            renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def sugestoes_planejamento_stream(self, request):
+        """
+        Generate pedagogical suggestion as Server-Sent Events.
+
+        Each section is relayed as soon as the agent produces it; the final
+        ``salvo`` event carries the id of the persisted SugestaoIa.
+        """
+        self.limitar(request)
+        try:
+            eventos = AuraMindService().gerar_sugestao_stream(request.user, request.data)
+        except AgenteIndisponivelError as e:
+            return _resposta_indisponivel(e)
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        response = StreamingHttpResponse(eventos, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Disable proxy buffering (nginx) so events reach the client immediately
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='sugestoes_planejamento/lote')
+    def sugestoes_planejamento_lote(self, request):
+        """
+        Generate several suggestions in a single agent call.
+
+        Body: ``{"itens": [<plano_data>, ...]}`` or ``{"planejamento_anual": <id>}``
+        (one suggestion per UnidadeTematica). Results keep the request order,
+        with per-item errors.
+        """
+        planejamento_id = request.data.get('planejamento_anual')
+        if planejamento_id:
+            planejamento = get_object_or_404(
+                PlanejamentoAnual.objects.select_related('turma'), pk=planejamento_id
+            )
+            itens = dados_planejamento_anual(planejamento)
+        else:
+            itens = request.data.get('itens')
+
+        if not isinstance(itens, list) or not itens:
+            return Response(
+                {'error': 'Informe "itens" (lista não vazia) ou "planejamento_anual"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(itens) > settings.AURAMIND_LOTE_MAX_ITENS:
+            return Response(
+                {'error': f'Máximo de {settings.AURAMIND_LOTE_MAX_ITENS} itens por lote'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        self.limitar(request, custo=len(itens))
+        try:
+            resultados = AuraMindService().gerar_sugestoes_em_lote(request.user, itens)
+        except AgenteIndisponivelError as e:
+            return _resposta_indisponivel(e)
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        sucessos = sum(1 for resultado in resultados if resultado['sucesso'])
+        return Response({
+            'resultados': resultados,
+            'total': len(resultados),
+            'sucessos': sucessos,
+            'falhas': len(resultados) - sucessos,
+        })
+
     @action(detail=False, methods=['post'])
     def analise_plano(self, request):
         """
         Analyze planning.
+
+        Supports the same async mode as ``sugestoes_planejamento``.
         """
+        self.limitar(request)
+        if _modo_assincrono(request):
+            return _resposta_job(request, enfileirar_analise(request.user, request.data))
+
         try:
             service = AuraMindService()
             plano_data = request.data
@@ -81,8 +360,141 @@ class AuraMindAPIViewSet(viewsets.ViewSet):
             
             return Response(resultado, status=status.HTTP_200_OK)
         
+        except AgenteIndisponivelError as e:
+            return _resposta_indisponivel(e)
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+def _json(dados, status_code=status.HTTP_200_OK, headers=None):
+    """JSON response rendered with orjson (the async views bypass DRF)."""
+    return HttpResponse(
+        orjson.dumps(dados), content_type='application/json', status=status_code, headers=headers
+    )
+
+
+def _autenticar(request):
+    """
+    DRF authentication of an async view request.
+
+    Raises:
+        APIException: 401 if not authenticated
+    """
+    usuario = Request(
+        request, authenticators=[classe() for classe in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    ).user
+    if not usuario.is_authenticated:
+        raise NotAuthenticated()
+    return usuario
+
+
+def _autenticar_e_limitar(request, custo=1):
+    """
+    DRF authentication and rate limits of an async view request, in one sync hop.
+
+    Returns:
+        ``(usuario, cabecalhos_limite)``
+
+    Raises:
+        APIException: 401 if not authenticated
+        LimiteExcedidoError: Over a rate limit or daily quota (429)
+        LimiteOcupadoError: Rate limit state locked by concurrent calls (503)
+    """
+    usuario = _autenticar(request)
+    return usuario, limitador.consumir(usuario, custo)
+
+
+def _view_ia_async(metodo):
+    """
+    Async POST view around ``AuraMindService.<metodo>`` for the ASGI entry point.
+
+    Answers like the matching ``AuraMindAPIViewSet`` action (same status
+    codes, errors and RateLimit headers), without the async job mode. While
+    the agent works the request holds no thread and no database connection,
+    so one uvicorn worker serves hundreds of calls in flight.
+    """
+    async def view(request):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        try:
+            usuario, cabecalhos = await sync_to_async(_autenticar_e_limitar)(request)
+        except LimiteExcedidoError as e:
+            return _json(
+                {'error': str(e), 'codigo_erro': e.codigo_erro, 'escopo': e.escopo},
+                status.HTTP_429_TOO_MANY_REQUESTS, e.cabecalhos()
+            )
+        except LimiteOcupadoError as e:
+            return _json(
+                {'error': str(e), 'codigo_erro': 'LIMITE_OCUPADO', 'escopo': e.escopo},
+                status.HTTP_503_SERVICE_UNAVAILABLE, {'Retry-After': str(e.retry_after)}
+            )
+        except APIException as e:
+            return _json({'detail': str(e.detail)}, e.status_code)
+
+        try:
+            plano_data = orjson.loads(request.body or b'{}')
+        except orjson.JSONDecodeError:
+            plano_data = None
+        if not isinstance(plano_data, dict):
+            return _json({'error': 'Corpo JSON inválido'}, status.HTTP_400_BAD_REQUEST, cabecalhos)
+
+        try:
+            resultado = await getattr(AuraMindService(), metodo)(usuario, plano_data)
+        except AgenteIndisponivelError as e:
+            return _json(
+                {'error': str(e), 'codigo_erro': 'AGENTE_INDISPONIVEL'},
+                status.HTTP_503_SERVICE_UNAVAILABLE, {'Retry-After': str(e.retry_after)}
+            )
+        except httpx.PoolTimeout:
+            # Every pooled connection stayed busy for AURAMIND_ASYNC_POOL_TIMEOUT seconds
+            return _json(
+                {
+                    'error': (
+                        'Todas as conexões com o agente AuraMind estão ocupadas. Tente novamente.'
+                    ),
+                    'codigo_erro': 'AGENTE_OCUPADO',
+                },
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                {'Retry-After': '1'},
+            )
+        except Exception as e:
+            return _json({'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR, cabecalhos)
+        return _json(resultado, headers=cabecalhos)
+
+    # csrf_exempt only learns to wrap coroutine functions in Django 5.0
+    view.csrf_exempt = True
+    return view
+
+
+sugestoes_planejamento_async = _view_ia_async('agerar_sugestao_planejamento')
+analise_plano_async = _view_ia_async('aanalisar_plano')
+
+
+async def aguardar_job_async(request, pk):
+    """
+    Long-poll of an async job for the ASGI entry point.
+
+    ``GET async/jobs/{id}/?aguardar=<segundos>`` answers like ``GET jobs/{id}/``
+    once the job finishes or the wait (at most ``AURAMIND_LONG_POLL_MAX``
+    seconds) expires. The wait holds no thread and no database connection.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        usuario = await sync_to_async(_autenticar)(request)
+    except APIException as e:
+        return _json({'detail': str(e.detail)}, e.status_code)
+
+    job = await FilaIa.objects.filter(professor=usuario, pk=pk).defer('payload').afirst()
+    if job is None:
+        return _json({'detail': 'Não encontrado.'}, status.HTTP_404_NOT_FOUND)
+    try:
+        aguardar = float(request.GET.get('aguardar', 0))
+    except ValueError:
+        aguardar = 0
+    if aguardar > 0:
+        job = await aaguardar_conclusao(job, aguardar)
+    return _json(FilaIaSerializer(job).data)
@@ -0,0 +1,25 @@
+"""
+Queryset helpers shared by the ViewSets.
+"""
+
+
+def com_relacionados(queryset, *campos):
+    """
+    ``select_related`` loading only the listed columns of the joined rows.
+
+    The model's own columns are all loaded; ``'aluno__user__first_name'``
+    joins ``aluno`` and ``aluno.user`` and loads just that column of the user
+    (plus the keys of the join), instead of every column of every joined row.
+
+    Example:
+        com_relacionados(SubmissaoTarefa.objects.all(), 'tarefa__titulo', *nome_de('aluno__user'))
+    """
+    relacoes = {campo.rsplit('__', 1)[0] for campo in campos}
+    proprios = [campo.name for campo in queryset.model._meta.concrete_fields]
+    # The foreign keys along each path must be loaded to follow the join
+    return queryset.select_related(*relacoes).only(*proprios, *sorted(relacoes), *campos)
+
+
+def nome_de(relacao):
+    """Columns read by ``get_full_name`` of the user at ``relacao``, for ``com_relacionados``."""
+    return (f'{relacao}__first_name', f'{relacao}__last_name')
@@ -0,0 +1,81 @@
+"""
+Maintain monthly partitions and retention of the log tables (LogIa, AuditLog).
+
+Run daily (cron / scheduled job); every step is idempotent.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.partitioning import ACOES_RETENCAO, TABELAS_PARTICIONADAS, particionamentos
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria partições mensais futuras e aplica a política de retenção '
+        'aos logs (LogIa, AuditLog).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--converter', action='store_true',
+            help='Converte as tabelas para particionamento mensal (PostgreSQL, uma vez)'
+        )
+        parser.add_argument(
+            '--tabela', action='append', choices=list(TABELAS_PARTICIONADAS),
+            help='Restringe a uma tabela (pode ser repetido)'
+        )
+        parser.add_argument(
+            '--meses-futuros', type=int, default=None,
+            help='Partições criadas à frente do mês corrente (padrão: LOG_PARTICOES_FUTURAS)'
+        )
+        parser.add_argument(
+            '--retencao', type=int, default=None,
+            help='Meses completos mantidos além do corrente (padrão: LOG_RETENCAO_MESES)'
+        )
+        parser.add_argument(
+            '--acao', choices=ACOES_RETENCAO, default=None,
+            help='O que fazer com meses expirados (padrão: LOG_RETENCAO_ACAO)'
+        )
+        parser.add_argument(
+            '--destino', default=None,
+            help='Diretório dos arquivos NDJSON.gz exportados (padrão: LOG_ARQUIVO_DIR)'
+        )
+        parser.add_argument(
+            '--sem-retencao', action='store_true',
+            help='Apenas cria partições, sem arquivar meses antigos'
+        )
+
+    def handle(self, *args, **options):
+        for particionamento in particionamentos(options['tabela']):
+            tabela = particionamento.tabela
+
+            if options['converter']:
+                if not particionamento.postgresql:
+                    raise CommandError('--converter requer PostgreSQL')
+                if particionamento.converter():
+                    self.stdout.write(
+                        self.style.SUCCESS(f'{tabela}: convertida para partições mensais')
+                    )
+                else:
+                    self.stdout.write(f'{tabela}: já particionada')
+
+            for nome in particionamento.criar_particoes(options['meses_futuros']):
+                self.stdout.write(f'{tabela}: partição {nome} criada')
+
+            if options['sem_retencao']:
+                continue
+            try:
+                resultado = particionamento.aplicar_retencao(
+                    meses=options['retencao'],
+                    acao=options['acao'],
+                    destino=options['destino']
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            for nome in resultado['arquivadas']:
+                self.stdout.write(f'{tabela}: {nome} arquivada')
+            for caminho in resultado['exportadas']:
+                self.stdout.write(f'{tabela}: exportada para {caminho}')
+            for nome in resultado['descartadas']:
+                self.stdout.write(f'{tabela}: {nome} removida')
+        self.stdout.write(self.style.SUCCESS('Partições e retenção atualizadas'))
@@ -0,0 +1,27 @@
+# Generated migration for Core app: indexes of the keyset (cursor) pagination
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='core_notifi_user_id_created_at_idx',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(
+                fields=['user', '-created_at', '-id'], name='core_notifi_user_crea_id_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='core_auditl_timestamp_id_idx'),
+        ),
+    ]
@@ -96,6 +96,8 @@ class AuditLog(models.Model):
         indexes = [
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['model_name', 'object_id']),
+            # Cursor pagination (apps.core.paginacao)
+            models.Index(fields=['-timestamp', '-id']),
         ]
     
     def __str__(self):
@@ -148,7 +150,8 @@ class Notification(models.Model):
         verbose_name_plural = _('Notificações')
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', '-created_at']),
+            # Also serves the cursor pages of NotificationViewSet
+            models.Index(fields=['user', '-created_at', '-id']),
             models.Index(fields=['user', 'status']),
         ]
     
@@ -0,0 +1,36 @@
+"""
+Cursor (keyset) pagination for large, append-heavy lists.
+
+``PageNumberPagination`` (the project default) runs a ``COUNT(*)`` and an
+``OFFSET`` scan per page, so page 5,000 of a log reads 100,000 rows before
+the 20 it returns. A cursor page instead filters on the position of the last
+row seen (``WHERE created_at < %s ORDER BY created_at DESC``), which an index
+on the ordering answers in the same time on any page.
+
+ViewSets opt in with::
+
+    ordering = ('-created_at', '-id')
+    pagination_class = paginacao_cursor(*ordering)
+
+``ordering`` on the view is what ``OrderingFilter`` (a default filter
+backend) hands to the paginator, so both must agree; the model needs a
+matching composite index. The response has ``next``/``previous`` links and
+``results``, without ``count`` or page numbers.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacaoCursor(CursorPagination):
+    """
+    Cursor pages in the order of ``ordering``.
+
+    Only the first field is the cursor position; the others (the primary key)
+    make the order total, so rows sharing a timestamp or date are neither
+    repeated nor skipped between pages.
+    """
+    ordering = ('-created_at', '-id')
+
+
+def paginacao_cursor(*ordering):
+    """Cursor pagination class ordered by ``ordering`` (e.g. ``'-data', '-id'``)."""
+    return type('PaginacaoCursor', (PaginacaoCursor,), {'ordering': ordering})
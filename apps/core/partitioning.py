@@ -0,0 +1,370 @@
+"""
+Monthly partitioning and retention for append-only log tables.
+
+On PostgreSQL the tables listed in ``TABELAS_PARTICIONADAS`` are converted
+once (``gerenciar_particoes --converter``) into tables partitioned by range
+on their timestamp column, with one partition per month named
+``<tabela>_pYYYYMM`` plus a default partition. Queries filtered on the
+timestamp only scan the months they touch, and expiring a month is a
+``DETACH PARTITION`` instead of a large DELETE.
+
+Other backends (SQLite) have no native partitioning: rows of expired months
+are moved out of the main table into archive tables with the same
+``<tabela>_pYYYYMM`` naming.
+
+Detached partitions / archive tables are then kept, exported to
+``<tabela>_pYYYYMM.ndjson.gz`` and dropped, or dropped, according to the
+retention action.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# model label -> timestamp field used as partition key
+TABELAS_PARTICIONADAS = {
+    'auramind.LogIa': 'created_at',
+    'core.AuditLog': 'timestamp',
+}
+
+ACOES_RETENCAO = ('arquivar', 'exportar', 'descartar')
+
+
+def inicio_mes(data):
+    """First instant of the (local time) month of ``data``."""
+    local = timezone.localtime(data)
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def somar_meses(mes, quantidade):
+    """Shift a month start by ``quantidade`` months."""
+    indice = mes.year * 12 + mes.month - 1 + quantidade
+    return timezone.make_aware(datetime(indice // 12, indice % 12 + 1, 1))
+
+
+class ParticionamentoMensal:
+    """Partition and retention operations for one log table."""
+
+    def __init__(self, model, campo, using='default'):
+        self.model = model
+        self.campo = campo
+        self.tabela = model._meta.db_table
+        self.coluna = model._meta.get_field(campo).column
+        self.connection = connections[using]
+        self.using = using
+        self._padrao_nome = re.compile(rf'^{re.escape(self.tabela)}_p(\d{{4}})(\d{{2}})$')
+
+    @property
+    def postgresql(self):
+        return self.connection.vendor == 'postgresql'
+
+    def _q(self, nome):
+        return self.connection.ops.quote_name(nome)
+
+    def _valor(self, data):
+        return self.connection.ops.adapt_datetimefield_value(data)
+
+    def nome_particao(self, mes):
+        return f'{self.tabela}_p{mes:%Y%m}'
+
+    def mes_da_tabela(self, nome):
+        """Month start encoded in a partition/archive table name, or None."""
+        encontrado = self._padrao_nome.match(nome)
+        if not encontrado:
+            return None
+        return timezone.make_aware(datetime(int(encontrado[1]), int(encontrado[2]), 1))
+
+    def _executar(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _consultar(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    # --- PostgreSQL -------------------------------------------------------
+
+    def particionada(self):
+        """Whether the table is already a partitioned table."""
+        if not self.postgresql:
+            return False
+        return bool(self._consultar(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)',
+            [self.tabela]
+        ))
+
+    def particoes(self):
+        """Names of the partitions currently attached to the table."""
+        if not self.particionada():
+            return []
+        return [nome for (nome,) in self._consultar(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)',
+            [self.tabela]
+        )]
+
+    def _criar_particao(self, mes):
+        nome = self.nome_particao(mes)
+        self._executar(
+            f'CREATE TABLE IF NOT EXISTS {self._q(nome)} PARTITION OF {self._q(self.tabela)} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [mes.isoformat(), somar_meses(mes, 1).isoformat()]
+        )
+        return nome
+
+    def converter(self):
+        """
+        Convert the plain table into a monthly partitioned table (PostgreSQL).
+
+        Rows are copied into partitions covering their months; indexes and
+        foreign keys of the old table are recreated on the partitioned one.
+        The primary key becomes ``(id, <timestamp>)``, as PostgreSQL requires
+        the partition key in every unique constraint.
+        """
+        if not self.postgresql or self.particionada():
+            return False
+
+        legado = f'{self.tabela}_legado'
+        pk = self.model._meta.pk.column
+        with transaction.atomic(using=self.using):
+            indices = self._consultar(
+                'SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN '
+                '(SELECT conname FROM pg_constraint '
+                "WHERE conrelid = to_regclass(%s) AND contype = 'p')",
+                [self.tabela, self.tabela]
+            )
+            fks = self._consultar(
+                'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+                "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+                [self.tabela]
+            )
+            self._executar(f'ALTER TABLE {self._q(self.tabela)} RENAME TO {self._q(legado)}')
+            self._executar(
+                f'CREATE TABLE {self._q(self.tabela)} (LIKE {self._q(legado)} '
+                f'INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) '
+                f'PARTITION BY RANGE ({self._q(self.coluna)})'
+            )
+            self._executar(
+                f'ALTER TABLE {self._q(self.tabela)} '
+                f'ADD PRIMARY KEY ({self._q(pk)}, {self._q(self.coluna)})'
+            )
+            self._executar(
+                f'CREATE TABLE {self._q(self.tabela + "_padrao")} '
+                f'PARTITION OF {self._q(self.tabela)} DEFAULT'
+            )
+
+            (minimo,) = self._consultar(
+                f'SELECT MIN({self._q(self.coluna)}) FROM {self._q(legado)}'
+            )[0]
+            mes = inicio_mes(minimo or timezone.now())
+            limite = somar_meses(inicio_mes(timezone.now()), settings.LOG_PARTICOES_FUTURAS)
+            while mes <= limite:
+                self._criar_particao(mes)
+                mes = somar_meses(mes, 1)
+
+            self._executar(
+                f'INSERT INTO {self._q(self.tabela)} OVERRIDING SYSTEM VALUE '
+                f'SELECT * FROM {self._q(legado)}'
+            )
+            self._executar(
+                "SELECT setval(pg_get_serial_sequence(%s, %s), "
+                f"COALESCE((SELECT MAX({self._q(pk)}) FROM {self._q(self.tabela)}), 0) + 1, false)",
+                [self.tabela, pk]
+            )
+            self._executar(f'DROP TABLE {self._q(legado)}')
+
+            # Definitions were read before the rename, so they target the new table
+            for (indexdef,) in indices:
+                self._executar(indexdef)
+            for nome, definicao in fks:
+                self._executar(
+                    f'ALTER TABLE {self._q(self.tabela)} ADD CONSTRAINT {self._q(nome)} {definicao}'
+                )
+        logger.info(f"Tabela {self.tabela} convertida para particionamento mensal")
+        return True
+
+    def criar_particoes(self, futuras=None):
+        """
+        Create the partitions of the current month and the next ``futuras``.
+
+        Returns:
+            Names of the partitions that did not exist yet
+        """
+        if not self.particionada():
+            return []
+        futuras = settings.LOG_PARTICOES_FUTURAS if futuras is None else futuras
+        existentes = set(self.particoes())
+        atual = inicio_mes(timezone.now())
+        criadas = []
+        for i in range(futuras + 1):
+            mes = somar_meses(atual, i)
+            if self.nome_particao(mes) not in existentes:
+                criadas.append(self._criar_particao(mes))
+        return criadas
+
+    # --- Retention --------------------------------------------------------
+
+    def tabelas_arquivo(self):
+        """Archive tables (detached partitions) as ``{nome: mes}``."""
+        anexadas = set(self.particoes())
+        arquivo = {}
+        with self.connection.cursor() as cursor:
+            nomes = self.connection.introspection.table_names(cursor)
+        for nome in nomes:
+            mes = self.mes_da_tabela(nome)
+            if mes is not None and nome not in anexadas:
+                arquivo[nome] = mes
+        return arquivo
+
+    def arquivar_ate(self, limite):
+        """
+        Move every month older than ``limite`` out of the main table.
+
+        PostgreSQL detaches the month partitions; other backends copy the rows
+        into ``<tabela>_pYYYYMM`` tables and delete them from the main table.
+
+        Returns:
+            Names of the archive tables created
+        """
+        if self.particionada():
+            arquivadas = []
+            for nome in self.particoes():
+                mes = self.mes_da_tabela(nome)
+                if mes is not None and mes < limite:
+                    self._executar(
+                        f'ALTER TABLE {self._q(self.tabela)} DETACH PARTITION {self._q(nome)}'
+                    )
+                    arquivadas.append(nome)
+            return arquivadas
+
+        arquivadas = []
+        # Oldest remaining month first, so months without rows get no table
+        while True:
+            minimo = self._mais_antigo(limite)
+            if minimo is None:
+                return arquivadas
+            mes = inicio_mes(minimo)
+            nome = self.nome_particao(mes)
+            filtro = (
+                f'WHERE {self._q(self.coluna)} >= %s AND {self._q(self.coluna)} < %s'
+            )
+            params = [self._valor(mes), self._valor(somar_meses(mes, 1))]
+            with transaction.atomic(using=self.using):
+                if nome in self.tabelas_arquivo():
+                    self._executar(
+                        f'INSERT INTO {self._q(nome)} '
+                        f'SELECT * FROM {self._q(self.tabela)} {filtro}',
+                        params
+                    )
+                else:
+                    self._executar(
+                        f'CREATE TABLE {self._q(nome)} AS '
+                        f'SELECT * FROM {self._q(self.tabela)} {filtro}',
+                        params
+                    )
+                self._executar(f'DELETE FROM {self._q(self.tabela)} {filtro}', params)
+            arquivadas.append(nome)
+
+    def _mais_antigo(self, limite):
+        """Oldest timestamp before ``limite`` in the main table, or None."""
+        (minimo,) = self._consultar(
+            f'SELECT MIN({self._q(self.coluna)}) FROM {self._q(self.tabela)} '
+            f'WHERE {self._q(self.coluna)} < %s',
+            [self._valor(limite)]
+        )[0]
+        if isinstance(minimo, str):
+            # SQLite returns the stored UTC text
+            minimo = parse_datetime(minimo)
+        if minimo is not None and timezone.is_naive(minimo):
+            minimo = timezone.make_aware(minimo, dt_timezone.utc)
+        return minimo
+
+    def exportar(self, nome, destino):
+        """
+        Export an archive table to ``<destino>/<nome>.ndjson.gz``.
+
+        Returns:
+            Path of the written file
+        """
+        os.makedirs(destino, exist_ok=True)
+        caminho = os.path.join(destino, f'{nome}.ndjson.gz')
+        temporario = f'{caminho}.tmp'
+        colunas_json = {
+            campo.column for campo in self.model._meta.concrete_fields
+            if isinstance(campo, models.JSONField)
+        }
+        with self.connection.cursor() as cursor, \
+                gzip.open(temporario, 'wt', encoding='utf-8') as arquivo:
+            cursor.execute(f'SELECT * FROM {self._q(nome)} ORDER BY {self._q(self.coluna)}')
+            colunas = [descricao[0] for descricao in cursor.description]
+            while True:
+                linhas = cursor.fetchmany(1000)
+                if not linhas:
+                    break
+                for linha in linhas:
+                    registro = dict(zip(colunas, linha))
+                    for coluna in colunas_json:
+                        if isinstance(registro.get(coluna), str):
+                            registro[coluna] = json.loads(registro[coluna])
+                    arquivo.write(json.dumps(registro, ensure_ascii=False, default=str))
+                    arquivo.write('\n')
+        os.replace(temporario, caminho)
+        return caminho
+
+    def descartar(self, nome):
+        """Drop an archive table."""
+        self._executar(f'DROP TABLE {self._q(nome)}')
+
+    def aplicar_retencao(self, meses=None, acao=None, destino=None):
+        """
+        Archive months older than the retention window and process the archives.
+
+        Args:
+            meses: Full months kept besides the current one (LOG_RETENCAO_MESES)
+            acao: ``arquivar`` (keep archive tables), ``exportar`` (NDJSON.gz
+                then drop) or ``descartar`` (drop) (LOG_RETENCAO_ACAO)
+            destino: Export directory (LOG_ARQUIVO_DIR)
+
+        Returns:
+            Dict with the archived tables and, per action, the exported files
+            or dropped tables
+        """
+        meses = settings.LOG_RETENCAO_MESES if meses is None else meses
+        acao = acao or settings.LOG_RETENCAO_ACAO
+        destino = destino or settings.LOG_ARQUIVO_DIR
+        if acao not in ACOES_RETENCAO:
+            raise ValueError(f"Ação de retenção inválida: {acao}")
+
+        limite = somar_meses(inicio_mes(timezone.now()), -meses)
+        resultado = {'arquivadas': self.arquivar_ate(limite), 'exportadas': [], 'descartadas': []}
+        if acao == 'arquivar':
+            return resultado
+
+        for nome, mes in sorted(self.tabelas_arquivo().items()):
+            if mes >= limite:
+                continue
+            if acao == 'exportar':
+                resultado['exportadas'].append(self.exportar(nome, destino))
+            self.descartar(nome)
+            resultado['descartadas'].append(nome)
+        return resultado
+
+
+def particionamentos(labels=None, using='default'):
+    """ParticionamentoMensal for each configured table (or only ``labels``)."""
+    return [
+        ParticionamentoMensal(apps.get_model(label), campo, using=using)
+        for label, campo in TABELAS_PARTICIONADAS.items()
+        if not labels or label in labels
+    ]
@@ -1,11 +1,21 @@
 """
 Tests for Core app.
 """
+import gzip
+import json
+from datetime import timedelta
+
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from .models import AuditLog, Notification, User as Usuario
+from .partitioning import ParticionamentoMensal, inicio_mes, somar_meses
+
 User = get_user_model()
 
 
@@ -52,3 +62,78 @@ class TestUserAPI:
         assert response.status_code == status.HTTP_200_OK
         assert response.data['username'] == 'testuser'
         assert response.data['role'] == 'professor'
+
+
+@pytest.mark.django_db
+class TestLogRetention:
+    """Test monthly archiving and NDJSON export of log tables (SQLite fallback)."""
+
+    def setup_method(self):
+        """Create one current and two expired audit log rows."""
+        self.particionamento = ParticionamentoMensal(AuditLog, 'timestamp')
+        self.mes_antigo = somar_meses(inicio_mes(timezone.now()), -14)
+        for object_id in (1, 2, 3):
+            AuditLog.objects.create(action='create', model_name='Turma', object_id=object_id)
+        AuditLog.objects.filter(object_id__in=[1, 2]).update(
+            timestamp=self.mes_antigo + timedelta(days=3)
+        )
+
+    def _tabelas(self):
+        return connection.introspection.table_names()
+
+    def test_expired_months_move_to_archive_table(self):
+        """Test that rows older than the retention window leave the main table."""
+        resultado = self.particionamento.aplicar_retencao(meses=12, acao='arquivar')
+
+        nome = self.particionamento.nome_particao(self.mes_antigo)
+        assert resultado['arquivadas'] == [nome]
+        assert nome in self._tabelas()
+        assert list(AuditLog.objects.values_list('object_id', flat=True)) == [3]
+
+    def test_archives_export_to_ndjson_gz(self, tmp_path):
+        """Test that the export action writes compressed NDJSON and drops the archive."""
+        call_command('gerenciar_particoes', tabela=['core.AuditLog'], retencao=12,
+                     acao='exportar', destino=str(tmp_path))
+
+        nome = self.particionamento.nome_particao(self.mes_antigo)
+        assert nome not in self._tabelas()
+        with gzip.open(tmp_path / f'{nome}.ndjson.gz', 'rt') as arquivo:
+            registros = [json.loads(linha) for linha in arquivo]
+        assert sorted(r['object_id'] for r in registros) == [1, 2]
+        assert registros[0]['changes'] == {}
+        assert AuditLog.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    """Query-count budget of the user and notification endpoints."""
+
+    LINHAS = 5
+    # Max queries of a list page, checked by the orcamento_lista_detalhe fixture
+    ORCAMENTOS = {
+        'users': 2,
+        'notifications': 2,
+    }
+
+    def setup_method(self):
+        """Setup LINHAS users and LINHAS notifications of the authenticated one."""
+        self.client = APIClient()
+        for i in range(self.LINHAS):
+            self.usuario = Usuario.objects.create(username=f'usuario_orcamento{i}')
+        for i in range(self.LINHAS):
+            Notification.objects.create(user=self.usuario, title=f'Aviso {i}', message='Mensagem')
+        self.client.force_authenticate(user=self.usuario)
+
+    @pytest.mark.parametrize('endpoint', sorted(ORCAMENTOS))
+    def test_list_and_detail_within_budget(self, endpoint, orcamento_lista_detalhe):
+        """Test that list and detail cost the same few queries whatever the number of rows."""
+        orcamento_lista_detalhe(
+            self.client, f'/api/v1/core/{endpoint}/', self.ORCAMENTOS[endpoint], self.LINHAS
+        )
+
+    def test_mark_all_as_read_reports_updated_rows(self, django_assert_max_num_queries):
+        """Test that mark_all_as_read is a single UPDATE reporting how many rows changed."""
+        with django_assert_max_num_queries(1):
+            response = self.client.post('/api/v1/core/notifications/mark_all_as_read/')
+        assert response.data['message'] == f'{self.LINHAS} notificações marcadas como lidas'
+        assert not Notification.objects.filter(status='unread').exists()
@@ -9,6 +9,7 @@ from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import User, Notification
+from .paginacao import paginacao_cursor
 from .serializers import UserSerializer, UserDetailSerializer, NotificationSerializer
 
 
@@ -60,6 +61,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('-created_at', '-id')
+    pagination_class = paginacao_cursor(*ordering)
     
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
@@ -90,7 +93,6 @@ class NotificationViewSet(viewsets.ModelViewSet):
         """
         Mark all notifications as read.
         """
-        notifications = self.get_queryset().filter(status='unread')
-        notifications.update(status='read')
+        marcadas = self.get_queryset().filter(status='unread').update(status='read')
         
-        return Response({'message': f'{notifications.count()} notificações marcadas como lidas'})
+        return Response({'message': f'{marcadas} notificações marcadas como lidas'})
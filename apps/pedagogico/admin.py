@@ -4,7 +4,7 @@ Admin configuration for Pedagogico app.
 from django.contrib import admin
 from .models import (
     Turma, Aluno, PlanejamentoAnual, UnidadeTematica,
-    RegistroDeAula, Avaliacao, NotaAluno, Tarefa, SubmissaoTarefa
+    RegistroDeAula, Avaliacao, NotaAluno, BoletimTurma, Tarefa, SubmissaoTarefa
 )
 
 
@@ -56,6 +56,13 @@ class NotaAlunoAdmin(admin.ModelAdmin):
     search_fields = ['aluno__user__first_name']
 
 
+@admin.register(BoletimTurma)
+class BoletimTurmaAdmin(admin.ModelAdmin):
+    list_display = ['turma', 'updated_at']
+    search_fields = ['turma__nome']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(Tarefa)
 class TarefaAdmin(admin.ModelAdmin):
     list_display = ['titulo', 'turma', 'professor', 'status', 'data_entrega']
@@ -8,3 +8,6 @@ class PedagogicoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.pedagogico'
     verbose_name = 'Pedagógico'
+
+    def ready(self):
+        from . import signals  # noqa: F401
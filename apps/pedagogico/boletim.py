@@ -0,0 +1,297 @@
+"""
+Incrementally maintained gradebooks of the turmas (``BoletimTurma``).
+
+Each saved or deleted NotaAluno updates one cell of its turma's gradebook
+and the means of that student; each saved or deleted Avaliacao updates one
+column, and an Avaliacao moved to another turma rebuilds both gradebooks.
+Renamed students are refreshed in the gradebooks that list them. Reading a
+gradebook is then a single-row lookup instead of a join of
+NotaAluno → Avaliacao → Turma over every student × assessment.
+
+Means are weighted by ``valor_maximo``: the points obtained over the points
+possible in the graded assessments of each type (and overall), on a 0-10
+scale: a 9/10 and a 30/50 average 6.50 (39 of 60 points), not 7.50.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import DatabaseError, transaction
+
+from apps.core.consultas import com_relacionados, nome_de
+from .models import Aluno, Avaliacao, BoletimTurma, NotaAluno
+
+logger = logging.getLogger(__name__)
+
+TIPOS = [tipo for tipo, _ in Avaliacao.TIPO_CHOICES]
+
+ESCALA = Decimal(10)
+CENTESIMO = Decimal('0.01')
+
+
+def _decimal(valor):
+    """Two-decimal string of a grade or maximum, as DRF renders DecimalFields."""
+    return str(Decimal(str(valor)).quantize(CENTESIMO))
+
+
+def _coluna(avaliacao):
+    return {
+        'titulo': avaliacao.titulo,
+        'tipo': avaliacao.tipo,
+        'data': str(avaliacao.data),
+        'valor_maximo': _decimal(avaliacao.valor_maximo),
+    }
+
+
+def _linha(aluno):
+    return {
+        'nome': aluno.user.get_full_name(),
+        'matricula': aluno.matricula,
+        'notas': {},
+        'medias': {},
+    }
+
+
+def calcular_medias(notas, avaliacoes):
+    """
+    Weighted means of one student's grades.
+
+    Args:
+        notas: Grade per assessment id, as stored in ``BoletimTurma.alunos``
+        avaliacoes: Columns of the gradebook (``BoletimTurma.avaliacoes``)
+
+    Returns:
+        Mean (0-10, two-decimal string) per type and ``'geral'``; None for a
+        type without graded assessments
+    """
+    somas = {chave: [Decimal(0), Decimal(0)] for chave in (*TIPOS, 'geral')}
+    for avaliacao_id, valor in notas.items():
+        avaliacao = avaliacoes.get(avaliacao_id)
+        if avaliacao is None:
+            continue
+        for chave in (avaliacao['tipo'], 'geral'):
+            somas[chave][0] += Decimal(valor)
+            somas[chave][1] += Decimal(avaliacao['valor_maximo'])
+    return {
+        chave: _decimal(ESCALA * obtido / maximo) if maximo else None
+        for chave, (obtido, maximo) in somas.items()
+    }
+
+
+def reconstruir(turma_id):
+    """Build the gradebook of a turma from its Avaliacao and NotaAluno rows."""
+    avaliacoes = {
+        str(avaliacao.pk): _coluna(avaliacao)
+        for avaliacao in Avaliacao.objects.filter(turma_id=turma_id).only(
+            'titulo', 'tipo', 'data', 'valor_maximo'
+        )
+    }
+    alunos = {}
+    notas = com_relacionados(
+        NotaAluno.objects.filter(avaliacao__turma_id=turma_id),
+        'aluno__matricula',
+        *nome_de('aluno__user'),
+    )
+    for nota in notas:
+        linha = alunos.setdefault(str(nota.aluno_id), _linha(nota.aluno))
+        linha['notas'][str(nota.avaliacao_id)] = _decimal(nota.valor)
+    for linha in alunos.values():
+        linha['medias'] = calcular_medias(linha['notas'], avaliacoes)
+    boletim, _ = BoletimTurma.objects.update_or_create(
+        turma_id=turma_id, defaults={'avaliacoes': avaliacoes, 'alunos': alunos}
+    )
+    return boletim
+
+
+def _por_turma(notas):
+    """Group grades by turma, reading the turma of uncached assessments in one query."""
+    sem_avaliacao = {nota.avaliacao_id for nota in notas if not NotaAluno.avaliacao.is_cached(nota)}
+    turmas = dict(
+        Avaliacao.objects.filter(pk__in=sem_avaliacao).values_list('pk', 'turma_id')
+    ) if sem_avaliacao else {}
+    grupos = defaultdict(list)
+    for nota in notas:
+        if NotaAluno.avaliacao.is_cached(nota):
+            grupos[nota.avaliacao.turma_id].append(nota)
+        elif nota.avaliacao_id in turmas:
+            grupos[turmas[nota.avaliacao_id]].append(nota)
+    return grupos
+
+
+def _boletim(turma_id):
+    return BoletimTurma.objects.select_for_update().filter(turma_id=turma_id).first()
+
+
+def _descartar(turma_ids, erro):
+    """
+    Drop the gradebooks an update failed on; the next read rebuilds them.
+
+    Gradebook errors never propagate to the request path, but a gradebook
+    that missed an update must not keep being served.
+    """
+    logger.error(
+        f"Erro ao atualizar boletim das turmas {sorted(turma_ids)}: {str(erro)}", exc_info=erro
+    )
+    try:
+        BoletimTurma.objects.filter(turma_id__in=turma_ids).delete()
+    except DatabaseError as e:
+        logger.error(f"Erro ao descartar boletim das turmas {sorted(turma_ids)}: {str(e)}")
+
+
+def registrar_notas(notas):
+    """
+    Merge saved NotaAluno rows into their turmas' gradebooks.
+
+    A turma without a gradebook yet gets one built from all its rows. The
+    row is inserted first (``get_or_create``), so its lock also covers a
+    turma's first grades: of two concurrent first writes one builds the
+    gradebook and the other waits for it, then merges into it.
+    """
+    grupos = {}
+    try:
+        with transaction.atomic():
+            grupos = _por_turma(notas)
+            for turma_id, notas_turma in grupos.items():
+                _, criado = BoletimTurma.objects.get_or_create(turma_id=turma_id)
+                if criado:
+                    reconstruir(turma_id)
+                    continue
+                boletim = _boletim(turma_id)
+                novos = {
+                    nota.aluno_id
+                    for nota in notas_turma
+                    if str(nota.aluno_id) not in boletim.alunos
+                }
+                alunos = {}
+                if novos:
+                    consulta = com_relacionados(
+                        Aluno.objects.filter(pk__in=novos), *nome_de('user')
+                    )
+                    alunos = {aluno.pk: aluno for aluno in consulta}
+                alterados = set()
+                for nota in notas_turma:
+                    chave = str(nota.aluno_id)
+                    if chave not in boletim.alunos:
+                        if nota.aluno_id not in alunos:
+                            continue
+                        boletim.alunos[chave] = _linha(alunos[nota.aluno_id])
+                    avaliacao_id = str(nota.avaliacao_id)
+                    nova = avaliacao_id not in boletim.avaliacoes
+                    if nova and NotaAluno.avaliacao.is_cached(nota):
+                        boletim.avaliacoes[avaliacao_id] = _coluna(nota.avaliacao)
+                    boletim.alunos[chave]['notas'][avaliacao_id] = _decimal(nota.valor)
+                    alterados.add(chave)
+                for chave in alterados:
+                    linha = boletim.alunos[chave]
+                    linha['medias'] = calcular_medias(linha['notas'], boletim.avaliacoes)
+                boletim.save()
+    except DatabaseError as e:
+        _descartar(list(grupos), e)
+
+
+def remover_notas(notas):
+    """Remove deleted NotaAluno rows from their turmas' gradebooks."""
+    grupos = {}
+    try:
+        with transaction.atomic():
+            grupos = _por_turma(notas)
+            for turma_id, notas_turma in grupos.items():
+                boletim = _boletim(turma_id)
+                if boletim is None:
+                    continue
+                alterados = set()
+                for nota in notas_turma:
+                    chave = str(nota.aluno_id)
+                    linha = boletim.alunos.get(chave)
+                    if linha is None:
+                        continue
+                    linha['notas'].pop(str(nota.avaliacao_id), None)
+                    alterados.add(chave)
+                for chave in alterados:
+                    linha = boletim.alunos[chave]
+                    if linha['notas']:
+                        linha['medias'] = calcular_medias(linha['notas'], boletim.avaliacoes)
+                    else:
+                        del boletim.alunos[chave]
+                boletim.save()
+    except DatabaseError as e:
+        _descartar(list(grupos), e)
+
+
+def registrar_avaliacao(avaliacao):
+    """Add or refresh an assessment column; a new type or maximum recomputes the means."""
+    try:
+        with transaction.atomic():
+            boletim = _boletim(avaliacao.turma_id)
+            if boletim is None:
+                return
+            chave = str(avaliacao.pk)
+            anterior = boletim.avaliacoes.get(chave)
+            coluna = _coluna(avaliacao)
+            if coluna == anterior:
+                return
+            boletim.avaliacoes[chave] = coluna
+            peso_mudou = anterior is not None and any(
+                anterior[campo] != coluna[campo] for campo in ('tipo', 'valor_maximo')
+            )
+            if peso_mudou:
+                for linha in boletim.alunos.values():
+                    if chave in linha['notas']:
+                        linha['medias'] = calcular_medias(linha['notas'], boletim.avaliacoes)
+            boletim.save()
+    except DatabaseError as e:
+        _descartar([avaliacao.turma_id], e)
+
+
+def remover_avaliacao(avaliacao):
+    """Remove an assessment column and its grades."""
+    try:
+        with transaction.atomic():
+            boletim = _boletim(avaliacao.turma_id)
+            if boletim is None:
+                return
+            chave = str(avaliacao.pk)
+            boletim.avaliacoes.pop(chave, None)
+            for aluno_id, linha in list(boletim.alunos.items()):
+                if linha['notas'].pop(chave, None) is None:
+                    continue
+                if linha['notas']:
+                    linha['medias'] = calcular_medias(linha['notas'], boletim.avaliacoes)
+                else:
+                    del boletim.alunos[aluno_id]
+            boletim.save()
+    except DatabaseError as e:
+        _descartar([avaliacao.turma_id], e)
+
+
+def reconstruir_turmas(turma_ids):
+    """Rebuild the existing gradebooks of ``turma_ids`` (an Avaliacao moved between them)."""
+    try:
+        with transaction.atomic():
+            existentes = BoletimTurma.objects.select_for_update().filter(turma_id__in=turma_ids)
+            for turma_id in sorted(existentes.values_list('turma_id', flat=True)):
+                reconstruir(turma_id)
+    except DatabaseError as e:
+        _descartar(turma_ids, e)
+
+
+def atualizar_aluno(aluno):
+    """Refresh the name and matricula of a student in the gradebooks listing them."""
+    turma_ids = set(
+        NotaAluno.objects.filter(aluno=aluno).values_list('avaliacao__turma_id', flat=True)
+    )
+    if not turma_ids:
+        return
+    novo = _linha(aluno)
+    try:
+        with transaction.atomic():
+            for boletim in BoletimTurma.objects.select_for_update().filter(turma_id__in=turma_ids):
+                linha = boletim.alunos.get(str(aluno.pk))
+                if linha is None:
+                    continue
+                if (linha['nome'], linha['matricula']) == (novo['nome'], novo['matricula']):
+                    continue
+                linha.update(nome=novo['nome'], matricula=novo['matricula'])
+                boletim.save()
+    except DatabaseError as e:
+        _descartar(turma_ids, e)
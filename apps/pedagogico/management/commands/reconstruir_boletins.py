@@ -0,0 +1,35 @@
+"""
+Rebuild the turma gradebooks (BoletimTurma) from NotaAluno and Avaliacao.
+
+Only needed once for grades entered before the gradebooks existed, or after
+writes that skip signals (raw SQL, ``QuerySet.update``) or a student's name
+change; new grades are merged as they are saved.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.pedagogico.boletim import reconstruir
+from apps.pedagogico.models import Turma
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os boletins das turmas (BoletimTurma) a partir das notas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--turma', type=int, action='append', default=None,
+            help='Reconstrói apenas esta turma (pode repetir; padrão: todas)'
+        )
+
+    def handle(self, *args, **options):
+        turmas = Turma.objects.all()
+        if options['turma']:
+            turmas = turmas.filter(pk__in=options['turma'])
+
+        total = 0
+        for turma_id in turmas.values_list('pk', flat=True).iterator():
+            with transaction.atomic():
+                reconstruir(turma_id)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{total} boletins reconstruídos'))
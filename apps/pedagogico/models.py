@@ -236,6 +236,11 @@ class RegistroDeAula(models.Model):
         verbose_name_plural = _('Registros de Aula')
         ordering = ['-data']
         unique_together = ['turma', 'professor', 'data']
+        indexes = [
+            # Cursor pagination (apps.core.paginacao)
+            models.Index(fields=['-data', '-id']),
+            models.Index(fields=['turma', '-data', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.turma.nome} - {self.data}"
@@ -323,6 +328,41 @@ class NotaAluno(models.Model):
         return f"{self.aluno.user.get_full_name()} - {self.avaliacao.titulo}: {self.valor}"
 
 
+class BoletimTurma(models.Model):
+    """
+    Materialized gradebook of a Turma: students × assessments and the
+    weighted means of each student by assessment type.
+
+    Maintained incrementally as NotaAluno and Avaliacao rows are saved or
+    deleted (see ``boletim``), so the gradebook endpoint reads a single row.
+    """
+    turma = models.OneToOneField(
+        Turma,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='boletim',
+        verbose_name=_('Turma')
+    )
+    avaliacoes = models.JSONField(
+        default=dict,
+        verbose_name=_('Avaliações'),
+        help_text=_('Por id: título, tipo, data e valor máximo')
+    )
+    alunos = models.JSONField(
+        default=dict,
+        verbose_name=_('Alunos'),
+        help_text=_('Por id: nome, matrícula, notas por avaliação e médias por tipo')
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Atualizado em'))
+
+    class Meta:
+        verbose_name = _('Boletim da Turma')
+        verbose_name_plural = _('Boletins das Turmas')
+
+    def __str__(self):
+        return f"Boletim - {self.turma_id}"
+
+
 class Tarefa(models.Model):
     """
     Model for Tasks/Assignments (estilo Google Classroom).
@@ -436,6 +476,11 @@ class SubmissaoTarefa(models.Model):
         verbose_name_plural = _('Submissões de Tarefas')
         unique_together = ['tarefa', 'aluno']
         ordering = ['-data_submissao']
+        indexes = [
+            # Cursor pagination (apps.core.paginacao)
+            models.Index(fields=['-data_submissao', '-id']),
+            models.Index(fields=['tarefa', '-data_submissao', '-id']),
+        ]
     
     def __str__(self):
         return f"Submissão de {self.aluno.user.get_full_name()} para {self.tarefa.titulo}"
@@ -1,11 +1,14 @@
 """
 Serializers for Pedagogico app.
 """
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 from .models import (
     Turma, Aluno, PlanejamentoAnual, UnidadeTematica,
-    RegistroDeAula, Avaliacao, NotaAluno, Tarefa, SubmissaoTarefa
+    RegistroDeAula, Avaliacao, NotaAluno, BoletimTurma, Tarefa, SubmissaoTarefa
 )
+from .boletim import registrar_notas
 
 
 class TurmaSerializer(serializers.ModelSerializer):
@@ -89,6 +92,131 @@ class NotaAlunoSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class NotaLoteItemSerializer(serializers.Serializer):
+    """One cell of a bulk grade entry (ids are checked by NotaLoteSerializer)."""
+    aluno = serializers.IntegerField()
+    avaliacao = serializers.IntegerField()
+    valor = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    observacoes = serializers.CharField(required=False, allow_blank=True)
+
+
+class NotaLoteSerializer(serializers.Serializer):
+    """
+    Bulk grade entry: a grid of ``{aluno, avaliacao, valor[, observacoes]}`` cells.
+
+    All cells are validated in one pass, with one query for the students and
+    one for the assessments; each ``valor`` must not exceed the assessment's
+    ``valor_maximo``. Errors come back per cell, in the order sent (``{}`` for
+    a valid cell). Saving upserts every cell in one transaction; a cell
+    without ``observacoes`` keeps the stored ones.
+    """
+    notas = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=settings.NOTAS_LOTE_MAX_ITENS
+    )
+
+    def validate_notas(self, notas):
+        # One serializer for every cell: building one per cell deep-copies its fields each time
+        item = NotaLoteItemSerializer()
+        celulas, erros = [], []
+        for nota in notas:
+            try:
+                celulas.append(item.run_validation(nota))
+                erros.append({})
+            except serializers.ValidationError as e:
+                celulas.append(None)
+                erros.append(e.detail)
+
+        validas = [celula for celula in celulas if celula]
+        alunos_ids = {celula['aluno'] for celula in validas}
+        alunos = set(Aluno.objects.filter(pk__in=alunos_ids).values_list('pk', flat=True))
+        # Also the gradebook column fields (_coluna), so a new column costs no deferred load
+        avaliacoes = Avaliacao.objects.only('turma_id', 'valor_maximo', 'titulo', 'tipo', 'data')
+        avaliacoes = avaliacoes.in_bulk({celula['avaliacao'] for celula in validas})
+        vistas = {}
+        for indice, celula in enumerate(celulas):
+            if celula is None:
+                continue
+            erro = erros[indice]
+            avaliacao = avaliacoes.get(celula['avaliacao'])
+            if celula['aluno'] not in alunos:
+                erro['aluno'] = ['Aluno não encontrado.']
+            if avaliacao is None:
+                erro['avaliacao'] = ['Avaliação não encontrada.']
+            elif celula['valor'] > avaliacao.valor_maximo:
+                erro['valor'] = [
+                    f'Maior que o valor máximo da avaliação ({avaliacao.valor_maximo}).'
+                ]
+            chave = (celula['aluno'], celula['avaliacao'])
+            if chave in vistas:
+                erro['non_field_errors'] = [f'Nota repetida na grade (item {vistas[chave]}).']
+            vistas.setdefault(chave, indice)
+            celula['avaliacao'] = avaliacao
+
+        if any(erros):
+            raise serializers.ValidationError(erros)
+        return celulas
+
+    def create(self, validated_data):
+        """Upsert the cells; returns how many grades were created and updated."""
+        notas = [
+            NotaAluno(
+                aluno_id=celula['aluno'], avaliacao=celula['avaliacao'], valor=celula['valor'],
+                observacoes=celula.get('observacoes', '')
+            )
+            for celula in validated_data['notas']
+        ]
+        with transaction.atomic():
+            existentes = set(NotaAluno.objects.filter(
+                aluno_id__in={nota.aluno_id for nota in notas},
+                avaliacao_id__in={nota.avaliacao_id for nota in notas}
+            ).values_list('aluno_id', 'avaliacao_id'))
+            grupos = {True: [], False: []}
+            for nota, celula in zip(notas, validated_data['notas']):
+                grupos['observacoes' in celula].append(nota)
+            for com_observacoes, grupo in grupos.items():
+                if grupo:
+                    NotaAluno.objects.bulk_create(
+                        grupo,
+                        update_conflicts=True,
+                        unique_fields=['aluno', 'avaliacao'],
+                        update_fields=(
+                            ['valor', 'observacoes', 'updated_at']
+                            if com_observacoes
+                            else ['valor', 'updated_at']
+                        ),
+                    )
+            # bulk_create sends no post_save: update the gradebooks here
+            registrar_notas(notas)
+
+        atualizadas = sum(1 for nota in notas if (nota.aluno_id, nota.avaliacao_id) in existentes)
+        return {
+            'total': len(notas),
+            'criadas': len(notas) - atualizadas,
+            'atualizadas': atualizadas,
+        }
+
+
+class BoletimTurmaSerializer(serializers.ModelSerializer):
+    """
+    Serializer for BoletimTurma: assessments by date and students by name,
+    each student with its grade per assessment id and means per type.
+    """
+    avaliacoes = serializers.SerializerMethodField()
+    alunos = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BoletimTurma
+        fields = ['turma', 'avaliacoes', 'alunos', 'updated_at']
+
+    def get_avaliacoes(self, obj):
+        colunas = [{'id': int(pk), **coluna} for pk, coluna in obj.avaliacoes.items()]
+        return sorted(colunas, key=lambda coluna: (coluna['data'], coluna['id']))
+
+    def get_alunos(self, obj):
+        linhas = [{'id': int(pk), **linha} for pk, linha in obj.alunos.items()]
+        return sorted(linhas, key=lambda linha: (linha['nome'], linha['id']))
+
+
 class TarefaSerializer(serializers.ModelSerializer):
     """Serializer for Tarefa model."""
     professor_nome = serializers.CharField(source='professor.get_full_name', read_only=True)
@@ -0,0 +1,89 @@
+"""
+Signal handlers keeping the turma gradebooks (``boletim``) up to date.
+
+Deletes include cascades (of an Aluno, Avaliacao or Turma). Writes that skip
+signals, such as ``bulk_create`` or ``QuerySet.update``, must call
+``boletim.registrar_notas`` (or ``boletim.reconstruir``) themselves.
+
+An Avaliacao's stored turma is read before it is saved or deleted: when it
+differs from the instance's (the assessment moved, or the instance is
+stale), the gradebooks of both turmas are rebuilt instead of patched.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import boletim
+from .models import Aluno, Avaliacao, NotaAluno
+
+
+@receiver(post_save, sender=NotaAluno)
+def nota_salva(sender, instance, raw=False, **kwargs):
+    if not raw:
+        boletim.registrar_notas([instance])
+
+
+@receiver(post_delete, sender=NotaAluno)
+def nota_removida(sender, instance, **kwargs):
+    boletim.remover_notas([instance])
+
+
+def _turma_gravada(avaliacao):
+    if avaliacao._state.adding or avaliacao.pk is None:
+        return None
+    return Avaliacao.objects.filter(pk=avaliacao.pk).values_list('turma_id', flat=True).first()
+
+
+def _turmas_alteradas(avaliacao):
+    """Old and new turma of a moved assessment, or None if it stayed put."""
+    anterior = getattr(avaliacao, '_turma_gravada', None)
+    if anterior is None or anterior == avaliacao.turma_id:
+        return None
+    return [anterior, avaliacao.turma_id]
+
+
+@receiver(pre_save, sender=Avaliacao)
+def avaliacao_a_salvar(sender, instance, raw=False, **kwargs):
+    instance._turma_gravada = None if raw else _turma_gravada(instance)
+
+
+@receiver(post_save, sender=Avaliacao)
+def avaliacao_salva(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    turmas = _turmas_alteradas(instance)
+    if turmas:
+        boletim.reconstruir_turmas(turmas)
+    else:
+        boletim.registrar_avaliacao(instance)
+
+
+@receiver(pre_delete, sender=Avaliacao)
+def avaliacao_a_remover(sender, instance, **kwargs):
+    instance._turma_gravada = _turma_gravada(instance)
+
+
+@receiver(post_delete, sender=Avaliacao)
+def avaliacao_removida(sender, instance, **kwargs):
+    turmas = _turmas_alteradas(instance)
+    if turmas:
+        boletim.reconstruir_turmas(turmas)
+    else:
+        boletim.remover_avaliacao(instance)
+
+
+@receiver(post_save, sender=Aluno)
+def aluno_salvo(sender, instance, created=False, raw=False, **kwargs):
+    if not (raw or created):
+        boletim.atualizar_aluno(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def usuario_salvo(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    nome_alterado = update_fields is None or {'first_name', 'last_name'} & set(update_fields)
+    if raw or created or not nome_alterado:
+        return
+    aluno = Aluno.objects.filter(user=instance).first()
+    if aluno is not None:
+        aluno.user = instance
+        boletim.atualizar_aluno(aluno)
@@ -1,11 +1,22 @@
 """
 Tests for Pedagogico app.
 """
+import io
+from decimal import Decimal
+from unittest import mock
+
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Turma, PlanejamentoAnual
+from apps.administrativo.models import Escola
+from apps.core.models import User as Usuario
+from .models import (
+    Turma, Aluno, PlanejamentoAnual, UnidadeTematica, RegistroDeAula,
+    Avaliacao, NotaAluno, BoletimTurma, Tarefa, SubmissaoTarefa
+)
 
 User = get_user_model()
 
@@ -95,3 +106,441 @@ class TestPlanejamentoAnualAPI:
         )
         assert response.status_code == status.HTTP_200_OK
         assert response.data['status'] == 'pendente'
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    """
+    Query-count budget of every list and detail endpoint.
+
+    Each row points at its own related rows (teacher, student, class), so a
+    serializer field that queries per row goes over the budget.
+    """
+
+    LINHAS = 5
+    # Max queries of a list page, checked by the orcamento_lista_detalhe fixture
+    ORCAMENTOS = {
+        'turmas': 2,
+        'alunos': 3,
+        'planejamentos': 3,
+        'unidades-tematicas': 2,
+        'registros-aula': 2,
+        'avaliacoes': 2,
+        'notas': 2,
+        'tarefas': 2,
+        'submissoes-tarefas': 2,
+    }
+
+    def setup_method(self):
+        """Setup LINHAS rows of every model, each with its own teacher and student."""
+        self.client = APIClient()
+        escola = Escola.objects.create(nome='Escola Orçamento', cnpj='00.000.000/0001-22')
+        for i in range(self.LINHAS):
+            professor = Usuario.objects.create(
+                username=f'prof_orcamento{i}', first_name='Prof', last_name=str(i)
+            )
+            turma = Turma.objects.create(
+                escola=escola,
+                nome=f'Turma {i}',
+                nivel_ensino='5ef',
+                professor=professor,
+                ano_letivo=2025,
+                semestre=1,
+            )
+            aluno = Aluno.objects.create(
+                user=Usuario.objects.create(
+                    username=f'aluno_orcamento{i}', first_name='Aluno', last_name=str(i)
+                ),
+                matricula=f'M{i}'
+            )
+            aluno.turmas.add(turma, *Turma.objects.exclude(pk=turma.pk)[:1])
+            planejamento = PlanejamentoAnual.objects.create(
+                professor=professor, turma=turma, titulo=f'Plano {i}', introducao_geral='Introdução'
+            )
+            for ordem in range(2):
+                UnidadeTematica.objects.create(
+                    planejamento=planejamento, titulo=f'Unidade {ordem}', descricao='Descrição',
+                    duracao_semanas=4, ordem=ordem
+                )
+            RegistroDeAula.objects.create(
+                turma=turma,
+                professor=professor,
+                data='2025-03-10',
+                titulo=f'Aula {i}',
+                conteudo='Conteúdo',
+            )
+            avaliacao = Avaliacao.objects.create(
+                turma=turma, professor=professor, titulo=f'Prova {i}', tipo='somativa',
+                descricao='Descrição', data='2025-04-10'
+            )
+            NotaAluno.objects.create(aluno=aluno, avaliacao=avaliacao, valor=8)
+            tarefa = Tarefa.objects.create(
+                turma=turma, titulo=f'Tarefa {i}', descricao='Descrição', professor=professor
+            )
+            SubmissaoTarefa.objects.create(tarefa=tarefa, aluno=aluno, texto_enviado='Resposta')
+        self.client.force_authenticate(user=professor)
+
+    @pytest.mark.parametrize('endpoint', sorted(ORCAMENTOS))
+    def test_list_and_detail_within_budget(self, endpoint, orcamento_lista_detalhe):
+        """Test that list and detail cost the same few queries whatever the number of rows."""
+        orcamento_lista_detalhe(
+            self.client, f'/api/v1/pedagogico/{endpoint}/', self.ORCAMENTOS[endpoint], self.LINHAS
+        )
+
+    def test_nested_fields_are_serialized(self):
+        """Test that the tuned querysets still fill the related fields."""
+        submissao = self.client.get('/api/v1/pedagogico/submissoes-tarefas/').data['results'][0]
+        assert submissao['aluno_nome'].startswith('Aluno ')
+        assert submissao['tarefa_titulo'].startswith('Tarefa ')
+        tarefa = self.client.get('/api/v1/pedagogico/tarefas/').data['results'][0]
+        assert tarefa['professor_nome'].startswith('Prof ')
+        assert len(self.client.get('/api/v1/pedagogico/alunos/').data['results'][-1]['turmas']) == 2
+        planejamento = self.client.get('/api/v1/pedagogico/planejamentos/').data['results'][0]
+        assert len(planejamento['unidades_tematicas']) == 2
+
+
+@pytest.mark.django_db
+class TestPaginacaoCursor:
+    """Cursor pagination of the lesson records, whose dates repeat across classes."""
+
+    DATAS = ['2025-03-10', '2025-03-11', '2025-03-12']
+    TURMAS = 15
+
+    def setup_method(self):
+        """Setup TURMAS classes with one lesson record on each of DATAS."""
+        self.client = APIClient()
+        escola = Escola.objects.create(nome='Escola Cursor', cnpj='00.000.000/0001-33')
+        self.professor = Usuario.objects.create(username='prof_cursor')
+        for i in range(self.TURMAS):
+            turma = Turma.objects.create(
+                escola=escola, nome=f'Turma {i}', nivel_ensino='5ef', professor=self.professor,
+                ano_letivo=2025, semestre=1
+            )
+            for data in self.DATAS:
+                RegistroDeAula.objects.create(
+                    turma=turma,
+                    professor=self.professor,
+                    data=data,
+                    titulo=f'Aula {i}',
+                    conteudo='Conteúdo',
+                )
+        self.client.force_authenticate(user=self.professor)
+
+    def test_pages_walk_every_row_once(self, django_assert_num_queries):
+        """Test that next links walk all rows in (-data, -id) order, a query per page, no COUNT."""
+        esperado = list(
+            RegistroDeAula.objects.order_by('-data', '-id').values_list('id', flat=True)
+        )
+        vistos = []
+        url = '/api/v1/pedagogico/registros-aula/'
+        while url:
+            with django_assert_num_queries(1):
+                response = self.client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert 'count' not in response.data
+            vistos += [registro['id'] for registro in response.data['results']]
+            url = response.data['next']
+        assert vistos == esperado
+
+    def test_previous_link_returns_the_same_page(self):
+        """Test that going forward then back lands on the first page again."""
+        primeira = self.client.get('/api/v1/pedagogico/registros-aula/').data
+        segunda = self.client.get(primeira['next']).data
+        de_volta = self.client.get(segunda['previous']).data
+        assert de_volta['results'] == primeira['results']
+
+    def test_filter_keeps_cursor_order(self):
+        """Test that a filtered list is paginated in the same order."""
+        turma = Turma.objects.first()
+        response = self.client.get('/api/v1/pedagogico/registros-aula/', {'turma': turma.pk})
+        datas = [registro['data'] for registro in response.data['results']]
+        assert datas == sorted(self.DATAS, reverse=True)
+
+
+@pytest.mark.django_db
+class TestBoletim:
+    """Materialized gradebook of a turma, kept up to date by NotaAluno and Avaliacao signals."""
+
+    def setup_method(self):
+        """Setup a turma with two students and one assessment of each type."""
+        self.client = APIClient()
+        escola = Escola.objects.create(nome='Escola Boletim', cnpj='00.000.000/0001-44')
+        self.professor = Usuario.objects.create(username='prof_boletim')
+        self.turma = Turma.objects.create(
+            escola=escola,
+            nome='5º A',
+            nivel_ensino='5ef',
+            professor=self.professor,
+            ano_letivo=2025,
+            semestre=1,
+        )
+        self.ana, self.bruno = (
+            Aluno.objects.create(
+                user=Usuario.objects.create(username=f'aluno_boletim_{nome}', first_name=nome),
+                matricula=f'B-{nome}',
+            )
+            for nome in ('Ana', 'Bruno')
+        )
+        self.diagnostica, self.formativa, self.somativa = (
+            Avaliacao.objects.create(
+                turma=self.turma,
+                professor=self.professor,
+                titulo=tipo.title(),
+                tipo=tipo,
+                descricao='Descrição',
+                data=f'2025-04-1{dia}',
+                valor_maximo=maximo,
+            )
+            for dia, (tipo, maximo) in enumerate(
+                [('diagnostica', 10), ('formativa', 10), ('somativa', 50)]
+            )
+        )
+        self.client.force_authenticate(user=self.professor)
+
+    def boletim(self):
+        return self.client.get(f'/api/v1/pedagogico/turmas/{self.turma.pk}/boletim/').data
+
+    def linha(self, boletim, aluno):
+        return next(linha for linha in boletim['alunos'] if linha['id'] == aluno.pk)
+
+    def test_matrix_and_weighted_means(self):
+        """Test the student × assessment matrix and the means weighted by valor_maximo."""
+        NotaAluno.objects.create(aluno=self.ana, avaliacao=self.formativa, valor=9)
+        NotaAluno.objects.create(aluno=self.ana, avaliacao=self.somativa, valor=30)
+        NotaAluno.objects.create(aluno=self.bruno, avaliacao=self.diagnostica, valor=5)
+
+        boletim = self.boletim()
+        assert [coluna['tipo'] for coluna in boletim['avaliacoes']] == [
+            'diagnostica',
+            'formativa',
+            'somativa',
+        ]
+        assert [linha['nome'] for linha in boletim['alunos']] == ['Ana', 'Bruno']
+        ana = self.linha(boletim, self.ana)
+        assert ana['notas'] == {str(self.formativa.pk): '9.00', str(self.somativa.pk): '30.00'}
+        # (9 + 30) / (10 + 50) points, on a 0-10 scale
+        assert ana['medias'] == {
+            'diagnostica': None,
+            'formativa': '9.00',
+            'somativa': '6.00',
+            'geral': '6.50',
+        }
+        assert self.linha(boletim, self.bruno)['medias']['geral'] == '5.00'
+
+    def test_single_query(self, django_assert_num_queries):
+        """Test that a maintained gradebook is read with one query."""
+        for aluno in (self.ana, self.bruno):
+            for avaliacao in (self.diagnostica, self.formativa, self.somativa):
+                NotaAluno.objects.create(aluno=aluno, avaliacao=avaliacao, valor=7)
+        with django_assert_num_queries(1):
+            boletim = self.boletim()
+        assert all(len(linha['notas']) == 3 for linha in boletim['alunos'])
+
+    def test_updates_on_save_and_delete(self):
+        """Test that grade edits, deletions and assessment changes reach the gradebook."""
+        nota = NotaAluno.objects.create(aluno=self.ana, avaliacao=self.formativa, valor=4)
+        NotaAluno.objects.create(aluno=self.bruno, avaliacao=self.formativa, valor=6)
+        NotaAluno.objects.create(aluno=self.bruno, avaliacao=self.somativa, valor=50)
+
+        nota.valor = 8
+        nota.save()
+        assert self.linha(self.boletim(), self.ana)['medias']['formativa'] == '8.00'
+
+        self.formativa.valor_maximo = 20
+        self.formativa.save()
+        assert self.linha(self.boletim(), self.ana)['medias']['formativa'] == '4.00'
+
+        nota.delete()
+        assert [linha['id'] for linha in self.boletim()['alunos']] == [self.bruno.pk]
+
+        self.somativa.delete()
+        bruno = self.linha(self.boletim(), self.bruno)
+        assert bruno['notas'] == {str(self.formativa.pk): '6.00'}
+        assert bruno['medias']['geral'] == '3.00'
+
+    def test_incremental_matches_rebuild(self):
+        """Test that the incrementally maintained row equals a rebuild from scratch."""
+        NotaAluno.objects.create(aluno=self.ana, avaliacao=self.diagnostica, valor=3)
+        NotaAluno.objects.create(aluno=self.bruno, avaliacao=self.somativa, valor=41)
+        nota = NotaAluno.objects.create(aluno=self.bruno, avaliacao=self.formativa, valor=2)
+        nota.delete()
+        incremental = BoletimTurma.objects.get(turma=self.turma)
+
+        BoletimTurma.objects.all().delete()
+        call_command('reconstruir_boletins', stdout=io.StringIO())
+        reconstruido = BoletimTurma.objects.get(turma=self.turma)
+        assert (reconstruido.avaliacoes, reconstruido.alunos) == (
+            incremental.avaliacoes,
+            incremental.alunos,
+        )
+
+    def test_first_grade_builds_the_gradebook_row(self):
+        """Test that a turma's first grade inserts its gradebook and builds it from every row."""
+        NotaAluno.objects.bulk_create(
+            [NotaAluno(aluno=self.bruno, avaliacao=self.diagnostica, valor=6)]
+        )
+        assert not BoletimTurma.objects.exists()
+
+        NotaAluno.objects.create(aluno=self.ana, avaliacao=self.formativa, valor=9)
+        boletim = BoletimTurma.objects.get(turma=self.turma)
+        assert set(boletim.alunos) == {str(self.ana.pk), str(self.bruno.pk)}
+
+    def test_failed_update_discards_the_gradebook(self, caplog):
+        """Test that a gradebook that missed an update is dropped, logged, and rebuilt on read."""
+        NotaAluno.objects.create(aluno=self.ana, avaliacao=self.formativa, valor=4)
+        assert BoletimTurma.objects.filter(turma=self.turma).exists()
+
+        with mock.patch.object(
+            BoletimTurma, 'save', side_effect=OperationalError('database is locked')
+        ):
+            nota = NotaAluno.objects.create(aluno=self.bruno, avaliacao=self.formativa, valor=7)
+
+        assert nota.pk is not None
+        assert not BoletimTurma.objects.filter(turma=self.turma).exists()
+        assert 'database is locked' in caplog.text
+        assert self.linha(self.boletim(), self.bruno)['notas'] == {str(self.formativa.pk): '7.00'}
+
+    def test_moved_assessment_rebuilds_both_gradebooks(self):
+        """Test that moving an Avaliacao, or deleting a stale copy, updates both gradebooks."""
+        outra = Turma.objects.create(
+            escola=self.turma.escola, nome='5º B', nivel_ensino='5ef', professor=self.professor,
+            ano_letivo=2025, semestre=1
+        )
+        NotaAluno.objects.create(aluno=self.ana, avaliacao=self.formativa, valor=8)
+        NotaAluno.objects.create(aluno=self.ana, avaliacao=self.somativa, valor=40)
+        boletim_outra = self.client.get(f'/api/v1/pedagogico/turmas/{outra.pk}/boletim/').data
+        assert boletim_outra['alunos'] == []
+
+        self.formativa.turma = outra
+        self.formativa.save()
+        ana = self.linha(self.boletim(), self.ana)
+        assert ana['notas'] == {str(self.somativa.pk): '40.00'}
+        assert ana['medias']['geral'] == '8.00'
+        boletim_outra = BoletimTurma.objects.get(turma=outra)
+        assert list(boletim_outra.avaliacoes) == [str(self.formativa.pk)]
+        assert boletim_outra.alunos[str(self.ana.pk)]['notas'] == {str(self.formativa.pk): '8.00'}
+
+        antiga = Avaliacao.objects.get(pk=self.somativa.pk)
+        self.somativa.turma = outra
+        self.somativa.save()
+        antiga.delete()
+        assert self.boletim()['alunos'] == []
+        boletim_outra = BoletimTurma.objects.get(turma=outra)
+        assert list(boletim_outra.avaliacoes) == [str(self.formativa.pk)]
+        assert boletim_outra.alunos[str(self.ana.pk)]['medias']['geral'] == '8.00'
+
+    def test_renamed_student_is_refreshed(self):
+        """Test that a student's new name or matricula reaches the gradebook."""
+        NotaAluno.objects.create(aluno=self.ana, avaliacao=self.formativa, valor=8)
+
+        self.ana.user.first_name = 'Ana Clara'
+        self.ana.user.save()
+        self.ana.matricula = 'B-Ana-2'
+        self.ana.save()
+        self.ana.user.save(update_fields=['last_login'])
+
+        ana = self.linha(self.boletim(), self.ana)
+        assert (ana['nome'], ana['matricula']) == ('Ana Clara', 'B-Ana-2')
+
+    def test_turma_without_grades(self):
+        """Test that a turma without grades gets an empty gradebook, and an unknown one a 404."""
+        boletim = self.boletim()
+        assert boletim['alunos'] == []
+        assert len(boletim['avaliacoes']) == 3
+        assert (
+            self.client.get('/api/v1/pedagogico/turmas/999999/boletim/').status_code
+            == status.HTTP_404_NOT_FOUND
+        )
+
+
+@pytest.mark.django_db
+class TestNotaLote:
+    """Bulk grade entry on the NotaAluno endpoint."""
+
+    ALUNOS = 40
+    AVALIACOES = 5
+    URL = '/api/v1/pedagogico/notas/lote/'
+
+    def setup_method(self):
+        """Setup a turma with ALUNOS students and AVALIACOES assessments worth 10 points."""
+        self.client = APIClient()
+        escola = Escola.objects.create(nome='Escola Lote', cnpj='00.000.000/0001-55')
+        professor = Usuario.objects.create(username='prof_lote')
+        self.turma = Turma.objects.create(
+            escola=escola,
+            nome='5º B',
+            nivel_ensino='5ef',
+            professor=professor,
+            ano_letivo=2025,
+            semestre=1,
+        )
+        self.alunos = [
+            Aluno.objects.create(
+                user=Usuario.objects.create(username=f'aluno_lote{i}'), matricula=f'L{i}'
+            )
+            for i in range(self.ALUNOS)
+        ]
+        self.avaliacoes = [
+            Avaliacao.objects.create(
+                turma=self.turma, professor=professor, titulo=f'Prova {i}', tipo='somativa',
+                descricao='Descrição', data='2025-05-10'
+            )
+            for i in range(self.AVALIACOES)
+        ]
+        self.client.force_authenticate(user=professor)
+
+    def grade(self, valor):
+        return [
+            {'aluno': aluno.pk, 'avaliacao': avaliacao.pk, 'valor': valor}
+            for aluno in self.alunos for avaliacao in self.avaliacoes
+        ]
+
+    def test_grid_upserts_with_constant_queries(self, django_assert_max_num_queries):
+        """Test that a 40 × 5 grid is created, then updated, in a fixed number of queries."""
+        # Lookups, upsert and gradebook (built on this first write), savepoints included;
+        # per-row saves would be 200+
+        with django_assert_max_num_queries(20):
+            response = self.client.post(self.URL, {'notas': self.grade('7.5')}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'total': 200, 'criadas': 200, 'atualizadas': 0}
+
+        with django_assert_max_num_queries(20):
+            response = self.client.post(self.URL, {'notas': self.grade('9')}, format='json')
+        assert response.data == {'total': 200, 'criadas': 0, 'atualizadas': 200}
+        assert set(NotaAluno.objects.values_list('valor', flat=True)) == {Decimal('9')}
+
+        boletim = self.client.get(f'/api/v1/pedagogico/turmas/{self.turma.pk}/boletim/').data
+        assert len(boletim['alunos']) == self.ALUNOS
+        assert {linha['medias']['geral'] for linha in boletim['alunos']} == {'9.00'}
+
+    def test_errors_per_cell_and_nothing_saved(self):
+        """Test that invalid cells are reported by position and no cell is written."""
+        grade = self.grade('8')[:4]
+        grade[1]['valor'] = '10.01'
+        grade[2]['avaliacao'] = 999999
+        grade[3] = dict(grade[0])
+        grade.append({'aluno': self.alunos[0].pk, 'valor': 'x'})
+
+        response = self.client.post(self.URL, {'notas': grade}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        erros = response.data['notas']
+        assert erros[0] == {}
+        assert list(erros[1]) == ['valor'] and '10.00' in erros[1]['valor'][0]
+        assert list(erros[2]) == ['avaliacao']
+        assert list(erros[3]) == ['non_field_errors']
+        assert set(erros[4]) == {'avaliacao', 'valor'}
+        assert not NotaAluno.objects.exists()
+
+    def test_observacoes_kept_when_omitted(self):
+        """Test that a cell without observacoes updates the grade and keeps the stored remark."""
+        aluno, avaliacao = self.alunos[0], self.avaliacoes[0]
+        NotaAluno.objects.create(
+            aluno=aluno, avaliacao=avaliacao, valor=5, observacoes='Refazer a questão 2'
+        )
+        celula = {'aluno': aluno.pk, 'avaliacao': avaliacao.pk, 'valor': '6'}
+        self.client.post(self.URL, {'notas': [celula]}, format='json')
+        nota = NotaAluno.objects.get()
+        assert (nota.valor, nota.observacoes) == (Decimal('6'), 'Refazer a questão 2')
+
+        self.client.post(self.URL, {'notas': [dict(celula, observacoes='')]}, format='json')
+        assert NotaAluno.objects.get().observacoes == ''
@@ -10,16 +10,22 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.db.models import Prefetch
+from django.http import Http404
 
+from apps.core.consultas import com_relacionados, nome_de
+from apps.core.paginacao import paginacao_cursor
 from .models import (
     Turma, Aluno, PlanejamentoAnual, UnidadeTematica,
-    RegistroDeAula, Avaliacao, NotaAluno, Tarefa, SubmissaoTarefa
+    RegistroDeAula, Avaliacao, NotaAluno, BoletimTurma, Tarefa, SubmissaoTarefa
 )
 from .serializers import (
     TurmaSerializer, AlunoSerializer, PlanejamentoAnualSerializer,
     UnidadeTematicaSerializer, RegistroDeAulaSerializer,
-    AvaliacaoSerializer, NotaAlunoSerializer, TarefaSerializer, SubmissaoTarefaSerializer
+    AvaliacaoSerializer, NotaAlunoSerializer, NotaLoteSerializer, BoletimTurmaSerializer,
+    TarefaSerializer, SubmissaoTarefaSerializer
 )
+from .boletim import reconstruir
 
 logger = logging.getLogger(__name__) # NOVO
 
@@ -61,10 +67,27 @@ class TurmaViewSet(viewsets.ModelViewSet):
     search_fields = ['nome', 'professor__first_name']
     ordering_fields = ['nome', 'ano_letivo']
 
+    @action(detail=True, methods=['get'])
+    def boletim(self, request, pk=None):
+        """
+        Gradebook of the turma: students × assessments with weighted means by type.
+
+        Reads the materialized BoletimTurma row (one query); a turma without
+        one yet gets it built from its grades on the first read.
+        """
+        try:
+            boletim = BoletimTurma.objects.filter(turma_id=pk).first()
+        except (TypeError, ValueError):
+            raise Http404
+        if boletim is None:
+            boletim = reconstruir(self.get_object().pk)
+        return Response(BoletimTurmaSerializer(boletim).data)
+
 
 class AlunoViewSet(viewsets.ModelViewSet):
     """ViewSet for Aluno model."""
-    queryset = Aluno.objects.all()
+    # Turma ids only: the serializer lists turmas as primary keys
+    queryset = Aluno.objects.prefetch_related(Prefetch('turmas', queryset=Turma.objects.only('id')))
     serializer_class = AlunoSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter]
@@ -73,7 +96,7 @@ class AlunoViewSet(viewsets.ModelViewSet):
 
 class PlanejamentoAnualViewSet(viewsets.ModelViewSet):
     """ViewSet for PlanejamentoAnual model."""
-    queryset = PlanejamentoAnual.objects.all()
+    queryset = PlanejamentoAnual.objects.prefetch_related('unidades_tematicas')
     serializer_class = PlanejamentoAnualSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -93,7 +116,7 @@ class PlanejamentoAnualViewSet(viewsets.ModelViewSet):
             # Dispara o webhook n8n para iniciar o fluxo de aprovação
             send_n8n_webhook(
                 plano_id=planejamento.id,
-                professor_id=planejamento.professor.id,
+                professor_id=planejamento.professor_id,
                 status_novo='pendente'
             )
         
@@ -139,6 +162,8 @@ class RegistroDeAulaViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['turma', 'professor', 'data']
     ordering_fields = ['-data']
+    ordering = ('-data', '-id')
+    pagination_class = paginacao_cursor(*ordering)
 
 
 class AvaliacaoViewSet(viewsets.ModelViewSet):
@@ -159,10 +184,22 @@ class NotaAlunoViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['aluno', 'avaliacao']
 
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Bulk grade entry: ``{"notas": [{"aluno", "avaliacao", "valor"[, "observacoes"]}, ...]}``.
+
+        All or nothing: any invalid cell returns 400 with the errors of every
+        cell; otherwise all cells are created or updated in one transaction.
+        """
+        serializer = NotaLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
 
 class TarefaViewSet(viewsets.ModelViewSet):
     """ViewSet for Tarefa model (estilo Google Classroom)."""
-    queryset = Tarefa.objects.all()
+    queryset = com_relacionados(Tarefa.objects.all(), *nome_de('professor'))
     serializer_class = TarefaSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -195,12 +232,16 @@ class TarefaViewSet(viewsets.ModelViewSet):
 
 class SubmissaoTarefaViewSet(viewsets.ModelViewSet):
     """ViewSet for SubmissaoTarefa model."""
-    queryset = SubmissaoTarefa.objects.all()
+    queryset = com_relacionados(
+        SubmissaoTarefa.objects.all(), 'tarefa__titulo', *nome_de('aluno__user')
+    )
     serializer_class = SubmissaoTarefaSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['tarefa', 'aluno', 'status']
     ordering_fields = ['-data_submissao', '-data_avaliacao']
+    ordering = ('-data_submissao', '-id')
+    pagination_class = paginacao_cursor(*ordering)
 
     @action(detail=True, methods=['post'])
     def avaliar(self, request, pk=None):
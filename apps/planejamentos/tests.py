@@ -0,0 +1,87 @@
+"""
+Tests for Planejamentos app.
+"""
+import pytest
+from rest_framework.test import APIClient
+
+from apps.core.models import User
+from .models import PlanejamentoTemplate, AtividadeTemplate, MaterialDidatico, ColeçaoPlanejamentos
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    """
+    Query-count budget of every list and detail endpoint.
+
+    Each row has its own author, so an ``autor_nome``/``criador_nome`` read
+    per row goes over the budget.
+    """
+
+    LINHAS = 5
+    # Max queries of a list page, checked by the orcamento_lista_detalhe fixture
+    ORCAMENTOS = {
+        'templates': 2,
+        'atividades': 2,
+        'materiais': 2,
+        'colecoes': 3,
+    }
+
+    def setup_method(self):
+        """Setup LINHAS public rows of every model, each by its own author."""
+        self.client = APIClient()
+        for i in range(self.LINHAS):
+            autor = User.objects.create(
+                username=f'autor_orcamento{i}', first_name='Autor', last_name=str(i)
+            )
+            planos = [
+                PlanejamentoTemplate.objects.create(
+                    titulo=f'Plano {i}.{n}',
+                    nivel_ensino='5ef',
+                    objetivos_aprendizagem='Objetivos',
+                    desenvolvimento='Desenvolvimento',
+                    avaliacao='Avaliação',
+                    autor=autor,
+                    publico=True,
+                )
+                for n in range(2)
+            ]
+            AtividadeTemplate.objects.create(
+                titulo=f'Atividade {i}',
+                descricao='Descrição',
+                tipo='exercicio',
+                nivel_ensino='5ef',
+                autor=autor,
+                publico=True,
+            )
+            MaterialDidatico.objects.create(
+                titulo=f'Material {i}',
+                tipo='silabario',
+                arquivo='materiais/silabario.pdf',
+                nivel_ensino='5ef',
+                autor=autor,
+                publico=True,
+            )
+            colecao = ColeçaoPlanejamentos.objects.create(
+                titulo=f'Coleção {i}', nivel_ensino='5ef', criador=autor, publico=True
+            )
+            colecao.planejamentos.add(*planos)
+        self.client.force_authenticate(user=autor)
+
+    @pytest.mark.parametrize('endpoint', sorted(ORCAMENTOS))
+    def test_list_and_detail_within_budget(self, endpoint, orcamento_lista_detalhe):
+        """Test that list and detail cost the same few queries whatever the number of rows."""
+        orcamento_lista_detalhe(
+            self.client,
+            f'/api/v1/planejamentos/{endpoint}/',
+            self.ORCAMENTOS[endpoint],
+            self.LINHAS,
+        )
+
+    def test_nested_fields_are_serialized(self):
+        """Test that the tuned querysets still fill the author names and nested plans."""
+        colecao = self.client.get('/api/v1/planejamentos/colecoes/').data['results'][0]
+        assert colecao['criador_nome'].startswith('Autor ')
+        assert len(colecao['planejamentos']) == 2
+        assert colecao['planejamentos'][0]['autor_nome'] == colecao['criador_nome']
+        material = self.client.get('/api/v1/planejamentos/materiais/').data['results'][0]
+        assert material['autor_nome'].startswith('Autor ')
@@ -7,7 +7,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.db.models import Prefetch
 
+from apps.core.consultas import com_relacionados, nome_de
 from .models import PlanejamentoTemplate, AtividadeTemplate, MaterialDidatico, ColeçaoPlanejamentos
 from .serializers import (
     PlanejamentoTemplateSerializer, AtividadeTemplateSerializer,
@@ -27,13 +29,12 @@ class PlanejamentoTemplateViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Retorna planejamentos públicos ou do próprio usuário."""
+        queryset = PlanejamentoTemplate.objects.filter(publico=True)
         if self.request.user.is_authenticated:
-            return PlanejamentoTemplate.objects.filter(
-                publico=True
-            ) | PlanejamentoTemplate.objects.filter(
+            queryset = queryset | PlanejamentoTemplate.objects.filter(
                 autor=self.request.user
             )
-        return PlanejamentoTemplate.objects.filter(publico=True)
+        return com_relacionados(queryset, *nome_de('autor'))
 
     def perform_create(self, serializer):
         """Define o autor como o usuário logado."""
@@ -74,13 +75,12 @@ class AtividadeTemplateViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Retorna atividades públicas ou do próprio usuário."""
+        queryset = AtividadeTemplate.objects.filter(publico=True)
         if self.request.user.is_authenticated:
-            return AtividadeTemplate.objects.filter(
-                publico=True
-            ) | AtividadeTemplate.objects.filter(
+            queryset = queryset | AtividadeTemplate.objects.filter(
                 autor=self.request.user
             )
-        return AtividadeTemplate.objects.filter(publico=True)
+        return com_relacionados(queryset, *nome_de('autor'))
 
     def perform_create(self, serializer):
         """Define o autor como o usuário logado."""
@@ -99,13 +99,12 @@ class MaterialDidaticoViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Retorna materiais públicos ou do próprio usuário."""
+        queryset = MaterialDidatico.objects.filter(publico=True)
         if self.request.user.is_authenticated:
-            return MaterialDidatico.objects.filter(
-                publico=True
-            ) | MaterialDidatico.objects.filter(
+            queryset = queryset | MaterialDidatico.objects.filter(
                 autor=self.request.user
             )
-        return MaterialDidatico.objects.filter(publico=True)
+        return com_relacionados(queryset, *nome_de('autor'))
 
     def perform_create(self, serializer):
         """Define o autor como o usuário logado."""
@@ -124,13 +123,15 @@ class ColeçaoPlanejamentosViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Retorna coleções públicas ou do próprio usuário."""
+        queryset = ColeçaoPlanejamentos.objects.filter(publico=True)
         if self.request.user.is_authenticated:
-            return ColeçaoPlanejamentos.objects.filter(
-                publico=True
-            ) | ColeçaoPlanejamentos.objects.filter(
+            queryset = queryset | ColeçaoPlanejamentos.objects.filter(
                 criador=self.request.user
             )
-        return ColeçaoPlanejamentos.objects.filter(publico=True)
+        planejamentos = com_relacionados(PlanejamentoTemplate.objects.all(), *nome_de('autor'))
+        return com_relacionados(queryset, *nome_de('criador')).prefetch_related(
+            Prefetch('planejamentos', queryset=planejamentos)
+        )
 
     def perform_create(self, serializer):
         """Define o criador como o usuário logado."""
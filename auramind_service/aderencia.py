@@ -0,0 +1,258 @@
+"""
+Pontuação determinística de aderência de planos de aula à BNCC.
+
+Cada seção do plano (objetivos, atividade dirigida, desenvolvimento e
+avaliação) é vetorizada com o TF-IDF do índice BNCC e comparada às descrições
+das habilidades declaradas. Vários planos são pontuados juntos: todas as
+seções de todos os planos formam uma única matriz, multiplicada uma vez pela
+matriz de habilidades; o resto são operações NumPy sobre o resultado.
+
+Cobertura de uma habilidade em uma seção:
+
+    similaridade(seção, habilidade) / max(melhor similaridade da seção no
+    catálogo do nível, SIMILARIDADE_REFERENCIA) x completude(seção)
+
+ou seja, 1.0 quando a habilidade é a que melhor descreve a seção. O piso de
+referência e a completude (tamanho da seção frente ao esperado) evitam que
+textos vagos ou curtos pareçam cobrir alguma habilidade por acaso. A
+cobertura da habilidade no plano é a média ponderada das seções.
+"""
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from bncc import IndiceBNCC
+
+SECOES = ("objetivos_aprendizagem", "atividade_dirigida", "desenvolvimento", "avaliacao")
+
+NOMES_SECOES = {
+    "objetivos_aprendizagem": "objetivos de aprendizagem",
+    "atividade_dirigida": "atividade dirigida",
+    "desenvolvimento": "desenvolvimento",
+    "avaliacao": "avaliação",
+}
+
+# Peso de cada seção na cobertura de uma habilidade (soma 1)
+PESOS_SECOES = np.array([0.3, 0.2, 0.3, 0.2], dtype=np.float32)
+
+# Palavras a partir das quais a seção é considerada completa
+PALAVRAS_ESPERADAS = np.array([12, 12, 25, 10], dtype=np.float32)
+
+# Similaridade típica entre uma seção focada e a sua habilidade; abaixo dela
+# a melhor habilidade do catálogo não é tratada como cobertura plena
+SIMILARIDADE_REFERENCIA = 0.25
+
+# Situação de uma habilidade pela cobertura
+LIMITE_COBERTA = 0.6
+LIMITE_PARCIAL = 0.3
+
+# Peso da aderência à BNCC no score geral (o restante é a qualidade pedagógica)
+PESO_ADERENCIA = 0.7
+
+# Habilidades não declaradas sugeridas quando o plano já as trabalha
+RELACIONADAS_MAXIMO = 2
+
+
+def situacao(cobertura: float) -> str:
+    """Classifica a cobertura de uma habilidade"""
+    if cobertura >= LIMITE_COBERTA:
+        return "coberta"
+    if cobertura >= LIMITE_PARCIAL:
+        return "parcial"
+    return "nao_coberta"
+
+
+def avaliar_planos(indice: IndiceBNCC, planos: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Pontua vários planos de uma vez.
+
+    Args:
+        indice: Índice BNCC carregado
+        planos: Dicts com ``nivel_ensino``, ``habilidades_bncc`` e as seções
+
+    Returns:
+        Um dict por plano, na mesma ordem, com ``aderencia``, ``qualidade``,
+        ``score_geral``, ``completude`` (por seção), ``cobertura`` (por
+        habilidade declarada, com o detalhe por seção) e ``relacionadas``
+        (habilidades não declaradas que o plano já trabalha)
+    """
+    total_planos, total_secoes = len(planos), len(SECOES)
+    if not total_planos:
+        return []
+
+    textos = [(plano.get(secao) or "").strip() for plano in planos for secao in SECOES]
+    similaridades = indice.similaridades(textos).reshape(total_planos, total_secoes, len(indice))
+
+    palavras = np.array([len(texto.split()) for texto in textos], dtype=np.float32)
+    completude = np.minimum(1.0, palavras.reshape(total_planos, total_secoes) / PALAVRAS_ESPERADAS)
+
+    mascaras = np.stack([indice.mascara(plano.get("nivel_ensino")) for plano in planos])
+    # Nível sem habilidades no catálogo: compara com o catálogo inteiro
+    mascaras[~mascaras.any(axis=1)] = True
+    melhores = np.where(mascaras[:, None, :], similaridades, 0.0).max(axis=2)
+    denominadores = np.maximum(melhores, SIMILARIDADE_REFERENCIA)
+
+    # (planos, seções, habilidades): cobertura de cada habilidade em cada seção
+    coberturas = (
+        np.clip(similaridades / denominadores[:, :, None], 0.0, 1.0) * completude[:, :, None]
+    )
+    coberturas_plano = np.einsum("psh,s->ph", coberturas, PESOS_SECOES)
+
+    qualidade = completude @ PESOS_SECOES
+
+    resultados = []
+    for p, plano in enumerate(planos):
+        codigos = list(
+            dict.fromkeys(
+                codigo.strip().upper()
+                for codigo in plano.get("habilidades_bncc") or []
+                if codigo.strip()
+            )
+        )
+        posicoes = [indice.posicao(codigo) for codigo in codigos]
+
+        cobertura = []
+        for codigo, posicao in zip(codigos, posicoes):
+            if posicao is None:
+                item = {
+                    "codigo": codigo,
+                    "cobertura": 0.0,
+                    "secoes": {},
+                    "motivo": "código não encontrado na BNCC",
+                }
+            elif not mascaras[p, posicao]:
+                item = {
+                    "codigo": codigo, "cobertura": 0.0, "secoes": {},
+                    "motivo": f"habilidade não corresponde ao nível {plano.get('nivel_ensino')}"
+                }
+            else:
+                item = {
+                    "codigo": codigo,
+                    "cobertura": round(float(coberturas_plano[p, posicao]), 2),
+                    "secoes": {
+                        secao: round(float(coberturas[p, s, posicao]), 2)
+                        for s, secao in enumerate(SECOES)
+                    },
+                    "motivo": "",
+                }
+            item["situacao"] = situacao(item["cobertura"])
+            cobertura.append(item)
+
+        aderencia = float(np.mean([item["cobertura"] for item in cobertura])) if cobertura else 0.0
+
+        # Habilidades do nível que o plano cobre sem tê-las declarado
+        candidatas = np.where(mascaras[p], coberturas_plano[p], -1.0)
+        candidatas[[posicao for posicao in posicoes if posicao is not None]] = -1.0
+        relacionadas = [
+            (indice.habilidades[h], round(float(candidatas[h]), 2))
+            for h in np.argsort(-candidatas)[:RELACIONADAS_MAXIMO]
+            if candidatas[h] >= LIMITE_COBERTA
+        ]
+
+        resultados.append(
+            {
+                "aderencia": round(aderencia, 2),
+                "qualidade": round(float(qualidade[p]), 2),
+                "score_geral": round(
+                    PESO_ADERENCIA * aderencia + (1 - PESO_ADERENCIA) * float(qualidade[p]), 2
+                ),
+                "completude": {
+                    secao: round(float(completude[p, s]), 2) for s, secao in enumerate(SECOES)
+                },
+                "cobertura": cobertura,
+                "relacionadas": relacionadas,
+            }
+        )
+    return resultados
+
+
+def montar_pontos(indice: IndiceBNCC, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte o resultado de ``avaliar_planos`` em pontos fortes, pontos a
+    revisar (do maior para o menor impacto), sugestões e recomendação final.
+    """
+    fortes, revisar, sugestoes = [], [], []
+
+    for item in resultado["cobertura"]:
+        codigo = item["codigo"]
+        if item["motivo"]:
+            revisar.append((1.0, {
+                "aspecto": f"Habilidade {codigo}",
+                "descricao": f"{codigo}: {item['motivo']}",
+                "impacto": "alto",
+            }))
+            sugestoes.append(f"Substitua {codigo} por uma habilidade válida para o nível do plano")
+            continue
+
+        descricao = indice.obter(codigo).descricao
+        if item["situacao"] == "coberta":
+            fortes.append(
+                {
+                    "aspecto": f"Habilidade {codigo}",
+                    "descricao": (
+                        f"O plano trabalha {codigo} de forma consistente "
+                        f"(cobertura {item['cobertura']:.0%})"
+                    ),
+                    "impacto": "alto",
+                }
+            )
+            continue
+
+        ausentes = [
+            NOMES_SECOES[secao] for secao, valor in item["secoes"].items() if valor < LIMITE_PARCIAL
+        ]
+        revisar.append((1.0 - item["cobertura"], {
+            "aspecto": f"Habilidade {codigo}",
+            "descricao": (
+                f"{codigo} tem cobertura {item['cobertura']:.0%}"
+                + (f"; pouco presente em: {', '.join(ausentes)}" if ausentes else "")
+            ),
+            "impacto": "alto" if item["situacao"] == "nao_coberta" else "médio",
+        }))
+        sugestoes.append(f"Inclua atividades que trabalhem {codigo}: {descricao}")
+
+    for secao, valor in resultado["completude"].items():
+        if valor < 1.0:
+            revisar.append(((1.0 - valor) * 0.5, {
+                "aspecto": NOMES_SECOES[secao].capitalize(),
+                "descricao": f"A seção '{NOMES_SECOES[secao]}' está pouco detalhada",
+                "impacto": "médio" if valor < 0.5 else "baixo",
+            }))
+    if all(valor >= 1.0 for valor in resultado["completude"].values()):
+        fortes.append({
+            "aspecto": "Estrutura Pedagógica",
+            "descricao": "Todas as seções do plano estão detalhadas",
+            "impacto": "médio",
+        })
+
+    if not resultado["cobertura"]:
+        revisar.append((1.0, {
+            "aspecto": "Habilidades BNCC",
+            "descricao": "Nenhuma habilidade BNCC foi declarada no plano",
+            "impacto": "alto",
+        }))
+    for habilidade, valor in resultado["relacionadas"]:
+        sugestoes.append(
+            f"Considere declarar {habilidade.codigo}, já trabalhada no plano "
+            f"(cobertura {valor:.0%}): {habilidade.descricao}"
+        )
+
+    score = resultado["score_geral"]
+    if score >= 0.75 and not any(ponto["impacto"] == "alto" for _, ponto in revisar):
+        recomendacao = "APROVADO - Plano bem alinhado às habilidades BNCC declaradas."
+    elif score >= 0.5:
+        recomendacao = (
+            "APROVADO COM OBSERVAÇÕES - "
+            "Revise os pontos indicados para fortalecer o alinhamento à BNCC."
+        )
+    else:
+        recomendacao = (
+            "REVISAR - O plano não trabalha de forma suficiente as habilidades BNCC declaradas."
+        )
+
+    return {
+        "pontos_fortes": fortes,
+        "pontos_revisar": [ponto for _, ponto in sorted(revisar, key=lambda par: -par[0])],
+        "sugestoes_melhoria": sugestoes,
+        "recomendacao_final": recomendacao,
+    }
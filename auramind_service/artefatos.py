@@ -0,0 +1,235 @@
+"""
+Artefatos pré-compilados do índice BNCC.
+
+Ajustar o TF-IDF na inicialização custa CPU em cada worker e deixa uma cópia
+privada da matriz em cada processo. A etapa de build (``python artefatos.py``,
+executada no Dockerfile) ajusta o índice uma vez e grava em
+``<raiz>/<versao>/``:
+
+- ``manifesto.json``: versões, hash do catálogo, parâmetros e formas dos arrays
+- ``habilidades.json``: habilidades em ordem de código (linhas da matriz)
+- ``vocabulario.npy``: n-gramas na ordem das colunas da matriz
+- ``idf.npy``: pesos IDF
+- ``matriz_dados.npy``, ``matriz_indices.npy``, ``matriz_indptr.npy``: matriz
+  TF-IDF (CSR)
+
+e aponta ``<raiz>/ATUAL`` para a nova versão. A versão deriva do catálogo e
+do formato: o mesmo catálogo gera sempre o mesmo diretório.
+
+Na inicialização os arrays são abertos com ``numpy.load(mmap_mode="r")``
+(``numpy.memmap``): nada é copiado para a memória do processo, e os workers
+do uvicorn e do executor de CPU compartilham as mesmas páginas pelo cache do
+sistema operacional. Sem artefato, ou com um artefato de outro catálogo ou
+formato, o índice é ajustado a partir do JSON, como antes.
+
+Uso:
+    python artefatos.py [--bncc data/bncc_habilidades.json] [--saida artefatos]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import sklearn
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from bncc import PARAMETROS_TFIDF, Habilidade, IndiceBNCC
+
+logger = logging.getLogger(__name__)
+
+# Muda quando o conteúdo ou o significado dos arquivos muda
+FORMATO = 1
+
+DIRETORIO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "artefatos")
+PONTEIRO = "ATUAL"
+
+
+def _parametros() -> Dict[str, Any]:
+    """Parâmetros do TF-IDF em forma serializável (para o manifesto e o hash)"""
+    def serializavel(valor: Any) -> Any:
+        if isinstance(valor, type):
+            return valor.__name__
+        return list(valor) if isinstance(valor, tuple) else valor
+
+    return {chave: serializavel(valor) for chave, valor in PARAMETROS_TFIDF.items()}
+
+
+def hash_catalogo(bncc_arquivo: str) -> str:
+    """SHA-256 do arquivo do catálogo BNCC"""
+    with open(bncc_arquivo, "rb") as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()
+
+
+def versao_artefato(versao_bncc: str, sha_catalogo: str) -> str:
+    """Nome do diretório do artefato: versão do catálogo + hash de catálogo, formato e parâmetros"""
+    assinatura = json.dumps([sha_catalogo, FORMATO, _parametros()], sort_keys=True)
+    return f"{versao_bncc or 'bncc'}-{hashlib.sha256(assinatura.encode()).hexdigest()[:12]}"
+
+
+def construir(bncc_arquivo: str, raiz: str = DIRETORIO_PADRAO) -> str:
+    """
+    Ajusta o índice do catálogo e grava o artefato versionado.
+
+    O artefato é gravado em um diretório temporário e renomeado ao final; o
+    ponteiro ``ATUAL`` é trocado atomicamente, então workers iniciando
+    durante o build carregam a versão anterior ou a nova, nunca uma parcial.
+
+    Returns:
+        Versão do artefato
+    """
+    sha_catalogo = hash_catalogo(bncc_arquivo)
+    indice = IndiceBNCC.carregar(bncc_arquivo)
+    versao = versao_artefato(indice.versao, sha_catalogo)
+    destino = os.path.join(raiz, versao)
+    os.makedirs(raiz, exist_ok=True)
+
+    if not os.path.isdir(destino):
+        temporario = tempfile.mkdtemp(prefix=f".{versao}-", dir=raiz)
+        try:
+            os.chmod(temporario, 0o755)
+            _gravar(indice, temporario, versao, sha_catalogo)
+            os.replace(temporario, destino)
+        except BaseException:
+            shutil.rmtree(temporario, ignore_errors=True)
+            raise
+
+    ponteiro = os.path.join(raiz, PONTEIRO)
+    with open(f"{ponteiro}.tmp", "w", encoding="utf-8") as arquivo:
+        arquivo.write(versao)
+    os.replace(f"{ponteiro}.tmp", ponteiro)
+    return versao
+
+
+def _gravar(indice: IndiceBNCC, diretorio: str, versao: str, sha_catalogo: str) -> None:
+    vocabulario = indice.vetorizador.get_feature_names_out()
+    matriz = indice.matriz
+    matriz.sort_indices()
+    arrays = {
+        # Unicode de tamanho fixo, não objetos Python: pode ser mapeado em memória
+        "vocabulario": vocabulario.astype(str),
+        "idf": indice.vetorizador.idf_.astype(np.float32),
+        "matriz_dados": matriz.data.astype(np.float32),
+        "matriz_indices": matriz.indices.astype(np.int32),
+        "matriz_indptr": matriz.indptr.astype(np.int32),
+    }
+    for nome, array in arrays.items():
+        np.save(os.path.join(diretorio, f"{nome}.npy"), array, allow_pickle=False)
+
+    with open(os.path.join(diretorio, "habilidades.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(
+            [habilidade.para_dict() for habilidade in indice.habilidades],
+            arquivo,
+            ensure_ascii=False,
+        )
+
+    manifesto = {
+        "versao": versao,
+        "formato": FORMATO,
+        "versao_bncc": indice.versao,
+        "catalogo_sha256": sha_catalogo,
+        "parametros_tfidf": _parametros(),
+        "sklearn": sklearn.__version__,
+        "habilidades": len(indice),
+        "termos": len(vocabulario),
+        "forma_matriz": list(matriz.shape),
+        "criado_em": datetime.now().isoformat(),
+    }
+    with open(os.path.join(diretorio, "manifesto.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+
+
+def abrir(diretorio: str) -> Tuple[IndiceBNCC, Dict[str, Any]]:
+    """Abre um artefato com os arrays mapeados em memória (somente leitura)"""
+    with open(os.path.join(diretorio, "manifesto.json"), encoding="utf-8") as arquivo:
+        manifesto = json.load(arquivo)
+    with open(os.path.join(diretorio, "habilidades.json"), encoding="utf-8") as arquivo:
+        habilidades = [
+            Habilidade(**dict(item, anos=tuple(item["anos"])))
+            for item in json.load(arquivo)
+        ]
+
+    def mapear(nome: str) -> np.ndarray:
+        return np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode="r", allow_pickle=False)
+
+    termos = mapear("vocabulario").tolist()
+    vetorizador = TfidfVectorizer(
+        **PARAMETROS_TFIDF, vocabulary=dict(zip(termos, range(len(termos))))
+    )
+    vetorizador.idf_ = mapear("idf")
+    matriz = sparse.csr_matrix(
+        (mapear("matriz_dados"), mapear("matriz_indices"), mapear("matriz_indptr")),
+        shape=tuple(manifesto["forma_matriz"]),
+        copy=False,
+    )
+    indice = IndiceBNCC(
+        habilidades, versao=manifesto["versao_bncc"], vetorizador=vetorizador, matriz=matriz
+    )
+    return indice, manifesto
+
+
+def carregar_indice(
+    bncc_arquivo: str, raiz: str = DIRETORIO_PADRAO
+) -> Tuple[IndiceBNCC, Optional[str]]:
+    """
+    Índice BNCC do artefato atual, ou ajustado a partir do JSON.
+
+    O artefato só é usado se foi construído a partir do mesmo catálogo e no
+    formato atual.
+
+    Returns:
+        (índice, versão do artefato ou None se o índice foi ajustado do JSON)
+    """
+    ponteiro = os.path.join(raiz, PONTEIRO)
+    if os.path.exists(ponteiro):
+        with open(ponteiro, encoding="utf-8") as arquivo:
+            versao = arquivo.read().strip()
+        try:
+            indice, manifesto = abrir(os.path.join(raiz, versao))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(
+                f"Artefato BNCC {versao} ilegível ({e}); ajustando o índice a partir do catálogo"
+            )
+        else:
+            if manifesto.get("formato") != FORMATO:
+                logger.warning(
+                    f"Artefato BNCC {versao} no formato {manifesto.get('formato')}, "
+                    f"esperado {FORMATO}"
+                )
+            elif manifesto.get("catalogo_sha256") != hash_catalogo(bncc_arquivo):
+                logger.warning(f"Artefato BNCC {versao} foi construído a partir de outro catálogo")
+            else:
+                return indice, versao
+    else:
+        logger.info(f"Nenhum artefato BNCC em {raiz}; rode `python artefatos.py` na etapa de build")
+    return IndiceBNCC.carregar(bncc_arquivo), None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Constrói o artefato pré-compilado do índice BNCC")
+    parser.add_argument(
+        "--bncc",
+        default=os.getenv(
+            "AURAMIND_BNCC_ARQUIVO",
+            os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), "data", "bncc_habilidades.json"
+            ),
+        ),
+        help="Catálogo BNCC (JSON)",
+    )
+    parser.add_argument("--saida", default=os.getenv("AURAMIND_ARTEFATOS_DIR", DIRETORIO_PADRAO),
+                        help="Diretório raiz dos artefatos")
+    argumentos = parser.parse_args()
+
+    inicio = time.perf_counter()
+    versao = construir(argumentos.bncc, argumentos.saida)
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    logger.info(f"Artefato {versao} pronto em {duracao_ms:.0f} ms ({argumentos.saida})")
@@ -0,0 +1,313 @@
+"""
+Índice local das habilidades da BNCC.
+
+Carregado uma vez na inicialização a partir de um arquivo JSON empacotado com
+o serviço (``data/bncc_habilidades.json``), sem acesso à rede. Oferece:
+
+- consulta por código e por prefixo de código (``EF05``, ``EF05LP``...),
+  por busca binária sobre os códigos ordenados;
+- busca por similaridade TF-IDF (n-gramas de caracteres, tolerante a acentos
+  e flexões) como um único produto matriz-vetor, filtrado por nível de ensino
+  e componente com máscaras NumPy pré-calculadas.
+
+Ano, etapa e componente são derivados do próprio código: ``EF05LP01`` é
+Ensino Fundamental, 5º ano, Língua Portuguesa; ``EF15AR01`` cobre do 1º ao
+5º ano; ``EI03EO01`` é Educação Infantil, crianças pequenas, campo de
+experiência "O eu, o outro e o nós".
+"""
+import bisect
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+COMPONENTES = {
+    "LP": "Língua Portuguesa",
+    "MA": "Matemática",
+    "CI": "Ciências",
+    "GE": "Geografia",
+    "HI": "História",
+    "AR": "Arte",
+    "EF": "Educação Física",
+    "LI": "Língua Inglesa",
+    "ER": "Ensino Religioso",
+}
+
+CAMPOS_EXPERIENCIA = {
+    "EO": "O eu, o outro e o nós",
+    "CG": "Corpo, gestos e movimentos",
+    "TS": "Traços, sons, cores e formas",
+    "EF": "Escuta, fala, pensamento e imaginação",
+    "ET": "Espaços, tempos, quantidades, relações e transformações",
+}
+
+# Faixa etária da Educação Infantil correspondente a cada nível de ensino
+FAIXAS_EDUCACAO_INFANTIL = {"maternal": 2, "pre": 3}
+
+# Parâmetros do TF-IDF. N-gramas de caracteres dentro das palavras: "fração"
+# e "frações" compartilham a maior parte dos termos, sem depender de um stemmer
+PARAMETROS_TFIDF = {
+    "analyzer": "char_wb",
+    "ngram_range": (3, 5),
+    "strip_accents": "unicode",
+    "lowercase": True,
+    "sublinear_tf": True,
+    "dtype": np.float32,
+}
+
+_CODIGO = re.compile(r"^(EI|EF|EM)(\d)(\d)([A-Z]{2,3})(\d{2,3})$")
+_NIVEL_EF = re.compile(r"^(\d)(ef|em)$")
+
+
+@dataclass(frozen=True)
+class Habilidade:
+    """Habilidade BNCC com os atributos derivados do código"""
+    codigo: str
+    descricao: str
+    etapa: str  # "EI", "EF" ou "EM"
+    anos: Tuple[int, ...]  # anos (EF/EM) ou faixas etárias (EI) cobertos
+    componente: str
+    campo: str  # unidade temática / prática de linguagem, ou campo de experiência na EI
+
+    def para_dict(self) -> Dict[str, object]:
+        return {
+            "codigo": self.codigo,
+            "descricao": self.descricao,
+            "etapa": self.etapa,
+            "anos": list(self.anos),
+            "componente": self.componente,
+            "campo": self.campo,
+        }
+
+
+def decodificar(codigo: str) -> Tuple[str, Tuple[int, ...], str]:
+    """
+    Extrai etapa, anos e sigla do componente/campo de um código BNCC.
+
+    ``EF05`` cobre só o 5º ano; ``EF15``, ``EF35``, ``EF69`` etc. são
+    intervalos de anos.
+
+    Raises:
+        ValueError: Se o código não segue o formato da BNCC
+    """
+    correspondencia = _CODIGO.match(codigo)
+    if not correspondencia:
+        raise ValueError(f"Código BNCC inválido: {codigo}")
+    etapa, inicio, fim, sigla, _ = correspondencia.groups()
+    inicio, fim = int(inicio), int(fim)
+    anos = (fim,) if inicio == 0 else tuple(range(inicio, fim + 1))
+    return etapa, anos, sigla
+
+
+def nivel_para_etapa(nivel_ensino: str) -> Optional[Tuple[str, int]]:
+    """Converte o nível de ensino do AuraClass (``5ef``, ``pre``...) em (etapa, ano)"""
+    nivel = (nivel_ensino or "").strip().lower()
+    if nivel in FAIXAS_EDUCACAO_INFANTIL:
+        return "EI", FAIXAS_EDUCACAO_INFANTIL[nivel]
+    correspondencia = _NIVEL_EF.match(nivel)
+    if correspondencia:
+        return correspondencia.group(2).upper(), int(correspondencia.group(1))
+    return None
+
+
+class IndiceBNCC:
+    """Índice em memória das habilidades BNCC (código, prefixo e similaridade)"""
+
+    def __init__(
+        self,
+        habilidades: Sequence[Habilidade],
+        versao: str = "",
+        vetorizador: Optional[TfidfVectorizer] = None,
+        matriz: Optional[sparse.csr_matrix] = None,
+    ):
+        """
+        Sem ``vetorizador`` e ``matriz``, ajusta o TF-IDF sobre as descrições;
+        com eles (artefato pré-compilado, ver ``artefatos.py``), usa-os como
+        estão: as linhas da matriz seguem as habilidades em ordem de código.
+        """
+        self.versao = versao
+        self.habilidades: List[Habilidade] = sorted(habilidades, key=lambda h: h.codigo)
+        self.codigos: List[str] = [h.codigo for h in self.habilidades]
+        self._posicao = {codigo: i for i, codigo in enumerate(self.codigos)}
+
+        if vetorizador is None or matriz is None:
+            vetorizador = TfidfVectorizer(**PARAMETROS_TFIDF)
+            # Linhas normalizadas (L2): o produto com a consulta já é o cosseno
+            matriz = vetorizador.fit_transform(self.textos()).tocsr()
+        self.vetorizador = vetorizador
+        self.matriz = matriz
+
+        self._componentes = np.array([h.componente.lower() for h in self.habilidades])
+        self._mascaras_nivel: Dict[Tuple[str, int], np.ndarray] = {}
+        for i, habilidade in enumerate(self.habilidades):
+            for ano in habilidade.anos:
+                chave = (habilidade.etapa, ano)
+                if chave not in self._mascaras_nivel:
+                    self._mascaras_nivel[chave] = np.zeros(len(self.habilidades), dtype=bool)
+                self._mascaras_nivel[chave][i] = True
+
+    def textos(self) -> List[str]:
+        """Texto vetorizado de cada habilidade, na ordem da matriz"""
+        return [f"{h.descricao} {h.campo} {h.componente}" for h in self.habilidades]
+
+    @classmethod
+    def carregar(cls, caminho: str) -> "IndiceBNCC":
+        """
+        Carrega o índice de um arquivo JSON.
+
+        Formato: ``{"versao": ..., "habilidades": [{"codigo", "descricao",
+        "campo"?}, ...]}``. O catálogo completo da BNCC pode substituir o
+        arquivo empacotado sem mudança de código.
+        """
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+
+        habilidades = []
+        for item in dados["habilidades"]:
+            codigo = item["codigo"].strip().upper()
+            etapa, anos, sigla = decodificar(codigo)
+            if etapa == "EI":
+                componente = "Educação Infantil"
+                campo = item.get("campo") or CAMPOS_EXPERIENCIA.get(sigla, "")
+            else:
+                componente = item.get("componente") or COMPONENTES.get(sigla, sigla)
+                campo = item.get("campo", "")
+            habilidades.append(Habilidade(
+                codigo=codigo,
+                descricao=item["descricao"],
+                etapa=etapa,
+                anos=anos,
+                componente=componente,
+                campo=campo,
+            ))
+        return cls(habilidades, versao=dados.get("versao", ""))
+
+    def __len__(self) -> int:
+        return len(self.habilidades)
+
+    def __contains__(self, codigo: str) -> bool:
+        return codigo in self._posicao
+
+    def posicao(self, codigo: str) -> Optional[int]:
+        """Linha da habilidade na matriz TF-IDF, ou None se o código não existe"""
+        return self._posicao.get((codigo or "").strip().upper())
+
+    def obter(self, codigo: str) -> Optional[Habilidade]:
+        """Habilidade pelo código exato, ou None"""
+        posicao = self.posicao(codigo)
+        return None if posicao is None else self.habilidades[posicao]
+
+    def por_prefixo(
+        self,
+        prefixo: str,
+        limite: Optional[int] = None,
+        nivel_ensino: Optional[str] = None,
+        componente: Optional[str] = None,
+    ) -> List[Habilidade]:
+        """Habilidades cujo código começa com ``prefixo``, em ordem de código"""
+        prefixo = (prefixo or "").strip().upper()
+        inicio = bisect.bisect_left(self.codigos, prefixo)
+        # "\uffff" é maior que qualquer caractere de um código BNCC
+        fim = bisect.bisect_right(self.codigos, prefixo + "\uffff", lo=inicio)
+        posicoes = range(inicio, fim)
+        if nivel_ensino or componente:
+            posicoes = np.flatnonzero(self.mascara(nivel_ensino, componente)[inicio:fim]) + inicio
+        return [self.habilidades[i] for i in posicoes[:limite]]
+
+    def mascara(
+        self, nivel_ensino: Optional[str] = None, componente: Optional[str] = None
+    ) -> np.ndarray:
+        """Máscara booleana das habilidades do nível de ensino e componente"""
+        mascara = np.ones(len(self.habilidades), dtype=bool)
+        if nivel_ensino:
+            chave = nivel_para_etapa(nivel_ensino)
+            nivel = self._mascaras_nivel.get(chave) if chave else None
+            mascara &= nivel if nivel is not None else False
+        if componente:
+            nome = COMPONENTES.get(componente.strip().upper(), componente.strip())
+            mascara &= self._componentes == nome.lower()
+        return mascara
+
+    def similaridades(self, textos: Sequence[str]) -> np.ndarray:
+        """Matriz (len(textos) x habilidades) de similaridade de cosseno"""
+        consultas = self.vetorizador.transform(list(textos))
+        return (consultas @ self.matriz.T).toarray()
+
+    def buscar(
+        self,
+        texto: str,
+        nivel_ensino: Optional[str] = None,
+        componente: Optional[str] = None,
+        limite: int = 5,
+        minimo: float = 0.0,
+        minimo_relativo: float = 0.0,
+    ) -> List[Tuple[Habilidade, float]]:
+        """
+        Habilidades mais próximas de ``texto``, da mais para a menos similar.
+
+        Args:
+            texto: Tema ou texto livre do planejamento
+            nivel_ensino: Restringe ao nível (``5ef``, ``pre``...)
+            componente: Restringe ao componente (sigla ``LP`` ou nome)
+            limite: Máximo de resultados
+            minimo: Similaridade mínima (0-1) para entrar no resultado
+            minimo_relativo: Fração da similaridade do primeiro colocado
+                abaixo da qual os demais são descartados
+        """
+        if not texto or not texto.strip() or limite <= 0:
+            return []
+        pontuacoes = self.similaridades([texto])[0]
+        pontuacoes[~self.mascara(nivel_ensino, componente)] = -1.0
+
+        limite = min(limite, len(pontuacoes))
+        # argpartition evita ordenar o catálogo inteiro
+        melhores = np.argpartition(-pontuacoes, limite - 1)[:limite]
+        melhores = melhores[np.argsort(-pontuacoes[melhores], kind="stable")]
+        corte = max(minimo, float(pontuacoes[melhores[0]]) * minimo_relativo)
+        return [
+            (self.habilidades[i], float(pontuacoes[i]))
+            for i in melhores
+            if pontuacoes[i] > minimo and pontuacoes[i] >= corte
+        ]
+
+    def aderencia(
+        self,
+        texto: str,
+        codigos: Sequence[str],
+        nivel_ensino: Optional[str] = None,
+    ) -> Tuple[float, Dict[str, str]]:
+        """
+        Aderência das habilidades escolhidas ao tema e ao nível de ensino.
+
+        Cada código vale a sua similaridade com ``texto`` dividida pela da
+        habilidade mais similar do nível (1.0 = a melhor escolha possível no
+        catálogo); códigos desconhecidos ou de outro nível valem 0.
+
+        Returns:
+            (score médio entre 0 e 1, {código: motivo} dos códigos que valem 0)
+        """
+        if not codigos:
+            return 0.0, {}
+        mascara = self.mascara(nivel_ensino)
+        pontuacoes = (
+            self.similaridades([texto])[0] if texto and texto.strip() else np.zeros(len(self))
+        )
+        melhor = float(pontuacoes[mascara].max()) if mascara.any() else 0.0
+
+        problemas = {}
+        valores = []
+        for codigo in codigos:
+            posicao = self.posicao(codigo)
+            if posicao is None:
+                problemas[codigo] = "código não encontrado na BNCC"
+                valores.append(0.0)
+            elif nivel_ensino and not mascara[posicao]:
+                problemas[codigo] = f"habilidade não corresponde ao nível {nivel_ensino}"
+                valores.append(0.0)
+            else:
+                valores.append(min(1.0, float(pontuacoes[posicao]) / melhor) if melhor > 0 else 0.0)
+        return round(float(np.mean(valores)), 2), problemas
@@ -0,0 +1,234 @@
+"""
+Compressão das respostas e dos corpos de requisição do agente.
+
+``MiddlewareCompressao`` é um middleware ASGI puro, como o de métricas:
+
+- respostas: negocia ``Accept-Encoding`` (brotli, se o pacote ``brotli``
+  estiver instalado, senão gzip) e comprime respostas completas a partir de
+  ``minimo`` bytes. Respostas em streaming (SSE, ``more_body``) passam sem
+  compressão, para que cada evento chegue ao cliente assim que é gerado;
+- requisições: corpos com ``Content-Encoding: gzip`` ou ``br`` (lotes
+  grandes enviados pelo Django) são descomprimidos antes de chegar ao
+  FastAPI, até ``corpo_max`` bytes (acima disso, 413). O limite vale para o
+  corpo comprimido lido e para a saída, que nunca passa dele em memória:
+  um corpo pequeno que se expande demais (zip/brotli bomb) é recusado assim
+  que a saída excede o limite.
+
+Os níveis são os mais rápidos (gzip 1, brotli 1): o salto Django↔agente é
+interno e, nos lotes grandes, o nível 6 do gzip custa ~4x mais CPU para
+corpos só ~25% menores. A resposta de um lote de 500 análises (~960 KB) cai
+para ~110 KB em ~7 ms; veja ``benchmarks/auramind_json_bench.py``.
+"""
+import gzip
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só gzip é negociado
+    brotli = None
+
+NIVEL_GZIP = 1
+QUALIDADE_BROTLI = 1
+# Entrada brotli entregue ao descompressor por vez
+BLOCO_BROTLI = 64 * 1024
+
+
+def codificacoes_aceitas(cabecalho: str) -> Dict[str, float]:
+    """``Accept-Encoding`` como ``{codificação: q}``"""
+    aceitas = {}
+    for parte in cabecalho.split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        if not nome:
+            continue
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        aceitas[nome.strip().lower()] = q
+    return aceitas
+
+
+def escolher_codificacao(cabecalho: str) -> Optional[str]:
+    """Melhor codificação suportada pelas duas pontas, ou None"""
+    aceitas = codificacoes_aceitas(cabecalho)
+    candidatas = (["br"] if brotli is not None else []) + ["gzip"]
+    melhor = max(candidatas, key=lambda nome: aceitas.get(nome, aceitas.get("*", 0.0)))
+    return melhor if aceitas.get(melhor, aceitas.get("*", 0.0)) > 0 else None
+
+
+def comprimir(corpo: bytes, codificacao: str) -> bytes:
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=QUALIDADE_BROTLI)
+    return gzip.compress(corpo, compresslevel=NIVEL_GZIP)
+
+
+def _descomprimir_brotli(corpo: bytes, maximo: int) -> bytes:
+    """Brotli em blocos, sem deixar a saída passar de ``maximo`` (+ um bloco de saída)"""
+    descompressor = brotli.Decompressor()
+    saida = bytearray()
+    for inicio in range(0, len(corpo), BLOCO_BROTLI):
+        saida += descompressor.process(
+            corpo[inicio : inicio + BLOCO_BROTLI], output_buffer_limit=maximo + 1 - len(saida)
+        )
+        # Saída represada pelo limite: esvazia antes de aceitar mais entrada
+        while len(saida) <= maximo and not descompressor.can_accept_more_data():
+            saida += descompressor.process(b"", output_buffer_limit=maximo + 1 - len(saida))
+        if len(saida) > maximo:
+            raise OverflowError
+    if not descompressor.is_finished():
+        raise ValueError("corpo brotli incompleto")
+    return bytes(saida)
+
+
+def descomprimir(corpo: bytes, codificacao: str, maximo: int) -> bytes:
+    """Descomprime limitando o tamanho final (proteção contra zip bombs)"""
+    if codificacao == "br":
+        if brotli is None:
+            raise ValueError("brotli não suportado")
+        return _descomprimir_brotli(corpo, maximo)
+    descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    saida = descompressor.decompress(corpo, maximo + 1)
+    if len(saida) > maximo:
+        raise OverflowError
+    return saida
+
+
+def _cabecalhos(escopo_ou_mensagem: dict) -> List[Tuple[bytes, bytes]]:
+    return list(escopo_ou_mensagem.get("headers", []))
+
+
+def _valor(cabecalhos: List[Tuple[bytes, bytes]], nome: bytes) -> str:
+    for chave, valor in cabecalhos:
+        if chave.lower() == nome:
+            return valor.decode("latin-1")
+    return ""
+
+
+class MiddlewareCompressao:
+    """Middleware ASGI: gzip/brotli nas respostas e corpos de requisição comprimidos"""
+
+    def __init__(self, app, minimo: int = 1024, corpo_max: int = 32 * 1024 * 1024):
+        self.app = app
+        self.minimo = minimo
+        self.corpo_max = corpo_max
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cabecalhos = _cabecalhos(scope)
+        codificacao_corpo = _valor(cabecalhos, b"content-encoding").strip().lower()
+        if codificacao_corpo in ("gzip", "br"):
+            receive = await self._descomprimir_requisicao(
+                scope, receive, send, cabecalhos, codificacao_corpo
+            )
+            if receive is None:
+                return
+
+        codificacao = (
+            escolher_codificacao(_valor(cabecalhos, b"accept-encoding")) if self.minimo else None
+        )
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio: Optional[dict] = None
+        repassar = False
+
+        async def enviar(mensagem):
+            nonlocal inicio, repassar
+            if mensagem["type"] == "http.response.start":
+                inicio = mensagem
+                return
+            if mensagem["type"] != "http.response.body" or repassar:
+                await send(mensagem)
+                return
+
+            corpo = mensagem.get("body", b"")
+            cabecalhos_resposta = _cabecalhos(inicio)
+            ja_codificada = _valor(cabecalhos_resposta, b"content-encoding")
+            if mensagem.get("more_body") or ja_codificada or len(corpo) < self.minimo:
+                # Streaming, já comprimida ou pequena demais: repassa como veio
+                repassar = True
+                await send(inicio)
+                await send(mensagem)
+                return
+
+            comprimido = comprimir(corpo, codificacao)
+            cabecalhos_resposta = [
+                (chave, valor) for chave, valor in cabecalhos_resposta
+                if chave.lower() not in (b"content-length", b"vary")
+            ] + [
+                (b"content-encoding", codificacao.encode()),
+                (b"content-length", str(len(comprimido)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send(dict(inicio, headers=cabecalhos_resposta))
+            await send({"type": "http.response.body", "body": comprimido})
+
+        await self.app(scope, receive, enviar)
+
+    async def _descomprimir_requisicao(self, scope, receive, send, cabecalhos, codificacao):
+        """
+        Lê o corpo inteiro e o entrega descomprimido; responde 413/415 se não der.
+
+        Mais de ``corpo_max`` bytes comprimidos já são 413, sem ler o resto.
+        Os cabeçalhos são trocados no próprio ``scope``: o middleware de
+        métricas lê a rota que o roteador grava nesse mesmo dict.
+        """
+        partes = []
+        lidos = 0
+        while True:
+            mensagem = await receive()
+            partes.append(mensagem.get("body", b""))
+            lidos += len(partes[-1])
+            if lidos > self.corpo_max:
+                await self._erro(send, 413, "Corpo da requisição grande demais")
+                return None
+            if not mensagem.get("more_body"):
+                break
+        try:
+            corpo = descomprimir(b"".join(partes), codificacao, self.corpo_max)
+        except OverflowError:
+            await self._erro(send, 413, "Corpo da requisição grande demais")
+            return None
+        except Exception as e:
+            await self._erro(send, 415, f"Corpo {codificacao} inválido: {e}")
+            return None
+
+        scope["headers"] = [
+            (chave, valor) for chave, valor in cabecalhos
+            if chave.lower() not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(corpo)).encode())]
+        entregue = False
+
+        async def receber():
+            nonlocal entregue
+            if not entregue:
+                entregue = True
+                return {"type": "http.request", "body": corpo, "more_body": False}
+            return await receive()
+
+        return receber
+
+    @staticmethod
+    async def _erro(send, status: int, detalhe: str) -> None:
+        corpo = orjson.dumps({"detail": detalhe})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(corpo)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": corpo})
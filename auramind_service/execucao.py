@@ -0,0 +1,162 @@
+"""
+Execução das etapas de CPU do agente fora do event loop.
+
+A escolha de habilidades e a pontuação de aderência (TF-IDF + NumPy) seguram
+o GIL: no threadpool do Starlette, requisições simultâneas disputam um único
+núcleo e atrasam o event loop. ``ExecutorCPU`` as envia para um pool de
+processos:
+
+- workers aquecidos: o pool usa o start method ``spawn``; cada worker importa
+  o módulo da função executada (carregando o índice BNCC uma vez) e roda o
+  ``inicializador``, que faz uma busca e uma pontuação de aquecimento. Na
+  inicialização do serviço todos os workers são criados antes de receber a
+  primeira requisição;
+- fila com backpressure: no máximo ``fila_max`` tarefas pendentes (em
+  execução ou esperando um worker); acima disso ``executar`` levanta
+  ``FilaCheia``, que o endpoint responde com 429 e ``Retry-After``;
+- tempo de fila: ``executar`` devolve, junto do resultado, quanto a tarefa
+  esperou por um worker, para compor o tempo por etapa da resposta.
+
+Com ``processos=0`` as tarefas rodam no threadpool do Starlette, com o mesmo
+limite de fila (desenvolvimento e testes).
+
+``CacheLRU`` guarda, no processo principal, resultados de etapas
+determinísticas: um acerto não passa pelo executor (nem pela fila).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class FilaCheia(Exception):
+    """O executor já tem ``fila_max`` tarefas pendentes"""
+
+    def __init__(self, pendentes: int, retry_after: int = 1):
+        self.pendentes = pendentes
+        self.retry_after = retry_after
+        super().__init__(
+            f"Agente sobrecarregado: {pendentes} tarefas na fila. "
+            f"Tente novamente em {retry_after} s."
+        )
+
+
+@contextmanager
+def medir(etapas: Dict[str, float], nome: str) -> Iterator[None]:
+    """Registra em ``etapas[nome]`` a duração do bloco, em ms"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        etapas[nome] = round((time.perf_counter() - inicio) * 1000, 2)
+
+
+def _executar(funcao: Callable, enviado_em: float, args: Tuple) -> Tuple[Any, float]:
+    """Roda no worker: resultado da função e tempo de espera na fila (ms)"""
+    fila_ms = max(0.0, (time.time() - enviado_em) * 1000)
+    return funcao(*args), round(fila_ms, 2)
+
+
+class ExecutorCPU:
+    """Pool de processos com fila limitada para as etapas de CPU"""
+
+    def __init__(self, processos: int, fila_max: int, inicializador: Optional[Callable] = None):
+        self.processos = max(0, processos)
+        self.fila_max = max(1, fila_max)
+        self.inicializador = inicializador
+        self.pendentes = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def iniciar(self) -> None:
+        """Cria e aquece todos os workers (chamado na inicialização do serviço)"""
+        if not self.processos or self._pool is not None:
+            return
+        inicio = time.perf_counter()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.processos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=self.inicializador,
+        )
+        # Com "spawn" os workers são criados sob demanda: uma tarefa por
+        # worker, enviadas juntas, força a criação (e o aquecimento) de todos
+        pids = await asyncio.gather(*(
+            asyncio.wrap_future(self._pool.submit(os.getpid)) for _ in range(self.processos)
+        ))
+        logger.info(
+            f"Executor de CPU pronto: {len(set(pids))} processos aquecidos "
+            f"em {(time.perf_counter() - inicio) * 1000:.0f} ms (fila máxima {self.fila_max})"
+        )
+
+    def encerrar(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def executar(self, funcao: Callable, *args: Any) -> Tuple[Any, float]:
+        """
+        Executa ``funcao(*args)`` em um worker.
+
+        ``funcao`` precisa ser uma função de módulo (serializável por
+        referência) e os argumentos e o resultado, serializáveis com pickle.
+
+        Returns:
+            (resultado, tempo de espera na fila em ms)
+
+        Raises:
+            FilaCheia: Se já há ``fila_max`` tarefas pendentes
+        """
+        if self.pendentes >= self.fila_max:
+            raise FilaCheia(self.pendentes)
+        self.pendentes += 1
+        try:
+            if not self.processos:
+                return await run_in_threadpool(_executar, funcao, time.time(), args)
+            if self._pool is None:
+                await self.iniciar()
+            return await asyncio.wrap_future(
+                self._pool.submit(_executar, funcao, time.time(), args)
+            )
+        finally:
+            self.pendentes -= 1
+
+    def estado(self) -> Dict[str, Any]:
+        """Configuração e ocupação atual, para o endpoint de status"""
+        return {
+            "processos": self.processos,
+            "fila_max": self.fila_max,
+            "pendentes": self.pendentes,
+        }
+
+
+class CacheLRU:
+    """Cache LRU em memória, com no máximo ``maximo`` entradas (0 desativa)"""
+
+    def __init__(self, maximo: int):
+        self.maximo = max(0, maximo)
+        self._itens: "OrderedDict[Any, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def obter(self, chave: Any) -> Optional[Any]:
+        valor = self._itens.get(chave)
+        if valor is not None:
+            self._itens.move_to_end(chave)
+        return valor
+
+    def guardar(self, chave: Any, valor: Any) -> None:
+        if not self.maximo:
+            return
+        self._itens[chave] = valor
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.maximo:
+            self._itens.popitem(last=False)
@@ -3,24 +3,132 @@ AuraMind LLM Agent - Micro-serviço FastAPI
 Agente de IA para análise e sugestão de planejamentos pedagógicos.
 Roda na porta 8001 e é chamado pelo sistema AuraClass.
 """
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, Request, status
+from fastapi.concurrency import iterate_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+import orjson
+from typing import List, Optional, Dict, Any, Iterator, Tuple
+import asyncio
 import logging
+import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 
+from aderencia import avaliar_planos, montar_pontos
+from artefatos import DIRETORIO_PADRAO as ARTEFATOS_PADRAO, carregar_indice
+from compressao import MiddlewareCompressao
+from execucao import CacheLRU, ExecutorCPU, FilaCheia, medir
+from metricas import (
+    CACHE, RECUSAS, Medidor, MiddlewareMetricas, contar_tokens, observar_etapas, registro
+)
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Limites do endpoint de lote
+LOTE_MAX_ITENS = int(os.getenv("AURAMIND_LOTE_MAX_ITENS", "32"))
+LOTE_CONCORRENCIA = int(os.getenv("AURAMIND_LOTE_CONCORRENCIA", "4"))
+# Planos por chamada do endpoint de análise em lote
+ANALISE_LOTE_MAX_ITENS = int(os.getenv("AURAMIND_ANALISE_LOTE_MAX_ITENS", "500"))
+
+# Catálogo BNCC empacotado com o serviço
+BNCC_ARQUIVO = os.getenv(
+    "AURAMIND_BNCC_ARQUIVO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bncc_habilidades.json")
+)
+# Artefatos pré-compilados do índice (python artefatos.py)
+ARTEFATOS_DIR = os.getenv("AURAMIND_ARTEFATOS_DIR", ARTEFATOS_PADRAO)
+# Habilidades escolhidas quando a requisição não informa nenhuma
+HABILIDADES_SUGERIDAS = int(os.getenv("AURAMIND_HABILIDADES_SUGERIDAS", "6"))
+# Descarta habilidades com similaridade abaixo desta fração da mais similar
+RELEVANCIA_MINIMA = float(os.getenv("AURAMIND_RELEVANCIA_MINIMA", "0.35"))
+
+# Processos do executor das etapas de CPU (0 = threadpool, sem processos)
+PROCESSOS = int(os.getenv("AURAMIND_PROCESSOS", str(os.cpu_count() or 1)))
+# Tarefas pendentes no executor acima das quais o agente responde 429
+FILA_MAX = int(os.getenv("AURAMIND_FILA_MAX", str(max(PROCESSOS, 1) * 8)))
+# Escolhas de habilidades (tema + nível) guardadas em memória (0 desativa)
+CACHE_PREPARO_MAX = int(os.getenv("AURAMIND_CACHE_PREPARO_MAX", "1024"))
+# Respostas a partir deste tamanho (bytes) são comprimidas com brotli/gzip (0 desativa)
+COMPRESSAO_MIN_BYTES = int(os.getenv("AURAMIND_COMPRESSAO_MIN_BYTES", "1024"))
+# Tamanho máximo de um corpo de requisição depois de descomprimido
+CORPO_MAX_BYTES = int(os.getenv("AURAMIND_CORPO_MAX_BYTES", str(32 * 1024 * 1024)))
+
+_inicio_carga = time.perf_counter()
+indice_bncc, ARTEFATO_VERSAO = carregar_indice(BNCC_ARQUIVO, ARTEFATOS_DIR)
+CARGA_INDICE_MS = round((time.perf_counter() - _inicio_carga) * 1000, 1)
+logger.info(
+    f"Índice BNCC carregado: {len(indice_bncc)} habilidades ({indice_bncc.versao}) "
+    f"em {CARGA_INDICE_MS:.0f} ms, "
+    + (f"artefato {ARTEFATO_VERSAO}" if ARTEFATO_VERSAO else "ajustado a partir do catálogo")
+)
+
+
+def aquecer_worker():
+    """
+    Inicializador dos workers do executor.
+
+    O índice já foi carregado na importação deste módulo; uma busca e uma
+    pontuação descartáveis deixam o vetorizador e o NumPy prontos antes da
+    primeira requisição.
+    """
+    indice_bncc.buscar("aquecimento do agente", limite=1)
+    avaliar_planos(indice_bncc, [{"nivel_ensino": "1ef", "objetivos_aprendizagem": "aquecimento"}])
+
+
+executor = ExecutorCPU(PROCESSOS, FILA_MAX, inicializador=aquecer_worker)
+cache_preparo = CacheLRU(CACHE_PREPARO_MAX)
+
+registro.registrar(Medidor(
+    "auramind_executor_pendentes", "Tarefas no executor de CPU (em execução + na fila)",
+    funcao=lambda: executor.pendentes
+))
+registro.registrar(Medidor(
+    "auramind_executor_fila_max", "Tarefas pendentes acima das quais o agente responde 429",
+    funcao=lambda: executor.fila_max
+))
+registro.registrar(Medidor(
+    "auramind_executor_processos", "Processos do executor de CPU", funcao=lambda: executor.processos
+))
+registro.registrar(Medidor(
+    "auramind_cache_entradas", "Entradas em cada cache interno", ("cache",),
+    funcao=lambda: {("preparo",): len(cache_preparo)}
+))
+registro.registrar(Medidor(
+    "auramind_indice_carga_segundos", "Tempo de carga do índice BNCC na inicialização",
+    ("versao_bncc", "artefato"),
+    funcao=lambda: {(indice_bncc.versao, ARTEFATO_VERSAO or ""): CARGA_INDICE_MS / 1000}
+))
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    await executor.iniciar()
+    yield
+    executor.encerrar()
+
+
 # Inicializar aplicação FastAPI
 app = FastAPI(
     title="AuraMind LLM Agent",
     description="Agente de IA para análise e sugestão de planejamentos pedagógicos",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=ciclo_de_vida,
+    # Serialização com orjson em vez do encoder JSON padrão
+    default_response_class=ORJSONResponse
 )
 
+# Compressão brotli/gzip das respostas e corpos comprimidos vindos do Django
+# (dentro do middleware de métricas, para que a latência inclua a compressão)
+app.add_middleware(MiddlewareCompressao, minimo=COMPRESSAO_MIN_BYTES, corpo_max=CORPO_MAX_BYTES)
+
+# Métricas por rota em /metrics
+app.add_middleware(MiddlewareMetricas)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +139,18 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(FilaCheia)
+async def fila_cheia(request: Request, erro: FilaCheia):
+    """Backpressure: o executor de CPU está com a fila cheia"""
+    RECUSAS.inc()
+    logger.warning(f"Requisição recusada ({request.url.path}): {erro}")
+    return ORJSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(erro)},
+        headers={"Retry-After": str(erro.retry_after)}
+    )
+
+
 # ============================================================================
 # MODELOS PYDANTIC
 # ============================================================================
@@ -39,6 +159,18 @@ class HabilidadeBNCC(BaseModel):
     """Modelo para habilidade BNCC"""
     codigo: str = Field(..., description="Código BNCC (ex: EF05LP01)")
     descricao: str = Field(..., description="Descrição da habilidade")
+    etapa: Optional[str] = Field(None, description="EI, EF ou EM")
+    anos: List[int] = Field(default=[], description="Anos (ou faixas etárias na EI) cobertos")
+    componente: Optional[str] = Field(None, description="Componente curricular")
+    campo: Optional[str] = Field(None, description="Unidade temática ou campo de experiência")
+    similaridade: Optional[float] = Field(None, description="Similaridade com a busca (0-1)")
+
+
+class BuscaHabilidadesResposta(BaseModel):
+    """Modelo para resposta da busca no índice BNCC"""
+    versao: str
+    total: int
+    habilidades: List[HabilidadeBNCC]
 
 
 class SolicitacaoSugestao(BaseModel):
@@ -60,6 +192,36 @@ class SugestaoResposta(BaseModel):
     avaliacoes_propostas: List[str]
     score_aderencia_bncc: float
     observacoes: str
+    metadata: Dict[str, Any] = Field(default={}, description="Modelo e tempo por etapa (etapas_ms)")
+
+
+class SolicitacaoSugestaoLote(BaseModel):
+    """Modelo para requisição de sugestões em lote (ex: todas as unidades de um plano)"""
+    itens: List[Dict[str, Any]] = Field(
+        ..., min_length=1, max_length=LOTE_MAX_ITENS,
+        description="Lista de SolicitacaoSugestao; cada item é validado separadamente"
+    )
+    concorrencia: Optional[int] = Field(
+        None, ge=1, le=LOTE_CONCORRENCIA,
+        description="Itens processados em paralelo (máximo AURAMIND_LOTE_CONCORRENCIA)"
+    )
+
+
+class ResultadoItemLote(BaseModel):
+    """Resultado de um item do lote, na mesma posição da requisição"""
+    indice: int
+    sucesso: bool
+    sugestao: Optional[SugestaoResposta] = None
+    erro: Optional[str] = None
+
+
+class SugestaoLoteResposta(BaseModel):
+    """Modelo para resposta de sugestões em lote"""
+    resultados: List[ResultadoItemLote]
+    total: int
+    sucessos: int
+    falhas: int
+    tempo_processamento_ms: int
 
 
 class RequisicaoAnalise(BaseModel):
@@ -81,17 +243,346 @@ class PontoAnalise(BaseModel):
     impacto: str  # "alto", "médio", "baixo"
 
 
+class CoberturaHabilidade(BaseModel):
+    """Cobertura de uma habilidade declarada no plano"""
+    codigo: str
+    cobertura: float = Field(..., description="0 a 1; média ponderada das seções")
+    situacao: str = Field(..., description="coberta, parcial ou nao_coberta")
+    secoes: Dict[str, float] = Field(default={}, description="Cobertura em cada seção do plano")
+    motivo: str = Field(default="", description="Por que a habilidade não pôde ser avaliada")
+
+
 class AnaliseResposta(BaseModel):
     """Modelo para resposta de análise"""
     plano_id: int
     score_geral: float
     aderencia_bncc: float
     qualidade_pedagogica: float
+    cobertura_habilidades: List[CoberturaHabilidade] = []
     pontos_fortes: List[PontoAnalise]
     pontos_revisar: List[PontoAnalise]
     sugestoes_melhoria: List[str]
     recomendacao_final: str
     timestamp: str
+    metadata: Dict[str, Any] = Field(default={}, description="Tempo por etapa (etapas_ms)")
+
+
+class SolicitacaoAnaliseLote(BaseModel):
+    """Modelo para requisição de análise em lote (ex: todos os templates de uma escola)"""
+    planos: List[Dict[str, Any]] = Field(
+        ..., min_length=1, max_length=ANALISE_LOTE_MAX_ITENS,
+        description="Lista de RequisicaoAnalise; cada plano é validado separadamente"
+    )
+
+
+class ResultadoAnaliseLote(BaseModel):
+    """Resultado de um plano do lote, na mesma posição da requisição"""
+    indice: int
+    sucesso: bool
+    analise: Optional[AnaliseResposta] = None
+    erro: Optional[str] = None
+
+
+class AnaliseLoteResposta(BaseModel):
+    """Modelo para resposta de análise em lote"""
+    resultados: List[ResultadoAnaliseLote]
+    total: int
+    sucessos: int
+    falhas: int
+    tempo_processamento_ms: int
+    metadata: Dict[str, Any] = Field(
+        default={}, description="Tempo por etapa (etapas_ms) do lote inteiro"
+    )
+
+
+# ============================================================================
+# GERAÇÃO
+# ============================================================================
+
+def texto_busca(requisicao: SolicitacaoSugestao) -> str:
+    """Texto usado na busca por similaridade (tema + contexto da turma)"""
+    return " ".join(filter(None, [requisicao.tema, requisicao.contexto_turma]))
+
+
+def escolher_habilidades(requisicao: SolicitacaoSugestao) -> List[str]:
+    """
+    Habilidades BNCC da sugestão: as informadas na requisição ou, se nenhuma
+    foi informada, as mais similares ao tema no nível de ensino pedido.
+    """
+    if requisicao.habilidades_bncc:
+        return [codigo.strip().upper() for codigo in requisicao.habilidades_bncc]
+    resultados = indice_bncc.buscar(
+        texto_busca(requisicao),
+        nivel_ensino=requisicao.nivel_ensino,
+        limite=HABILIDADES_SUGERIDAS,
+        minimo_relativo=RELEVANCIA_MINIMA
+    )
+    return [habilidade.codigo for habilidade, _ in resultados]
+
+
+def distribuir(codigos: List[str], partes: int) -> List[List[str]]:
+    """
+    Divide os códigos, em ordem, entre ``partes`` grupos de tamanho parecido.
+
+    Com menos códigos que grupos, os códigos se repetem para que nenhum grupo
+    fique vazio.
+    """
+    if not codigos:
+        return [[] for _ in range(partes)]
+    if len(codigos) < partes:
+        return [[codigos[i % len(codigos)]] for i in range(partes)]
+    tamanho, resto = divmod(len(codigos), partes)
+    grupos, inicio = [], 0
+    for i in range(partes):
+        fim = inicio + tamanho + (1 if i < resto else 0)
+        grupos.append(codigos[inicio:fim])
+        inicio = fim
+    return grupos
+
+
+def preparar_sugestao(requisicao: SolicitacaoSugestao) -> Dict[str, Any]:
+    """
+    Etapas de CPU da sugestão, executadas no executor: escolha das
+    habilidades e aderência delas ao tema.
+
+    Returns:
+        Dict com ``habilidades``, ``score``, ``problemas`` e ``etapas_ms``
+    """
+    etapas: Dict[str, float] = {}
+    with medir(etapas, "habilidades"):
+        habilidades = escolher_habilidades(requisicao)
+    with medir(etapas, "aderencia"):
+        score, problemas = indice_bncc.aderencia(
+            texto_busca(requisicao), habilidades, requisicao.nivel_ensino
+        )
+    return {"habilidades": habilidades, "score": score, "problemas": problemas, "etapas_ms": etapas}
+
+
+def gerar_secoes(
+    requisicao: SolicitacaoSugestao, preparo: Dict[str, Any]
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Gera a sugestão seção por seção, na ordem em que o modelo as produz.
+
+    Cada item é ``(nome_da_secao, dados)``; é a base do endpoint de streaming
+    (um evento SSE por seção) e de ``sugerir`` (resposta completa).
+    ``preparo`` é o resultado de ``preparar_sugestao``.
+    """
+    habilidades = preparo["habilidades"]
+
+    # Simular processamento de IA
+    # Em produção, isso chamaria um modelo LLM real (GPT, Claude, etc)
+    yield "inicio", {
+        "titulo": f"Planejamento: {requisicao.tema} ({requisicao.nivel_ensino})",
+        "introducao": (
+            f"Este planejamento foi gerado pela IA AuraMind para o tema '{requisicao.tema}' "
+            f"no nível '{requisicao.nivel_ensino}'. "
+            f"Ele integra {len(habilidades)} habilidades BNCC e está estruturado em "
+            f"{requisicao.duracao_semanas} semanas."
+        ),
+    }
+
+    por_unidade = distribuir(habilidades, 3)
+    unidades_tematicas = [
+        {
+            "titulo": f"Unidade 1: Introdução ao {requisicao.tema}",
+            "semanas": 1,
+            "habilidades": por_unidade[0],
+            "descricao": f"Apresentação e contextualização do tema {requisicao.tema}"
+        },
+        {
+            "titulo": f"Unidade 2: Desenvolvimento de {requisicao.tema}",
+            "semanas": 2,
+            "habilidades": por_unidade[1],
+            "descricao": f"Aprofundamento dos conceitos de {requisicao.tema}"
+        },
+        {
+            "titulo": f"Unidade 3: Aplicação prática de {requisicao.tema}",
+            "semanas": 1,
+            "habilidades": por_unidade[2],
+            "descricao": f"Projetos e atividades práticas com {requisicao.tema}"
+        }
+    ]
+    yield "unidades_tematicas", unidades_tematicas
+
+    atividades_sugeridas = [
+        {
+            "titulo": "Atividade Dirigida: Exploração Inicial",
+            "tipo": "exercicio",
+            "duracao_min": 30,
+            "habilidades": habilidades[:1]
+        },
+        {
+            "titulo": "Projeto Colaborativo",
+            "tipo": "projeto",
+            "duracao_min": 120,
+            "habilidades": habilidades[1:3] or habilidades[:1]
+        },
+        {
+            "titulo": "Avaliação Formativa",
+            "tipo": "quiz",
+            "duracao_min": 45,
+            "habilidades": habilidades
+        }
+    ]
+    yield "atividades_sugeridas", atividades_sugeridas
+
+    recursos = [
+        "Quadro branco e marcadores",
+        "Computadores/tablets para pesquisa",
+        "Materiais de arte e criatividade",
+        "Livros e referências sobre o tema",
+        "Acesso à internet"
+    ]
+    yield "recursos_necessarios", recursos
+
+    avaliacoes = [
+        "Observação contínua das atividades",
+        "Análise de participação em discussões",
+        "Avaliação do projeto colaborativo",
+        "Quiz de verificação de aprendizagem",
+        "Autoavaliação do aluno"
+    ]
+    yield "avaliacoes_propostas", avaliacoes
+
+    problemas = preparo["problemas"]
+    observacoes = (
+        "Planejamento gerado automaticamente. "
+        "Recomenda-se revisão e personalização conforme contexto da turma."
+    )
+    if not habilidades:
+        observacoes += (
+            " Nenhuma habilidade da BNCC relacionada ao tema foi encontrada "
+            f"para o nível {requisicao.nivel_ensino}."
+        )
+    if problemas:
+        observacoes += " Revise as habilidades: " + "; ".join(
+            f"{codigo} ({motivo})" for codigo, motivo in problemas.items()
+        ) + "."
+    yield "fim", {
+        "score_aderencia_bncc": preparo["score"],
+        "observacoes": observacoes
+    }
+
+
+def metadados(inicio: float, etapas: Dict[str, float], tokens: Dict[str, int]) -> Dict[str, Any]:
+    """Metadados da resposta: modelo, tempo total, tempo por etapa (ms) e tokens estimados"""
+    return {
+        "modelo_ia": "AuraMind-v3",
+        "tempo_processamento_ms": int((time.perf_counter() - inicio) * 1000),
+        "etapas_ms": etapas,
+        **tokens,
+    }
+
+
+async def preparar(requisicao: SolicitacaoSugestao) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    ``preparar_sugestao`` pelo cache LRU ou, se ausente, pelo executor.
+
+    Returns:
+        (preparo, tempo por etapa em ms); num acerto do cache a única etapa é ``cache``
+    """
+    inicio = time.perf_counter()
+    chave = (
+        requisicao.nivel_ensino,
+        requisicao.tema,
+        requisicao.contexto_turma,
+        tuple(requisicao.habilidades_bncc),
+    )
+    preparo = cache_preparo.obter(chave)
+    if preparo is not None:
+        CACHE.inc(cache="preparo", resultado="hit")
+        return preparo, {"cache": round((time.perf_counter() - inicio) * 1000, 2)}
+
+    CACHE.inc(cache="preparo", resultado="miss")
+    preparo, fila_ms = await executor.executar(preparar_sugestao, requisicao)
+    cache_preparo.guardar(chave, preparo)
+    return preparo, {"fila": fila_ms, **preparo["etapas_ms"]}
+
+
+async def sugerir(requisicao: SolicitacaoSugestao) -> SugestaoResposta:
+    """
+    Gera a sugestão de planejamento completa para uma requisição.
+
+    Compartilhada pelo endpoint individual e pelo endpoint de lote. As
+    etapas de CPU rodam no executor; ``etapas_ms`` traz a espera na fila, a
+    escolha de habilidades, a aderência e a geração das seções.
+
+    Raises:
+        FilaCheia: Se o executor está com a fila cheia
+    """
+    inicio = time.perf_counter()
+    preparo, etapas = await preparar(requisicao)
+    with medir(etapas, "geracao"):
+        secoes = dict(gerar_secoes(requisicao, preparo))
+    resposta = SugestaoResposta(
+        **secoes.pop("inicio"),
+        **secoes.pop("fim"),
+        **secoes
+    )
+    tokens = contar_tokens("sugestao", requisicao.model_dump_json(), resposta.model_dump_json())
+    resposta.metadata = metadados(inicio, etapas, tokens)
+    observar_etapas("sugestao", etapas)
+    return resposta
+
+
+def pontuar_planos(planos: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    Etapa de CPU da análise, executada no executor: pontuação
+    (``aderencia.avaliar_planos``) e pontos fortes/a revisar de cada plano.
+    """
+    etapas: Dict[str, float] = {}
+    with medir(etapas, "aderencia"):
+        resultados = avaliar_planos(indice_bncc, planos)
+    with medir(etapas, "pontos"):
+        pontuados = [
+            {
+                **{chave: valor for chave, valor in resultado.items() if chave != "relacionadas"},
+                **montar_pontos(indice_bncc, resultado)
+            }
+            for resultado in resultados
+        ]
+    return pontuados, etapas
+
+
+async def analisar(
+    requisicoes: List[RequisicaoAnalise],
+) -> Tuple[List[AnaliseResposta], Dict[str, float]]:
+    """
+    Pontua os planos contra as habilidades BNCC declaradas.
+
+    Todos os planos são pontuados em uma única operação matricial, em um
+    worker do executor; usado pelo endpoint individual e pelo de lote.
+
+    Returns:
+        (uma AnaliseResposta por requisição, tempo por etapa em ms)
+
+    Raises:
+        FilaCheia: Se o executor está com a fila cheia
+    """
+    (resultados, etapas), fila_ms = await executor.executar(
+        pontuar_planos, [requisicao.model_dump() for requisicao in requisicoes]
+    )
+    etapas = {"fila": fila_ms, **etapas}
+    timestamp = datetime.now().isoformat()
+    with medir(etapas, "montagem"):
+        respostas = [
+            AnaliseResposta(
+                plano_id=requisicao.plano_id,
+                score_geral=resultado["score_geral"],
+                aderencia_bncc=resultado["aderencia"],
+                qualidade_pedagogica=resultado["qualidade"],
+                cobertura_habilidades=resultado["cobertura"],
+                pontos_fortes=resultado["pontos_fortes"],
+                pontos_revisar=resultado["pontos_revisar"],
+                sugestoes_melhoria=resultado["sugestoes_melhoria"],
+                recomendacao_final=resultado["recomendacao_final"],
+                timestamp=timestamp
+            )
+            for requisicao, resultado in zip(requisicoes, resultados)
+        ]
+    observar_etapas("analise", etapas)
+    return respostas, etapas
 
 
 # ============================================================================
@@ -105,6 +596,11 @@ async def health_check():
         "status": "healthy",
         "service": "AuraMind LLM Agent",
         "version": "1.0.0",
+        "indice_bncc": {
+            "versao_bncc": indice_bncc.versao,
+            "artefato": ARTEFATO_VERSAO,
+            "carga_ms": CARGA_INDICE_MS,
+        },
         "timestamp": datetime.now().isoformat()
     }
 
@@ -132,86 +628,18 @@ async def sugerir_planejamento(requisicao: SolicitacaoSugestao):
     - Recursos necessários
     - Propostas de avaliação
     - Score de aderência à BNCC
+    - Metadados com o tempo de cada etapa (`etapas_ms`)
+
+    Responde 429 (com `Retry-After`) quando a fila do executor de CPU está cheia.
     """
     try:
         logger.info(f"Gerando sugestão para tema: {requisicao.tema}")
-        
-        # Simular processamento de IA
-        # Em produção, isso chamaria um modelo LLM real (GPT, Claude, etc)
-        
-        unidades_tematicas = [
-            {
-                "titulo": f"Unidade 1: Introdução ao {requisicao.tema}",
-                "semanas": 1,
-                "habilidades": requisicao.habilidades_bncc[:2] if requisicao.habilidades_bncc else ["EF05LP01"],
-                "descricao": f"Apresentação e contextualização do tema {requisicao.tema}"
-            },
-            {
-                "titulo": f"Unidade 2: Desenvolvimento de {requisicao.tema}",
-                "semanas": 2,
-                "habilidades": requisicao.habilidades_bncc[2:4] if len(requisicao.habilidades_bncc) > 2 else ["EF05LP02"],
-                "descricao": f"Aprofundamento dos conceitos de {requisicao.tema}"
-            },
-            {
-                "titulo": f"Unidade 3: Aplicação prática de {requisicao.tema}",
-                "semanas": 1,
-                "habilidades": requisicao.habilidades_bncc[4:] if len(requisicao.habilidades_bncc) > 4 else ["EF05LP03"],
-                "descricao": f"Projetos e atividades práticas com {requisicao.tema}"
-            }
-        ]
-        
-        atividades_sugeridas = [
-            {
-                "titulo": "Atividade Dirigida: Exploração Inicial",
-                "tipo": "exercicio",
-                "duracao_min": 30,
-                "habilidades": requisicao.habilidades_bncc[:1] if requisicao.habilidades_bncc else ["EF05LP01"]
-            },
-            {
-                "titulo": "Projeto Colaborativo",
-                "tipo": "projeto",
-                "duracao_min": 120,
-                "habilidades": requisicao.habilidades_bncc[1:3] if len(requisicao.habilidades_bncc) > 1 else ["EF05LP02"]
-            },
-            {
-                "titulo": "Avaliação Formativa",
-                "tipo": "quiz",
-                "duracao_min": 45,
-                "habilidades": requisicao.habilidades_bncc
-            }
-        ]
-        
-        recursos = [
-            "Quadro branco e marcadores",
-            "Computadores/tablets para pesquisa",
-            "Materiais de arte e criatividade",
-            "Livros e referências sobre o tema",
-            "Acesso à internet"
-        ]
-        
-        avaliacoes = [
-            "Observação contínua das atividades",
-            "Análise de participação em discussões",
-            "Avaliação do projeto colaborativo",
-            "Quiz de verificação de aprendizagem",
-            "Autoavaliação do aluno"
-        ]
-        
-        resposta = SugestaoResposta(
-            titulo=f"Planejamento: {requisicao.tema} ({requisicao.nivel_ensino})",
-            introducao=f"Este planejamento foi gerado pela IA AuraMind para o tema '{requisicao.tema}' no nível '{requisicao.nivel_ensino}'. "
-                      f"Ele integra {len(requisicao.habilidades_bncc)} habilidades BNCC e está estruturado em {requisicao.duracao_semanas} semanas.",
-            unidades_tematicas=unidades_tematicas,
-            atividades_sugeridas=atividades_sugeridas,
-            recursos_necessarios=recursos,
-            avaliacoes_propostas=avaliacoes,
-            score_aderencia_bncc=0.92,
-            observacoes="Planejamento gerado automaticamente. Recomenda-se revisão e personalização conforme contexto da turma."
-        )
-        
+        resposta = await sugerir(requisicao)
         logger.info(f"Sugestão gerada com sucesso para tema: {requisicao.tema}")
         return resposta
         
+    except FilaCheia:
+        raise
     except Exception as e:
         logger.error(f"Erro ao gerar sugestão: {str(e)}")
         raise HTTPException(
@@ -220,6 +648,176 @@ async def sugerir_planejamento(requisicao: SolicitacaoSugestao):
         )
 
 
+def evento_sse(evento: str, dados: Any) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {evento}\ndata: {orjson.dumps(dados).decode()}\n\n"
+
+
+@app.post(
+    "/api/v1/auramind/sugestoes_planejamento/stream/",
+    tags=["Planejamentos"],
+    summary="Gerar sugestão de planejamento com IA em streaming (SSE)",
+    response_class=StreamingResponse
+)
+async def sugerir_planejamento_stream(requisicao: SolicitacaoSugestao):
+    """
+    Versão em streaming de `sugestoes_planejamento`.
+
+    Emite um evento SSE por seção assim que ela é gerada (`inicio`,
+    `unidades_tematicas`, `atividades_sugeridas`, `recursos_necessarios`,
+    `avaliacoes_propostas`) e termina com `fim`, que traz o score, as
+    observações e os metadados. Em caso de falha no meio da geração é
+    emitido `erro` e o stream é encerrado.
+
+    As etapas de CPU rodam no executor antes do primeiro evento, para que a
+    fila cheia ainda possa ser respondida com 429.
+    """
+    logger.info(f"Gerando sugestão em streaming para tema: {requisicao.tema}")
+    inicio = time.perf_counter()
+    preparo, etapas = await preparar(requisicao)
+
+    async def eventos():
+        try:
+            inicio_geracao = time.perf_counter()
+            saida = []
+            # O gerador roda em thread: uma chamada bloqueante ao LLM não trava o event loop
+            async for secao, dados in iterate_in_threadpool(gerar_secoes(requisicao, preparo)):
+                saida.append(orjson.dumps(dados).decode())
+                if secao == "fim":
+                    etapas["geracao"] = round((time.perf_counter() - inicio_geracao) * 1000, 2)
+                    tokens = contar_tokens("sugestao", requisicao.model_dump_json(), "".join(saida))
+                    dados = dict(dados, metadata=metadados(inicio, etapas, tokens))
+                    observar_etapas("sugestao", etapas)
+                yield evento_sse(secao, dados)
+        except Exception as e:
+            logger.error(f"Erro ao gerar sugestão em streaming: {str(e)}")
+            yield evento_sse("erro", {"detail": f"Erro ao processar sugestão: {str(e)}"})
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post(
+    "/api/v1/auramind/sugestoes_planejamento/batch/",
+    response_model=SugestaoLoteResposta,
+    tags=["Planejamentos"],
+    summary="Gerar sugestões de planejamento em lote"
+)
+async def sugerir_planejamento_lote(lote: SolicitacaoSugestaoLote):
+    """
+    Endpoint para gerar várias sugestões em uma única chamada.
+
+    Usado para preencher todas as unidades temáticas de um planejamento anual
+    sem uma ida e volta por unidade. Os itens são processados em paralelo,
+    no máximo `concorrencia` ao mesmo tempo, e os resultados voltam na ordem
+    da requisição. Um item inválido ou com erro não derruba o lote: o erro
+    fica no campo `erro` do próprio item, inclusive quando a fila do
+    executor de CPU está cheia.
+    """
+    inicio = time.perf_counter()
+    semaforo = asyncio.Semaphore(lote.concorrencia or LOTE_CONCORRENCIA)
+    logger.info(f"Gerando lote de {len(lote.itens)} sugestões")
+
+    async def processar(indice: int, dados: Dict[str, Any]) -> ResultadoItemLote:
+        try:
+            requisicao = SolicitacaoSugestao.model_validate(dados)
+        except ValidationError as e:
+            erros = "; ".join(
+                f"{'.'.join(str(parte) for parte in erro['loc'])}: {erro['msg']}"
+                for erro in e.errors()
+            )
+            return ResultadoItemLote(
+                indice=indice, sucesso=False, erro=f"Requisição inválida: {erros}"
+            )
+
+        async with semaforo:
+            try:
+                sugestao = await sugerir(requisicao)
+            except Exception as e:
+                logger.error(f"Erro ao gerar sugestão {indice} do lote: {str(e)}")
+                return ResultadoItemLote(indice=indice, sucesso=False, erro=str(e))
+        return ResultadoItemLote(indice=indice, sucesso=True, sugestao=sugestao)
+
+    resultados = await asyncio.gather(
+        *(processar(indice, dados) for indice, dados in enumerate(lote.itens))
+    )
+    sucessos = sum(1 for resultado in resultados if resultado.sucesso)
+
+    logger.info(f"Lote concluído: {sucessos}/{len(resultados)} sugestões geradas")
+    return SugestaoLoteResposta(
+        resultados=resultados,
+        total=len(resultados),
+        sucessos=sucessos,
+        falhas=len(resultados) - sucessos,
+        tempo_processamento_ms=int((time.perf_counter() - inicio) * 1000)
+    )
+
+
+@app.get(
+    "/api/v1/auramind/bncc/habilidades/",
+    response_model=BuscaHabilidadesResposta,
+    tags=["BNCC"],
+    summary="Buscar habilidades no índice BNCC local"
+)
+async def buscar_habilidades(
+    q: Optional[str] = Query(
+        None, description="Texto livre (tema, objetivo...) para busca por similaridade"
+    ),
+    prefixo: Optional[str] = Query(None, description="Prefixo do código (ex: EF05, EF05MA)"),
+    nivel_ensino: Optional[str] = Query(None, description="Nível de ensino (1ef, pre, etc)"),
+    componente: Optional[str] = Query(None, description="Sigla (LP, MA...) ou nome do componente"),
+    limite: int = Query(10, ge=1, le=100),
+):
+    """
+    Consulta o catálogo BNCC carregado na inicialização, sem acesso à rede.
+
+    Com `q`, retorna as habilidades mais similares ao texto (TF-IDF),
+    com a similaridade de cada uma. Sem `q`, lista as habilidades em ordem
+    de código, opcionalmente a partir de um `prefixo`. Os filtros de nível
+    de ensino e componente valem nos dois modos.
+    """
+    if q:
+        resultados = indice_bncc.buscar(
+            q, nivel_ensino=nivel_ensino, componente=componente, limite=limite
+        )
+    else:
+        resultados = [
+            (habilidade, None)
+            for habilidade in indice_bncc.por_prefixo(prefixo, limite, nivel_ensino, componente)
+        ]
+
+    habilidades = [
+        HabilidadeBNCC(
+            **habilidade.para_dict(),
+            similaridade=None if similaridade is None else round(similaridade, 4),
+        )
+        for habilidade, similaridade in resultados
+    ]
+    return BuscaHabilidadesResposta(
+        versao=indice_bncc.versao, total=len(habilidades), habilidades=habilidades
+    )
+
+
+@app.get(
+    "/api/v1/auramind/bncc/habilidades/{codigo}/",
+    response_model=HabilidadeBNCC,
+    tags=["BNCC"],
+    summary="Consultar uma habilidade BNCC pelo código"
+)
+async def obter_habilidade(codigo: str):
+    """Retorna a habilidade BNCC com o código informado"""
+    habilidade = indice_bncc.obter(codigo)
+    if habilidade is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Habilidade {codigo} não encontrada no índice BNCC"
+        )
+    return HabilidadeBNCC(**habilidade.para_dict())
+
+
 @app.post(
     "/api/v1/auramind/analise_plano/",
     response_model=AnaliseResposta,
@@ -239,69 +837,25 @@ async def analisar_plano(requisicao: RequisicaoAnalise):
     - Score geral de qualidade
     - Aderência à BNCC
     - Qualidade pedagógica
-    - Pontos fortes e fracos
+    - Cobertura de cada habilidade declarada, por seção do plano
+    - Pontos fortes e pontos a revisar (do maior para o menor impacto)
     - Sugestões de melhoria
     - Recomendação final
+
+    A pontuação é determinística: o mesmo plano recebe sempre o mesmo score.
+    Roda no executor de CPU; com a fila cheia, responde 429.
     """
     try:
         logger.info(f"Analisando plano ID: {requisicao.plano_id}")
-        
-        # Simular análise de IA
-        # Em produção, isso usaria um modelo LLM para análise real
-        
-        pontos_fortes = [
-            PontoAnalise(
-                aspecto="Alinhamento BNCC",
-                descricao="O plano está bem alinhado com as habilidades BNCC especificadas",
-                impacto="alto"
-            ),
-            PontoAnalise(
-                aspecto="Estrutura Pedagógica",
-                descricao="As atividades estão bem sequenciadas e progressivas",
-                impacto="alto"
-            ),
-            PontoAnalise(
-                aspecto="Diversidade de Metodologias",
-                descricao="Uso de diferentes tipos de atividades (dirigidas, projetos, avaliações)",
-                impacto="médio"
-            )
-        ]
-        
-        pontos_revisar = [
-            PontoAnalise(
-                aspecto="Tempo de Aula",
-                descricao="Considere ajustar o tempo estimado para algumas atividades",
-                impacto="médio"
-            ),
-            PontoAnalise(
-                aspecto="Recursos Específicos",
-                descricao="Detalhe melhor quais recursos serão necessários",
-                impacto="baixo"
-            )
-        ]
-        
-        sugestoes = [
-            "Adicione mais atividades de diferenciação para alunos com dificuldades",
-            "Inclua estratégias de engajamento para manter a motivação",
-            "Considere integrar tecnologia de forma mais significativa",
-            "Aumente as oportunidades de feedback formativo"
-        ]
-        
-        resposta = AnaliseResposta(
-            plano_id=requisicao.plano_id,
-            score_geral=0.88,
-            aderencia_bncc=0.95,
-            qualidade_pedagogica=0.85,
-            pontos_fortes=pontos_fortes,
-            pontos_revisar=pontos_revisar,
-            sugestoes_melhoria=sugestoes,
-            recomendacao_final="APROVADO COM OBSERVAÇÕES - Plano de boa qualidade. Recomenda-se implementar as sugestões de melhoria para otimizar a experiência de aprendizagem.",
-            timestamp=datetime.now().isoformat()
-        )
-        
+        inicio = time.perf_counter()
+        (resposta,), etapas = await analisar([requisicao])
+        tokens = contar_tokens("analise", requisicao.model_dump_json(), resposta.model_dump_json())
+        resposta.metadata = metadados(inicio, etapas, tokens)
         logger.info(f"Análise concluída para plano ID: {requisicao.plano_id}")
         return resposta
         
+    except FilaCheia:
+        raise
     except Exception as e:
         logger.error(f"Erro ao analisar plano: {str(e)}")
         raise HTTPException(
@@ -310,6 +864,71 @@ async def analisar_plano(requisicao: RequisicaoAnalise):
         )
 
 
+@app.post(
+    "/api/v1/auramind/analise_plano/batch/",
+    response_model=AnaliseLoteResposta,
+    tags=["Análises"],
+    summary="Analisar planos pedagógicos em lote"
+)
+async def analisar_planos_lote(lote: SolicitacaoAnaliseLote):
+    """
+    Pontua vários planos em uma única chamada (ex: reanálise de todos os
+    templates de uma escola).
+
+    Os planos válidos são pontuados juntos em uma única operação matricial;
+    um plano inválido não derruba o lote: o erro fica no campo `erro` do
+    próprio item. Os resultados voltam na ordem da requisição. Com a fila
+    do executor de CPU cheia, o lote inteiro é recusado com 429.
+    """
+    inicio = time.perf_counter()
+    logger.info(f"Analisando lote de {len(lote.planos)} planos")
+
+    resultados: List[Optional[ResultadoAnaliseLote]] = [None] * len(lote.planos)
+    validos: List[Tuple[int, RequisicaoAnalise]] = []
+    for indice, dados in enumerate(lote.planos):
+        try:
+            validos.append((indice, RequisicaoAnalise.model_validate(dados)))
+        except ValidationError as e:
+            erros = "; ".join(
+                f"{'.'.join(str(parte) for parte in erro['loc'])}: {erro['msg']}"
+                for erro in e.errors()
+            )
+            resultados[indice] = ResultadoAnaliseLote(
+                indice=indice, sucesso=False, erro=f"Requisição inválida: {erros}"
+            )
+
+    etapas: Dict[str, float] = {}
+    tokens: Dict[str, int] = {}
+    if validos:
+        try:
+            analises, etapas = await analisar([requisicao for _, requisicao in validos])
+        except FilaCheia:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao analisar lote: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Erro ao processar análise: {str(e)}"
+            )
+        for (indice, _), analise in zip(validos, analises):
+            resultados[indice] = ResultadoAnaliseLote(indice=indice, sucesso=True, analise=analise)
+        tokens = contar_tokens(
+            "analise",
+            "".join(requisicao.model_dump_json() for _, requisicao in validos),
+            "".join(analise.model_dump_json() for analise in analises)
+        )
+
+    logger.info(f"Lote de análises concluído: {len(validos)}/{len(resultados)} planos pontuados")
+    return AnaliseLoteResposta(
+        resultados=resultados,
+        total=len(resultados),
+        sucessos=len(validos),
+        falhas=len(resultados) - len(validos),
+        tempo_processamento_ms=int((time.perf_counter() - inicio) * 1000),
+        metadata={"etapas_ms": etapas, **tokens}
+    )
+
+
 @app.get("/api/v1/auramind/status/", tags=["Status"])
 async def status_auramind():
     """Retornar status do agente AuraMind"""
@@ -318,13 +937,25 @@ async def status_auramind():
         "service": "AuraMind LLM Agent",
         "endpoints": {
             "sugestoes_planejamento": "/api/v1/auramind/sugestoes_planejamento/",
+            "sugestoes_planejamento_lote": "/api/v1/auramind/sugestoes_planejamento/batch/",
+            "sugestoes_planejamento_stream": "/api/v1/auramind/sugestoes_planejamento/stream/",
             "analise_plano": "/api/v1/auramind/analise_plano/",
-            "health": "/health"
+            "analise_plano_lote": "/api/v1/auramind/analise_plano/batch/",
+            "bncc_habilidades": "/api/v1/auramind/bncc/habilidades/",
+            "health": "/health",
+            "metricas": "/metrics"
         },
+        "executor": executor.estado(),
         "timestamp": datetime.now().isoformat()
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metricas():
+    """Métricas no formato de exposição do Prometheus"""
+    return PlainTextResponse(registro.exposicao(), media_type="text/plain; version=0.0.4")
+
+
 # ============================================================================
 # ROOT
 # ============================================================================
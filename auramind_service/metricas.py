@@ -0,0 +1,277 @@
+"""
+Métricas do agente no formato de exposição do Prometheus (texto, 0.0.4).
+
+Implementação mínima, sem dependências: contadores, medidores e histogramas
+com rótulos, mantidos em memória no processo do uvicorn e servidos em
+``GET /metrics``. Os workers do executor de CPU não registram métricas: os
+tempos das etapas voltam na resposta (``etapas_ms``) e são observados no
+processo principal.
+
+``MiddlewareMetricas`` é um middleware ASGI puro (sem ``BaseHTTPMiddleware``,
+que enfileira o corpo das respostas e atrapalha o streaming): registra a
+contagem, a latência e as requisições em andamento por rota. A rota é o
+template do caminho (``/api/v1/auramind/bncc/habilidades/{codigo}/``), nunca
+o caminho com parâmetros, para manter a cardinalidade dos rótulos limitada.
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Limites (segundos) dos buckets de latência das requisições e das etapas
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Caracteres por token na estimativa de tokens (média de textos em português)
+CARACTERES_POR_TOKEN = 4
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa de tokens de um texto (~4 caracteres por token)"""
+    return math.ceil(len(texto or "") / CARACTERES_POR_TOKEN)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(nomes: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == math.inf:
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._trava = threading.Lock()
+
+    def _chave(self, rotulos: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+
+    def linhas(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def exposicao(self) -> str:
+        cabecalho = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        return "\n".join(cabecalho + list(self.linhas()))
+
+
+class Contador(_Metrica):
+    """Valor que só cresce (requisições, tokens...)"""
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1, **rotulos: str) -> None:
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos: str) -> float:
+        return self._valores.get(self._chave(rotulos), 0)
+
+    def linhas(self) -> Iterable[str]:
+        valores = self._valores or ({(): 0} if not self.rotulos else {})
+        for chave, valor in sorted(valores.items()):
+            yield f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}"
+
+
+class Medidor(_Metrica):
+    """
+    Valor que sobe e desce. Com ``funcao``, o valor é lido na hora da coleta
+    (ex: tarefas pendentes no executor) e ``funcao`` devolve
+    ``{(valores dos rótulos): valor}``, ou um número se não há rótulos.
+    """
+    tipo = "gauge"
+
+    def __init__(
+        self, nome: str, ajuda: str, rotulos: Sequence[str] = (), funcao: Optional[Callable] = None
+    ):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self.funcao = funcao
+
+    def inc(self, valor: float = 1, **rotulos: str) -> None:
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def dec(self, valor: float = 1, **rotulos: str) -> None:
+        self.inc(-valor, **rotulos)
+
+    def set(self, valor: float, **rotulos: str) -> None:
+        self._valores[self._chave(rotulos)] = valor
+
+    def linhas(self) -> Iterable[str]:
+        valores = self._valores
+        if self.funcao is not None:
+            coletado = self.funcao()
+            valores = coletado if isinstance(coletado, dict) else {(): coletado}
+        for chave, valor in sorted(valores.items()):
+            yield f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}"
+
+
+class Histograma(_Metrica):
+    """Distribuição em buckets cumulativos, com soma e contagem"""
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nome: str,
+        ajuda: str,
+        rotulos: Sequence[str] = (),
+        buckets: Sequence[float] = BUCKETS_LATENCIA,
+    ):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+        # Por conjunto de rótulos: [contagem por bucket (+Inf no fim), soma]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observar(self, valor: float, **rotulos: str) -> None:
+        chave = self._chave(rotulos)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._trava:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+
+    def contagem(self, **rotulos: str) -> int:
+        serie = self._series.get(self._chave(rotulos))
+        return sum(serie[0]) if serie else 0
+
+    def linhas(self) -> Iterable[str]:
+        for chave, (contagens, soma) in sorted(self._series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (math.inf,), contagens):
+                acumulado += contagem
+                le = 'le="' + _numero(limite) + '"'
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(soma)}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, chave)} {acumulado}"
+
+
+class Registro:
+    """Conjunto de métricas expostas em ``/metrics``"""
+
+    def __init__(self):
+        self.metricas: List[_Metrica] = []
+
+    def registrar(self, metrica: _Metrica) -> _Metrica:
+        self.metricas.append(metrica)
+        return metrica
+
+    def exposicao(self) -> str:
+        return "\n".join(metrica.exposicao() for metrica in self.metricas) + "\n"
+
+
+registro = Registro()
+
+REQUISICOES = registro.registrar(Contador(
+    "auramind_requisicoes_total", "Requisições HTTP atendidas", ("metodo", "rota", "status")
+))
+LATENCIA = registro.registrar(Histograma(
+    "auramind_requisicao_duracao_segundos", "Latência das requisições HTTP (até o fim do corpo)",
+    ("metodo", "rota")
+))
+EM_ANDAMENTO = registro.registrar(Medidor(
+    "auramind_requisicoes_em_andamento", "Requisições HTTP em andamento"
+))
+ETAPAS = registro.registrar(Histograma(
+    "auramind_etapa_duracao_segundos", "Duração de cada etapa (fila, habilidades, aderencia...)",
+    ("operacao", "etapa")
+))
+TOKENS = registro.registrar(Contador(
+    "auramind_tokens_total", "Tokens estimados de entrada e saída", ("operacao", "tipo")
+))
+CACHE = registro.registrar(Contador(
+    "auramind_cache_consultas_total", "Consultas a caches internos do agente",
+    ("cache", "resultado")
+))
+
+
+def _taxas_acerto() -> Dict[Tuple[str, ...], float]:
+    consultas: Dict[str, List[float]] = {}
+    for (cache, resultado), valor in list(CACHE._valores.items()):
+        consultas.setdefault(cache, [0, 0])[resultado == "hit"] += valor
+    return {(cache,): acertos / (erros + acertos) for cache, (erros, acertos) in consultas.items()}
+
+
+TAXA_ACERTO = registro.registrar(Medidor(
+    "auramind_cache_taxa_acerto", "Fração de acertos de cada cache interno", ("cache",),
+    funcao=_taxas_acerto
+))
+RECUSAS = registro.registrar(Contador(
+    "auramind_executor_recusas_total", "Requisições recusadas com 429 por fila cheia"
+))
+
+
+def observar_etapas(operacao: str, etapas_ms: Dict[str, float]) -> None:
+    """Registra o tempo de cada etapa de uma resposta (``etapas_ms``)"""
+    for etapa, duracao_ms in etapas_ms.items():
+        ETAPAS.observar(duracao_ms / 1000, operacao=operacao, etapa=etapa)
+
+
+def contar_tokens(operacao: str, entrada: str, saida: str) -> Dict[str, int]:
+    """
+    Estima e contabiliza os tokens de uma operação.
+
+    Returns:
+        ``tokens_entrada``, ``tokens_saida`` e ``custo_token`` (a soma), para
+        os metadados da resposta
+    """
+    tokens_entrada, tokens_saida = estimar_tokens(entrada), estimar_tokens(saida)
+    TOKENS.inc(tokens_entrada, operacao=operacao, tipo="entrada")
+    TOKENS.inc(tokens_saida, operacao=operacao, tipo="saida")
+    return {
+        "tokens_entrada": tokens_entrada,
+        "tokens_saida": tokens_saida,
+        "custo_token": tokens_entrada + tokens_saida,
+    }
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI: contagem, latência e requisições em andamento por rota"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        EM_ANDAMENTO.inc()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            EM_ANDAMENTO.dec()
+            # O roteador do FastAPI grava a rota encontrada no próprio scope
+            rota = scope.get("route")
+            caminho = getattr(rota, "path", None) or "desconhecida"
+            LATENCIA.observar(time.perf_counter() - inicio, metodo=scope["method"], rota=caminho)
+            REQUISICOES.inc(metodo=scope["method"], rota=caminho, status=str(status))
@@ -0,0 +1,495 @@
+"""
+Tests for the AuraMind agent (auramind_service).
+
+The agent modules are imported by bare name, as the service runs them; the
+root conftest puts this directory on ``sys.path``.
+"""
+import asyncio
+import gzip
+import json
+import os
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import artefatos
+from aderencia import PESO_ADERENCIA, SECOES, avaliar_planos, montar_pontos
+from bncc import IndiceBNCC, decodificar, nivel_para_etapa
+from compressao import MiddlewareCompressao, brotli, descomprimir
+from execucao import CacheLRU, ExecutorCPU, FilaCheia
+from metricas import Contador, Histograma
+
+CATALOGO = {
+    "versao": "bncc-teste",
+    "habilidades": [
+        {
+            "codigo": "EF05MA01",
+            "descricao": (
+                "Ler, escrever e ordenar números naturais até a ordem das "
+                "centenas de milhar com compreensão do sistema de numeração decimal."
+            ),
+            "campo": "Números",
+        },
+        {
+            "codigo": "EF05MA03",
+            "descricao": (
+                "Identificar e representar frações, associando-as ao resultado "
+                "de uma divisão ou à ideia de parte de um todo."
+            ),
+            "campo": "Números",
+        },
+        {
+            "codigo": "EF05CI02",
+            "descricao": (
+                "Aplicar os conhecimentos sobre as mudanças de estado físico da água "
+                "para explicar o ciclo hidrológico e a evaporação."
+            ),
+            "campo": "Terra e Universo",
+        },
+        {
+            "codigo": "EF05LP01",
+            "descricao": (
+                "Grafar palavras utilizando regras de correspondência fonema-grafema "
+                "e a ortografia das palavras de uso frequente."
+            ),
+            "campo": "Análise linguística",
+        },
+        {
+            "codigo": "EF15AR01",
+            "descricao": (
+                "Identificar e apreciar formas distintas das artes visuais "
+                "tradicionais e contemporâneas, cultivando a percepção estética."
+            ),
+            "campo": "Artes visuais",
+        },
+        {
+            "codigo": "EF03MA01",
+            "descricao": (
+                "Ler, escrever e comparar números naturais de até a ordem de "
+                "unidade de milhar, estabelecendo relações entre os registros."
+            ),
+            "campo": "Números",
+        },
+        {
+            "codigo": "EI03EO01",
+            "descricao": (
+                "Demonstrar empatia pelos outros, percebendo que as pessoas têm "
+                "diferentes sentimentos, necessidades e maneiras de pensar e agir."
+            ),
+        },
+    ],
+}
+
+
+@pytest.fixture
+def catalogo(tmp_path):
+    """Path of a small BNCC catalog (JSON) in a temporary directory."""
+    caminho = tmp_path / "bncc.json"
+    caminho.write_text(json.dumps(CATALOGO, ensure_ascii=False), encoding="utf-8")
+    return str(caminho)
+
+
+@pytest.fixture
+def indice(catalogo):
+    return IndiceBNCC.carregar(catalogo)
+
+
+class TestIndiceBNCC:
+    """Test code decoding, prefix lookup and TF-IDF search of the BNCC index."""
+
+    def test_code_attributes_are_derived_from_the_code(self, indice):
+        """Test that stage, years and component come from the code itself."""
+        assert decodificar("EF05LP01") == ("EF", (5,), "LP")
+        assert decodificar("EF15AR01") == ("EF", (1, 2, 3, 4, 5), "AR")
+        with pytest.raises(ValueError):
+            decodificar("EF5LP01")
+        assert nivel_para_etapa("5EF") == ("EF", 5)
+        assert nivel_para_etapa("pre") == ("EI", 3)
+        assert nivel_para_etapa("graduacao") is None
+
+        infantil = indice.obter("ei03eo01")
+        assert infantil.componente == "Educação Infantil"
+        assert infantil.campo == "O eu, o outro e o nós"
+        assert indice.obter("EF05MA03").componente == "Matemática"
+        assert indice.obter("EF09MA01") is None
+
+    def test_prefix_lookup_in_code_order(self, indice):
+        """Test prefix lookup with the level and component filters."""
+        def codigos(*args, **kwargs):
+            return [habilidade.codigo for habilidade in indice.por_prefixo(*args, **kwargs)]
+
+        assert codigos("EF05") == ["EF05CI02", "EF05LP01", "EF05MA01", "EF05MA03"]
+        assert codigos("ef05ma") == ["EF05MA01", "EF05MA03"]
+        assert codigos("EF05", limite=2) == ["EF05CI02", "EF05LP01"]
+        # EF15AR01 covers years 1-5; EF03MA01 does not cover the 5th year
+        assert codigos("EF", nivel_ensino="5ef") == [
+            "EF05CI02",
+            "EF05LP01",
+            "EF05MA01",
+            "EF05MA03",
+            "EF15AR01",
+        ]
+        assert codigos("EF", nivel_ensino="3ef", componente="MA") == ["EF03MA01"]
+        assert codigos("EM") == []
+
+    def test_similarity_search_ranks_and_filters_by_level(self, indice):
+        """Test that the closest description ranks first, within the requested level."""
+        resultados = indice.buscar("frações e divisão em partes de um todo")
+        assert resultados[0][0].codigo == "EF05MA03"
+        similaridades = [similaridade for _, similaridade in resultados]
+        assert similaridades == sorted(similaridades, reverse=True)
+        assert 0 < similaridades[0] <= 1
+
+        resultados = indice.buscar("ler e escrever números naturais", nivel_ensino="3ef")
+        assert resultados[0][0].codigo == "EF03MA01"
+        assert all(3 in habilidade.anos for habilidade, _ in resultados)
+
+        assert indice.buscar("ciclo da água", limite=1)[0][0].codigo == "EF05CI02"
+        assert indice.buscar("   ") == []
+
+    def test_adherence_of_chosen_skills(self, indice):
+        """Test that unknown and wrong-level codes score 0 and are reported."""
+        score, problemas = indice.aderencia("ciclo da água e evaporação", ["EF05CI02"], "5ef")
+        assert (score, problemas) == (1.0, {})
+
+        score, problemas = indice.aderencia(
+            "ciclo da água e evaporação", ["EF05CI02", "EF03MA01", "EF05XX99"], "5ef"
+        )
+        assert score == pytest.approx(1 / 3, abs=0.01)
+        assert set(problemas) == {"EF03MA01", "EF05XX99"}
+
+    def test_endpoint_serves_packaged_catalog(self, agente):
+        """Test the BNCC endpoints of the agent on the packaged catalog."""
+        resposta = agente.get(
+            "/api/v1/auramind/bncc/habilidades/", params={"prefixo": "EF05MA", "limite": 3}
+        )
+        assert resposta.status_code == 200
+        codigos = [habilidade["codigo"] for habilidade in resposta.json()["habilidades"]]
+        assert codigos == sorted(codigos) and len(codigos) == 3
+        assert all(codigo.startswith("EF05MA") for codigo in codigos)
+
+        resposta = agente.get(
+            "/api/v1/auramind/bncc/habilidades/", params={"q": "frações", "nivel_ensino": "5ef"}
+        )
+        habilidades = resposta.json()["habilidades"]
+        assert habilidades and all(5 in habilidade["anos"] for habilidade in habilidades)
+        assert habilidades[0]["similaridade"] >= habilidades[-1]["similaridade"]
+
+        assert agente.get("/api/v1/auramind/bncc/habilidades/EF99XX99/").status_code == 404
+
+
+def _plano(**secoes):
+    """Lesson plan about the water cycle (EF05CI02), with ``secoes`` overridden."""
+    return {
+        "nivel_ensino": "5ef",
+        "habilidades_bncc": ["EF05CI02"],
+        "objetivos_aprendizagem": (
+            "Aplicar os conhecimentos sobre as mudanças de estado físico da água "
+            "para explicar o ciclo hidrológico"
+        ),
+        "atividade_dirigida": (
+            "Experimento de evaporação e condensação da água com os estados físicos da água "
+            "observados em grupo"
+        ),
+        "desenvolvimento": (
+            "Os alunos registram as mudanças de estado físico da água, a evaporação e a "
+            "condensação, e explicam o ciclo hidrológico em um esquema coletivo, relacionando "
+            "cada etapa do ciclo da água com o que observaram no experimento"
+        ),
+        "avaliacao": "Explicar o ciclo hidrológico e a evaporação da água em um texto curto",
+        **secoes,
+    }
+
+
+class TestAderencia:
+    """Test the deterministic BNCC adherence scores of lesson plans."""
+
+    def test_scores_are_deterministic_and_batch_independent(self, indice):
+        """Test that a plan scores the same alone, repeated and inside a batch."""
+        plano = _plano()
+        sozinho = avaliar_planos(indice, [plano])[0]
+        assert avaliar_planos(indice, [plano])[0] == sozinho
+        lote = avaliar_planos(
+            indice, [_plano(habilidades_bncc=["EF05LP01"]), plano, _plano(avaliacao="")]
+        )
+        assert lote[1] == sozinho
+        assert avaliar_planos(indice, []) == []
+
+    def test_focused_plan_covers_its_skill(self, indice):
+        """Test coverage, completeness and the weighted overall score of a focused plan."""
+        resultado = avaliar_planos(indice, [_plano()])[0]
+        cobertura, = resultado["cobertura"]
+        assert cobertura["codigo"] == "EF05CI02"
+        assert cobertura["situacao"] == "coberta"
+        assert set(cobertura["secoes"]) == set(SECOES)
+        assert resultado["aderencia"] == cobertura["cobertura"]
+        assert resultado["completude"] == dict.fromkeys(SECOES, 1.0)
+        assert resultado["score_geral"] == pytest.approx(
+            PESO_ADERENCIA * resultado["aderencia"] + (1 - PESO_ADERENCIA) * resultado["qualidade"],
+            abs=0.01,
+        )
+
+    def test_unrelated_invalid_and_short_plans_score_lower(self, indice):
+        """Test that unrelated, unknown or wrong-level skills and short sections lower scores."""
+        focado, alheio, invalido, curto = avaliar_planos(indice, [
+            _plano(),
+            _plano(habilidades_bncc=["EF05LP01"]),
+            _plano(habilidades_bncc=["EF03MA01", "EF05XX99"]),
+            _plano(desenvolvimento="Esquema do ciclo", avaliacao=""),
+        ])
+        assert alheio["cobertura"][0]["situacao"] == "nao_coberta"
+        assert alheio["score_geral"] < focado["score_geral"]
+        assert [item["motivo"] for item in invalido["cobertura"]] == [
+            "habilidade não corresponde ao nível 5ef", "código não encontrado na BNCC"
+        ]
+        assert invalido["aderencia"] == 0.0
+        assert curto["completude"]["avaliacao"] == 0.0
+        assert curto["qualidade"] < focado["qualidade"]
+
+        pontos = montar_pontos(indice, invalido)
+        assert pontos["recomendacao_final"].startswith("REVISAR")
+        assert pontos["pontos_revisar"][0]["impacto"] == "alto"
+        assert montar_pontos(indice, focado)["recomendacao_final"].startswith("APROVADO")
+
+
+class TestExecutorCPU:
+    """Test the bounded queue of the CPU executor and its 429 answer."""
+
+    def test_full_queue_raises_fila_cheia(self):
+        """Test that a task above fila_max is refused while the others still run."""
+        executor = ExecutorCPU(processos=0, fila_max=2)
+        liberar = threading.Event()
+
+        async def cenario():
+            tarefas = [asyncio.ensure_future(executor.executar(liberar.wait, 5)) for _ in range(2)]
+            while executor.pendentes < 2:
+                await asyncio.sleep(0.01)
+            with pytest.raises(FilaCheia) as erro:
+                await executor.executar(sum, [1, 2])
+            assert erro.value.pendentes == 2
+            liberar.set()
+            return await asyncio.gather(*tarefas), await executor.executar(sum, [1, 2])
+
+        concluidas, (resultado, fila_ms) = asyncio.run(cenario())
+        assert [liberada for liberada, _ in concluidas] == [True, True]
+        assert resultado == 3 and fila_ms >= 0
+        assert executor.pendentes == 0
+
+    def test_endpoint_answers_429_with_retry_after(self, agente, monkeypatch):
+        """Test that the agent refuses work with 429 when the executor queue is full."""
+        import main
+
+        monkeypatch.setattr(main.executor, "pendentes", main.executor.fila_max)
+        recusas = main.RECUSAS.valor()
+        resposta = agente.post(
+            "/api/v1/auramind/sugestoes_planejamento/",
+            json={
+                "nivel_ensino": "5ef",
+                "tema": "Fila cheia do executor",
+                "habilidades_bncc": ["EF05CI02"],
+            },
+        )
+
+        assert resposta.status_code == 429
+        assert resposta.headers["Retry-After"] == "1"
+        assert "sobrecarregado" in resposta.json()["detail"]
+        assert main.RECUSAS.valor() == recusas + 1
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        """Test the preparation cache that lets repeated requests skip the queue."""
+        cache = CacheLRU(2)
+        cache.guardar("a", 1)
+        cache.guardar("b", 2)
+        assert cache.obter("a") == 1
+        cache.guardar("c", 3)
+        assert (cache.obter("a"), cache.obter("b"), cache.obter("c")) == (1, None, 3)
+        desativado = CacheLRU(0)
+        desativado.guardar("a", 1)
+        assert desativado.obter("a") is None
+
+
+class TestArtefatos:
+    """Test the precompiled, versioned BNCC index artifacts."""
+
+    def test_artifact_loads_the_same_index(self, catalogo, indice, tmp_path):
+        """Test that a built artifact is memory-mapped and answers like the fitted index."""
+        raiz = str(tmp_path / "artefatos")
+        versao = artefatos.construir(catalogo, raiz)
+        assert artefatos.construir(catalogo, raiz) == versao
+        assert open(os.path.join(raiz, artefatos.PONTEIRO)).read() == versao
+
+        carregado, versao_carregada = artefatos.carregar_indice(catalogo, raiz)
+        assert versao_carregada == versao
+        assert carregado.versao == "bncc-teste"
+        assert carregado.codigos == indice.codigos
+        assert isinstance(carregado.vetorizador.idf_, np.memmap)
+        texto = "frações e divisão em partes de um todo"
+        assert [h.codigo for h, _ in carregado.buscar(texto)] == [
+            h.codigo for h, _ in indice.buscar(texto)
+        ]
+
+    def test_mismatched_artifact_falls_back_and_rebuilds(self, catalogo, tmp_path):
+        """Test that a changed catalog or format is ignored and the rebuild gets a new version."""
+        raiz = str(tmp_path / "artefatos")
+        versao = artefatos.construir(catalogo, raiz)
+
+        with open(catalogo, "w", encoding="utf-8") as arquivo:
+            json.dump(
+                dict(CATALOGO, habilidades=CATALOGO["habilidades"][:-1]),
+                arquivo,
+                ensure_ascii=False,
+            )
+        indice, versao_carregada = artefatos.carregar_indice(catalogo, raiz)
+        assert versao_carregada is None
+        assert "EI03EO01" not in indice
+
+        nova = artefatos.construir(catalogo, raiz)
+        assert nova != versao
+        assert artefatos.carregar_indice(catalogo, raiz)[1] == nova
+
+        manifesto = os.path.join(raiz, nova, "manifesto.json")
+        with open(manifesto, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+        with open(manifesto, "w", encoding="utf-8") as arquivo:
+            json.dump(dict(dados, formato=artefatos.FORMATO + 1), arquivo)
+        assert artefatos.carregar_indice(catalogo, raiz)[1] is None
+        assert artefatos.carregar_indice(catalogo, str(tmp_path / "vazio"))[1] is None
+
+
+def _amostra(exposicao, serie):
+    """Value of one sample (``nome{rotulos}``) in a Prometheus exposition, 0 if absent."""
+    for linha in exposicao.splitlines():
+        if linha.startswith(serie + " "):
+            return float(linha.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestMetricas:
+    """Test the Prometheus metrics of the agent."""
+
+    def test_exposition_format(self):
+        """Test the text exposition of counters and cumulative histogram buckets."""
+        contador = Contador("teste_total", "Contador de teste", ("rota",))
+        contador.inc(rota="/a")
+        contador.inc(2, rota="/a")
+        assert contador.exposicao().splitlines() == [
+            "# HELP teste_total Contador de teste",
+            "# TYPE teste_total counter",
+            'teste_total{rota="/a"} 3',
+        ]
+
+        histograma = Histograma("teste_segundos", "Histograma de teste", buckets=(0.1, 1.0))
+        for valor in (0.05, 0.5, 5):
+            histograma.observar(valor)
+        linhas = list(histograma.linhas())
+        assert linhas[:3] == [
+            'teste_segundos_bucket{le="0.1"} 1',
+            'teste_segundos_bucket{le="1"} 2',
+            'teste_segundos_bucket{le="+Inf"} 3',
+        ]
+        assert linhas[-1] == "teste_segundos_count 3"
+
+    def test_metrics_endpoint_counts_requests_by_route(self, agente):
+        """Test that /metrics counts requests by route template, status and token estimate."""
+        rota = 'metodo="GET",rota="/api/v1/auramind/bncc/habilidades/{codigo}/"'
+        antes = agente.get("/metrics").text
+        agente.get("/api/v1/auramind/bncc/habilidades/EF01CI01/")
+        agente.get("/api/v1/auramind/bncc/habilidades/ef01ci01/")
+        agente.get("/api/v1/auramind/bncc/habilidades/EF99XX99/")
+        agente.post("/api/v1/auramind/sugestoes_planejamento/", json={
+            "nivel_ensino": "5ef", "tema": "Métricas do agente", "habilidades_bncc": ["EF05CI02"]
+        })
+        resposta = agente.get("/metrics")
+
+        assert resposta.headers["content-type"].startswith("text/plain; version=0.0.4")
+        depois = resposta.text
+        requisicoes = f"auramind_requisicoes_total{{{rota},status=\"200\"}}"
+        nao_encontradas = f"auramind_requisicoes_total{{{rota},status=\"404\"}}"
+        assert _amostra(depois, requisicoes) - _amostra(antes, requisicoes) == 2
+        assert _amostra(depois, nao_encontradas) - _amostra(antes, nao_encontradas) == 1
+        duracoes = f"auramind_requisicao_duracao_segundos_count{{{rota}}}"
+        assert _amostra(depois, duracoes) - _amostra(antes, duracoes) == 3
+        tokens = 'auramind_tokens_total{operacao="sugestao",tipo="saida"}'
+        assert _amostra(depois, tokens) > _amostra(antes, tokens)
+        assert _amostra(depois, "auramind_requisicoes_em_andamento") == 1
+
+
+class TestCompressao:
+    """Test compressed request bodies sent by Django."""
+
+    def test_gzipped_request_keeps_its_route_label(self, agente):
+        """Test that a gzip body is decompressed and still counted under its route."""
+        rota = 'metodo="POST",rota="/api/v1/auramind/sugestoes_planejamento/",status="200"'
+        desconhecida = 'metodo="POST",rota="desconhecida",status="200"'
+        antes = agente.get("/metrics").text
+        corpo = gzip.compress(json.dumps({
+            "nivel_ensino": "5ef", "tema": "Corpo comprimido", "habilidades_bncc": ["EF05CI02"]
+        }).encode())
+        resposta = agente.post(
+            "/api/v1/auramind/sugestoes_planejamento/",
+            content=corpo,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+        depois = agente.get("/metrics").text
+
+        assert resposta.status_code == 200, resposta.text
+        assert "Corpo comprimido" in resposta.json()["titulo"]
+        assert _amostra(depois, f"auramind_requisicoes_total{{{rota}}}") - _amostra(
+            antes, f"auramind_requisicoes_total{{{rota}}}"
+        ) == 1
+        assert _amostra(depois, f"auramind_requisicoes_total{{{desconhecida}}}") == _amostra(
+            antes, f"auramind_requisicoes_total{{{desconhecida}}}"
+        )
+
+    @pytest.mark.skipif(brotli is None, reason="brotli não instalado")
+    def test_brotli_bomb_stops_at_the_limit(self):
+        """Test that a small br body expanding past the limit fails without inflating in memory."""
+        bomba = brotli.compress(b"a" * 64 * 1024 * 1024, quality=1)
+        assert len(bomba) < 64 * 1024
+
+        tracemalloc.start()
+        try:
+            with pytest.raises(OverflowError):
+                descomprimir(bomba, "br", 1024 * 1024)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert pico < 8 * 1024 * 1024
+        assert descomprimir(brotli.compress(b"corpo"), "br", 1024) == b"corpo"
+        with pytest.raises(ValueError):
+            descomprimir(brotli.compress(b"corpo" * 100)[:-4], "br", 1024)
+
+    @pytest.mark.skipif(brotli is None, reason="brotli não instalado")
+    def test_oversized_brotli_body_answers_413(self, agente):
+        """Test that the agent refuses a br body expanding past AURAMIND_CORPO_MAX_BYTES."""
+        import main
+        corpo = brotli.compress(b" " * (main.CORPO_MAX_BYTES + 1), quality=1)
+        resposta = agente.post(
+            "/api/v1/auramind/sugestoes_planejamento/",
+            content=corpo,
+            headers={"Content-Type": "application/json", "Content-Encoding": "br"}
+        )
+        assert resposta.status_code == 413
+
+    def test_compressed_body_is_read_up_to_the_limit(self):
+        """Test that more compressed bytes than corpo_max answer 413 before the rest is read."""
+        chamadas, enviadas, respostas = [], [], []
+
+        async def app(scope, receive, send):
+            chamadas.append(scope)
+
+        async def receive():
+            enviadas.append(1)
+            return {"type": "http.request", "body": b"x" * 64, "more_body": True}
+
+        async def send(mensagem):
+            respostas.append(mensagem)
+
+        escopo = {"type": "http", "headers": [(b"content-encoding", b"gzip")]}
+        asyncio.run(MiddlewareCompressao(app, corpo_max=100)(escopo, receive, send))
+
+        assert len(enviadas) == 2
+        assert respostas[0]["status"] == 413
+        assert chamadas == []
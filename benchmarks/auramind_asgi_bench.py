@@ -0,0 +1,291 @@
+"""
+Benchmark: concurrent AuraMind suggestions, gunicorn sync (WSGI) vs. uvicorn (ASGI).
+
+Starts a stub agent answering after ``--latencia`` seconds, a throwaway SQLite
+database and two servers with the same settings:
+
+- ``gunicorn config.wsgi`` with ``--workers`` sync workers (the ``web``
+  service of ``docker-compose.yml``), on ``api/sugestoes_planejamento/``;
+- ``uvicorn config.asgi`` with a single worker, on the async view
+  ``async/sugestoes_planejamento/``;
+
+then sends ``--requisicoes`` requests per concurrency level to each one and
+prints throughput, p50/p99 latency and errors. Rate limits and the
+near-duplicate cache are off and every request has its own context, so each
+one reaches the agent and writes its SugestaoIa and LogIa rows.
+
+The project settings do not set ``AUTH_USER_MODEL``; the servers run with a
+settings module that does (``core.User``), so JWT users own the rows they
+create.
+
+Uso:
+    python benchmarks/auramind_asgi_bench.py --concorrencia 8,64,256 --latencia 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURACAO = '''
+from config.settings import *  # noqa: F401,F403
+
+AUTH_USER_MODEL = 'core.User'
+# Concurrent writers wait for the SQLite lock instead of failing at once
+DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+
+
+class _SemMigracoes(dict):
+    """The apps have no migrations: create the tables straight from the models."""
+
+    def __contains__(self, app):
+        return True
+
+    def __getitem__(self, app):
+        return None
+
+
+MIGRATION_MODULES = _SemMigracoes()
+'''
+
+RESPOSTA_STUB = json.dumps({
+    'dados_sugeridos': {
+        'titulo': 'Atividade: Ciclo da Água',
+        'sugestao_texto': 'Sugestão gerada pelo stub de benchmark. ' * 20,
+        'habilidades_sugeridas': ['EF05CI02', 'EF05CI03'],
+    },
+    'metadata': {'custo_token': 420, 'modelo_ia': 'stub', 'tempo_processamento_ms': 0},
+}).encode()
+
+
+def stub_agente(latencia):
+    """Threaded stub of the agent's suggestion endpoint (one thread per connection)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latencia)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(RESPOSTA_STUB)))
+            self.end_headers()
+            self.wfile.write(RESPOSTA_STUB)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Servidor(ThreadingHTTPServer):
+        daemon_threads = True
+        # listen() backlog; the default of 5 resets connections under load
+        request_queue_size = 1024
+
+    server = Servidor(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def preparar_banco(env):
+    """Create the schema and a teacher; return a JWT access token."""
+    script = '''
+import sqlite3, django
+django.setup()
+from django.conf import settings
+from django.core.management import call_command
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.core.models import User
+call_command('migrate', run_syncdb=True, verbosity=0, skip_checks=True)
+call_command('createcachetable', verbosity=0)
+sqlite3.connect(settings.DATABASES['default']['NAME']).execute('PRAGMA journal_mode=WAL')
+professor = User.objects.create_user(username='prof_bench', password='bench')
+print(AccessToken.for_user(professor))
+'''
+    saida = subprocess.run([sys.executable, '-c', script], env=env, cwd=RAIZ, check=True,
+                           capture_output=True, text=True)
+    return saida.stdout.strip().splitlines()[-1]
+
+
+def iniciar(comando, env, porta, log):
+    """Start a server logging to ``log`` (a pipe nobody reads would block it once full)."""
+    with open(log, 'wb') as saida:
+        processo = subprocess.Popen(
+            comando, env=env, cwd=RAIZ, stdout=saida, stderr=subprocess.STDOUT
+        )
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            httpx.get(
+                f'http://127.0.0.1:{porta}/api/v1/auramind/async/sugestoes_planejamento/', timeout=1
+            )
+            return processo
+        except httpx.TransportError:
+            time.sleep(0.2)
+    processo.kill()
+    with open(log) as saida:
+        raise RuntimeError(f"Servidor não subiu: {' '.join(comando)}\n{saida.read()}")
+
+
+async def carga(url, token, total, concorrencia, prefixo):
+    """Send ``total`` requests, ``concorrencia`` at a time; return (latencies ms, errors, s)."""
+    semaforo = asyncio.Semaphore(concorrencia)
+    latencias, erros = [], 0
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    async with httpx.AsyncClient(limits=limites, timeout=300) as cliente:
+        async def requisicao(i):
+            nonlocal erros
+            corpo = {
+                'plano_id': i, 'nivel_ensino': '5ef', 'habilidade_foco': 'EF05CI02',
+                'contexto_previo': f'{prefixo} turma {i}', 'formato_desejado': 'atividade',
+            }
+            async with semaforo:
+                inicio = time.perf_counter()
+                try:
+                    resposta = await cliente.post(
+                        url, json=corpo, headers={'Authorization': f'Bearer {token}'}
+                    )
+                    if resposta.status_code != 200:
+                        erros += 1
+                except httpx.HTTPError:
+                    erros += 1
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(requisicao(i) for i in range(total)))
+        return sorted(latencias), erros, time.perf_counter() - inicio
+
+
+def percentil(amostras, p):
+    return amostras[min(len(amostras) - 1, int(len(amostras) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--concorrencia', default='8,64,256', help='Requisições em voo, separadas por vírgula'
+    )
+    parser.add_argument(
+        '--requisicoes', type=int, default=512, help='Requisições por nível de concorrência'
+    )
+    parser.add_argument(
+        '--latencia', type=float, default=0.5, help='Latência do stub do agente (s)'
+    )
+    parser.add_argument('--workers', type=int, default=4, help='Workers sync do gunicorn')
+    args = parser.parse_args()
+    niveis = [int(n) for n in args.concorrencia.split(',')]
+
+    agente = stub_agente(args.latencia)
+    with tempfile.TemporaryDirectory() as pasta:
+        with open(os.path.join(pasta, 'bench_settings.py'), 'w') as arquivo:
+            arquivo.write(CONFIGURACAO)
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join([pasta, RAIZ]),
+            DJANGO_SETTINGS_MODULE='bench_settings',
+            DATABASE_URL=f"sqlite:///{os.path.join(pasta, 'bench.sqlite3')}",
+            DEBUG='False',
+            ALLOWED_HOSTS='127.0.0.1,localhost',
+            AURAMIND_API_URL=f'http://127.0.0.1:{agente.server_address[1]}/api/v1/auramind/',
+            AURAMIND_LIMITE_USUARIO_RAJADA='0',
+            AURAMIND_LIMITE_ESCOLA_RAJADA='0',
+            AURAMIND_QUOTA_USUARIO_DIA='0',
+            AURAMIND_QUOTA_ESCOLA_DIA='0',
+            AURAMIND_CACHE_SEMANTICO='False',
+            # Shared state in per-process memory, as with Redis in production:
+            # the database cache would add SQLite write contention of its own
+            AURAMIND_CACHE_DB_FALLBACK='False',
+            AURAMIND_ASYNC_POOL_MAXSIZE=str(max(niveis)),
+        )
+        token = preparar_banco(env)
+
+        porta_wsgi, porta_asgi = porta_livre(), porta_livre()
+        servidores = {
+            f'gunicorn sync ({args.workers} workers)': (
+                [
+                    sys.executable,
+                    '-m',
+                    'gunicorn',
+                    'config.wsgi:application',
+                    '--workers',
+                    str(args.workers),
+                    '--bind',
+                    f'127.0.0.1:{porta_wsgi}',
+                    '--timeout',
+                    '300',
+                    '--backlog',
+                    '2048',
+                ],
+                porta_wsgi,
+                'api/sugestoes_planejamento/',
+            ),
+            'uvicorn ASGI (1 worker)': (
+                [
+                    sys.executable,
+                    '-m',
+                    'uvicorn',
+                    'config.asgi:application',
+                    '--port',
+                    str(porta_asgi),
+                    '--log-level',
+                    'warning',
+                    '--backlog',
+                    '2048',
+                    '--timeout-graceful-shutdown',
+                    '5',
+                ],
+                porta_asgi,
+                'async/sugestoes_planejamento/',
+            ),
+        }
+
+        print(
+            f"Agente stub: {args.latencia * 1000:.0f} ms por chamada; "
+            f"{args.requisicoes} requisições por nível"
+        )
+        print(
+            f"{'servidor':<28} {'em voo':>7} {'req/s':>8} "
+            f"{'p50 (ms)':>10} {'p99 (ms)':>10} {'erros':>6}"
+        )
+        for nome, (comando, porta, caminho) in servidores.items():
+            processo = iniciar(comando, env, porta, os.path.join(pasta, f'{porta}.log'))
+            try:
+                url = f'http://127.0.0.1:{porta}/api/v1/auramind/{caminho}'
+                asyncio.run(carga(url, token, min(niveis), min(niveis), 'aquecimento'))
+                for nivel in niveis:
+                    latencias, erros, duracao = asyncio.run(
+                        carga(url, token, args.requisicoes, nivel, f'{nome} {nivel}')
+                    )
+                    print(
+                        f"{nome:<28} {nivel:>7} {len(latencias) / duracao:>8.1f} "
+                        f"{percentil(latencias, 50):>10.1f} {percentil(latencias, 99):>10.1f} "
+                        f"{erros:>6}"
+                    )
+            finally:
+                processo.terminate()
+                try:
+                    processo.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    processo.kill()
+                    processo.wait()
+    agente.shutdown()
+
+
+if __name__ == '__main__':
+    main()
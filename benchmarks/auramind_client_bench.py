@@ -0,0 +1,131 @@
+"""
+Benchmark: pooled keep-alive session vs. one connection per call.
+
+Starts a local stub of ``auramind_service/main.py`` (same routes and response
+shape, no FastAPI needed) and measures p50/p99 latency of
+``sugestoes_planejamento`` calls made with the module-level ``requests.post``
+(old behaviour) and with the pooled session from ``apps.auramind.client``.
+
+Uso:
+    python benchmarks/auramind_client_bench.py --requests 2000 --threads 4
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:
+    settings.configure(
+        AURAMIND_CONNECT_TIMEOUT=3.05,
+        AURAMIND_READ_TIMEOUT=60,
+        AURAMIND_POOL_CONNECTIONS=2,
+        AURAMIND_POOL_MAXSIZE=10,
+        AURAMIND_POOL_BLOCK=False,
+    )
+
+from apps.auramind.client import get_session, get_timeout  # noqa: E402
+
+RESPOSTA_STUB = json.dumps({
+    'titulo': 'Planejamento: Ciclo da Água (4ef)',
+    'introducao': 'Planejamento gerado pelo stub de benchmark.',
+    'unidades_tematicas': [
+        {'titulo': 'Unidade 1', 'semanas': 1, 'habilidades': ['EF04CI02'], 'descricao': '...'},
+    ],
+    'atividades_sugeridas': [
+        {'titulo': 'Exploração Inicial', 'tipo': 'exercicio', 'duracao_min': 30},
+    ],
+    'recursos_necessarios': ['Quadro branco e marcadores'],
+    'avaliacoes_propostas': ['Observação contínua das atividades'],
+    'score_aderencia_bncc': 0.92,
+    'observacoes': 'stub',
+}).encode()
+
+
+class StubAuraMindHandler(BaseHTTPRequestHandler):
+    """Minimal HTTP/1.1 stub answering like the AuraMind agent."""
+    protocol_version = 'HTTP/1.1'
+    # uvicorn sets TCP_NODELAY; without it delayed ACKs dominate keep-alive latency
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPOSTA_STUB)))
+        self.end_headers()
+        self.wfile.write(RESPOSTA_STUB)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubAuraMindHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(post, url, total, threads):
+    payload = {
+        'nivel_ensino': '4ef',
+        'tema': 'Ciclo da Água',
+        'habilidades_bncc': ['EF04CI02', 'EF04CI03'],
+    }
+
+    def call(_):
+        inicio = time.perf_counter()
+        response = post(url, json=payload, timeout=get_timeout())
+        response.json()
+        return (time.perf_counter() - inicio) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return sorted(executor.map(call, range(total)))
+
+
+def percentile(amostras, p):
+    return amostras[min(len(amostras) - 1, int(len(amostras) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_stub()
+    url = f'http://127.0.0.1:{server.server_address[1]}/api/v1/auramind/sugestoes_planejamento/'
+
+    # Warm-up both paths
+    run(requests.post, url, 50, args.threads)
+    run(get_session().post, url, 50, args.threads)
+
+    resultados = {
+        'requests.post (sem pool)': run(requests.post, url, args.requests, args.threads),
+        'sessão com pool (keep-alive)': run(get_session().post, url, args.requests, args.threads),
+    }
+    server.shutdown()
+
+    print(f"{args.requests} requisições, {args.threads} threads")
+    print(f"{'cliente':<30} {'p50 (ms)':>10} {'p99 (ms)':>10} {'média (ms)':>11}")
+    for nome, amostras in resultados.items():
+        print(
+            f"{nome:<30} {percentile(amostras, 50):>10.3f} "
+            f"{percentile(amostras, 99):>10.3f} {statistics.mean(amostras):>11.3f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark: JSON serialization and compression of agent payloads.
+
+Builds synthetic bodies shaped like the agent's largest traffic (the analysis
+batch request ``analise_plano/batch/`` and its response) with 1 to 500 plans
+and measures, per payload size:
+
+- ``json`` vs ``orjson`` dumps and loads (what Django and the agent used
+  before and after the switch to orjson);
+- gzip (level 1 by default, as ``codificar_json`` and
+  ``MiddlewareCompressao``) and, if the ``brotli`` package is installed,
+  brotli (quality 1) size, compression and decompression time.
+
+Uso:
+    python benchmarks/auramind_json_bench.py --tamanhos 1,32,200,500 --repeticoes 50 --nivel-gzip 1
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+
+import orjson
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VOCABULARIO = (
+    'alunos observam ciclo água experimento garrafa registram etapas evaporação condensação '
+    'caderno discutem grupo relação clima local professora apresenta mapa conceitual leitura '
+    'texto informativo produção escrita cartaz roda conversa hipóteses investigação medição '
+    'temperatura tabela gráfico comparação resultados sistematização avaliação formativa '
+    'rubrica autoavaliação colegas registro fotografia horta escola chuva rios bacia '
+    'hidrográfica consumo consciente desperdício família'
+).split()
+
+
+def texto(aleatorio, palavras):
+    """Pseudo-random Portuguese text (keeps compression ratios realistic)."""
+    return ' '.join(aleatorio.choice(VOCABULARIO) for _ in range(palavras)) + '.'
+
+
+def plano(i):
+    aleatorio = random.Random(i)
+    return {
+        'plano_id': i,
+        'titulo': f'Plano {i}: Ciclo da Água',
+        'nivel_ensino': '5ef',
+        'habilidades_bncc': ['EF05CI02', 'EF05CI03', 'EF05CI04'],
+        'objetivos_aprendizagem': texto(aleatorio, 60),
+        'atividade_dirigida': texto(aleatorio, 90),
+        'desenvolvimento': texto(aleatorio, 150),
+        'avaliacao': texto(aleatorio, 30),
+    }
+
+
+def analise(i):
+    aleatorio = random.Random(-i - 1)
+    return {
+        'indice': i,
+        'sucesso': True,
+        'erro': None,
+        'analise': {
+            'plano_id': i,
+            'score_geral': 0.78,
+            'aderencia_bncc': 0.81,
+            'qualidade_pedagogica': 0.74,
+            'cobertura_habilidades': [
+                {
+                    'codigo': codigo,
+                    'cobertura': 0.66,
+                    'situacao': 'parcial',
+                    'motivo': '',
+                    'secoes': {
+                        'objetivos': 0.8,
+                        'atividade': 0.6,
+                        'desenvolvimento': 0.7,
+                        'avaliacao': 0.3,
+                    },
+                }
+                for codigo in ('EF05CI02', 'EF05CI03', 'EF05CI04')
+            ],
+            'pontos_fortes': [
+                {'aspecto': 'Atividade', 'descricao': texto(aleatorio, 30), 'impacto': 'alto'}
+            ],
+            'pontos_revisar': [
+                {'aspecto': 'Avaliação', 'descricao': texto(aleatorio, 30), 'impacto': 'médio'}
+                for _ in range(2)
+            ],
+            'sugestoes_melhoria': [
+                'Inclua uma rubrica de avaliação.',
+                'Relacione com o clima da região.',
+            ],
+            'recomendacao_final': 'APROVADO_COM_AJUSTES',
+            'timestamp': '2024-05-01T10:00:00',
+            'metadata': {'etapas_ms': {'habilidades': 1.2, 'aderencia': 3.4, 'pontos': 0.8}},
+        },
+    }
+
+
+def payloads(tamanho):
+    return {
+        'requisição': {'planos': [plano(i) for i in range(tamanho)]},
+        'resposta': {
+            'resultados': [analise(i) for i in range(tamanho)],
+            'total': tamanho, 'sucessos': tamanho, 'falhas': 0, 'tempo_processamento_ms': 1234,
+        },
+    }
+
+
+def medir(funcao, repeticoes):
+    """Median time of ``funcao()`` in ms."""
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        amostras.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(amostras)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--tamanhos', default='1,32,200,500', help='Planos por lote, separados por vírgula'
+    )
+    parser.add_argument('--repeticoes', type=int, default=50)
+    parser.add_argument('--nivel-gzip', type=int, default=1)
+    parser.add_argument('--qualidade-brotli', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'corpo':<12} {'planos':>6} {'bytes':>9} {'json dumps':>11} {'orjson dumps':>13} "
+          f"{'json loads':>11} {'orjson loads':>13}   (ms, mediana)")
+    compressao = []
+    for tamanho in (int(t) for t in args.tamanhos.split(',')):
+        for nome, dados in payloads(tamanho).items():
+            serializado = json.dumps(dados)
+            corpo = orjson.dumps(dados)
+            print(
+                f"{nome:<12} {tamanho:>6} {len(corpo):>9} "
+                f"{medir(lambda: json.dumps(dados), args.repeticoes):>11.3f} "
+                f"{medir(lambda: orjson.dumps(dados), args.repeticoes):>13.3f} "
+                f"{medir(lambda: json.loads(serializado), args.repeticoes):>11.3f} "
+                f"{medir(lambda: orjson.loads(corpo), args.repeticoes):>13.3f}"
+            )
+
+            gz = gzip.compress(corpo, compresslevel=args.nivel_gzip)
+            linha = [
+                nome,
+                tamanho,
+                len(corpo),
+                len(gz),
+                medir(lambda: gzip.compress(corpo, compresslevel=args.nivel_gzip), args.repeticoes),
+                medir(lambda: gzip.decompress(gz), args.repeticoes),
+            ]
+            if brotli is not None:
+                br = brotli.compress(corpo, quality=args.qualidade_brotli)
+                linha += [
+                    len(br),
+                    medir(
+                        lambda: brotli.compress(corpo, quality=args.qualidade_brotli),
+                        args.repeticoes,
+                    ),
+                    medir(lambda: brotli.decompress(br), args.repeticoes),
+                ]
+            compressao.append(linha)
+
+    print()
+    cabecalho = (
+        f"{'corpo':<12} {'planos':>6} {'bytes':>9} {'gzip':>9} {'comprime':>9} {'descomp.':>9}"
+    )
+    if brotli is not None:
+        cabecalho += f" {'brotli':>9} {'comprime':>9} {'descomp.':>9}"
+    print(cabecalho + "   (bytes / ms)")
+    for linha in compressao:
+        nome, tamanho, bruto, *resto = linha
+        colunas = ''.join(
+            f" {valor:>9}" if isinstance(valor, int) else f" {valor:>9.3f}" for valor in resto
+        )
+        print(f"{nome:<12} {tamanho:>6} {bruto:>9}{colunas}")
+    if brotli is None:
+        print("(pacote brotli não instalado: apenas gzip)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: startup of the AuraMind agent's BNCC index, fitted vs. memory-mapped.
+
+Each sample is a fresh Python process that loads the index either by fitting
+the TF-IDF from the JSON catalogue (no artifact) or from the precompiled
+artifact built by ``auramind_service/artefatos.py`` (``numpy.memmap``), runs
+one similarity query and reports the load time, the first query time and its
+anonymous (non-shareable) memory from ``/proc/self/smaps_rollup``.
+
+``--replicas N`` multiplies the packaged catalogue (up to 9x, with shifted
+codes) to approximate the full BNCC.
+
+Uso:
+    python benchmarks/auramind_startup_bench.py --amostras 5 --replicas 9
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SERVICO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'auramind_service'
+)
+
+FILHO = r'''
+import json, sys, time
+sys.path.insert(0, {servico!r})
+import numpy, sklearn.feature_extraction.text  # dependências fora da medição
+from artefatos import carregar_indice
+
+inicio = time.perf_counter()
+indice, artefato = carregar_indice({catalogo!r}, {artefatos!r})
+carga = time.perf_counter() - inicio
+
+inicio = time.perf_counter()
+indice.similaridades(["frações e números decimais na reta numérica"])
+consulta = time.perf_counter() - inicio
+
+anonima = None
+try:
+    with open("/proc/self/smaps_rollup") as arquivo:
+        for linha in arquivo:
+            if linha.startswith("Anonymous:"):
+                anonima = int(linha.split()[1])
+except OSError:
+    pass
+print(json.dumps({{"artefato": artefato, "carga_ms": carga * 1000, "consulta_ms": consulta * 1000,
+                  "anonima_kb": anonima, "habilidades": len(indice)}}))
+'''
+
+
+def catalogo_replicado(origem, replicas, destino):
+    """Copy of the catalogue with ``replicas`` shifted copies of every skill."""
+    with open(origem, encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+    habilidades = []
+    for replica in range(replicas):
+        for item in dados['habilidades']:
+            codigo = item['codigo']
+            numero = int(codigo[-2:]) + 100 * replica
+            habilidades.append(
+                dict(
+                    item,
+                    codigo=f"{codigo[:-2]}{numero:02d}",
+                    descricao=(
+                        item['descricao']
+                        if not replica
+                        else f"{item['descricao']} (variação {replica})"
+                    ),
+                )
+            )
+    dados['habilidades'] = habilidades
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False)
+
+
+def amostrar(catalogo, artefatos, amostras):
+    codigo = FILHO.format(servico=SERVICO, catalogo=catalogo, artefatos=artefatos)
+    resultados = []
+    for _ in range(amostras):
+        saida = subprocess.run(
+            [sys.executable, '-c', codigo], capture_output=True, text=True, check=True
+        )
+        resultados.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--amostras', type=int, default=5)
+    parser.add_argument('--replicas', type=int, default=1, choices=range(1, 10))
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVICO)
+    from artefatos import construir
+
+    with tempfile.TemporaryDirectory() as temporario:
+        catalogo = os.path.join(temporario, 'bncc.json')
+        catalogo_replicado(
+            os.path.join(SERVICO, 'data', 'bncc_habilidades.json'), args.replicas, catalogo
+        )
+        artefatos = os.path.join(temporario, 'artefatos')
+        vazio = os.path.join(temporario, 'sem_artefatos')
+
+        versao = construir(catalogo, artefatos)
+        resultados = {
+            'ajuste do catálogo (JSON)': amostrar(catalogo, vazio, args.amostras),
+            f'artefato memmap ({versao})': amostrar(catalogo, artefatos, args.amostras),
+        }
+
+    habilidades = next(iter(resultados.values()))[0]['habilidades']
+    print(f"{habilidades} habilidades, {args.amostras} processos por modo (medianas)")
+    print(f"{'modo':<45} {'carga (ms)':>11} {'1ª consulta (ms)':>17} {'anônima (MiB)':>14}")
+    for nome, amostras in resultados.items():
+        anonimas = [
+            amostra['anonima_kb'] for amostra in amostras if amostra['anonima_kb'] is not None
+        ]
+        print(
+            f"{nome:<45} {statistics.median(a['carga_ms'] for a in amostras):>11.1f} "
+            f"{statistics.median(a['consulta_ms'] for a in amostras):>17.2f} "
+            f"{(statistics.median(anonimas) / 1024 if anonimas else float('nan')):>14.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
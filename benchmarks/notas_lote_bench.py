@@ -0,0 +1,154 @@
+"""
+Benchmark: entering a class's grades one POST per cell vs. the bulk endpoint.
+
+Creates a throwaway SQLite database with one turma of ``--alunos`` students
+and ``--avaliacoes`` assessments, then times, through the full Django stack
+(middleware, authentication, JSON):
+
+- one ``POST /api/v1/pedagogico/notas/`` per cell (what clients did before);
+- ``POST /api/v1/pedagogico/notas/lote/`` with the whole grid, creating the
+  grades and then updating them (upsert).
+
+Every write also updates the turma's gradebook (``BoletimTurma``).
+
+The project settings do not set ``AUTH_USER_MODEL``; the benchmark runs with
+a settings module that does (``core.User``), as the other benchmarks.
+
+Uso:
+    python benchmarks/notas_lote_bench.py --alunos 40 --avaliacoes 5 --repeticoes 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURACAO = '''
+from config.settings import *  # noqa: F401,F403
+
+AUTH_USER_MODEL = 'core.User'
+ALLOWED_HOSTS = ['testserver']
+
+
+class _SemMigracoes(dict):
+    """The apps have no migrations: create the tables straight from the models."""
+
+    def __contains__(self, app):
+        return True
+
+    def __getitem__(self, app):
+        return None
+
+
+MIGRATION_MODULES = _SemMigracoes()
+'''
+
+
+def preparar(pasta, num_alunos, num_avaliacoes):
+    """Configure Django on a new database with one turma; return (professor, alunos, avaliacoes)."""
+    with open(os.path.join(pasta, 'bench_settings.py'), 'w') as arquivo:
+        arquivo.write(CONFIGURACAO)
+    sys.path[:0] = [pasta, RAIZ]
+    os.environ.update(
+        DJANGO_SETTINGS_MODULE='bench_settings',
+        DATABASE_URL=f"sqlite:///{os.path.join(pasta, 'bench.sqlite3')}",
+        DEBUG='False',
+    )
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from apps.administrativo.models import Escola
+    from apps.core.models import User
+    from apps.pedagogico.models import Aluno, Avaliacao, Turma
+
+    call_command('migrate', run_syncdb=True, verbosity=0, skip_checks=True)
+    professor = User.objects.create(username='prof_bench')
+    escola = Escola.objects.create(nome='Escola Bench', cnpj='00.000.000/0001-99')
+    turma = Turma.objects.create(
+        escola=escola,
+        nome='5º A',
+        nivel_ensino='5ef',
+        professor=professor,
+        ano_letivo=2025,
+        semestre=1,
+    )
+    alunos = [
+        Aluno.objects.create(
+            user=User.objects.create(username=f'aluno{i}', first_name='Aluno', last_name=str(i)),
+            matricula=f'M{i}',
+        )
+        for i in range(num_alunos)
+    ]
+    avaliacoes = [
+        Avaliacao.objects.create(
+            turma=turma,
+            professor=professor,
+            titulo=f'Avaliação {i}',
+            tipo=('formativa', 'somativa')[i % 2],
+            descricao='Descrição',
+            data='2025-05-10',
+        )
+        for i in range(num_avaliacoes)
+    ]
+    return professor, alunos, avaliacoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--alunos', type=int, default=40, help='Alunos da turma')
+    parser.add_argument('--avaliacoes', type=int, default=5, help='Avaliações da turma')
+    parser.add_argument('--repeticoes', type=int, default=20, help='Rodadas por medição')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        professor, alunos, avaliacoes = preparar(pasta, args.alunos, args.avaliacoes)
+
+        from rest_framework.test import APIClient
+        from apps.pedagogico.models import NotaAluno
+
+        cliente = APIClient()
+        cliente.force_authenticate(user=professor)
+
+        def grade(valor):
+            return [
+                {'aluno': aluno.pk, 'avaliacao': avaliacao.pk, 'valor': valor}
+                for aluno in alunos for avaliacao in avaliacoes
+            ]
+
+        def individual():
+            for celula in grade('7.5'):
+                resposta = cliente.post('/api/v1/pedagogico/notas/', celula, format='json')
+                assert resposta.status_code == 201, resposta.content[:200]
+
+        def lote(valor):
+            resposta = cliente.post(
+                '/api/v1/pedagogico/notas/lote/', {'notas': grade(valor)}, format='json'
+            )
+            assert resposta.status_code == 200, resposta.content[:200]
+
+        medicoes = [
+            ('um POST por nota (criação)', individual, True),
+            ('lote (criação)', lambda: lote('7.5'), True),
+            ('lote (atualização)', lambda: lote('8'), False),
+        ]
+        celulas = args.alunos * args.avaliacoes
+        print(f"Grade de {args.alunos} alunos × {args.avaliacoes} avaliações ({celulas} notas)")
+        print(f"{'envio':<28} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+        for nome, enviar, limpar in medicoes:
+            tempos = []
+            for _ in range(args.repeticoes + 1):
+                if limpar:
+                    NotaAluno.objects.all().delete()
+                inicio = time.perf_counter()
+                enviar()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            tempos = sorted(tempos[1:])
+            p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+            print(f"{nome:<28} {statistics.median(tempos):>10.1f} {p95:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
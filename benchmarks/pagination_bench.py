@@ -0,0 +1,177 @@
+"""
+Benchmark: page-number vs cursor (keyset) pagination of ``/api/v1/auramind/logs/``.
+
+Fills a throwaway SQLite database with ``--linhas`` LogIa rows, each with its
+own ``created_at``, and times the ``LogIaViewSet`` list (serialization
+included) on the first page and on page ``--pagina``:
+
+- ``PageNumberPagination`` (the project default): ``?page=N`` runs a
+  ``COUNT(*)`` and an ``OFFSET`` that reads every row before the page;
+- ``paginacao_cursor('-created_at', '-id')`` (what the ViewSet uses): the
+  cursor of the same page filters on ``created_at`` and reads only its rows
+  from the ``(-created_at, -id)`` index;
+- the same cursor after dropping that index, to show what the index buys.
+
+The project settings do not set ``AUTH_USER_MODEL``; the benchmark runs with
+a settings module that does (``core.User``), as the other benchmarks.
+
+Uso:
+    python benchmarks/pagination_bench.py --linhas 120000 --pagina 5000 --repeticoes 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURACAO = '''
+from config.settings import *  # noqa: F401,F403
+
+AUTH_USER_MODEL = 'core.User'
+
+
+class _SemMigracoes(dict):
+    """The apps have no migrations: create the tables straight from the models."""
+
+    def __contains__(self, app):
+        return True
+
+    def __getitem__(self, app):
+        return None
+
+
+MIGRATION_MODULES = _SemMigracoes()
+'''
+
+
+def preparar(pasta, linhas):
+    """Configure Django on a new database holding ``linhas`` LogIa rows; return their user."""
+    with open(os.path.join(pasta, 'bench_settings.py'), 'w') as arquivo:
+        arquivo.write(CONFIGURACAO)
+    sys.path[:0] = [pasta, RAIZ]
+    os.environ.update(
+        DJANGO_SETTINGS_MODULE='bench_settings',
+        DATABASE_URL=f"sqlite:///{os.path.join(pasta, 'bench.sqlite3')}",
+        DEBUG='False',
+    )
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from apps.auramind.models import LogIa
+    from apps.core.models import User
+
+    call_command('migrate', run_syncdb=True, verbosity=0, skip_checks=True)
+    usuario = User.objects.create(username='bench')
+    with transaction.atomic():
+        for inicio in range(0, linhas, 10_000):
+            LogIa.objects.bulk_create(
+                LogIa(
+                    usuario=usuario,
+                    tipo='sugestao',
+                    entrada={'plano_id': i},
+                    saida={'titulo': f'Sugestão {i}'},
+                    custo_token=420,
+                    tempo_resposta_ms=900,
+                )
+                for i in range(inicio, min(linhas, inicio + 10_000))
+            )
+        # One second apart, so the ordering is the insertion order
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {LogIa._meta.db_table} "
+                "SET created_at = datetime('2025-01-01', '+' || id || ' seconds')"
+            )
+        connection.cursor().execute('ANALYZE')
+    return usuario
+
+
+def cronometrar(view, usuario, params, repeticoes):
+    """Median and p95 (ms) of ``repeticoes`` GETs of the LogIa list with ``params``."""
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    fabrica = APIRequestFactory()
+    tempos = []
+    for _ in range(repeticoes + 1):
+        requisicao = fabrica.get('/api/v1/auramind/logs/', params)
+        force_authenticate(requisicao, user=usuario)
+        inicio = time.perf_counter()
+        resposta = view(requisicao)
+        resposta.render()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        assert resposta.status_code == 200, resposta.content[:200]
+    tempos = sorted(tempos[1:])
+    return statistics.median(tempos), tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+
+
+def cursor_da_pagina(view_class, pagina):
+    """``cursor`` param pointing where page ``pagina`` starts (as reached by following ``next``)."""
+    from rest_framework.pagination import Cursor
+    from apps.auramind.models import LogIa
+
+    paginador = view_class.pagination_class()
+    posicao = LogIa.objects.order_by(*view_class.ordering).values_list('created_at', flat=True)[
+        (pagina - 1) * paginador.page_size - 1
+    ]
+    paginador.base_url = 'http://testserver/'
+    url = paginador.encode_cursor(Cursor(offset=0, reverse=False, position=str(posicao)))
+    return url.split('cursor=')[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--linhas', type=int, default=120_000, help='Linhas de LogIa')
+    parser.add_argument(
+        '--pagina', type=int, default=5000, help='Página distante comparada à primeira'
+    )
+    parser.add_argument('--repeticoes', type=int, default=20, help='Requisições por medição')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        inicio = time.perf_counter()
+        usuario = preparar(pasta, args.linhas)
+        print(f"{args.linhas} linhas de LogIa em {time.perf_counter() - inicio:.1f} s")
+
+        from urllib.parse import unquote
+        from django.db import connection
+        from rest_framework.pagination import PageNumberPagination
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from apps.auramind.models import LogIa
+        from apps.auramind.views import LogIaViewSet
+
+        class LogIaPorPagina(LogIaViewSet):
+            pagination_class = PageNumberPagination
+
+        por_pagina = LogIaPorPagina.as_view({'get': 'list'})
+        por_cursor = LogIaViewSet.as_view({'get': 'list'})
+        cursor = unquote(cursor_da_pagina(LogIaViewSet, args.pagina))
+
+        fabrica = APIRequestFactory()
+        paginas = []
+        for view, params in ((por_pagina, {'page': args.pagina}), (por_cursor, {'cursor': cursor})):
+            requisicao = fabrica.get('/api/v1/auramind/logs/', params)
+            force_authenticate(requisicao, user=usuario)
+            paginas.append([log['id'] for log in view(requisicao).data['results']])
+        assert paginas[0] == paginas[1], 'o cursor não aponta para a mesma página'
+
+        medicoes = [
+            ('página (?page=N)', por_pagina, {'page': 1}, {'page': args.pagina}),
+            ('cursor', por_cursor, {}, {'cursor': cursor}),
+            ('cursor sem índice', por_cursor, {}, {'cursor': cursor}),
+        ]
+        print(f"{'paginação':<24} {'página':>7} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+        for nome, view, primeira, distante in medicoes:
+            if nome == 'cursor sem índice':
+                indice = next(i for i in LogIa._meta.indexes if i.fields == ['-created_at', '-id'])
+                with connection.schema_editor() as editor:
+                    editor.remove_index(LogIa, indice)
+            for pagina, params in ((1, primeira), (args.pagina, distante)):
+                p50, p95 = cronometrar(view, usuario, params, args.repeticoes)
+                print(f"{nome:<24} {pagina:>7} {p50:>10.2f} {p95:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
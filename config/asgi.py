@@ -0,0 +1,15 @@
+"""
+ASGI config for AuraClass project.
+
+Serves the async AuraMind views (``/api/v1/auramind/async/``) with one event
+loop per worker; the rest of the API stays on ``config/wsgi.py``.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('DJANGO_ASGI', 'True')
+
+application = get_asgi_application()
@@ -58,6 +58,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# config/asgi.py serves the async AuraMind views. whitenoise is sync-only: under
+# ASGI it would pin a thread to every in-flight request (static files stay on WSGI)
+if env.bool('DJANGO_ASGI', default=False):
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -155,6 +160,117 @@ CORS_ALLOWED_ORIGINS = env.list(
 # AuraMind Configuration
 AURAMIND_API_URL = env('AURAMIND_API_URL', default='http://localhost:8001/api/v1/auramind/')
 AURAMIND_API_KEY = env('AURAMIND_API_KEY', default='dev-key-change-in-production')
+AURAMIND_CONNECT_TIMEOUT = env.float('AURAMIND_CONNECT_TIMEOUT', default=3.05)
+AURAMIND_READ_TIMEOUT = env.float('AURAMIND_READ_TIMEOUT', default=60)
+# Connection pool per gunicorn worker (one pool per host, POOL_MAXSIZE sockets each)
+AURAMIND_POOL_CONNECTIONS = env.int('AURAMIND_POOL_CONNECTIONS', default=2)
+AURAMIND_POOL_MAXSIZE = env.int('AURAMIND_POOL_MAXSIZE', default=10)
+AURAMIND_POOL_BLOCK = env.bool('AURAMIND_POOL_BLOCK', default=False)
+# Async views (ASGI): httpx connections per event loop and max wait for a free one (s)
+AURAMIND_ASYNC_POOL_MAXSIZE = env.int('AURAMIND_ASYNC_POOL_MAXSIZE', default=200)
+AURAMIND_ASYNC_POOL_TIMEOUT = env.float('AURAMIND_ASYNC_POOL_TIMEOUT', default=10.0)
+# Agent request bodies from this size (bytes) up are sent gzip-compressed (0 disables)
+AURAMIND_COMPRESSAO_MIN_BYTES = env.int('AURAMIND_COMPRESSAO_MIN_BYTES', default=1024)
+# Async job mode (python manage.py processar_fila_ia)
+AURAMIND_FILA_WORKERS = env.int('AURAMIND_FILA_WORKERS', default=4)
+AURAMIND_FILA_INTERVALO = env.float('AURAMIND_FILA_INTERVALO', default=1.0)
+AURAMIND_FILA_LEASE = env.int('AURAMIND_FILA_LEASE', default=300)
+AURAMIND_FILA_MAX_TENTATIVAS = env.int('AURAMIND_FILA_MAX_TENTATIVAS', default=3)
+AURAMIND_LONG_POLL_MAX = env.int('AURAMIND_LONG_POLL_MAX', default=25)
+# Response cache (TTL in seconds, 0 disables)
+AURAMIND_CACHE_TTL = env.int('AURAMIND_CACHE_TTL', default=60 * 60 * 24)
+AURAMIND_CACHE_DB_FALLBACK = env.bool('AURAMIND_CACHE_DB_FALLBACK', default=True)
+# Near-duplicate suggestion cache (MinHash/LSH over SugestaoIa, per process):
+# Jaccard threshold on the words of contexto_previo, index size and refresh interval (s)
+AURAMIND_CACHE_SEMANTICO = env.bool('AURAMIND_CACHE_SEMANTICO', default=True)
+AURAMIND_CACHE_SEMANTICO_LIMIAR = env.float('AURAMIND_CACHE_SEMANTICO_LIMIAR', default=0.85)
+AURAMIND_CACHE_SEMANTICO_MAX_ENTRADAS = env.int(
+    'AURAMIND_CACHE_SEMANTICO_MAX_ENTRADAS', default=20000
+)
+AURAMIND_CACHE_SEMANTICO_ATUALIZACAO = env.float('AURAMIND_CACHE_SEMANTICO_ATUALIZACAO', default=10)
+# Single-flight coalescing of identical calls: off | local | cache | db (PostgreSQL advisory lock)
+AURAMIND_COALESCING = env('AURAMIND_COALESCING', default='local')
+AURAMIND_COALESCING_CACHE = env(
+    'AURAMIND_COALESCING_CACHE',
+    default='auramind_db' if AURAMIND_CACHE_DB_FALLBACK else 'default'
+)
+AURAMIND_COALESCING_TIMEOUT = env.float(
+    'AURAMIND_COALESCING_TIMEOUT', default=AURAMIND_READ_TIMEOUT + 5
+)
+AURAMIND_COALESCING_LEASE = env.int(
+    'AURAMIND_COALESCING_LEASE', default=int(AURAMIND_READ_TIMEOUT) + 10
+)
+AURAMIND_COALESCING_RESULT_TTL = env.int('AURAMIND_COALESCING_RESULT_TTL', default=15)
+AURAMIND_COALESCING_POLL = env.float('AURAMIND_COALESCING_POLL', default=0.1)
+# Circuit breaker (state shared by all workers through AURAMIND_BREAKER_CACHE)
+AURAMIND_BREAKER_CACHE = env('AURAMIND_BREAKER_CACHE', default=AURAMIND_COALESCING_CACHE)
+AURAMIND_BREAKER_FALHAS = env.int('AURAMIND_BREAKER_FALHAS', default=5)
+AURAMIND_BREAKER_RESET = env.int('AURAMIND_BREAKER_RESET', default=30)
+# Retry with jittered exponential backoff (5xx and connection errors only)
+AURAMIND_RETRY_MAX = env.int('AURAMIND_RETRY_MAX', default=2)
+AURAMIND_RETRY_BASE_DELAY = env.float('AURAMIND_RETRY_BASE_DELAY', default=0.5)
+AURAMIND_RETRY_MAX_DELAY = env.float('AURAMIND_RETRY_MAX_DELAY', default=5)
+# Rate limits per user and per school (token buckets, 0 disables) and daily
+# token quotas (sum of LogIa.custo_token since local midnight, 0 disables)
+AURAMIND_LIMITE_CACHE = env('AURAMIND_LIMITE_CACHE', default=AURAMIND_BREAKER_CACHE)
+AURAMIND_LIMITE_USUARIO_RAJADA = env.int('AURAMIND_LIMITE_USUARIO_RAJADA', default=20)
+AURAMIND_LIMITE_USUARIO_POR_MINUTO = env.float('AURAMIND_LIMITE_USUARIO_POR_MINUTO', default=10)
+AURAMIND_LIMITE_ESCOLA_RAJADA = env.int('AURAMIND_LIMITE_ESCOLA_RAJADA', default=200)
+AURAMIND_LIMITE_ESCOLA_POR_MINUTO = env.float('AURAMIND_LIMITE_ESCOLA_POR_MINUTO', default=100)
+AURAMIND_QUOTA_USUARIO_DIA = env.int('AURAMIND_QUOTA_USUARIO_DIA', default=200000)
+AURAMIND_QUOTA_ESCOLA_DIA = env.int('AURAMIND_QUOTA_ESCOLA_DIA', default=2000000)
+# Scheduler of agent calls (interactive before bulk, fair per school).
+# VAGAS: calls in flight per process; beyond the pool size connections are not reused anyway
+AURAMIND_AGENDADOR_VAGAS = env.int('AURAMIND_AGENDADOR_VAGAS', default=AURAMIND_POOL_MAXSIZE)
+AURAMIND_AGENDADOR_CACHE = env('AURAMIND_AGENDADOR_CACHE', default=AURAMIND_BREAKER_CACHE)
+AURAMIND_AGENDADOR_JANELA = env.float('AURAMIND_AGENDADOR_JANELA', default=2.0)
+AURAMIND_AGENDADOR_LOTE_ESPERA_MAX = env.float('AURAMIND_AGENDADOR_LOTE_ESPERA_MAX', default=30)
+# Weighted fair queuing weights per school id, e.g. "1=2;7=0.5" (default 1)
+AURAMIND_AGENDADOR_PESOS = env.dict('AURAMIND_AGENDADOR_PESOS', cast={'value': float}, default={})
+# Batch suggestions (one agent call per plan); keep <= AURAMIND_LOTE_MAX_ITENS of the agent
+AURAMIND_LOTE_MAX_ITENS = env.int('AURAMIND_LOTE_MAX_ITENS', default=32)
+# Bulk re-analysis (manage.py reanalisar_planos);
+# keep LOTE <= AURAMIND_ANALISE_LOTE_MAX_ITENS of the agent
+AURAMIND_REANALISE_LOTE = env.int('AURAMIND_REANALISE_LOTE', default=200)
+AURAMIND_REANALISE_CHECKPOINT = env(
+    'AURAMIND_REANALISE_CHECKPOINT', default=str(BASE_DIR / 'reanalise_ia.json')
+)
+# LogIa write-behind: rows are buffered and saved with bulk_create (LOTE <= 1 saves immediately)
+AURAMIND_LOG_LOTE = env.int('AURAMIND_LOG_LOTE', default=50)
+AURAMIND_LOG_INTERVALO = env.float('AURAMIND_LOG_INTERVALO', default=2.0)
+AURAMIND_LOG_BUFFER_MAX = env.int('AURAMIND_LOG_BUFFER_MAX', default=5000)
+# saida bodies above this size are stored compressed or truncated (0 disables)
+AURAMIND_LOG_SAIDA_MAX_BYTES = env.int('AURAMIND_LOG_SAIDA_MAX_BYTES', default=16384)
+AURAMIND_LOG_SAIDA_MODO = env('AURAMIND_LOG_SAIDA_MODO', default='comprimir')  # comprimir | truncar
+
+# Cache Configuration
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    # AuraMind responses: per-process LRU (MAX_ENTRIES) in front of a shared DB table
+    'auramind': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auramind',
+        'TIMEOUT': AURAMIND_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': env.int('AURAMIND_CACHE_MAX_ENTRIES', default=1000)},
+    },
+}
+if AURAMIND_CACHE_DB_FALLBACK:
+    # Requires: python manage.py createcachetable
+    CACHES['auramind_db'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'auramind_cache',
+        'TIMEOUT': AURAMIND_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': env.int('AURAMIND_CACHE_DB_MAX_ENTRIES', default=20000)},
+    }
+
+# Log retention (LogIa, AuditLog): python manage.py gerenciar_particoes
+LOG_PARTICOES_FUTURAS = env.int('LOG_PARTICOES_FUTURAS', default=3)
+LOG_RETENCAO_MESES = env.int('LOG_RETENCAO_MESES', default=12)
+LOG_RETENCAO_ACAO = env('LOG_RETENCAO_ACAO', default='exportar')  # arquivar | exportar | descartar
+LOG_ARQUIVO_DIR = env('LOG_ARQUIVO_DIR', default=str(BASE_DIR / 'arquivo'))
+
+# Bulk grade entry (POST /api/v1/pedagogico/notas/lote/): max cells per request
+NOTAS_LOTE_MAX_ITENS = env.int('NOTAS_LOTE_MAX_ITENS', default=2000)
 
 # n8n Configuration
 N8N_WEBHOOK_URL = env('N8N_WEBHOOK_URL', default='http://localhost:5678/webhook/')
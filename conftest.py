@@ -2,8 +2,58 @@
 Pytest configuration and fixtures.
 """
 import os
+import sys
 import django
-from django.conf import settings
+import pytest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
+
+# The agent imports its modules by bare name, as when run from its own directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'auramind_service'))
+# CPU stages in a thread pool: no worker processes in the test run
+os.environ.setdefault('AURAMIND_PROCESSOS', '0')
+
+
+@pytest.fixture(autouse=True)
+def auramind_log_sincrono(settings):
+    """Save LogIa rows immediately so tests can assert on them."""
+    settings.AURAMIND_LOG_LOTE = 1
+
+
+@pytest.fixture(autouse=True)
+def auramind_indice_semantico_vazio():
+    """Start every test with an empty near-duplicate index (rows are rolled back)."""
+    from apps.auramind.semantico import indice_semantico
+    indice_semantico.limpar()
+
+
+@pytest.fixture(scope='session')
+def agente():
+    """TestClient of the real AuraMind agent app (``auramind_service/main.py``)."""
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def orcamento_lista_detalhe(django_assert_max_num_queries):
+    """
+    Check the query budget of a list endpoint and of the detail of its first row.
+
+    ``orcamento`` is the max queries of a list page (COUNT + page + one per
+    prefetched relation); a detail costs one query less (no COUNT). The page
+    must hold at least ``linhas`` rows, so a per-row query goes over budget.
+    """
+    def verificar(client, url, orcamento, linhas):
+        with django_assert_max_num_queries(orcamento):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert len(response.data['results']) >= linhas
+
+        with django_assert_max_num_queries(orcamento - 1):
+            response = client.get(f"{url}{response.data['results'][0]['id']}/")
+        assert response.status_code == 200
+
+    return verificar